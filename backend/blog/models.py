@@ -40,6 +40,7 @@ from .serializers import (
     StreamFieldHeadings,
 )
 from wagtail_headless_preview.models import HeadlessPreviewMixin
+from price_models import jalali
 
 User = user_model()
 
@@ -145,6 +146,8 @@ from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.search import index
 from data_management.models import AllData
+from data_management.commodities import get_resolver
+from data_management.signals import mark_dirty
 import requests
 import json
 from decimal import Decimal
@@ -247,24 +250,34 @@ class ScrollTimePage(Page):
             "Accept-Language": "fa-IR,fa;q=0.9,en-GB;q=0.8,en;q=0.7,en-US;q=0.6"
         }
         
+        from prices.response_cache import IMEResponseCache
+        cache = IMEResponseCache()
+        
         try:
-            # درخواست POST مطابق کدهای شما
-            logger.info(f"درخواست به API با پارامترهای: {payload}")
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=30)
-            
-            if response.status_code != 200:
-                logger.error(f"خطای HTTP: {response.status_code}, پاسخ: {response.text[:500]}")
-                return False, f"خطای HTTP {response.status_code}: سرور پاسخ نامعتبر داد"
+            # ابتدا از cache دیسکی پاسخ‌ها؛ در غیر این صورت درخواست POST مطابق کدهای شما
+            body = cache.load(self.api_url, payload)
+            from_cache = body is not None
+            if not from_cache:
+                logger.info(f"درخواست به API با پارامترهای: {payload}")
+                # کلاینت مشترک بورس: connection pool، محدودیت نرخ، retry و قطع‌کننده مدار
+                from prices.ime_client import get_client
+                try:
+                    response = get_client().post(self.api_url, json=payload, headers=headers, timeout=30)
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else '-'
+                    logger.error(f"خطای HTTP: {status}, پاسخ: {e}")
+                    return False, f"خطای HTTP {status}: سرور پاسخ نامعتبر داد"
+                body = response.content
             
             # پردازش پاسخ JSON
             try:
-                response_data = response.json()
+                response_data = json.loads(body)
             except ValueError as e:
-                logger.error(f"خطا در پردازش JSON: {e}, محتوا: {response.text[:500]}")
+                logger.error(f"خطا در پردازش JSON: {e}, محتوا: {body[:500]}")
                 return False, f"خطا در پردازش پاسخ: محتوای دریافتی JSON معتبر نیست"
             
             if not response_data.get("d"):
-                logger.error(f"خطا در ساختار JSON: کلید 'd' یافت نشد. پاسخ: {response_data}")
+                logger.error(f"خطا در ساختار JSON: کلید 'd' یافت نشد. پاسخ: {str(response_data)[:500]}")
                 return False, "خطا در ساختار پاسخ: داده‌های مورد انتظار یافت نشد"
             
             try:
@@ -277,6 +290,10 @@ class ScrollTimePage(Page):
                 logger.error(f"داده دریافتی لیست نیست: {type(data)}")
                 return False, f"فرمت پاسخ API نامعتبر است: {type(data)}"
             
+            # فقط پاسخ‌های سالم در cache ذخیره می‌شوند
+            if not from_cache:
+                cache.store(self.api_url, payload, body)
+            
             total_records = len(data)
             saved_count = 0
             errors_count = 0
@@ -285,46 +302,48 @@ class ScrollTimePage(Page):
                 logger.warning("هیچ داده‌ای از API دریافت نشد")
                 return False, "هیچ داده‌ای برای ذخیره‌سازی یافت نشد"
             
-            for item in data:
-                try:
-                    # بررسی فیلدهای ضروری
-                    if not all([item.get('GoodsName'), item.get('Symbol'), item.get('date')]):
-                        logger.warning(f"داده ناقص: {item}")
-                        errors_count += 1
-                        continue
-                    
-                    # ذخیره در AllData
-                    all_data, created = AllData.objects.update_or_create(
-                        symbol=item.get('Symbol', ''),
-                        transaction_date=item.get('date', ''),
-                        defaults={
-                            'commodity_name': item.get('GoodsName', ''),
-                            'final_price': float(item.get('Price')) if item.get('Price') else None,
-                            'source': f'scroll-time-{self.id}',
-                            # استفاده از Quantity به عنوان جایگزین Volume
-                            'contract_volume': float(item.get('Quantity')) if item.get('Quantity') else float(item.get('Volume')) if item.get('Volume') else None,
-                            # استفاده از TotalPrice به عنوان جایگزین Value
-                            'transaction_value': float(item.get('TotalPrice')) if item.get('TotalPrice') else float(item.get('Value')) if item.get('Value') else None,
-                            'producer': item.get('ProducerName', '') or item.get('Producer', ''),
-                            'hall': item.get('Talar', '') or item.get('Hall', ''),
-                            'raw_data': item,
-                            # اطلاعات اضافی
-                            'supplier': item.get('ArzehKonandeh', ''),
-                            'broker': item.get('cBrokerSpcName', ''),
-                            'warehouse': item.get('Warehouse', ''),
-                            'delivery_date': item.get('DeliveryDate'),
-                            'settlement_date': item.get('SettlementDate'),
-                            'contract_type': item.get('ContractType', ''),
-                            'settlement_type': item.get('Tasvieh', ''),
-                            'unit': item.get('Unit', ''),
-                        }
-                    )
-                    if created:
-                        saved_count += 1
-                except Exception as item_error:
-                    logger.error(f"خطا در ذخیره آیتم {item.get('Symbol')}: {str(item_error)}")
+            # نگاشت فیلدها مشترک با ScrollTimeService است (prices.normalizer)
+            from prices.normalizer import IMERecordNormalizer
+            normalizer = IMERecordNormalizer()
+            accepted, report = normalizer.normalize_batch(data)
+            errors_count = report.rejected
+            if report.has_issues:
+                logger.warning(f"گزارش تبدیل داده‌ها: {report.summary()}")
+            
+            objs = {}
+            for item, row in accepted:
+                # بررسی فیلدهای ضروری (تاریخ در نرمال‌سازی بررسی شده است)
+                if not all([item.get('GoodsName'), item.get('Symbol')]):
+                    logger.warning(f"داده ناقص: {item}")
                     errors_count += 1
                     continue
+                obj = normalizer.build_alldata(row, source=f'scroll-time-{self.id}', raw_data=item)
+                objs[obj.natural_key()] = obj
+            
+            if objs:
+                get_resolver().assign(objs.values())
+                
+                # رکوردهای موجود فقط برای شمارش رکوردهای جدید (یک کوئری)
+                existing = set(
+                    AllData.objects.filter(
+                        x_talar_report_pk__in={key[0] for key in objs},
+                        trade_date__in={key[4] for key in objs},
+                    ).values_list(*AllData.NATURAL_KEY)
+                )
+                saved_count = sum(1 for key in objs if key not in existing)
+                
+                # ذخیره در AllData با INSERT ... ON CONFLICT روی کلید طبیعی
+                update_fields = [
+                    name for name in normalizer.columns if name not in AllData.NATURAL_KEY
+                ] + ['commodity', 'source', 'raw_data', 'updated_at']
+                AllData.objects.bulk_create(
+                    list(objs.values()),
+                    update_conflicts=True,
+                    unique_fields=list(AllData.NATURAL_KEY),
+                    update_fields=update_fields,
+                )
+                # bulk_create سیگنال post_save را اجرا نمی‌کند؛ یک تجمیع برای تاریخ‌های این دریافت
+                mark_dirty(objs.values())
             
             if errors_count > 0:
                 return True, f"تعداد {saved_count} رکورد جدید از {total_records} ذخیره شد. {errors_count} خطا رخ داد."
@@ -351,9 +370,8 @@ class ScrollTimePage(Page):
             
     @staticmethod
     def shamsi_to_gregorian(shamsi_date):
-        """تبدیل ساده تاریخ شمسی به میلادی (بدون jdatetime)"""
-        # برای سادگی فقط string برگردانیم
-        return shamsi_date
+        """تبدیل تاریخ شمسی به میلادی (None برای تاریخ نامعتبر)"""
+        return jalali.shamsi_to_gregorian(shamsi_date)
     
     def get_context(self, request, *args, **kwargs):
         """اضافه کردن داده‌های ذخیره شده به context"""
@@ -0,0 +1,169 @@
+"""
+نگاشت نام کالا به شناسه Commodity با cache درون پردازه
+
+ورود داده برای هر دسته نام‌های کالا را به شناسه عددی Commodity تبدیل می‌کند؛
+نام‌های دیده شده از cache پاسخ داده می‌شوند و فقط نام‌های ناشناخته یک بار از
+پایگاه داده خوانده (یا ایجاد) می‌شوند. نام‌ها قبل از جستجو یکسان‌سازی می‌شوند
+(فاصله‌های اضافه، ی/ك عربی) و aliases هر کالا هم به همان شناسه نگاشت می‌شوند.
+
+کالاهایی که پردازه‌های دیگر (ورود داده، کارگرها) می‌سازند سیگنالی در این پردازه
+ایجاد نمی‌کنند؛ بنابراین نامی که در cache نیست پیش از ایجاد یا پاسخ «ناموجود» یک
+بار در پایگاه داده (نام و aliases) جستجو و نتیجه در cache نگه داشته می‌شود.
+
+نمونه:
+    get_resolver().assign(alldata_objs, subcategory_id=scroll_request.subcategory_id)
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AllData, Commodity
+
+logger = logging.getLogger(__name__)
+
+# حروف عربی رایج در نام‌های IME ← معادل فارسی
+_ARABIC_LETTERS = str.maketrans({'ي': 'ی', 'ى': 'ی', 'ك': 'ک'})
+
+
+def canonical_name(value) -> str:
+    """نام یکسان‌سازی شده کالا (کلید جستجو و Commodity.name)"""
+    if not value:
+        return ''
+    return ' '.join(str(value).translate(_ARABIC_LETTERS).split())[:100]
+
+
+class CommodityResolver:
+    """نام کالا ← شناسه Commodity (cache مشترک در پردازه، امن برای چند thread)"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """خالی کردن cache (پس از تغییر Commodity ها)"""
+        with self._lock:
+            self._ids = {}
+            self._loaded = False
+
+    def _load(self):
+        """خواندن همه کالاها و aliases آن‌ها (یک کوئری؛ جدول کوچک است)"""
+        ids = {}
+        rows = list(Commodity.objects.values_list('id', 'name', 'aliases'))
+        for pk, name, aliases in rows:
+            for alias in aliases or []:
+                ids.setdefault(canonical_name(alias), pk)
+        # نام اصلی بر alias کالای دیگر مقدم است
+        for pk, name, _ in rows:
+            ids[canonical_name(name)] = pk
+        self._ids = ids
+        self._loaded = True
+
+    def _remember(self, ids: Dict[str, int]):
+        with self._lock:
+            if self._loaded:
+                self._ids.update(ids)
+
+    def _lookup(self, keys: Set[str]) -> Dict[str, int]:
+        """
+        جستجوی نام‌های یکسان‌سازی شده در پایگاه داده (نام یا alias)
+
+        نتیجه پس از commit تراکنش جاری به cache اضافه می‌شود (در autocommit بلافاصله).
+        """
+        # aliases به شکل خام ذخیره شده‌اند؛ تطبیق آن‌ها پس از یکسان‌سازی در پایتون انجام می‌شود
+        rows = list(
+            Commodity.objects.filter(Q(name__in=keys) | ~Q(aliases=[]))
+            .values_list('id', 'name', 'aliases')
+        )
+        found = {}
+        for pk, name, aliases in rows:
+            for alias in aliases or []:
+                if canonical_name(alias) in keys:
+                    found.setdefault(canonical_name(alias), pk)
+        # نام اصلی بر alias کالای دیگر مقدم است
+        for pk, name, _ in rows:
+            if canonical_name(name) in keys:
+                found[canonical_name(name)] = pk
+        if found:
+            transaction.on_commit(lambda: self._remember(found))
+        return found
+
+    def resolve_many(self, names: Iterable[str], subcategory_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        شناسه Commodity برای هر نام (نام‌های ناشناخته ایجاد می‌شوند)
+
+        شناسه کالاهای ایجاد شده فقط پس از commit تراکنش به cache اضافه می‌شوند تا
+        rollback یک دسته شناسه نامعتبری در cache باقی نگذارد.
+
+        Args:
+            subcategory_id: زیرگروه کالاهای جدید (اگر ورود از یک زیرگروه مشخص است)
+
+        Returns:
+            {نام ورودی: شناسه}؛ نام‌های خالی در خروجی نیستند
+        """
+        keys = {name: canonical_name(name) for name in set(names) if name}
+        keys = {name: key for name, key in keys.items() if key}
+        if not keys:
+            return {}
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            ids = {key: self._ids[key] for key in keys.values() if key in self._ids}
+        missing = set(keys.values()) - ids.keys()
+        if missing:
+            # کالاهایی که پس از بارگذاری cache در پردازه‌های دیگر ساخته شده‌اند
+            ids.update(self._lookup(missing))
+            missing -= ids.keys()
+
+        if missing:
+            Commodity.objects.bulk_create(
+                [Commodity(name=key, subcategory_id=subcategory_id) for key in sorted(missing)],
+                ignore_conflicts=True,
+            )
+            created = dict(Commodity.objects.filter(name__in=missing).values_list('name', 'id'))
+            ids.update(created)
+            transaction.on_commit(lambda: self._remember(created))
+            logger.debug(f"Resolved {len(created)} new commodities")
+
+        return {name: ids[key] for name, key in keys.items() if key in ids}
+
+    def resolve(self, name: str, subcategory_id: Optional[int] = None) -> Optional[int]:
+        return self.resolve_many([name], subcategory_id).get(name)
+
+    def find(self, name: str) -> Optional[int]:
+        """شناسه کالای موجود (بدون ایجاد؛ برای مسیرهای خواندن مانند API)"""
+        key = canonical_name(name)
+        if not key:
+            return None
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._ids:
+                return self._ids[key]
+        return self._lookup({key}).get(key)
+
+    def assign(self, objs: Iterable[AllData], subcategory_id: Optional[int] = None) -> List[AllData]:
+        """پر کردن commodity_id اشیاء AllData (ذخیره نشده) بر اساس commodity_name"""
+        objs = list(objs)
+        ids = self.resolve_many((obj.commodity_name for obj in objs), subcategory_id)
+        for obj in objs:
+            obj.commodity_id = ids.get(obj.commodity_name)
+        return objs
+
+
+_resolver: Optional[CommodityResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> CommodityResolver:
+    """نمونه مشترک CommodityResolver در این پردازه"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = CommodityResolver()
+    return _resolver
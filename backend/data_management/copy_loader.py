@@ -0,0 +1,184 @@
+"""
+بارگذاری انبوه AllData با COPY در PostgreSQL
+
+برای ورود حجم بالای داده (بازیابی تاریخچه)، INSERT های دسته‌ای ORM کند هستند:
+هر رکورد حدود 30 ستون و یک raw_data از نوع JSONB دارد و همه مقادیر به صورت
+پارامتر کوئری ارسال می‌شوند. AllDataCopyLoader رکوردها را با
+`COPY ... FROM STDIN` به یک جدول موقت (staging) می‌فرستد و سپس با یک دستور
+`INSERT ... SELECT ... ON CONFLICT` روی کلید طبیعی AllData ادغام می‌کند.
+
+نمونه:
+    loader = AllDataCopyLoader()
+    with transaction.atomic():
+        result = loader.load(alldata_objs, duplicate_handling='update')
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import AllData
+from .signals import mark_dirty
+
+logger = logging.getLogger(__name__)
+
+
+class AllDataCopyLoader:
+    """ورود AllData از طریق COPY به جدول موقت و ادغام set-based"""
+
+    STAGING_TABLE = 'all_data_copy_stage'
+
+    # حالت‌های مواجهه با رکورد تکراری (مطابق ScrollTimeRequest.duplicate_handling)
+    MODES = ('skip', 'update', 'replace')
+
+    # فیلدهایی که در حالت update بازنویسی نمی‌شوند
+    PRESERVED_FIELDS = ('id', 'created_at')
+
+    def __init__(self, using: Optional[str] = None):
+        self.connection = connections[using or DEFAULT_DB_ALIAS]
+        self.table = AllData._meta.db_table
+        self.fields = [field for field in AllData._meta.concrete_fields if not field.primary_key]
+        self.columns = [field.column for field in self.fields]
+        self.key_columns = [AllData._meta.get_field(name).column for name in AllData.NATURAL_KEY]
+        self.update_columns = [
+            column for column in self.columns
+            if column not in self.key_columns and column not in self.PRESERVED_FIELDS
+        ]
+
+    @classmethod
+    def is_supported(cls, using: Optional[str] = None) -> bool:
+        """COPY فقط در PostgreSQL در دسترس است"""
+        return connections[using or DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+    def load(self, objs: Iterable[AllData], duplicate_handling: str = 'update') -> Dict[str, int]:
+        """
+        ورود اشیاء AllData (ذخیره نشده) با COPY و ادغام روی کلید طبیعی
+
+        تکرار داخل خود ورودی با آخرین نمونه جایگزین می‌شود. رکوردهای نوشته شده
+        برای تجمیع علامت می‌خورند (mark_dirty)؛ سیگنال post_save اجرا نمی‌شود.
+
+        Args:
+            objs: اشیاء AllData (مثلاً از IMERecordNormalizer.build_alldata)
+            duplicate_handling: skip (نادیده گرفتن موجودها)، update (بازنویسی)
+                یا replace (حذف و ایجاد دوباره)
+
+        Returns:
+            {'staged', 'inserted', 'updated', 'duplicates'}
+        """
+        if duplicate_handling not in self.MODES:
+            raise ValueError(f"Unknown duplicate_handling: {duplicate_handling}")
+
+        rows = {}
+        for obj in objs:
+            rows[obj.natural_key()] = obj
+        result = {'staged': len(rows), 'inserted': 0, 'updated': 0, 'duplicates': 0}
+        if not rows:
+            return result
+
+        now = timezone.now()
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            self._create_staging(cursor)
+            self._copy_rows(cursor, rows.values(), now)
+
+            if duplicate_handling == 'replace':
+                cursor.execute(self._delete_sql())
+                result['duplicates'] = cursor.rowcount
+
+            if duplicate_handling == 'update':
+                # جدول پارتیشن‌بندی شده xmax را در RETURNING برنمی‌گرداند؛ رکوردهای
+                # موجود پیش از ادغام شمرده می‌شوند
+                cursor.execute(self._existing_sql())
+                result['updated'] = result['duplicates'] = cursor.fetchone()[0]
+
+            cursor.execute(self._merge_sql(duplicate_handling))
+            if duplicate_handling == 'update':
+                result['inserted'] = cursor.rowcount - result['updated']
+            else:
+                result['inserted'] = cursor.rowcount
+                if duplicate_handling == 'skip':
+                    result['duplicates'] = result['staged'] - result['inserted']
+
+            cursor.execute(f'DROP TABLE IF EXISTS pg_temp.{self.STAGING_TABLE}')
+
+            if result['inserted'] or result['updated']:
+                # کلیدهای سری قیمت همراه داده commit می‌شوند
+                mark_dirty(rows.values())
+
+        logger.info(
+            f"COPY loaded {result['staged']} AllData rows: {result['inserted']} inserted, "
+            f"{result['updated']} updated, {result['duplicates']} duplicates ({duplicate_handling})"
+        )
+        return result
+
+    # ------------------------------------------------------------------
+    # SQL
+    # ------------------------------------------------------------------
+
+    def _quoted(self, columns: List[str]) -> str:
+        quote = self.connection.ops.quote_name
+        return ', '.join(quote(column) for column in columns)
+
+    def _create_staging(self, cursor):
+        """جدول موقت هم‌شکل ستون‌های AllData (بدون محدودیت و ایندکس)"""
+        cursor.execute(f'DROP TABLE IF EXISTS pg_temp.{self.STAGING_TABLE}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {self.STAGING_TABLE} ON COMMIT DROP AS '
+            f'SELECT {self._quoted(self.columns)} FROM {self.connection.ops.quote_name(self.table)} '
+            f'WITH NO DATA'
+        )
+
+    def _copy_rows(self, cursor, objs: Iterable[AllData], now):
+        """ارسال ردیف‌ها با COPY FROM STDIN (psycopg 3)"""
+        sql = f'COPY {self.STAGING_TABLE} ({self._quoted(self.columns)}) FROM STDIN'
+        with cursor.copy(sql) as copy:
+            for obj in objs:
+                copy.write_row(self._row(obj, now))
+
+    def _row(self, obj: AllData, now) -> List[Any]:
+        values = []
+        for field in self.fields:
+            if field.name in ('created_at', 'updated_at'):
+                values.append(now)
+                continue
+            value = getattr(obj, field.attname)
+            if field.get_internal_type() == 'JSONField' and value is not None:
+                value = json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+            values.append(value)
+        return values
+
+    def _key_condition(self) -> str:
+        quote = self.connection.ops.quote_name
+        return ' AND '.join(
+            f'target.{quote(column)} = stage.{quote(column)}' for column in self.key_columns
+        )
+
+    def _existing_sql(self) -> str:
+        return (
+            f'SELECT COUNT(*) FROM {self.STAGING_TABLE} AS stage '
+            f'JOIN {self.connection.ops.quote_name(self.table)} AS target ON {self._key_condition()}'
+        )
+
+    def _delete_sql(self) -> str:
+        return (
+            f'DELETE FROM {self.connection.ops.quote_name(self.table)} AS target '
+            f'USING {self.STAGING_TABLE} AS stage WHERE {self._key_condition()}'
+        )
+
+    def _merge_sql(self, duplicate_handling: str) -> str:
+        quote = self.connection.ops.quote_name
+        columns = self._quoted(self.columns)
+        sql = (
+            f'INSERT INTO {quote(self.table)} ({columns}) '
+            f'SELECT {columns} FROM {self.STAGING_TABLE} '
+            f'ON CONFLICT ({self._quoted(self.key_columns)}) '
+        )
+        if duplicate_handling != 'update':
+            return sql + 'DO NOTHING'
+
+        assignments = ', '.join(
+            f'{quote(column)} = EXCLUDED.{quote(column)}' for column in self.update_columns
+        )
+        return f'{sql}DO UPDATE SET {assignments}'
@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
 from data_management.models import AllData
-from data_management.signals import aggregate_daily_data, aggregate_weekly_data, aggregate_monthly_data, aggregate_yearly_data, shamsi_to_gregorian
-from collections import defaultdict
+from data_management.signals import aggregate_trade_dates
 
 
 class Command(BaseCommand):
@@ -17,39 +16,25 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         force = options['force']
         
-        # گروه‌بندی داده‌ها بر اساس تاریخ میلادی
-        dates_to_aggregate = set()
-        all_records = AllData.objects.all()
+        self.stdout.write(f'تعداد کل رکوردها: {AllData.objects.count()}')
         
-        self.stdout.write(f'تعداد کل رکوردها: {all_records.count()}')
+        # فقط تاریخ‌های یکتا از پایگاه داده خوانده می‌شوند (نه همه رکوردها)
+        trade_dates = set(
+            AllData.objects.filter(trade_date__isnull=False)
+            .values_list('trade_date', flat=True)
+            .distinct()
+            .order_by()
+        )
         
-        for record in all_records:
-            if record.transaction_date:
-                # تبدیل تاریخ شمسی به میلادی
-                gregorian_date = shamsi_to_gregorian(record.transaction_date)
-                if gregorian_date:
-                    dates_to_aggregate.add(gregorian_date)
+        self.stdout.write(f'تعداد تاریخ‌های منحصر به فرد: {len(trade_dates)}')
         
-        self.stdout.write(f'تعداد تاریخ‌های منحصر به فرد: {len(dates_to_aggregate)}')
+        # تجمیع روزانه برای هر تاریخ و هفتگی/ماهانه/سالانه یک بار برای هر دوره
+        log = aggregate_trade_dates(trade_dates, force=force)
         
-        # تجمیع برای هر تاریخ
-        processed = 0
-        for date in sorted(dates_to_aggregate):
-            self.stdout.write(f'تجمیع برای تاریخ: {date}')
-            
-            # تجمیع روزانه
-            aggregate_daily_data(date, force=force)
-            
-            # تجمیع هفتگی، ماهانه و سالانه
-            aggregate_weekly_data(date, force=force)
-            aggregate_monthly_data(date, force=force)
-            aggregate_yearly_data(date, force=force)
-            
-            processed += 1
-            
-            if processed % 10 == 0:
-                self.stdout.write(f'پردازش شد: {processed}/{len(dates_to_aggregate)}')
+        if not log.success:
+            self.stdout.write(self.style.ERROR(f'خطا در تجمیع: {log.error_message}'))
+            return
         
         self.stdout.write(
-            self.style.SUCCESS(f'تجمیع کامل شد! {processed} تاریخ پردازش شد.')
+            self.style.SUCCESS(f'تجمیع کامل شد! {log.records_processed} تاریخ پردازش شد.')
         )
@@ -0,0 +1,123 @@
+"""
+Django management command برای نگهداری پارتیشن‌های ماهانه AllData
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from data_management.partitions import AllDataPartitions
+from price_models import jalali
+
+
+class Command(BaseCommand):
+    help = (
+        'نگهداری پارتیشن‌های ماهانه (ماه شمسی) جدول AllData: ساخت پارتیشن ماه‌های آینده، '
+        'انتقال رکوردهای مانده در پارتیشن DEFAULT و جداسازی/بایگانی ماه‌های قدیمی (فقط PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=AllDataPartitions.FUTURE_MONTHS,
+            help=f'تعداد ماه‌های آینده که پارتیشن آن‌ها ساخته می‌شود (پیش‌فرض: {AllDataPartitions.FUTURE_MONTHS})'
+        )
+        parser.add_argument(
+            '--detach-before',
+            type=str,
+            help='جداسازی پارتیشن ماه‌های قبل از این ماه شمسی (مثال: 1400/01)'
+        )
+        parser.add_argument(
+            '--archive-schema',
+            type=str,
+            help='انتقال پارتیشن‌های جدا شده به این schema (مثال: archive)'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='حذف پارتیشن‌های جدا شده (غیرقابل بازگشت)'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='فقط نمایش پارتیشن‌ها'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='نمایش تغییرات بدون اجرا'
+        )
+
+    def handle(self, *args, **options):
+        if not AllDataPartitions.is_supported():
+            raise CommandError('پارتیشن‌بندی فقط در پایگاه داده PostgreSQL پشتیبانی می‌شود')
+        partitions = AllDataPartitions()
+        if not partitions.is_partitioned():
+            raise CommandError(f'جدول {AllDataPartitions.PARENT} پارتیشن‌بندی نشده است (python manage.py migrate)')
+        if options['ahead'] < 0:
+            raise CommandError('--ahead نمی‌تواند منفی باشد')
+        if options['drop'] and options['archive_schema']:
+            raise CommandError('--drop و --archive-schema را نمی‌توان با هم استفاده کرد')
+        if (options['drop'] or options['archive_schema']) and not options['detach_before']:
+            raise CommandError('--drop و --archive-schema فقط همراه --detach-before معنا دارند')
+
+        detach_before = None
+        if options['detach_before']:
+            try:
+                jy, jm = (int(part) for part in options['detach_before'].split('/'))
+            except ValueError:
+                raise CommandError('فرمت --detach-before نامعتبر است (مثال: 1400/01)')
+            if not jalali.is_valid(jy, jm, 1):
+                raise CommandError('فرمت --detach-before نامعتبر است (مثال: 1400/01)')
+            detach_before = (jy, jm)
+
+        if options['list']:
+            self._list(partitions)
+            return
+
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write('🔍 اجرای آزمایشی؛ تغییری اعمال نمی‌شود')
+
+        # ماه جاری و ماه‌های آینده، سپس ماه‌هایی که رکوردشان در DEFAULT مانده است
+        if dry_run:
+            month, missing = jalali.today()[:2], []
+            for _ in range(options['ahead'] + 1):
+                if month not in partitions.attached_months():
+                    missing.append(partitions.partition_name(*month))
+                month = partitions.next_month(*month)
+            for name in missing:
+                self.stdout.write(f'   + {name}')
+        else:
+            created = partitions.ensure_future(options['ahead']) + partitions.split_default()
+            for name in created:
+                self.stdout.write(f'   + {name}')
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(created)} پارتیشن جدید ساخته شد'))
+
+        if detach_before:
+            old = [
+                partition for partition in partitions.partitions()
+                if partition['month'] and partition['month'] < detach_before
+            ]
+            action = 'حذف' if options['drop'] else (
+                f"بایگانی در {options['archive_schema']}" if options['archive_schema'] else 'جداسازی'
+            )
+            for partition in old:
+                self.stdout.write(f"   - {partition['name']} (~{partition['rows_estimate']} رکورد): {action}")
+                if not dry_run:
+                    partitions.detach(
+                        partition['name'],
+                        archive_schema=options['archive_schema'],
+                        drop=options['drop'],
+                    )
+            if not dry_run:
+                self.stdout.write(self.style.SUCCESS(f'🗄️ {len(old)} پارتیشن قبل از {options["detach_before"]} جدا شد'))
+
+    def _list(self, partitions: AllDataPartitions):
+        rows = partitions.partitions()
+        for partition in rows:
+            if partition['month']:
+                jy, jm = partition['month']
+                label = f"{jy}/{jm:02d} [{partition['lower']} تا {partition['upper']})"
+            else:
+                label = 'DEFAULT (ماه‌های بدون پارتیشن)'
+            self.stdout.write(f"{partition['name']:<40} {label:<40} ~{partition['rows_estimate']} رکورد")
+        self.stdout.write(self.style.SUCCESS(f'📋 {len(rows)} پارتیشن'))
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+# نسخه‌های قبلی شناسه‌های IME را از کلیدهای اشتباه (XTalarReportPK/ArzehPK) می‌خواندند و
+# ستون‌ها خالی مانده‌اند؛ ابتدا شناسه‌ها از رکورد اصلی ذخیره شده در raw_data پر می‌شوند
+# تا ورود دوباره همان بازه رکوردهای موجود را پیدا کند.
+# رکوردهایی که همچنان شناسه گزارش تالار معاملات ندارند متمایز هستند و حذف نمی‌شوند:
+# شناسه جایگزین یکتای -id می‌گیرند (شناسه‌های واقعی IME مثبت هستند). از هر گروه رکورد
+# تکراری دارای شناسه واقعی (بر اساس کلید طبیعی) فقط جدیدترین رکورد نگه داشته
+# می‌شود تا ایندکس یکتا قابل ساخت باشد
+DEDUPLICATE_SQL = """
+WITH source AS (
+    SELECT id,
+           COALESCE(raw_data->>'xTalarReportPK', raw_data->>'XTalarReportPK') AS report_pk,
+           COALESCE(raw_data->>'arzehPk', raw_data->>'ArzehPK') AS arzeh_pk
+    FROM data_management_all_data
+    WHERE (x_talar_report_pk IS NULL OR x_talar_report_pk = 0)
+      AND jsonb_typeof(raw_data::jsonb) = 'object'
+)
+UPDATE data_management_all_data AS target SET
+    x_talar_report_pk = CASE WHEN source.report_pk ~ '^[0-9]{1,9}$'
+                             THEN source.report_pk::integer ELSE target.x_talar_report_pk END,
+    arzeh_pk = CASE WHEN source.arzeh_pk ~ '^[0-9]{1,9}$'
+                    THEN source.arzeh_pk::integer ELSE target.arzeh_pk END
+FROM source
+WHERE target.id = source.id;
+UPDATE data_management_all_data SET x_talar_report_pk = -id
+WHERE x_talar_report_pk IS NULL OR x_talar_report_pk = 0;
+UPDATE data_management_all_data SET arzeh_pk = 0 WHERE arzeh_pk IS NULL;
+DELETE FROM data_management_all_data older
+USING data_management_all_data newer
+WHERE older.id < newer.id
+  AND older.x_talar_report_pk > 0
+  AND older.x_talar_report_pk = newer.x_talar_report_pk
+  AND older.arzeh_pk = newer.arzeh_pk
+  AND older.symbol = newer.symbol
+  AND older.transaction_date = newer.transaction_date;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0009_auto_20250809_0243'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='alldata',
+            name='arzeh_pk',
+            field=models.IntegerField(blank=True, default=0, verbose_name='شناسه عرضه'),
+        ),
+        migrations.AlterField(
+            model_name='alldata',
+            name='x_talar_report_pk',
+            field=models.IntegerField(blank=True, default=0, verbose_name='شناسه گزارش تالار'),
+        ),
+        migrations.AddConstraint(
+            model_name='alldata',
+            constraint=models.UniqueConstraint(fields=('x_talar_report_pk', 'arzeh_pk', 'symbol', 'transaction_date'), name='all_data_natural_key'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+from price_models import jalali
+
+
+def fill_trade_dates(apps, schema_editor):
+    """
+    پر کردن trade_date و jalali_date_key رکوردهای موجود
+
+    تعداد تاریخ‌های یکتا (روزهای معاملاتی) بسیار کمتر از رکوردها است؛ برای هر
+    تاریخ شمسی یکتا یک بار تبدیل و یک UPDATE اجرا می‌شود.
+    """
+    AllData = apps.get_model('data_management', 'AllData')
+    shamsi_dates = (
+        AllData.objects.exclude(transaction_date='')
+        .values_list('transaction_date', flat=True)
+        .distinct()
+        .order_by()
+    )
+    for shamsi_date in list(shamsi_dates):
+        trade_date = jalali.shamsi_to_gregorian(shamsi_date)
+        if trade_date is None:
+            continue
+        AllData.objects.filter(transaction_date=shamsi_date).update(
+            trade_date=trade_date,
+            jalali_date_key=jalali.date_key(trade_date),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0010_alldata_natural_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alldata',
+            name='jalali_date_key',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='کلید عددی تاریخ شمسی (YYYYMMDD)'),
+        ),
+        migrations.AddField(
+            model_name='alldata',
+            name='trade_date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='تاریخ معامله میلادی'),
+        ),
+        migrations.RunPython(fill_trade_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alldata',
+            index=models.Index(fields=['commodity_name', 'trade_date'], name='data_manage_commodi_3dad14_idx'),
+        ),
+    ]
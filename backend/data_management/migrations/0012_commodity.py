@@ -0,0 +1,102 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SERIES_MODELS = (
+    'CommodityDailyPriceSeries',
+    'CommodityWeeklyPriceSeries',
+    'CommodityMonthlyPriceSeries',
+    'CommodityYearlyPriceSeries',
+)
+
+# مطابق data_management.commodities.canonical_name در زمان این مهاجرت
+_ARABIC_LETTERS = str.maketrans({'ي': 'ی', 'ى': 'ی', 'ك': 'ک'})
+
+
+def _canonical_name(value):
+    if not value:
+        return ''
+    return ' '.join(str(value).translate(_ARABIC_LETTERS).split())[:100]
+
+
+def fill_commodities(apps, schema_editor):
+    """
+    ساخت Commodity برای نام‌های موجود و پر کردن کلید commodity_id
+
+    برای هر نام متنی یکتا یک UPDATE اجرا می‌شود (تعداد نام‌ها بسیار کمتر از رکوردها است).
+    """
+    Commodity = apps.get_model('data_management', 'Commodity')
+    models_with_names = [apps.get_model('data_management', 'AllData')] + [
+        apps.get_model('data_management', name) for name in SERIES_MODELS
+    ]
+
+    names = {}
+    for model in models_with_names:
+        distinct = model.objects.exclude(commodity_name='').values_list('commodity_name', flat=True).distinct().order_by()
+        names[model] = [name for name in distinct if _canonical_name(name)]
+
+    canonical = {_canonical_name(name) for model_names in names.values() for name in model_names}
+    Commodity.objects.bulk_create(
+        [Commodity(name=name, aliases=[]) for name in sorted(canonical)],
+        ignore_conflicts=True,
+    )
+    ids = dict(Commodity.objects.values_list('name', 'id'))
+
+    for model, model_names in names.items():
+        for name in model_names:
+            model.objects.filter(commodity_name=name).update(commodity_id=ids[_canonical_name(name)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0007_backfill'),
+        ('data_management', '0011_alldata_trade_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Commodity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='نام کالا')),
+                ('aliases', models.JSONField(blank=True, default=list, verbose_name='نام‌ها و نمادهای جایگزین')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('subcategory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commodities', to='price_data_ingestion.subcategory', verbose_name='زیرگروه')),
+            ],
+            options={
+                'verbose_name': 'کالا',
+                'verbose_name_plural': 'کالاها',
+                'db_table': 'data_management_commodity',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='alldata',
+            name='commodity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='records', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='commodity',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AddField(
+            model_name='commodityweeklypriceseries',
+            name='commodity',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='weekly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AddField(
+            model_name='commoditymonthlypriceseries',
+            name='commodity',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AddField(
+            model_name='commodityyearlypriceseries',
+            name='commodity',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='yearly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.RunPython(fill_commodities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# سری‌ها داده مشتق هستند (با تجمیع بعدی بازسازی می‌شوند): ردیف‌های بدون کالا و
+# ردیف‌هایی که پس از یکسان‌سازی نام‌ها روی کلید جدید تکراری شده‌اند حذف می‌شوند
+SERIES_KEYS = {
+    'commodity_daily_price_series': ('trade_date',),
+    'commodity_weekly_price_series': ('year', 'week_number'),
+    'commodity_monthly_price_series': ('year', 'month'),
+    'commodity_yearly_price_series': ('year',),
+}
+
+DEDUPLICATE_SQL = ''.join(
+    f"""
+DELETE FROM {table} WHERE commodity_id IS NULL;
+DELETE FROM {table} older USING {table} newer
+WHERE older.id < newer.id AND older.commodity_id = newer.commodity_id
+  {''.join(f' AND older.{column} = newer.{column}' for column in columns)};
+"""
+    for table, columns in SERIES_KEYS.items()
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0012_commodity'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='commoditydailypriceseries',
+            options={'ordering': ['-trade_date', 'commodity'], 'verbose_name': 'سری قیمت روزانه کالا', 'verbose_name_plural': 'سری\u200cهای قیمت روزانه کالاها'},
+        ),
+        migrations.AlterModelOptions(
+            name='commoditymonthlypriceseries',
+            options={'ordering': ['-year', '-month', 'commodity'], 'verbose_name': 'سری قیمت ماهانه کالا', 'verbose_name_plural': 'سری\u200cهای قیمت ماهانه کالاها'},
+        ),
+        migrations.AlterModelOptions(
+            name='commodityweeklypriceseries',
+            options={'ordering': ['-year', '-week_number', 'commodity'], 'verbose_name': 'سری قیمت هفتگی کالا', 'verbose_name_plural': 'سری\u200cهای قیمت هفتگی کالاها'},
+        ),
+        migrations.AlterModelOptions(
+            name='commodityyearlypriceseries',
+            options={'ordering': ['-year', 'commodity'], 'verbose_name': 'سری قیمت سالانه کالا', 'verbose_name_plural': 'سری\u200cهای قیمت سالانه کالاها'},
+        ),
+        migrations.RemoveIndex(
+            model_name='alldata',
+            name='data_manage_commodi_3dad14_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='commoditydailypriceseries',
+            name='commodity_d_commodi_4d999a_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='commoditydailypriceseries',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commoditymonthlypriceseries',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commodityweeklypriceseries',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commodityyearlypriceseries',
+            unique_together=set(),
+        ),
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='commoditydailypriceseries',
+            name='commodity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AlterField(
+            model_name='commoditymonthlypriceseries',
+            name='commodity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AlterField(
+            model_name='commodityweeklypriceseries',
+            name='commodity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AlterField(
+            model_name='commodityyearlypriceseries',
+            name='commodity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yearly_series', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commoditydailypriceseries',
+            unique_together={('commodity', 'trade_date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='commoditymonthlypriceseries',
+            unique_together={('commodity', 'year', 'month')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='commodityweeklypriceseries',
+            unique_together={('commodity', 'year', 'week_number')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='commodityyearlypriceseries',
+            unique_together={('commodity', 'year')},
+        ),
+        migrations.AddIndex(
+            model_name='alldata',
+            index=models.Index(fields=['commodity', 'trade_date'], name='data_manage_commodi_57d7c9_idx'),
+        ),
+        migrations.RemoveField(
+            model_name='commoditydailypriceseries',
+            name='commodity_name',
+        ),
+        migrations.RemoveField(
+            model_name='commoditymonthlypriceseries',
+            name='commodity_name',
+        ),
+        migrations.RemoveField(
+            model_name='commodityweeklypriceseries',
+            name='commodity_name',
+        ),
+        migrations.RemoveField(
+            model_name='commodityyearlypriceseries',
+            name='commodity_name',
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from price_models import jalali
+
+
+TABLE = 'data_management_all_data'
+
+# trade_date کلید پارتیشن و غیر خالی می‌شود؛ رکوردهایی که تاریخ شمسی قابل تبدیل
+# ندارند حذف نمی‌شوند و برای بررسی دستی به جدول جداگانه منتقل می‌شوند
+MOVE_UNDATED_SQL = f"""
+CREATE TABLE {TABLE}_undated (LIKE {TABLE});
+INSERT INTO {TABLE}_undated SELECT * FROM {TABLE} WHERE trade_date IS NULL;
+DELETE FROM {TABLE} WHERE trade_date IS NULL;
+"""
+
+RESTORE_UNDATED_SQL = f"""
+INSERT INTO {TABLE} SELECT * FROM {TABLE}_undated;
+DROP TABLE {TABLE}_undated;
+"""
+
+# پارتیشن DEFAULT و تعداد ماه‌های آینده که همراه جدول ساخته می‌شوند
+DEFAULT_PARTITION = f'{TABLE}_default'
+FUTURE_MONTHS = 3
+
+
+def _next_month(jy, jm):
+    return (jy + 1, 1) if jm == 12 else (jy, jm + 1)
+
+
+def _create_partitions(cursor, quote, first_date, last_date):
+    """
+    ساخت پارتیشن DEFAULT و یک پارتیشن برای هر ماه شمسی از first_date تا
+    FUTURE_MONTHS ماه پس از امروز (یا last_date اگر دیرتر باشد)
+
+    جدول تازه خالی است، پس پارتیشن‌ها مستقیم ساخته می‌شوند و جابجایی رکورد لازم نیست.
+    """
+    table = quote(TABLE)
+    cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT')
+
+    month = jalali.today()[:2]
+    for _ in range(FUTURE_MONTHS):
+        month = _next_month(*month)
+    if last_date is not None:
+        month = max(month, jalali.from_gregorian(last_date)[:2])
+    last, month = month, jalali.today()[:2]
+    if first_date is not None:
+        month = min(month, jalali.from_gregorian(first_date)[:2])
+
+    while month <= last:
+        lower, upper = jalali.to_gregorian(*month, 1), jalali.to_gregorian(*_next_month(*month), 1)
+        cursor.execute(
+            f'CREATE TABLE {quote(f"{TABLE}_p{month[0]:04d}{month[1]:02d}")} PARTITION OF {table} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+        month = _next_month(*month)
+
+
+def _rebuild(schema_editor, partitioned):
+    """
+    بازسازی جدول AllData به صورت پارتیشن‌بندی شده (یا برعکس)
+
+    تعریف constraint ها و ایندکس‌های فعلی خوانده می‌شود، جدول قدیمی تغییر نام
+    می‌دهد، جدول جدید با همان ستون‌ها ساخته و داده کپی می‌شود و سپس ایندکس‌ها و
+    constraint ها با همان نام‌های Django روی جدول جدید ساخته می‌شوند (پس از کپی، سریع‌تر).
+    """
+    quote = schema_editor.quote_name
+    table, old = quote(TABLE), quote(f'{TABLE}_old')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+            'WHERE conrelid = %s::regclass AND contype IN (%s, %s, %s)',
+            [TABLE, 'p', 'u', 'f'],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass '
+            'AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)',
+            [TABLE, TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1, MIN(trade_date), MAX(trade_date) FROM {table}')
+        next_id, first_date, last_date = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (trade_date)')
+            _create_partitions(cursor, quote, first_date, last_date)
+        else:
+            cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old} CASCADE')
+
+        cursor.execute(
+            f'ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {int(next_id)})'
+        )
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                # کلید اصلی جدول پارتیشن‌بندی شده باید کلید پارتیشن را شامل شود
+                definition = 'PRIMARY KEY (id, trade_date)' if partitioned else 'PRIMARY KEY (id)'
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {quote(name)} {definition}')
+        for definition in indexes:
+            cursor.execute(definition)
+
+
+def partition_alldata(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_alldata(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0013_commodity_keys'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MOVE_UNDATED_SQL, RESTORE_UNDATED_SQL),
+        migrations.RemoveConstraint(
+            model_name='alldata',
+            name='all_data_natural_key',
+        ),
+        migrations.RemoveIndex(
+            model_name='alldata',
+            name='data_manage_transac_463b89_idx',
+        ),
+        migrations.AlterField(
+            model_name='alldata',
+            name='commodity',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='records', to='data_management.commodity', verbose_name='کالا'),
+        ),
+        migrations.AlterField(
+            model_name='alldata',
+            name='jalali_date_key',
+            field=models.IntegerField(blank=True, null=True, verbose_name='کلید عددی تاریخ شمسی (YYYYMMDD)'),
+        ),
+        migrations.AlterField(
+            model_name='alldata',
+            name='trade_date',
+            field=models.DateField(db_index=True, verbose_name='تاریخ معامله میلادی'),
+        ),
+        migrations.AddConstraint(
+            model_name='alldata',
+            constraint=models.UniqueConstraint(fields=('x_talar_report_pk', 'arzeh_pk', 'symbol', 'transaction_date', 'trade_date'), name='all_data_natural_key'),
+        ),
+        migrations.RunPython(partition_alldata, unpartition_alldata),
+    ]
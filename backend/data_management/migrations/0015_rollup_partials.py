@@ -0,0 +1,248 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+# مجموع‌های جزئی ردیف‌های روزانه موجود از AllData (هفته/ماه/سال در اجرای بعدی
+# تجمیع از همین مقادیر بازمحاسبه می‌شوند)
+FILL_PARTIALS_SQL = """
+UPDATE commodity_daily_price_series AS series
+SET price_sum = source.price_sum,
+    weighted_price_sum = source.weighted_price_sum,
+    avg_weighted_price = ROUND(source.weighted_price_sum / source.volume, 2),
+    first_price = source.first_price,
+    last_price = source.last_price
+FROM (
+    SELECT commodity_id, trade_date,
+           SUM(final_price) AS price_sum,
+           SUM(final_price * contract_volume) AS weighted_price_sum,
+           SUM(contract_volume) AS volume,
+           (array_agg(final_price ORDER BY x_talar_report_pk, id))[1] AS first_price,
+           (array_agg(final_price ORDER BY x_talar_report_pk DESC, id DESC))[1] AS last_price
+    FROM data_management_all_data
+    WHERE commodity_id IS NOT NULL AND final_price > 0 AND contract_volume > 0
+    GROUP BY commodity_id, trade_date
+) AS source
+WHERE series.commodity_id = source.commodity_id AND series.trade_date = source.trade_date;
+
+UPDATE data_management_daily_data AS daily
+SET final_price_sum = COALESCE(source.final_price_sum, 0),
+    final_price_count = source.final_price_count,
+    base_price_sum = COALESCE(source.base_price_sum, 0),
+    base_price_count = source.base_price_count,
+    weighted_price_sum = COALESCE(source.weighted_price_sum, 0),
+    weighted_volume = COALESCE(source.weighted_volume, 0)
+FROM (
+    SELECT trade_date,
+           SUM(final_price) AS final_price_sum,
+           COUNT(final_price) AS final_price_count,
+           SUM(base_price) AS base_price_sum,
+           COUNT(base_price) AS base_price_count,
+           SUM(final_price * contract_volume) FILTER (WHERE final_price <> 0 AND contract_volume <> 0) AS weighted_price_sum,
+           SUM(contract_volume) FILTER (WHERE final_price <> 0 AND contract_volume <> 0) AS weighted_volume
+    FROM data_management_all_data
+    GROUP BY trade_date
+) AS source
+WHERE daily.trade_date = source.trade_date;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0014_alldata_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='avg_weighted_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='میانگین موزون قیمت (بر اساس حجم)'),
+        ),
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='first_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='اولین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='آخرین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای نهایی'),
+        ),
+        migrations.AddField(
+            model_name='commoditydailypriceseries',
+            name='weighted_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='جمع قیمت نهایی × حجم'),
+        ),
+        migrations.AddField(
+            model_name='commoditymonthlypriceseries',
+            name='avg_weighted_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='میانگین موزون قیمت (بر اساس حجم)'),
+        ),
+        migrations.AddField(
+            model_name='commoditymonthlypriceseries',
+            name='first_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='اولین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commoditymonthlypriceseries',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='آخرین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commodityweeklypriceseries',
+            name='avg_weighted_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='میانگین موزون قیمت (بر اساس حجم)'),
+        ),
+        migrations.AddField(
+            model_name='commodityweeklypriceseries',
+            name='first_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='اولین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commodityweeklypriceseries',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='آخرین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commodityyearlypriceseries',
+            name='avg_weighted_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='میانگین موزون قیمت (بر اساس حجم)'),
+        ),
+        migrations.AddField(
+            model_name='commodityyearlypriceseries',
+            name='first_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='اولین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='commodityyearlypriceseries',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='آخرین قیمت'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='base_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='base_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='final_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='final_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='weighted_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='جمع قیمت پایانی × حجم قرارداد'),
+        ),
+        migrations.AddField(
+            model_name='dailydata',
+            name='weighted_volume',
+            field=models.BigIntegerField(default=0, verbose_name='جمع حجم قراردادهای دارای قیمت'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='base_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='base_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='final_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='final_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='weighted_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='جمع قیمت پایانی × حجم قرارداد'),
+        ),
+        migrations.AddField(
+            model_name='monthlydata',
+            name='weighted_volume',
+            field=models.BigIntegerField(default=0, verbose_name='جمع حجم قراردادهای دارای قیمت'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='base_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='base_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='final_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='final_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='weighted_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='جمع قیمت پایانی × حجم قرارداد'),
+        ),
+        migrations.AddField(
+            model_name='weeklydata',
+            name='weighted_volume',
+            field=models.BigIntegerField(default=0, verbose_name='جمع حجم قراردادهای دارای قیمت'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='base_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='base_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایه'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='final_price_count',
+            field=models.IntegerField(default=0, verbose_name='تعداد قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='final_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=25, verbose_name='جمع قیمت\u200cهای پایانی'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='weighted_price_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='جمع قیمت پایانی × حجم قرارداد'),
+        ),
+        migrations.AddField(
+            model_name='yearlydata',
+            name='weighted_volume',
+            field=models.BigIntegerField(default=0, verbose_name='جمع حجم قراردادهای دارای قیمت'),
+        ),
+        migrations.RunSQL(FILL_PARTIALS_SQL, migrations.RunSQL.noop),
+    ]
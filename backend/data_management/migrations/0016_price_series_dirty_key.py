@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0015_rollup_partials'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSeriesDirtyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trade_date', models.DateField(verbose_name='تاریخ معامله (میلادی)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('commodity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dirty_series_keys', to='data_management.commodity', verbose_name='کالا')),
+            ],
+            options={
+                'verbose_name': 'کلید تغییر یافته سری قیمت',
+                'verbose_name_plural': 'کلیدهای تغییر یافته سری\u200cهای قیمت',
+                'db_table': 'data_management_price_series_dirty_key',
+                'unique_together': {('commodity', 'trade_date')},
+            },
+        ),
+    ]
@@ -1,13 +1,57 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
-import jdatetime
+
+from price_models import jalali
+
+
+class Commodity(models.Model):
+    """
+    بُعد کالا: نام یکتای هر کالا با شناسه عددی
+
+    جداول سری قیمت و AllData با کلید عددی به این جدول اشاره می‌کنند (به جای تکرار
+    نام متنی کالا). نام‌ها و نمادهای دیگری که به همین کالا اشاره دارند در aliases
+    نگه‌داری می‌شوند و در ورود داده به همین شناسه نگاشت می‌شوند.
+    """
+    
+    name = models.CharField(max_length=100, unique=True, verbose_name="نام کالا")
+    aliases = models.JSONField(default=list, blank=True, verbose_name="نام‌ها و نمادهای جایگزین")
+    subcategory = models.ForeignKey(
+        'price_data_ingestion.SubCategory',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='commodities',
+        verbose_name="زیرگروه",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
+    
+    class Meta:
+        db_table = 'data_management_commodity'
+        verbose_name = "کالا"
+        verbose_name_plural = "کالاها"
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
 
 
 class AllData(models.Model):
     """تمام داده‌های خام استخراج شده از API بورس"""
     
+    # کلید طبیعی یک معامله بر اساس شناسه‌های IME (مطابق UniqueConstraint در Meta)؛
+    # ورود داده‌ها با INSERT ... ON CONFLICT روی همین ستون‌ها انجام می‌شود. trade_date
+    # (مشتق از transaction_date) کلید پارتیشن جدول است و باید در کلید یکتا باشد.
+    NATURAL_KEY = ('x_talar_report_pk', 'arzeh_pk', 'symbol', 'transaction_date', 'trade_date')
+    
     # اطلاعات اصلی
     commodity_name = models.CharField(max_length=100, verbose_name="نام کالا", blank=True)
+    # شناسه کالا (از commodity_name در زمان ورود؛ data_management.commodities)
+    # ایندکس (commodity, trade_date) در Meta جستجو بر اساس کالا را پوشش می‌دهد
+    commodity = models.ForeignKey(
+        Commodity, on_delete=models.SET_NULL, null=True, blank=True, db_index=False,
+        related_name='records', verbose_name="کالا",
+    )
     symbol = models.CharField(max_length=50, verbose_name="نماد", blank=True)
     hall = models.CharField(max_length=100, verbose_name="تالار", blank=True)
     producer = models.CharField(max_length=200, verbose_name="تولیدکننده", blank=True)
@@ -28,6 +72,10 @@ class AllData(models.Model):
     
     # تاریخ
     transaction_date = models.CharField(max_length=10, verbose_name="تاریخ معامله شمسی", blank=True)
+    # مشتق از transaction_date در زمان ورود؛ فیلترها و تجمیع‌ها بدون تبدیل تاریخ شمسی.
+    # جدول بر اساس trade_date به پارتیشن‌های ماهانه تقسیم شده است (data_management.partitions)
+    trade_date = models.DateField(db_index=True, verbose_name="تاریخ معامله میلادی")
+    jalali_date_key = models.IntegerField(null=True, blank=True, verbose_name="کلید عددی تاریخ شمسی (YYYYMMDD)")
     
     # اطلاعات اضافی
     supplier = models.CharField(max_length=200, verbose_name="عرضه‌کننده", blank=True)
@@ -38,13 +86,13 @@ class AllData(models.Model):
     settlement_date = models.CharField(max_length=10, null=True, blank=True, verbose_name="تاریخ تسویه")
     
     # شناسه‌ها
-    x_talar_report_pk = models.IntegerField(null=True, blank=True, verbose_name="شناسه گزارش تالار")
+    x_talar_report_pk = models.IntegerField(default=0, blank=True, verbose_name="شناسه گزارش تالار")
     b_arzeh_radif_tar_sarresid = models.CharField(max_length=10, null=True, blank=True)
     mode_description = models.CharField(max_length=50, null=True, blank=True, verbose_name="شرح روش")
     method_description = models.CharField(max_length=50, null=True, blank=True, verbose_name="شرح نحوه")
     currency = models.CharField(max_length=20, null=True, blank=True, verbose_name="ارز")
     packet_name = models.CharField(max_length=50, null=True, blank=True, verbose_name="نام بسته")
-    arzeh_pk = models.IntegerField(null=True, blank=True, verbose_name="شناسه عرضه")
+    arzeh_pk = models.IntegerField(default=0, blank=True, verbose_name="شناسه عرضه")
     
     # داده خام
     raw_data = models.JSONField(null=True, blank=True, verbose_name="داده خام")
@@ -66,11 +114,36 @@ class AllData(models.Model):
             models.Index(fields=['symbol', 'transaction_date']),
             models.Index(fields=['source', 'created_at']),
             models.Index(fields=['producer']),
-            models.Index(fields=['transaction_date']),
+            models.Index(fields=['commodity', 'trade_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['x_talar_report_pk', 'arzeh_pk', 'symbol', 'transaction_date', 'trade_date'],
+                name='all_data_natural_key',
+            ),
         ]
     
     def __str__(self):
         return f"{self.commodity_name or self.symbol} - {self.transaction_date}"
+    
+    def clean(self):
+        super().clean()
+        if jalali.shamsi_to_gregorian(self.transaction_date) is None:
+            raise ValidationError({
+                'transaction_date': 'تاریخ معامله شمسی نامعتبر است (نمونه: 1403/05/01)',
+            })
+    
+    def save(self, *args, **kwargs):
+        # ذخیره تکی (پنل مدیریت و ...)؛ ورود دسته‌ای این ستون‌ها را از نرمال‌ساز می‌گیرد
+        self.trade_date = jalali.shamsi_to_gregorian(self.transaction_date)
+        self.jalali_date_key = jalali.date_key(self.trade_date) if self.trade_date else None
+        if self.commodity_id is None and self.commodity_name:
+            from .commodities import get_resolver
+            self.commodity_id = get_resolver().resolve(self.commodity_name)
+        super().save(*args, **kwargs)
+    
+    def natural_key(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.NATURAL_KEY)
 
 
 class BaseAggregatedData(models.Model):
@@ -124,6 +197,18 @@ class BaseAggregatedData(models.Model):
         verbose_name="نسبت قدرت خریدار به فروشنده"
     )
     
+    # مجموع‌های جزئی: دوره‌های بزرگ‌تر از جمع این مقادیر روزانه محاسبه می‌شوند تا
+    # میانگین‌ها دقیق باشند (نه میانگین میانگین‌ها)
+    final_price_sum = models.DecimalField(max_digits=25, decimal_places=2, default=0, verbose_name="جمع قیمت‌های پایانی")
+    final_price_count = models.IntegerField(default=0, verbose_name="تعداد قیمت‌های پایانی")
+    base_price_sum = models.DecimalField(max_digits=25, decimal_places=2, default=0, verbose_name="جمع قیمت‌های پایه")
+    base_price_count = models.IntegerField(default=0, verbose_name="تعداد قیمت‌های پایه")
+    weighted_price_sum = models.DecimalField(
+        max_digits=30, decimal_places=2, default=0,
+        verbose_name="جمع قیمت پایانی × حجم قرارداد"
+    )
+    weighted_volume = models.BigIntegerField(default=0, verbose_name="جمع حجم قراردادهای دارای قیمت")
+    
     # متادیتا
     records_count = models.IntegerField(default=0, verbose_name="تعداد رکوردهای پردازش شده")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
@@ -215,7 +300,7 @@ class YearlyData(BaseAggregatedData):
 class CommodityDailyPriceSeries(models.Model):
     """سری‌های قیمت روزانه هر کالا"""
     
-    commodity_name = models.CharField(max_length=100, verbose_name="نام کالا")
+    commodity = models.ForeignKey(Commodity, on_delete=models.CASCADE, related_name='daily_series', verbose_name="کالا")
     trade_date = models.DateField(verbose_name="تاریخ معامله")
     trade_date_shamsi = models.CharField(max_length=10, verbose_name="تاریخ شمسی")
     
@@ -232,11 +317,30 @@ class CommodityDailyPriceSeries(models.Model):
         max_digits=15, decimal_places=2, null=True, blank=True,
         verbose_name="بیشترین قیمت"
     )
+    first_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="اولین قیمت"
+    )
+    last_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="آخرین قیمت"
+    )
+    avg_weighted_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="میانگین موزون قیمت (بر اساس حجم)"
+    )
     
     # حجم‌ها
     total_volume = models.BigIntegerField(default=0, verbose_name="مجموع حجم معاملات")
     transaction_count = models.IntegerField(default=0, verbose_name="تعداد معاملات")
     
+    # مجموع‌های جزئی روز؛ سری‌های هفتگی/ماهانه/سالانه از این مقادیر محاسبه می‌شوند
+    price_sum = models.DecimalField(max_digits=25, decimal_places=2, default=0, verbose_name="جمع قیمت‌های نهایی")
+    weighted_price_sum = models.DecimalField(
+        max_digits=30, decimal_places=2, default=0,
+        verbose_name="جمع قیمت نهایی × حجم"
+    )
+    
     # متادیتا
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -245,21 +349,20 @@ class CommodityDailyPriceSeries(models.Model):
         db_table = 'commodity_daily_price_series'
         verbose_name = "سری قیمت روزانه کالا"
         verbose_name_plural = "سری‌های قیمت روزانه کالاها"
-        unique_together = ['commodity_name', 'trade_date']
-        ordering = ['-trade_date', 'commodity_name']
+        unique_together = ['commodity', 'trade_date']
+        ordering = ['-trade_date', 'commodity']
         indexes = [
-            models.Index(fields=['commodity_name', 'trade_date']),
             models.Index(fields=['trade_date']),
         ]
         
     def __str__(self):
-        return f"{self.commodity_name} - {self.trade_date_shamsi}"
+        return f"{self.commodity} - {self.trade_date_shamsi}"
 
 
 class CommodityWeeklyPriceSeries(models.Model):
     """سری‌های قیمت هفتگی هر کالا"""
     
-    commodity_name = models.CharField(max_length=100, verbose_name="نام کالا")
+    commodity = models.ForeignKey(Commodity, on_delete=models.CASCADE, related_name='weekly_series', verbose_name="کالا")
     year = models.IntegerField(verbose_name="سال")
     week_number = models.IntegerField(verbose_name="شماره هفته")
     week_start_date = models.DateField(verbose_name="تاریخ شروع هفته")
@@ -278,6 +381,18 @@ class CommodityWeeklyPriceSeries(models.Model):
         max_digits=15, decimal_places=2, null=True, blank=True,
         verbose_name="بیشترین قیمت"
     )
+    first_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="اولین قیمت"
+    )
+    last_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="آخرین قیمت"
+    )
+    avg_weighted_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="میانگین موزون قیمت (بر اساس حجم)"
+    )
     
     # حجم‌ها
     total_volume = models.BigIntegerField(default=0, verbose_name="مجموع حجم معاملات")
@@ -291,17 +406,17 @@ class CommodityWeeklyPriceSeries(models.Model):
         db_table = 'commodity_weekly_price_series'
         verbose_name = "سری قیمت هفتگی کالا"
         verbose_name_plural = "سری‌های قیمت هفتگی کالاها"
-        unique_together = ['commodity_name', 'year', 'week_number']
-        ordering = ['-year', '-week_number', 'commodity_name']
+        unique_together = ['commodity', 'year', 'week_number']
+        ordering = ['-year', '-week_number', 'commodity']
         
     def __str__(self):
-        return f"{self.commodity_name} - هفته {self.week_number} سال {self.year}"
+        return f"{self.commodity} - هفته {self.week_number} سال {self.year}"
 
 
 class CommodityMonthlyPriceSeries(models.Model):
     """سری‌های قیمت ماهانه هر کالا"""
     
-    commodity_name = models.CharField(max_length=100, verbose_name="نام کالا")
+    commodity = models.ForeignKey(Commodity, on_delete=models.CASCADE, related_name='monthly_series', verbose_name="کالا")
     year = models.IntegerField(verbose_name="سال")
     month = models.IntegerField(verbose_name="ماه")
     month_shamsi = models.CharField(max_length=7, verbose_name="ماه و سال شمسی")
@@ -319,6 +434,18 @@ class CommodityMonthlyPriceSeries(models.Model):
         max_digits=15, decimal_places=2, null=True, blank=True,
         verbose_name="بیشترین قیمت"
     )
+    first_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="اولین قیمت"
+    )
+    last_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="آخرین قیمت"
+    )
+    avg_weighted_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="میانگین موزون قیمت (بر اساس حجم)"
+    )
     
     # حجم‌ها
     total_volume = models.BigIntegerField(default=0, verbose_name="مجموع حجم معاملات")
@@ -332,17 +459,17 @@ class CommodityMonthlyPriceSeries(models.Model):
         db_table = 'commodity_monthly_price_series'
         verbose_name = "سری قیمت ماهانه کالا"
         verbose_name_plural = "سری‌های قیمت ماهانه کالاها"
-        unique_together = ['commodity_name', 'year', 'month']
-        ordering = ['-year', '-month', 'commodity_name']
+        unique_together = ['commodity', 'year', 'month']
+        ordering = ['-year', '-month', 'commodity']
         
     def __str__(self):
-        return f"{self.commodity_name} - {self.month_shamsi}"
+        return f"{self.commodity} - {self.month_shamsi}"
 
 
 class CommodityYearlyPriceSeries(models.Model):
     """سری‌های قیمت سالانه هر کالا"""
     
-    commodity_name = models.CharField(max_length=100, verbose_name="نام کالا")
+    commodity = models.ForeignKey(Commodity, on_delete=models.CASCADE, related_name='yearly_series', verbose_name="کالا")
     year = models.IntegerField(verbose_name="سال شمسی")
     
     # قیمت‌ها
@@ -358,6 +485,18 @@ class CommodityYearlyPriceSeries(models.Model):
         max_digits=15, decimal_places=2, null=True, blank=True,
         verbose_name="بیشترین قیمت"
     )
+    first_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="اولین قیمت"
+    )
+    last_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="آخرین قیمت"
+    )
+    avg_weighted_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True,
+        verbose_name="میانگین موزون قیمت (بر اساس حجم)"
+    )
     
     # حجم‌ها
     total_volume = models.BigIntegerField(default=0, verbose_name="مجموع حجم معاملات")
@@ -371,11 +510,34 @@ class CommodityYearlyPriceSeries(models.Model):
         db_table = 'commodity_yearly_price_series'
         verbose_name = "سری قیمت سالانه کالا"
         verbose_name_plural = "سری‌های قیمت سالانه کالاها"
-        unique_together = ['commodity_name', 'year']
-        ordering = ['-year', 'commodity_name']
+        unique_together = ['commodity', 'year']
+        ordering = ['-year', 'commodity']
         
     def __str__(self):
-        return f"{self.commodity_name} - سال {self.year}"
+        return f"{self.commodity} - سال {self.year}"
+
+
+class PriceSeriesDirtyKey(models.Model):
+    """
+    (کالا، تاریخ معامله) هایی که داده AllData آن‌ها تغییر کرده و سری قیمتشان باید بازمحاسبه شود
+
+    ورود داده در همان تراکنش نوشتن AllData کلیدها را ثبت می‌کند و
+    aggregate_price_series --incremental فقط همین روزها و هفته/ماه/سال آن‌ها را
+    بازمحاسبه و کلیدها را حذف می‌کند.
+    """
+
+    commodity = models.ForeignKey(Commodity, on_delete=models.CASCADE, related_name='dirty_series_keys', verbose_name="کالا")
+    trade_date = models.DateField(verbose_name="تاریخ معامله (میلادی)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'data_management_price_series_dirty_key'
+        verbose_name = "کلید تغییر یافته سری قیمت"
+        verbose_name_plural = "کلیدهای تغییر یافته سری‌های قیمت"
+        unique_together = ['commodity', 'trade_date']
+
+    def __str__(self):
+        return f"{self.commodity} - {self.trade_date}"
 
 
 class DataAggregationLog(models.Model):
@@ -0,0 +1,249 @@
+"""
+پارتیشن‌بندی ماهانه جدول AllData در PostgreSQL
+
+جدول data_management_all_data بر اساس trade_date به صورت RANGE و برای هر ماه
+شمسی یک پارتیشن دارد (data_management_all_data_p140305 برای مرداد ۱۴۰۳). کوئری‌هایی
+که بر اساس trade_date محدود شده‌اند (تجمیع روزانه، فیلتر تاریخ API، یافتن رکوردهای
+موجود در ورود) فقط پارتیشن‌های همان بازه را می‌خوانند و ایندکس‌ها، vacuum و
+نگهداری هر پارتیشن مستقل و کوچک می‌مانند.
+
+یک پارتیشن DEFAULT رکوردهای ماه‌هایی را که هنوز پارتیشن ندارند نگه می‌دارد؛ بنابراین
+ورود داده هیچ‌گاه به خاطر نبود پارتیشن شکست نمی‌خورد. پس از commit هر ورود
+(signals.RollupBatch) پارتیشن ماه‌های نوشته شده ساخته و رکوردهای آن‌ها از DEFAULT
+منتقل می‌شوند. ساخت ماه‌های آینده و جداسازی/بایگانی ماه‌های قدیمی با دستور
+manage_alldata_partitions انجام می‌شود.
+"""
+import logging
+import re
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from price_models import jalali
+
+from .models import AllData
+
+logger = logging.getLogger(__name__)
+
+MonthKey = Tuple[int, int]
+
+
+class AllDataPartitions:
+    """ساخت، فهرست و جداسازی پارتیشن‌های ماهانه (ماه شمسی) جدول AllData"""
+
+    PARENT = AllData._meta.db_table
+    DEFAULT_PARTITION = f'{PARENT}_default'
+
+    # تعداد ماه‌های آینده که از قبل ساخته می‌شوند
+    FUTURE_MONTHS = 3
+
+    _NAME_RE = re.compile(rf'^{re.escape(PARENT)}_p(\d{{4}})(\d{{2}})$')
+
+    # ماه‌های دارای پارتیشن (cache درون پردازه برای هر پایگاه داده)
+    _attached: Dict[str, Set[MonthKey]] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, using: Optional[str] = None):
+        self.connection = connections[using or DEFAULT_DB_ALIAS]
+        self.quote = self.connection.ops.quote_name
+
+    @classmethod
+    def is_supported(cls, using: Optional[str] = None) -> bool:
+        return connections[using or DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+    # ------------------------------------------------------------------
+    # ماه‌ها و نام‌ها
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def month_of(value: date) -> MonthKey:
+        key = jalali.date_key(value)
+        return key // 10000, key // 100 % 100
+
+    @staticmethod
+    def next_month(jy: int, jm: int) -> MonthKey:
+        return (jy + 1, 1) if jm == 12 else (jy, jm + 1)
+
+    @classmethod
+    def month_bounds(cls, jy: int, jm: int) -> Tuple[date, date]:
+        """[اول ماه، اول ماه بعد) به میلادی"""
+        return jalali.to_gregorian(jy, jm, 1), jalali.to_gregorian(*cls.next_month(jy, jm), 1)
+
+    @classmethod
+    def partition_name(cls, jy: int, jm: int) -> str:
+        return f'{cls.PARENT}_p{jy:04d}{jm:02d}'
+
+    @classmethod
+    def months_between(cls, start: date, end: date) -> List[MonthKey]:
+        months = []
+        month, last = cls.month_of(start), cls.month_of(end)
+        while month <= last:
+            months.append(month)
+            month = cls.next_month(*month)
+        return months
+
+    # ------------------------------------------------------------------
+    # وضعیت
+    # ------------------------------------------------------------------
+
+    def is_partitioned(self) -> bool:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+                [self.PARENT],
+            )
+            return cursor.fetchone()[0]
+
+    def partitions(self) -> List[Dict]:
+        """پارتیشن‌های متصل: نام، ماه، بازه و تعداد تقریبی رکوردها"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT child.relname, child.reltuples::bigint FROM pg_inherits '
+                'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                'WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname',
+                [self.PARENT],
+            )
+            rows = cursor.fetchall()
+        result = []
+        for name, estimate in rows:
+            match = self._NAME_RE.match(name)
+            month = (int(match.group(1)), int(match.group(2))) if match else None
+            lower, upper = self.month_bounds(*month) if month else (None, None)
+            result.append({
+                'name': name,
+                'month': month,
+                'lower': lower,
+                'upper': upper,
+                'rows_estimate': max(estimate, 0),
+            })
+        return result
+
+    def attached_months(self, refresh: bool = False) -> Set[MonthKey]:
+        alias = self.connection.alias
+        with self._lock:
+            if refresh or alias not in self._attached:
+                self._attached[alias] = {
+                    partition['month'] for partition in self.partitions() if partition['month']
+                }
+            return self._attached[alias]
+
+    # ------------------------------------------------------------------
+    # ساخت پارتیشن
+    # ------------------------------------------------------------------
+
+    def create_partition(self, jy: int, jm: int) -> bool:
+        """
+        ساخت پارتیشن یک ماه و انتقال رکوردهای آن ماه از پارتیشن DEFAULT
+
+        Returns:
+            True اگر پارتیشن ساخته شد؛ False اگر از قبل وجود داشت
+        """
+        name = self.partition_name(jy, jm)
+        lower, upper = self.month_bounds(jy, jm)
+        parent, default, table = self.quote(self.PARENT), self.quote(self.DEFAULT_PARTITION), self.quote(name)
+
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            # ساخت همزمان پارتیشن از چند پردازه پشت سر هم انجام می‌شود
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [self.PARENT])
+            cursor.execute(
+                'SELECT inhparent = to_regclass(%s) FROM pg_inherits WHERE inhrelid = to_regclass(%s)',
+                [self.PARENT, name],
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                return False
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+            if cursor.fetchone()[0]:
+                # جدول جدا شده (detach) هم‌نام؛ رکوردها در DEFAULT می‌مانند
+                logger.warning(f"Partition table {name} exists but is not attached; skipping")
+                return False
+
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {default} WHERE trade_date >= %s AND trade_date < %s)',
+                [lower, upper],
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(
+                    f'CREATE TABLE {table} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)',
+                    [lower, upper],
+                )
+            else:
+                # رکوردهای این ماه در DEFAULT هستند: ساخت جدول، انتقال و سپس اتصال
+                cursor.execute(f'CREATE TABLE {table} (LIKE {parent} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {default} WHERE trade_date >= %s AND trade_date < %s '
+                    f'RETURNING *) INSERT INTO {table} SELECT * FROM moved',
+                    [lower, upper],
+                )
+                moved = cursor.rowcount
+                cursor.execute(
+                    f'ALTER TABLE {parent} ATTACH PARTITION {table} FOR VALUES FROM (%s) TO (%s)',
+                    [lower, upper],
+                )
+                logger.info(f"Moved {moved} AllData rows from the default partition into {name}")
+
+        self.attached_months().add((jy, jm))
+        logger.info(f"Created AllData partition {name} [{lower}, {upper})")
+        return True
+
+    def ensure_months(self, months: Iterable[MonthKey]) -> List[str]:
+        """ساخت پارتیشن ماه‌هایی که هنوز پارتیشن ندارند (بدون کوئری برای ماه‌های موجود)"""
+        attached = self.attached_months()
+        created = []
+        for jy, jm in sorted(set(months) - attached):
+            if self.create_partition(jy, jm):
+                created.append(self.partition_name(jy, jm))
+        return created
+
+    def ensure_for_dates(self, trade_dates: Iterable[Optional[date]]) -> List[str]:
+        return self.ensure_months({self.month_of(value) for value in trade_dates if value})
+
+    def ensure_range(self, start: date, end: date) -> List[str]:
+        return self.ensure_months(self.months_between(start, end))
+
+    def ensure_future(self, months_ahead: Optional[int] = None) -> List[str]:
+        """پارتیشن ماه جاری و months_ahead ماه بعد از آن"""
+        month = jalali.today()[:2]
+        months = [month]
+        for _ in range(self.FUTURE_MONTHS if months_ahead is None else months_ahead):
+            month = self.next_month(*month)
+            months.append(month)
+        return self.ensure_months(months)
+
+    def split_default(self) -> List[str]:
+        """ساخت پارتیشن برای همه ماه‌هایی که رکوردشان در DEFAULT مانده است"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT DISTINCT trade_date FROM {self.quote(self.DEFAULT_PARTITION)}')
+            dates = [row[0] for row in cursor.fetchall()]
+        return self.ensure_for_dates(dates)
+
+    # ------------------------------------------------------------------
+    # جداسازی و بایگانی
+    # ------------------------------------------------------------------
+
+    def detach(self, name: str, archive_schema: Optional[str] = None, drop: bool = False):
+        """
+        جدا کردن یک پارتیشن از AllData
+
+        جدول جدا شده در کوئری‌های AllData دیده نمی‌شود. با archive_schema به آن
+        schema منتقل و با drop حذف می‌شود؛ در غیر این صورت با همان نام باقی می‌ماند.
+        """
+        match = self._NAME_RE.match(name)
+        if not match:
+            raise ValueError(f"Not a monthly AllData partition: {name}")
+        table = self.quote(name)
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [self.PARENT])
+            cursor.execute(f'ALTER TABLE {self.quote(self.PARENT)} DETACH PARTITION {table}')
+            if drop:
+                cursor.execute(f'DROP TABLE {table}')
+            elif archive_schema:
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {self.quote(archive_schema)}')
+                cursor.execute(f'ALTER TABLE {table} SET SCHEMA {self.quote(archive_schema)}')
+        self.attached_months().discard((int(match.group(1)), int(match.group(2))))
+        logger.info(
+            f"Detached AllData partition {name}"
+            + (' (dropped)' if drop else f' (archived to {archive_schema})' if archive_schema else '')
+        )
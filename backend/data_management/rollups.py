@@ -0,0 +1,535 @@
+"""
+تجمیع سری‌های قیمت کالاها (روزانه/هفتگی/ماهانه/سالانه) در پایگاه داده
+
+برای هر دوره یک دستور SQL اجرا می‌شود: GROUP BY (کالا، دوره) و نوشتن نتیجه با
+یک INSERT ... ON CONFLICT در جدول سری همان دوره. هیچ رکورد خامی به پایتون منتقل
+نمی‌شود و محدود کردن بازه تاریخ (trade_date) فقط پارتیشن‌های همان ماه‌ها را می‌خواند.
+
+تجمیع آبشاری است: فقط سری روزانه از رکوردهای خام AllData ساخته می‌شود و مجموع‌های
+جزئی هر روز (جمع قیمت‌ها، جمع قیمت × حجم، اولین/آخرین قیمت) را نگه می‌دارد.
+سری‌های هفتگی/ماهانه/سالانه از همین مقادیر روزانه محاسبه می‌شوند؛ بنابراین
+میانگین و میانگین موزون آن‌ها دقیق است و هزینه‌شان به تعداد روزها بستگی دارد نه
+تعداد معاملات. ترتیب اجرا مهم است: ابتدا daily و سپس دوره‌های بزرگ‌تر.
+
+ورود داده (کالا، trade_date) های نوشته شده را در PriceSeriesDirtyKey ثبت می‌کند؛
+refresh_dirty فقط همان روزها و هفته/ماه/سال دربرگیرنده آن‌ها را بازمحاسبه و در
+همان تراکنش کلیدها را حذف می‌کند.
+
+هر تراکنش تجمیع قفل advisory کالاهای خود (و اجرای کامل یک قفل انحصاری برای همه
+کالاها) را تا پایان تراکنش نگه می‌دارد؛ اجراهای همزمان (cron هم‌پوشان یا run_parallel) هیچ‌گاه یک کالا را همزمان نمی‌نویسند.
+run_parallel کالاها را بین چند پردازه (هر کدام با اتصال پایگاه داده خود) تقسیم می‌کند.
+
+نمونه:
+    engine = PriceSeriesRollup()
+    engine.rollup_all(commodity_ids=[12], start=date(2024, 7, 22))
+    engine.refresh_dirty()
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+from price_models import jalali
+
+from .models import (
+    AllData,
+    Commodity,
+    CommodityDailyPriceSeries,
+    CommodityMonthlyPriceSeries,
+    CommodityWeeklyPriceSeries,
+    CommodityYearlyPriceSeries,
+    PriceSeriesDirtyKey,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _shamsi_sql(key: str, with_day: bool = True) -> str:
+    """رشته شمسی (1403/05/01 یا 1403/05) از کلید عددی YYYYMMDD در SQL"""
+    parts = [f"({key} / 10000)::text", "'/'", f"lpad(mod({key} / 100, 100)::text, 2, '0')"]
+    if with_day:
+        parts += ["'/'", f"lpad(mod({key}, 100)::text, 2, '0')"]
+    return f"concat({', '.join(parts)})"
+
+
+class RollupSource(NamedTuple):
+    """منبع یک دوره: جدول، ستون‌های انتخابی و شرط‌های اعتبار رکورد"""
+    model: Type[models.Model]
+    columns: str
+    conditions: Tuple[str, ...]
+    # تجمیع‌ها: نام ستون جدول سری ← عبارت SQL روی ستون‌های منبع
+    aggregates: Dict[str, str]
+
+
+# رکوردهای خام AllData (فقط برای سری روزانه)
+RAW_SOURCE = RollupSource(
+    AllData,
+    'commodity_id, trade_date, jalali_date_key, final_price, contract_volume, x_talar_report_pk, id',
+    ('final_price > 0', 'contract_volume > 0', 'jalali_date_key IS NOT NULL'),
+    {
+        'avg_price': 'ROUND(AVG(final_price), 2)',
+        'min_price': 'MIN(final_price)',
+        'max_price': 'MAX(final_price)',
+        'first_price': '(array_agg(final_price ORDER BY x_talar_report_pk, id))[1]',
+        'last_price': '(array_agg(final_price ORDER BY x_talar_report_pk DESC, id DESC))[1]',
+        'avg_weighted_price': 'ROUND(SUM(final_price * contract_volume) / SUM(contract_volume), 2)',
+        'total_volume': 'SUM(contract_volume)',
+        'transaction_count': 'COUNT(*)',
+        'price_sum': 'SUM(final_price)',
+        'weighted_price_sum': 'SUM(final_price * contract_volume)',
+    },
+)
+
+# سری روزانه (برای دوره‌های بزرگ‌تر)؛ میانگین‌ها از مجموع‌های جزئی، نه میانگین میانگین‌ها
+DAILY_SOURCE = RollupSource(
+    CommodityDailyPriceSeries,
+    "commodity_id, trade_date, replace(trade_date_shamsi, '/', '')::int AS jalali_date_key, "
+    'price_sum, weighted_price_sum, min_price, max_price, first_price, last_price, '
+    'total_volume, transaction_count',
+    (),
+    {
+        'avg_price': 'ROUND(SUM(price_sum) / NULLIF(SUM(transaction_count), 0), 2)',
+        'min_price': 'MIN(min_price)',
+        'max_price': 'MAX(max_price)',
+        'first_price': '(array_agg(first_price ORDER BY trade_date))[1]',
+        'last_price': '(array_agg(last_price ORDER BY trade_date DESC))[1]',
+        'avg_weighted_price': 'ROUND(SUM(weighted_price_sum) / NULLIF(SUM(total_volume), 0), 2)',
+        'total_volume': 'SUM(total_volume)',
+        'transaction_count': 'SUM(transaction_count)',
+    },
+)
+
+
+class RollupPeriod(NamedTuple):
+    """تعریف یک دوره: جدول سری، منبع، ستون‌های دوره و ستون‌های مشتق"""
+    model: Type[models.Model]
+    source: RollupSource
+    # ستون‌های گروه‌بندی: نام ستون جدول سری ← عبارت روی ستون‌های منبع
+    buckets: Dict[str, str]
+    # ستون‌های دیگر جدول سری: عبارت روی ستون‌های گروه‌بندی یا تجمیع
+    extra: Dict[str, str]
+    # کلید دوره در جدول سری و مقدار آن برای یک تاریخ (محدوده حذف دوره‌های بدون داده)
+    scope_key: str
+    scope_value: Callable[[date], Any]
+
+
+PERIODS = {
+    'daily': RollupPeriod(
+        CommodityDailyPriceSeries,
+        RAW_SOURCE,
+        buckets={'trade_date': 'trade_date'},
+        extra={'trade_date_shamsi': _shamsi_sql('MIN(jalali_date_key)')},
+        scope_key='trade_date',
+        scope_value=lambda value: value,
+    ),
+    'weekly': RollupPeriod(
+        CommodityWeeklyPriceSeries,
+        DAILY_SOURCE,
+        buckets={
+            'year': 'EXTRACT(isoyear FROM trade_date)::int',
+            'week_number': 'EXTRACT(week FROM trade_date)::int',
+            'week_start_date': "date_trunc('week', trade_date)::date",
+        },
+        extra={'week_end_date': 'week_start_date + 6'},
+        scope_key='week_start_date',
+        scope_value=lambda value: value - timedelta(days=value.weekday()),
+    ),
+    'monthly': RollupPeriod(
+        CommodityMonthlyPriceSeries,
+        DAILY_SOURCE,
+        buckets={'year': 'jalali_date_key / 10000', 'month': 'mod(jalali_date_key / 100, 100)'},
+        extra={'month_shamsi': _shamsi_sql('MIN(jalali_date_key)', with_day=False)},
+        scope_key='year * 100 + month',
+        scope_value=lambda value: jalali.date_key(value) // 100,
+    ),
+    'yearly': RollupPeriod(
+        CommodityYearlyPriceSeries,
+        DAILY_SOURCE,
+        buckets={'year': 'jalali_date_key / 10000'},
+        extra={},
+        scope_key='year',
+        scope_value=lambda value: jalali.date_key(value) // 10000,
+    ),
+}
+
+
+class PriceSeriesRollup:
+    """تجمیع set-based و آبشاری سری‌های قیمت کالاها"""
+
+    PERIODS = PERIODS
+
+    # فضای نام قفل‌های advisory کالاها (کلید اول pg_advisory_xact_lock دو کلیدی)
+    LOCK_NAMESPACE = 'commodity_price_series'
+
+    # بیشترین تعداد قفل کالا در یک تراکنش؛ بیش از آن قفل کل فضای نام گرفته می‌شود
+    MAX_COMMODITY_LOCKS = 1000
+
+    # تعداد بخش‌های کار به ازای هر پردازه (تقسیم بار کالاهای بزرگ و کوچک)
+    TASKS_PER_WORKER = 4
+
+    def __init__(self, using: Optional[str] = None):
+        self.connection = connections[using or DEFAULT_DB_ALIAS]
+        self.quote = self.connection.ops.quote_name
+
+    @classmethod
+    def is_supported(cls, using: Optional[str] = None) -> bool:
+        """عبارات تاریخ و ON CONFLICT برای PostgreSQL نوشته شده‌اند"""
+        return connections[using or DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+    @staticmethod
+    def period_range(period: str, start: Optional[date], end: Optional[date]) -> Tuple[Optional[date], Optional[date]]:
+        """
+        گسترش بازه تاریخ به ابتدا و انتهای کامل دوره‌ها
+
+        تجمیع یک هفته/ماه/سال باید همه روزهای آن دوره را ببیند، حتی اگر فقط
+        بخشی از آن در بازه درخواستی باشد.
+        """
+        if period == 'weekly':
+            start = start and start - timedelta(days=start.weekday())
+            end = end and end + timedelta(days=6 - end.weekday())
+        elif period in ('monthly', 'yearly'):
+            if start:
+                jy, jm, _ = jalali.from_gregorian(start)
+                start = jalali.to_gregorian(jy, jm if period == 'monthly' else 1, 1)
+            if end:
+                jy, jm, _ = jalali.from_gregorian(end)
+                if period == 'yearly':
+                    jm = 12
+                end = jalali.to_gregorian(jy, jm, jalali.month_length(jy, jm))
+        return start, end
+
+    @classmethod
+    def merge_scopes(cls, period: str, scopes: Iterable[Tuple[int, date, date]]) -> List[Tuple[int, date, date]]:
+        """گسترش بازه‌های (کالا، شروع، پایان) به دوره‌های کامل و ادغام بازه‌های هم‌پوشان یا پیوسته"""
+        merged = []
+        for commodity_id, low, high in sorted(
+            (commodity_id, *cls.period_range(period, low, high)) for commodity_id, low, high in scopes
+        ):
+            if merged and merged[-1][0] == commodity_id and low <= merged[-1][2] + timedelta(days=1):
+                merged[-1][2] = max(merged[-1][2], high)
+            else:
+                merged.append([commodity_id, low, high])
+        return [tuple(scope) for scope in merged]
+
+    @staticmethod
+    def _conditions(commodity_ids, expression: str, low, high, table: str = None,
+                    scopes=None) -> Tuple[List[str], list]:
+        """شرط‌های کالا و بازه یک عبارت (و در صورت وجود، بازه‌های جداگانه هر کالا)"""
+        conditions, params = [], []
+        if scopes:
+            conditions.append(
+                'EXISTS (SELECT 1 FROM unnest(%s, %s, %s) AS scope(commodity_id, low, high) '
+                f'WHERE scope.commodity_id = {table}.commodity_id AND {expression} BETWEEN scope.low AND scope.high)'
+            )
+            params.extend(list(column) for column in zip(*scopes))
+        if commodity_ids is not None:
+            conditions.append('commodity_id = ANY(%s)')
+            params.append(list(commodity_ids))
+        if low is not None:
+            conditions.append(f'{expression} >= %s')
+            params.append(low)
+        if high is not None:
+            conditions.append(f'{expression} <= %s')
+            params.append(high)
+        return conditions, params
+
+    def lock_commodities(self, commodity_ids: Optional[Iterable[int]] = None):
+        """
+        قفل advisory کالاها تا پایان تراکنش جاری (None: همه کالاها)
+
+        اجرای کامل (یا تعداد کالای بیش از MAX_COMMODITY_LOCKS) یک قفل انحصاری روی
+        کل فضای نام می‌گیرد، نه یک قفل برای هر کالا که جدول قفل‌ها
+        (max_locks_per_transaction) را پر می‌کند. اجراهای محدود همان قفل را اشتراکی
+        و سپس قفل کالاهای خود را به ترتیب شناسه می‌گیرند تا به deadlock نرسند؛
+        اجرای دوم هم‌پوشان تا commit اجرای اول منتظر می‌ماند.
+        """
+        ids = None if commodity_ids is None else sorted(set(commodity_ids))
+        with self.connection.cursor() as cursor:
+            if ids is None or len(ids) > self.MAX_COMMODITY_LOCKS:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [self.LOCK_NAMESPACE])
+                return
+            cursor.execute('SELECT pg_advisory_xact_lock_shared(hashtext(%s))', [self.LOCK_NAMESPACE])
+            cursor.execute(
+                'SELECT count(pg_advisory_xact_lock(hashtext(%s), id::int)) FROM unnest(%s::bigint[]) AS ids(id)',
+                [self.LOCK_NAMESPACE, ids],
+            )
+
+    def _upsert_sql(self, spec: RollupPeriod, commodity_ids, start, end, scopes=None) -> Tuple[str, list]:
+        opts = spec.model._meta
+        source = spec.source
+        table = self.quote(source.model._meta.db_table)
+        conditions, params = self._conditions(commodity_ids, 'trade_date', start, end, table, scopes)
+        conditions = ['commodity_id IS NOT NULL', *source.conditions, *conditions]
+
+        # ستون‌های دوره که همان ستون منبع هستند (trade_date سری روزانه) دوباره انتخاب نمی‌شوند
+        buckets = ''.join(
+            f', {expr} AS {self.quote(name)}' for name, expr in spec.buckets.items() if expr != name
+        )
+        group_by = ', '.join(['commodity_id'] + [self.quote(name) for name in spec.buckets])
+        outputs = {**{name: self.quote(name) for name in spec.buckets}, **spec.extra, **source.aggregates}
+
+        columns = ', '.join(self.quote(column) for column in ['commodity_id', *outputs, 'created_at', 'updated_at'])
+        conflict = [opts.get_field(name).column for name in opts.unique_together[0]]
+        updates = ', '.join(
+            f'{self.quote(name)} = EXCLUDED.{self.quote(name)}'
+            for name in [*(name for name in outputs if name not in conflict), 'updated_at']
+        )
+        rows = (
+            f'SELECT {source.columns} FROM {table} '
+            f'WHERE {" AND ".join(conditions)}'
+        )
+        sql = (
+            f'INSERT INTO {self.quote(opts.db_table)} ({columns}) '
+            f'SELECT commodity_id, {", ".join(outputs.values())}, now(), now() '
+            f'FROM (SELECT rows.*{buckets} FROM ({rows}) AS rows) AS source '
+            f'GROUP BY {group_by} '
+            f'ON CONFLICT ({", ".join(self.quote(column) for column in conflict)}) DO UPDATE SET {updates} '
+            f'RETURNING (xmax = 0) AS inserted'
+        )
+        # xmax صفر یعنی ردیف در همین دستور درج شده است (نه بروزرسانی)
+        sql = (
+            f'WITH merged AS ({sql}) '
+            f'SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged'
+        )
+        return sql, params
+
+    def _prune_sql(self, spec: RollupPeriod, commodity_ids, start, end, scopes=None) -> Tuple[str, list]:
+        """
+        حذف دوره‌های محدوده که در این اجرا نوشته نشده‌اند (داده منبعشان دیگر وجود ندارد)
+
+        now() زمان شروع تراکنش است؛ ردیف‌های نوشته شده در upsert همین تراکنش
+        updated_at برابر now() دارند.
+        """
+        table = self.quote(spec.model._meta.db_table)
+        conditions, params = self._conditions(
+            commodity_ids,
+            spec.scope_key,
+            spec.scope_value(start) if start else None,
+            spec.scope_value(end) if end else None,
+            table,
+            scopes and [
+                (commodity_id, spec.scope_value(low), spec.scope_value(high)) for commodity_id, low, high in scopes
+            ],
+        )
+        return (
+            f'DELETE FROM {table} '
+            f'WHERE {" AND ".join(["updated_at < now()", *conditions])}'
+        ), params
+
+    def rollup(self, period: str, commodity_ids: Optional[Iterable[int]] = None,
+               start: Optional[date] = None, end: Optional[date] = None,
+               scopes: Optional[Iterable[Tuple[int, date, date]]] = None) -> Dict[str, int]:
+        """
+        تجمیع یک دوره با یک GROUP BY و یک upsert
+
+        daily از AllData و دوره‌های دیگر از سری روزانه موجود محاسبه می‌شوند. دوره‌های
+        محدوده (کالاها و بازه) که دیگر داده‌ای ندارند حذف می‌شوند.
+
+        Args:
+            period: daily، weekly، monthly یا yearly
+            commodity_ids: محدود به این کالاها (None: همه)
+            start/end: محدود به این بازه trade_date (به دوره‌های کامل گسترش می‌یابد)
+            scopes: محدود به این بازه‌های (کالا، شروع، پایان)؛ هر بازه به دوره‌های کامل
+                گسترش می‌یابد (حالت افزایشی)
+
+        Returns:
+            {'processed', 'created', 'updated', 'deleted'}
+        """
+        if period not in self.PERIODS:
+            raise ValueError(f"Unknown rollup period: {period}")
+        spec = self.PERIODS[period]
+        if commodity_ids is not None:
+            commodity_ids = list(commodity_ids)
+        start, end = self.period_range(period, start, end)
+        if scopes is not None:
+            scopes = self.merge_scopes(period, scopes)
+            if not scopes:
+                return {'processed': 0, 'created': 0, 'updated': 0, 'deleted': 0}
+            # کران کلی بازه‌ها: محدود شدن پارتیشن‌های خوانده شده AllData
+            low, high = min(scope[1] for scope in scopes), max(scope[2] for scope in scopes)
+            start, end = max(start, low) if start else low, min(end, high) if end else high
+
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            self.lock_commodities(commodity_ids if scopes is None else {scope[0] for scope in scopes})
+            cursor.execute(*self._upsert_sql(spec, commodity_ids, start, end, scopes))
+            created, updated = cursor.fetchone()
+            cursor.execute(*self._prune_sql(spec, commodity_ids, start, end, scopes))
+            deleted = cursor.rowcount
+
+        logger.info(f"Rolled up {period} price series: {created} created, {updated} updated, {deleted} deleted")
+        return {'processed': created + updated, 'created': created, 'updated': updated, 'deleted': deleted}
+
+    def rollup_all(self, commodity_ids: Optional[Iterable[int]] = None,
+                   start: Optional[date] = None, end: Optional[date] = None,
+                   periods: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        تجمیع آبشاری دوره‌ها (روزانه از AllData، سپس بقیه از روزانه) در یک تراکنش
+
+        قفل کالاها تا پایان همه دوره‌ها نگه داشته می‌شود.
+        """
+        if commodity_ids is not None:
+            commodity_ids = list(commodity_ids)
+        periods = [period for period in self.PERIODS if periods is None or period in periods]
+        with transaction.atomic(using=self.connection.alias):
+            return {period: self.rollup(period, commodity_ids, start, end) for period in periods}
+
+    # ------------------------------------------------------------------
+    # حالت افزایشی
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def record_dirty(keys: Iterable[Tuple[Optional[int], Optional[date]]], using: Optional[str] = None) -> int:
+        """
+        ثبت (کالا، trade_date) های تغییر یافته برای refresh_dirty
+
+        باید در همان تراکنش نوشتن AllData فراخوانی شود تا کلیدها فقط همراه داده
+        commit شوند. کلیدهای تکراری (ثبت شده قبلی) نادیده گرفته می‌شوند.
+        """
+        keys = sorted({(commodity_id, trade_date) for commodity_id, trade_date in keys if commodity_id and trade_date})
+        if keys:
+            PriceSeriesDirtyKey.objects.using(using or DEFAULT_DB_ALIAS).bulk_create(
+                [PriceSeriesDirtyKey(commodity_id=commodity_id, trade_date=trade_date) for commodity_id, trade_date in keys],
+                ignore_conflicts=True,
+            )
+        return len(keys)
+
+    def refresh_dirty(self, commodity_ids: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+        """
+        بازمحاسبه سری‌ها فقط برای کلیدهای ثبت شده و حذف آن‌ها در همان تراکنش
+
+        روز هر کلید و هفته/ماه/سال دربرگیرنده آن (فقط برای همان کالا) بازمحاسبه
+        می‌شوند. کلیدها در ابتدای تراکنش حذف می‌شوند: کلیدهایی که ورود همزمان پس از
+        آن ثبت می‌کند برای اجرای بعد می‌مانند و خطا (rollback) همه را برمی‌گرداند.
+
+        Args:
+            commodity_ids: فقط کلیدهای این کالاها (None: همه)
+
+        Returns:
+            {'keys': تعداد کلیدها, 'periods': {دوره: آمار rollup}}
+        """
+        table = self.quote(PriceSeriesDirtyKey._meta.db_table)
+        conditions, params = self._conditions(commodity_ids, 'trade_date', None, None)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        with transaction.atomic(using=self.connection.alias):
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table}{where} RETURNING commodity_id, trade_date', params)
+                keys = cursor.fetchall()
+            self.lock_commodities({commodity_id for commodity_id, _ in keys})
+            scopes = [(commodity_id, trade_date, trade_date) for commodity_id, trade_date in keys]
+            periods = {period: self.rollup(period, scopes=scopes) for period in self.PERIODS} if keys else {}
+
+        logger.info(f"Refreshed price series for {len(keys)} dirty (commodity, trade_date) keys")
+        return {'keys': len(keys), 'periods': periods}
+
+    # ------------------------------------------------------------------
+    # اجرای چند پردازه‌ای
+    # ------------------------------------------------------------------
+
+    def _weights(self, commodity_ids: Optional[List[int]], incremental: bool) -> Dict[int, int]:
+        """
+        وزن تقریبی کار هر کالا: تعداد کلیدهای تغییر یافته (افزایشی) یا تعداد معاملات سری روزانه
+
+        در حالت کامل همه کالاهای داده شده (یا همه کالاها) حتی با وزن صفر برگردانده می‌شوند.
+        """
+        model = PriceSeriesDirtyKey if incremental else CommodityDailyPriceSeries
+        weight = 'count(*)' if incremental else 'sum(transaction_count)'
+        conditions, params = self._conditions(commodity_ids, 'trade_date', None, None)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT commodity_id, {weight} FROM {self.quote(model._meta.db_table)}{where} GROUP BY commodity_id',
+                params,
+            )
+            weights = dict(cursor.fetchall())
+        if not incremental:
+            ids = commodity_ids if commodity_ids is not None else Commodity.objects.using(
+                self.connection.alias
+            ).values_list('id', flat=True)
+            weights = {commodity_id: weights.get(commodity_id, 0) for commodity_id in ids}
+        return weights
+
+    @classmethod
+    def shard(cls, weights: Dict[int, int], count: int) -> List[List[int]]:
+        """تقسیم کالاها به count بخش با وزن نزدیک (سنگین‌ترین کالا به سبک‌ترین بخش)"""
+        shards = [[0, []] for _ in range(min(count, len(weights)))]
+        for commodity_id, weight in sorted(weights.items(), key=lambda item: (-(item[1] or 0), item[0])):
+            lightest = min(shards, key=lambda shard: shard[0])
+            lightest[0] += weight or 0
+            lightest[1].append(commodity_id)
+        # بخش‌های سنگین‌تر زودتر شروع می‌شوند
+        return [ids for _, ids in sorted(shards, key=lambda shard: -shard[0])]
+
+    @staticmethod
+    def merge_stats(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """جمع آمار چند اجرای rollup_all/refresh_dirty"""
+        merged = {'keys': 0, 'periods': {}}
+        for result in results:
+            merged['keys'] += result['keys']
+            for period, stats in result['periods'].items():
+                totals = merged['periods'].setdefault(period, dict.fromkeys(stats, 0))
+                for name, value in stats.items():
+                    totals[name] += value
+        merged['periods'] = {period: merged['periods'][period] for period in PERIODS if period in merged['periods']}
+        return merged
+
+    def run_parallel(self, workers: int, commodity_ids: Optional[Iterable[int]] = None,
+                     periods: Optional[Sequence[str]] = None, incremental: bool = False) -> Dict[str, Any]:
+        """
+        تجمیع با چند پردازه؛ هر بخش از کالاها در یک پردازه و تراکنش جداگانه
+
+        کالاها بر اساس حجم کار به workers × TASKS_PER_WORKER بخش تقسیم می‌شوند و
+        هر پردازه پس از پایان یک بخش، بخش بعدی را برمی‌دارد. هر پردازه اتصال
+        پایگاه داده خود را باز می‌کند (اتصال‌های این پردازه پیش از fork بسته می‌شوند)
+        و قفل advisory کالاهای بخش خود را تا commit نگه می‌دارد.
+
+        Args:
+            workers: تعداد پردازه‌ها
+            commodity_ids: محدود به این کالاها (None: همه)
+            periods: دوره‌ها (None: همه؛ در حالت افزایشی همیشه همه)
+            incremental: فقط کلیدهای تغییر یافته (refresh_dirty)
+
+        Returns:
+            {'keys', 'periods': آمار جمع شده هر دوره, 'shards', 'errors': پیام خطای بخش‌های ناموفق}
+        """
+        if commodity_ids is not None:
+            commodity_ids = list(commodity_ids)
+        shards = self.shard(self._weights(commodity_ids, incremental), workers * self.TASKS_PER_WORKER)
+        periods = list(periods) if periods else None
+        results, errors = [], []
+        if shards:
+            # اتصال‌های باز به پردازه‌های فرزند به ارث نمی‌رسند
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_worker) as executor:
+                futures = {
+                    executor.submit(_rollup_shard, self.connection.alias, ids, periods, incremental): ids
+                    for ids in shards
+                }
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Price series rollup of {len(futures[future])} commodities failed: {e}")
+                        errors.append(str(e))
+
+        merged = self.merge_stats(results)
+        merged.update(shards=len(shards), errors=errors)
+        logger.info(f"Parallel price series rollup: {len(shards)} shards on {workers} workers, {len(errors)} failed")
+        return merged
+
+
+def _init_worker():
+    """آماده‌سازی Django در پردازه کارگر (در روش spawn؛ در fork از قبل آماده است)"""
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def _rollup_shard(using: str, commodity_ids: List[int], periods: Optional[List[str]], incremental: bool) -> Dict[str, Any]:
+    """تجمیع یک بخش از کالاها در پردازه کارگر"""
+    engine = PriceSeriesRollup(using)
+    if incremental:
+        return engine.refresh_dirty(commodity_ids)
+    return {'keys': 0, 'periods': engine.rollup_all(commodity_ids, periods=periods)}
@@ -1,13 +1,14 @@
 from django.db import models
-from django.db.models import Avg, Sum, Min, Max, Count
+from django.db.models import Avg, Sum, Min, Max, Count, F, Q
 from django.utils import timezone
 from decimal import Decimal
 from datetime import datetime, date, timedelta
-# import jdatetime - disabled for now
 import logging
 
+from price_models import jalali
 from price_models.models import PriceData
 from .models import DailyData, WeeklyData, MonthlyData, YearlyData, DataAggregationLog
+from .signals import aggregate_from_daily
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +22,15 @@ class DataAggregationService:
     def convert_shamsi_to_gregorian(self, shamsi_date_str: str) -> date:
         """تبدیل تاریخ شمسی به میلادی"""
         try:
-            year, month, day = map(int, shamsi_date_str.split('/'))
-            jd = jdatetime.date(year, month, day)
-            return jd.togregorian()
-        except Exception as e:
+            return jalali.to_gregorian(*jalali.parse(shamsi_date_str))
+        except jalali.JalaliDateError as e:
             self.logger.error(f"Error converting shamsi date {shamsi_date_str}: {e}")
             return None
             
     def convert_gregorian_to_shamsi(self, gregorian_date: date) -> str:
         """تبدیل تاریخ میلادی به شمسی"""
         try:
-            jd = jdatetime.date.fromgregorian(date=gregorian_date)
-            return jd.strftime('%Y/%m/%d')
+            return jalali.gregorian_to_shamsi(gregorian_date)
         except Exception as e:
             self.logger.error(f"Error converting gregorian date {gregorian_date}: {e}")
             return str(gregorian_date)
@@ -70,7 +68,14 @@ class DataAggregationService:
                 total_supply_volume=Sum('volume'),
                 total_demand_volume=Sum('volume'),
                 total_trade_value=Sum('value'),
-                records_count=Count('id')
+                records_count=Count('id'),
+                # مجموع‌های جزئی برای تجمیع دقیق هفتگی/ماهانه/سالانه
+                final_price_sum=Sum('final_price'),
+                final_price_count=Count('final_price'),
+                base_price_sum=Sum('avg_price'),
+                base_price_count=Count('avg_price'),
+                weighted_price_sum=Sum(F('final_price') * F('volume'), output_field=models.DecimalField()),
+                weighted_volume=Sum('volume', filter=Q(final_price__isnull=False)),
             ).order_by('price_date')
             
             for group in daily_groups:
@@ -97,7 +102,13 @@ class DataAggregationService:
                         'total_demand_volume': group['total_demand_volume'] or 0,
                         'total_trade_value': group['total_trade_value'] or 0,
                         'buyer_seller_power_ratio': buyer_seller_ratio,
-                        'records_count': group['records_count']
+                        'records_count': group['records_count'],
+                        'final_price_sum': group['final_price_sum'] or 0,
+                        'final_price_count': group['final_price_count'],
+                        'base_price_sum': group['base_price_sum'] or 0,
+                        'base_price_count': group['base_price_count'],
+                        'weighted_price_sum': group['weighted_price_sum'] or 0,
+                        'weighted_volume': group['weighted_volume'] or 0,
                     }
                 )
                 
@@ -157,12 +168,11 @@ class DataAggregationService:
             # گروه‌بندی براساس هفته شمسی
             weekly_groups = {}
             for daily in daily_data:
-                jd = jdatetime.date.fromgregorian(date=daily.trade_date)
-                year = jd.year
-                week_number = jd.isocalendar()[1]  # شماره هفته
+                year, month, day = jalali.from_gregorian(daily.trade_date)
+                week_number = jalali.week_number(year, month, day)  # شماره هفته
                 
-                # محاسبه شروع و پایان هفته
-                week_start = jd - timedelta(days=jd.weekday())
+                # محاسبه شروع و پایان هفته (شنبه تا جمعه)
+                week_start = daily.trade_date - timedelta(days=jalali.weekday(daily.trade_date))
                 week_end = week_start + timedelta(days=6)
                 
                 week_key = f"{year}-{week_number}"
@@ -171,59 +181,35 @@ class DataAggregationService:
                     weekly_groups[week_key] = {
                         'year': year,
                         'week_number': week_number,
-                        'week_start_date': week_start.togregorian(),
-                        'week_end_date': week_end.togregorian(),
-                        'week_start_shamsi': week_start.strftime('%Y/%m/%d'),
-                        'week_end_shamsi': week_end.strftime('%Y/%m/%d'),
+                        'week_start_date': week_start,
+                        'week_end_date': week_end,
+                        'week_start_shamsi': jalali.gregorian_to_shamsi(week_start),
+                        'week_end_shamsi': jalali.gregorian_to_shamsi(week_end),
                         'daily_records': []
                     }
                 
                 weekly_groups[week_key]['daily_records'].append(daily)
             
-            # تجمیع داده‌ها برای هر هفته
+            # تجمیع داده‌ها برای هر هفته از مجموع‌های جزئی روزها (میانگین‌ها دقیق)
             for week_data in weekly_groups.values():
-                records = week_data['daily_records']
-                
-                # محاسبه آمار تجمیعی
-                total_trade_value = sum(r.total_trade_value or 0 for r in records)
-                total_contracts_volume = sum(r.total_contracts_volume or 0 for r in records)
-                total_supply_volume = sum(r.total_supply_volume or 0 for r in records)
-                total_demand_volume = sum(r.total_demand_volume or 0 for r in records)
-                
-                # میانگین‌ها
-                avg_weighted_final_price = sum(r.avg_weighted_final_price or 0 for r in records) / len(records) if records else 0
-                avg_final_price = sum(r.avg_final_price or 0 for r in records) / len(records) if records else 0
-                avg_base_price = sum(r.avg_base_price or 0 for r in records) / len(records) if records else 0
-                
-                # حداقل و حداکثر
-                min_price = min((r.min_price for r in records if r.min_price), default=0)
-                max_price = max((r.max_price for r in records if r.max_price), default=0)
-                
-                # نسبت قدرت خریدار به فروشنده
-                buyer_seller_ratio = total_demand_volume / total_supply_volume if total_supply_volume > 0 else None
+                values = aggregate_from_daily(
+                    daily_data.filter(pk__in=[record.pk for record in week_data['daily_records']])
+                )
                 
                 # ایجاد یا بروزرسانی رکورد هفتگی
                 weekly_data_obj, created = WeeklyData.objects.update_or_create(
                     year=week_data['year'],
                     week_number=week_data['week_number'],
                     defaults={
+                        **values,
                         'week_start_date': week_data['week_start_date'],
                         'week_end_date': week_data['week_end_date'],
                         'week_start_shamsi': week_data['week_start_shamsi'],
                         'week_end_shamsi': week_data['week_end_shamsi'],
-                        'avg_weighted_final_price': avg_weighted_final_price,
-                        'avg_final_price': avg_final_price,
-                        'min_price': min_price,
-                        'max_price': max_price,
-                        'avg_base_price': avg_base_price,
-                        'total_contracts_volume': total_contracts_volume,
-                        'total_supply_volume': total_supply_volume,
-                        'total_demand_volume': total_demand_volume,
-                        'total_trade_value': total_trade_value,
-                        'buyer_seller_power_ratio': buyer_seller_ratio,
-                        'records_count': len(records)
                     }
                 )
+                weekly_data_obj.calculate_buyer_seller_ratio()
+                weekly_data_obj.save(update_fields=['buyer_seller_power_ratio'])
                 
                 if created:
                     stats['records_created'] += 1
@@ -1,75 +1,261 @@
-from django.db.models.signals import post_save
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Optional, Set
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.db.models import Avg, Sum, Min, Max, Count
+from django.db.models import Sum, Min, Max, Count, DecimalField, F, Q
 from django.utils import timezone
 from decimal import Decimal
-import jdatetime
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from .models import AllData, DailyData, WeeklyData, MonthlyData, YearlyData, DataAggregationLog
+from price_models import jalali
+from price_models.jalali import gregorian_to_shamsi
+from .commodities import get_resolver
+from .models import AllData, Commodity, DailyData, WeeklyData, MonthlyData, YearlyData, DataAggregationLog
+from .partitions import AllDataPartitions
+from .rollups import PriceSeriesRollup
 
+logger = logging.getLogger(__name__)
 
-def shamsi_to_gregorian(shamsi_date_str):
-    """تبدیل تاریخ شمسی به میلادی"""
-    try:
-        if not shamsi_date_str or len(shamsi_date_str) != 10:
-            return None
-        year, month, day = map(int, shamsi_date_str.split('/'))
-        jd = jdatetime.date(year, month, day)
-        return jd.togregorian()
-    except:
-        return None
 
+# دسته تجمیع فعال در حالت تجمیع معوق (برای هر thread/context جداگانه)
+_active_rollups: ContextVar[Optional['RollupBatch']] = ContextVar('data_management_rollups', default=None)
+
+
+class RollupBatch:
+    """
+    مجموعه تاریخ‌های معامله (trade_date) تغییر یافته (کلیدهای dirty) یک ورود داده
+
+    در حین ورود فقط تاریخ‌ها علامت‌گذاری می‌شوند؛ flush پس از commit تراکنش
+    یک تجمیع برای هر روز/هفته/ماه/سال یکتا اجرا می‌کند.
+    """
+
+    def __init__(self):
+        self.dates: Set[date] = set()
 
-def gregorian_to_shamsi(gregorian_date):
-    """تبدیل تاریخ میلادی به شمسی"""
+    def __len__(self):
+        return len(self.dates)
+
+    def mark(self, trade_dates: Iterable[Optional[date]]):
+        self.dates.update(value for value in trade_dates if value)
+
+    def flush(self):
+        """اجرای تجمیع تاریخ‌های علامت‌گذاری شده پس از commit (یا بلافاصله خارج از تراکنش)"""
+        if not self.dates:
+            return
+        dates, self.dates = self.dates, set()
+        # تاریخ‌هایی که داده‌شان تغییر کرده باید بازمحاسبه شوند، حتی اگر تجمیع قبلی وجود داشته باشد
+        transaction.on_commit(lambda: process_trade_dates(dates, force=True))
+
+
+@contextmanager
+def deferred_rollups(batch: Optional[RollupBatch] = None):
+    """
+    غیرفعال کردن تجمیع سطر به سطر سیگنال و جمع‌آوری تاریخ‌ها در یک دسته
+
+    with deferred_rollups():
+        ...  # ذخیره AllData؛ سیگنال فقط تاریخ را علامت می‌زند
+
+    با خروج از بلوک تجمیع دسته‌ای پس از commit اجرا می‌شود (حتی در صورت خطا، چون
+    بخش‌های commit شده باید تجمیع شوند). بلوک‌های تو در تو از دسته بیرونی استفاده
+    می‌کنند. اگر batch داده شود فقط فعال می‌شود و flush آن بر عهده فراخواننده است
+    (مثلاً یک دسته مشترک برای چند فراخوانی در اجرای همزمان).
+    """
+    current = _active_rollups.get()
+    if current is not None and batch in (None, current):
+        yield current
+        return
+
+    owned = batch is None
+    if owned:
+        batch = RollupBatch()
+    token = _active_rollups.set(batch)
     try:
-        jd = jdatetime.date.fromgregorian(date=gregorian_date)
-        return jd.strftime('%Y/%m/%d')
-    except:
-        return None
+        yield batch
+    finally:
+        _active_rollups.reset(token)
+        if owned:
+            batch.flush()
+
+
+def mark_dirty(records: Iterable[AllData]):
+    """
+    ثبت رکوردهای AllData نوشته شده (ایجاد، بروزرسانی یا جایگزینی دسته‌ای)
+
+    کلیدهای (کالا، تاریخ) در همین تراکنش برای بازمحاسبه افزایشی سری‌های قیمت
+    ثبت می‌شوند. تاریخ‌ها در حالت تجمیع معوق فقط به دسته فعال اضافه می‌شوند؛ در
+    غیر این صورت یک تجمیع برای همه آن‌ها پس از commit اجرا می‌شود.
+    """
+    records = list(records)
+    PriceSeriesRollup.record_dirty((obj.commodity_id, obj.trade_date) for obj in records)
+    trade_dates = [obj.trade_date for obj in records]
+    batch = _active_rollups.get()
+    if batch is not None:
+        batch.mark(trade_dates)
+        return
+    pending = RollupBatch()
+    pending.mark(trade_dates)
+    pending.flush()
+
+
+@receiver(post_save, sender=Commodity)
+@receiver(post_delete, sender=Commodity)
+def reset_commodity_cache(sender, **kwargs):
+    """تغییر نام یا aliases یک کالا: cache نگاشت نام‌ها از نو خوانده شود"""
+    get_resolver().clear()
 
 
 @receiver(post_save, sender=AllData)
-def auto_aggregate_data(sender, instance, created, **kwargs):
+def auto_aggregate_data(sender, instance, created, raw=False, **kwargs):
     """تجمیع خودکار داده‌ها بعد از ذخیره AllData"""
-    if created and instance.transaction_date:
-        # فقط برای رکوردهای جدید و با تاریخ معتبر
-        
-        # شروع لاگ تجمیع
-        log = DataAggregationLog.objects.create(
-            aggregation_type='all',
-            start_time=timezone.now()
-        )
+    if raw or not instance.trade_date:
+        # بارگذاری fixture یا رکورد بدون تاریخ
+        return
+
+    PriceSeriesRollup.record_dirty([(instance.commodity_id, instance.trade_date)])
+    batch = _active_rollups.get()
+    if batch is not None:
+        # ورود دسته‌ای: فقط علامت‌گذاری؛ تجمیع یک بار پس از commit انجام می‌شود
+        batch.mark([instance.trade_date])
+        return
+
+    if created:
+        # ذخیره تکی: فقط برای رکوردهای جدید، پس از commit تراکنش
+        trade_date = instance.trade_date
+        transaction.on_commit(lambda: process_trade_dates([trade_date]))
+
+
+def ensure_partitions(trade_dates):
+    """
+    ساخت پارتیشن ماهانه AllData برای تاریخ‌های نوشته شده
+
+    رکوردهای ماه‌های بدون پارتیشن در پارتیشن DEFAULT نوشته شده‌اند و اینجا به
+    پارتیشن ماه خود منتقل می‌شوند. برای ماه‌های دارای پارتیشن کوئری اجرا نمی‌شود.
+    خطا در این مرحله ورود یا تجمیع را متوقف نمی‌کند (رکوردها در DEFAULT می‌مانند).
+    """
+    if not AllDataPartitions.is_supported():
+        return
+    try:
+        AllDataPartitions().ensure_for_dates(trade_dates)
+    except DatabaseError as e:
+        logger.warning(f"Could not create AllData partitions: {e}")
+
+
+def process_trade_dates(trade_dates, force=False):
+    """پس از commit ورود: ساخت پارتیشن ماه‌های جدید و سپس تجمیع تاریخ‌ها"""
+    ensure_partitions(trade_dates)
+    return aggregate_trade_dates(trade_dates, force=force)
+
+
+def aggregate_trade_dates(trade_dates, force=False):
+    """
+    تجمیع روزانه/هفتگی/ماهانه/سالانه برای مجموعه‌ای از تاریخ‌های معامله (میلادی)
+
+    تجمیع روزانه برای هر تاریخ یکتا و سپس هفتگی/ماهانه/سالانه فقط یک بار برای
+    هر هفته/ماه/سال یکتا اجرا می‌شود (نه یک بار به ازای هر تاریخ).
+
+    Args:
+        trade_dates: مقادیر AllData.trade_date (تکراری‌ها حذف می‌شوند)
+        force: بازمحاسبه حتی اگر تجمیع آن دوره قبلاً وجود داشته باشد
+
+    Returns:
+        DataAggregationLog ثبت شده برای این اجرا
+    """
+    # شروع لاگ تجمیع
+    log = DataAggregationLog.objects.create(
+        aggregation_type='all',
+        start_time=timezone.now()
+    )
+    
+    try:
+        days = sorted({value for value in trade_dates if value})
+
+        # 1. تجمیع روزانه
+        weeks, months, years = {}, {}, {}
+        for gregorian_date in days:
+            aggregate_daily_data(gregorian_date, force=force)
+
+            jy, jm, _ = jalali.from_gregorian(gregorian_date)
+            week_start = gregorian_date - timedelta(days=jalali.weekday(gregorian_date))
+            weeks.setdefault(week_start, gregorian_date)
+            months.setdefault((jy, jm), gregorian_date)
+            years.setdefault(jy, gregorian_date)
+
+        # 2. تجمیع هفتگی
+        for gregorian_date in weeks.values():
+            aggregate_weekly_data(gregorian_date, force=force)
+
+        # 3. تجمیع ماهانه
+        for gregorian_date in months.values():
+            aggregate_monthly_data(gregorian_date, force=force)
+
+        # 4. تجمیع سالانه (هفتگی/ماهانه/سالانه از مجموع‌های جزئی داده‌های روزانه)
+        for gregorian_date in years.values():
+            aggregate_yearly_data(gregorian_date, force=force)
         
-        try:
-            gregorian_date = shamsi_to_gregorian(instance.transaction_date)
-            if gregorian_date:
-                
-                # 1. تجمیع روزانه
-                aggregate_daily_data(gregorian_date, instance.transaction_date)
-                
-                # 2. تجمیع هفتگی
-                aggregate_weekly_data(gregorian_date)
-                
-                # 3. تجمیع ماهانه
-                aggregate_monthly_data(gregorian_date)
-                
-                # 4. تجمیع سالانه
-                aggregate_yearly_data(gregorian_date)
-                
-                # پایان موفق لاگ
-                log.end_time = timezone.now()
-                log.success = True
-                log.records_processed = 1
-                log.save()
-                
-        except Exception as e:
-            # خطا در تجمیع
-            log.end_time = timezone.now()
-            log.success = False
-            log.error_message = str(e)
-            log.save()
+        # پایان موفق لاگ
+        log.end_time = timezone.now()
+        log.success = True
+        log.records_processed = len(days)
+        log.save()
+    except Exception as e:
+        # خطا در تجمیع
+        log.end_time = timezone.now()
+        log.success = False
+        log.error_message = str(e)
+        log.save()
+
+    return log
+
+
+def _ratio(total, count):
+    """میانگین از مجموع و تعداد (None اگر تعداد صفر باشد)"""
+    if not count or total is None:
+        return None
+    return Decimal(total) / count
+
+
+def aggregate_from_daily(daily_records):
+    """
+    آمار یک دوره (هفته/ماه/سال) از مجموع‌های جزئی داده‌های روزانه
+
+    میانگین‌ها از جمع مقادیر و تعداد آن‌ها محاسبه می‌شوند (نه میانگین میانگین‌های
+    روزانه)؛ بنابراین با محاسبه مستقیم از رکوردهای خام برابرند.
+
+    Returns:
+        فیلدهای BaseAggregatedData (برای defaults در update_or_create) یا None اگر روزی نیست
+    """
+    totals = daily_records.aggregate(
+        days=Count('id'),
+        min_price=Min('min_price'),
+        max_price=Max('max_price'),
+        total_contracts_volume=Sum('total_contracts_volume'),
+        total_supply_volume=Sum('total_supply_volume'),
+        total_demand_volume=Sum('total_demand_volume'),
+        total_trade_value=Sum('total_trade_value'),
+        records_count=Sum('records_count'),
+        final_price_sum=Sum('final_price_sum'),
+        final_price_count=Sum('final_price_count'),
+        base_price_sum=Sum('base_price_sum'),
+        base_price_count=Sum('base_price_count'),
+        weighted_price_sum=Sum('weighted_price_sum'),
+        weighted_volume=Sum('weighted_volume'),
+    )
+    if not totals.pop('days'):
+        return None
+    
+    values = {name: value or 0 for name, value in totals.items()}
+    values.update(
+        min_price=totals['min_price'],
+        max_price=totals['max_price'],
+        avg_final_price=_ratio(values['final_price_sum'], values['final_price_count']),
+        avg_base_price=_ratio(values['base_price_sum'], values['base_price_count']),
+        avg_weighted_final_price=_ratio(values['weighted_price_sum'], values['weighted_volume']),
+    )
+    return values
 
 
 def aggregate_daily_data(date_gregorian, date_shamsi=None, force=False):
@@ -84,49 +270,42 @@ def aggregate_daily_data(date_gregorian, date_shamsi=None, force=False):
         return
     
     # دریافت تمام داده‌های آن روز
-    daily_records = AllData.objects.filter(transaction_date=date_shamsi)
+    daily_records = AllData.objects.filter(trade_date=date_gregorian)
     
     if not daily_records.exists():
         return
     
-    # محاسبه آمارها
+    # محاسبه آمارها (به همراه مجموع‌های جزئی برای تجمیع هفتگی/ماهانه/سالانه)
+    weighted = Q(final_price__isnull=False, contract_volume__isnull=False) & ~Q(final_price=0) & ~Q(contract_volume=0)
     aggregates = daily_records.aggregate(
-        avg_final_price=Avg('final_price'),
         min_price=Min('lowest_price'),
         max_price=Max('highest_price'),
-        avg_base_price=Avg('base_price'),
         total_contracts_volume=Sum('contract_volume'),
         total_supply_volume=Sum('offer_volume'),
         total_demand_volume=Sum('demand_volume'),
         total_trade_value=Sum('transaction_value'),
-        records_count=Count('id')
+        records_count=Count('id'),
+        final_price_sum=Sum('final_price'),
+        final_price_count=Count('final_price'),
+        base_price_sum=Sum('base_price'),
+        base_price_count=Count('base_price'),
+        # میانگین موزون قیمت نهایی (بر اساس حجم) در همان کوئری
+        weighted_price_sum=Sum(F('final_price') * F('contract_volume'), filter=weighted, output_field=DecimalField()),
+        weighted_volume=Sum('contract_volume', filter=weighted),
     )
-    
-    # محاسبه میانگین موزون قیمت نهایی (بر اساس حجم)
-    weighted_sum = 0
-    total_volume = 0
-    for record in daily_records:
-        if record.final_price and record.contract_volume:
-            weighted_sum += float(record.final_price) * record.contract_volume
-            total_volume += record.contract_volume
-    
-    avg_weighted_final_price = Decimal(weighted_sum / total_volume) if total_volume > 0 else None
+    values = {name: value or 0 for name, value in aggregates.items()}
     
     # ایجاد یا بروزرسانی رکورد روزانه
     daily_data, created = DailyData.objects.update_or_create(
         trade_date=date_gregorian,
         defaults={
+            **values,
             'trade_date_shamsi': date_shamsi,
-            'avg_weighted_final_price': avg_weighted_final_price,
-            'avg_final_price': aggregates['avg_final_price'],
             'min_price': aggregates['min_price'],
             'max_price': aggregates['max_price'],
-            'avg_base_price': aggregates['avg_base_price'],
-            'total_contracts_volume': aggregates['total_contracts_volume'] or 0,
-            'total_supply_volume': aggregates['total_supply_volume'] or 0,
-            'total_demand_volume': aggregates['total_demand_volume'] or 0,
-            'total_trade_value': aggregates['total_trade_value'] or 0,
-            'records_count': aggregates['records_count'],
+            'avg_final_price': _ratio(values['final_price_sum'], values['final_price_count']),
+            'avg_base_price': _ratio(values['base_price_sum'], values['base_price_count']),
+            'avg_weighted_final_price': _ratio(values['weighted_price_sum'], values['weighted_volume']),
         }
     )
     
@@ -139,7 +318,7 @@ def aggregate_weekly_data(date_gregorian, force=False):
     """تجمیع داده‌های هفتگی"""
     
     # پیدا کردن شروع و پایان هفته
-    days_since_saturday = (date_gregorian.weekday() + 2) % 7  # شنبه = 0
+    days_since_saturday = jalali.weekday(date_gregorian)  # شنبه = 0
     week_start = date_gregorian - timedelta(days=days_since_saturday)
     week_end = week_start + timedelta(days=6)
     
@@ -151,49 +330,24 @@ def aggregate_weekly_data(date_gregorian, force=False):
         return
     
     # تعیین سال و شماره هفته شمسی
-    shamsi_date = jdatetime.date.fromgregorian(date=date_gregorian)
-    year = shamsi_date.year
-    week_number = shamsi_date.isocalendar()[1]
+    year, month, day = jalali.from_gregorian(date_gregorian)
+    week_number = jalali.week_number(year, month, day)
     
-    # دریافت داده‌های روزانه آن هفته
-    weekly_records = DailyData.objects.filter(
-        trade_date__range=[week_start, week_end]
-    )
-    
-    if not weekly_records.exists():
+    # آمار هفته از داده‌های روزانه آن هفته
+    values = aggregate_from_daily(DailyData.objects.filter(trade_date__range=[week_start, week_end]))
+    if values is None:
         return
     
-    # محاسبه آمارها
-    aggregates = weekly_records.aggregate(
-        avg_final_price=Avg('avg_final_price'),
-        min_price=Min('min_price'),
-        max_price=Max('max_price'),
-        avg_base_price=Avg('avg_base_price'),
-        total_contracts_volume=Sum('total_contracts_volume'),
-        total_supply_volume=Sum('total_supply_volume'),
-        total_demand_volume=Sum('total_demand_volume'),
-        total_trade_value=Sum('total_trade_value'),
-        records_count=Sum('records_count')
-    )
-    
     # ایجاد یا بروزرسانی رکورد هفتگی
     weekly_data, created = WeeklyData.objects.update_or_create(
         year=year,
         week_number=week_number,
         defaults={
+            **values,
             'week_start_date': week_start,
             'week_end_date': week_end,
             'week_start_shamsi': gregorian_to_shamsi(week_start),
             'week_end_shamsi': gregorian_to_shamsi(week_end),
-            'avg_final_price': aggregates['avg_final_price'],
-            'min_price': aggregates['min_price'],
-            'max_price': aggregates['max_price'],
-            'avg_base_price': aggregates['avg_base_price'],
-            'total_contracts_volume': aggregates['total_contracts_volume'] or 0,
-            'total_supply_volume': aggregates['total_supply_volume'] or 0,
-            'total_demand_volume': aggregates['total_demand_volume'] or 0,
-            'total_trade_value': aggregates['total_trade_value'] or 0,
-            'records_count': aggregates['records_count'] or 0,
         }
     )
     
@@ -204,9 +358,7 @@ def aggregate_weekly_data(date_gregorian, force=False):
 def aggregate_monthly_data(date_gregorian, force=False):
     """تجمیع داده‌های ماهانه"""
     
-    shamsi_date = jdatetime.date.fromgregorian(date=date_gregorian)
-    year = shamsi_date.year
-    month = shamsi_date.month
+    year, month, _ = jalali.from_gregorian(date_gregorian)
     month_shamsi = f"{year}/{month:02d}"
     
     # بررسی اینکه آیا قبلاً تجمیع شده یا نه
@@ -215,44 +367,21 @@ def aggregate_monthly_data(date_gregorian, force=False):
     ).exists():
         return
     
-    # دریافت داده‌های روزانه آن ماه
-    monthly_records = DailyData.objects.filter(
-        trade_date__year=date_gregorian.year,
-        trade_date__month=date_gregorian.month
-    )
-    
-    if not monthly_records.exists():
+    # آمار ماه از داده‌های روزانه آن ماه شمسی
+    values = aggregate_from_daily(DailyData.objects.filter(
+        trade_date__range=[
+            jalali.to_gregorian(year, month, 1),
+            jalali.to_gregorian(year, month, jalali.month_length(year, month)),
+        ]
+    ))
+    if values is None:
         return
     
-    # محاسبه آمارها
-    aggregates = monthly_records.aggregate(
-        avg_final_price=Avg('avg_final_price'),
-        min_price=Min('min_price'),
-        max_price=Max('max_price'),
-        avg_base_price=Avg('avg_base_price'),
-        total_contracts_volume=Sum('total_contracts_volume'),
-        total_supply_volume=Sum('total_supply_volume'),
-        total_demand_volume=Sum('total_demand_volume'),
-        total_trade_value=Sum('total_trade_value'),
-        records_count=Sum('records_count')
-    )
-    
     # ایجاد یا بروزرسانی رکورد ماهانه
     monthly_data, created = MonthlyData.objects.update_or_create(
         year=year,
         month=month,
-        defaults={
-            'month_shamsi': month_shamsi,
-            'avg_final_price': aggregates['avg_final_price'],
-            'min_price': aggregates['min_price'],
-            'max_price': aggregates['max_price'],
-            'avg_base_price': aggregates['avg_base_price'],
-            'total_contracts_volume': aggregates['total_contracts_volume'] or 0,
-            'total_supply_volume': aggregates['total_supply_volume'] or 0,
-            'total_demand_volume': aggregates['total_demand_volume'] or 0,
-            'total_trade_value': aggregates['total_trade_value'] or 0,
-            'records_count': aggregates['records_count'] or 0,
-        }
+        defaults={**values, 'month_shamsi': month_shamsi}
     )
     
     monthly_data.calculate_buyer_seller_ratio()
@@ -262,46 +391,23 @@ def aggregate_monthly_data(date_gregorian, force=False):
 def aggregate_yearly_data(date_gregorian, force=False):
     """تجمیع داده‌های سالانه"""
     
-    shamsi_date = jdatetime.date.fromgregorian(date=date_gregorian)
-    year = shamsi_date.year
+    year, _, _ = jalali.from_gregorian(date_gregorian)
     
     # بررسی اینکه آیا قبلاً تجمیع شده یا نه
     if not force and YearlyData.objects.filter(year=year).exists():
         return
     
-    # دریافت داده‌های ماهانه آن سال
-    yearly_records = MonthlyData.objects.filter(year=year)
-    
-    if not yearly_records.exists():
+    # آمار سال از داده‌های روزانه آن سال شمسی (نه میانگین میانگین‌های ماهانه)
+    values = aggregate_from_daily(DailyData.objects.filter(
+        trade_date__range=[jalali.to_gregorian(year, 1, 1), jalali.to_gregorian(year + 1, 1, 1) - timedelta(days=1)]
+    ))
+    if values is None:
         return
     
-    # محاسبه آمارها
-    aggregates = yearly_records.aggregate(
-        avg_final_price=Avg('avg_final_price'),
-        min_price=Min('min_price'),
-        max_price=Max('max_price'),
-        avg_base_price=Avg('avg_base_price'),
-        total_contracts_volume=Sum('total_contracts_volume'),
-        total_supply_volume=Sum('total_supply_volume'),
-        total_demand_volume=Sum('total_demand_volume'),
-        total_trade_value=Sum('total_trade_value'),
-        records_count=Sum('records_count')
-    )
-    
     # ایجاد یا بروزرسانی رکورد سالانه
     yearly_data, created = YearlyData.objects.update_or_create(
         year=year,
-        defaults={
-            'avg_final_price': aggregates['avg_final_price'],
-            'min_price': aggregates['min_price'],
-            'max_price': aggregates['max_price'],
-            'avg_base_price': aggregates['avg_base_price'],
-            'total_contracts_volume': aggregates['total_contracts_volume'] or 0,
-            'total_supply_volume': aggregates['total_supply_volume'] or 0,
-            'total_demand_volume': aggregates['total_demand_volume'] or 0,
-            'total_trade_value': aggregates['total_trade_value'] or 0,
-            'records_count': aggregates['records_count'] or 0,
-        }
+        defaults=values
     )
     
     yearly_data.calculate_buyer_seller_ratio()
@@ -3,7 +3,7 @@ from wagtail import hooks
 from django.urls import path, reverse
 from django.utils.html import format_html
 from django.http import HttpResponseRedirect
-from .models import AllData, DailyData, WeeklyData, MonthlyData, YearlyData, DataAggregationLog
+from .models import AllData, Commodity, DailyData, WeeklyData, MonthlyData, YearlyData, DataAggregationLog
 
 
 class AllDataAdmin(ModelAdmin):
@@ -24,6 +24,23 @@ class AllDataAdmin(ModelAdmin):
         return qs.select_related()
 
 
+class CommodityAdmin(ModelAdmin):
+    model = Commodity
+    menu_label = 'کالاها (Commodities)'
+    menu_icon = 'tag'
+    menu_order = 150
+    add_to_settings_menu = False
+    exclude_from_explorer = False
+    list_display = ['name', 'subcategory', 'created_at']
+    list_filter = ['subcategory']
+    search_fields = ['name']
+    ordering = ['name']
+    list_per_page = 50
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('subcategory')
+
+
 class DailyDataAdmin(ModelAdmin):
     model = DailyData
     menu_label = 'روزانه (Daily)'
@@ -94,7 +111,7 @@ class DataManagementGroup(ModelAdminGroup):
     menu_label = 'مدیریت داده‌ها'
     menu_icon = 'folder-open-inverse'
     menu_order = 200
-    items = (AllDataAdmin, DailyDataAdmin, WeeklyDataAdmin, MonthlyDataAdmin, YearlyDataAdmin, DataAggregationLogAdmin)
+    items = (AllDataAdmin, CommodityAdmin, DailyDataAdmin, WeeklyDataAdmin, MonthlyDataAdmin, YearlyDataAdmin, DataAggregationLogAdmin)
 
 
 # ثبت گروه مدل‌ها در Wagtail Admin
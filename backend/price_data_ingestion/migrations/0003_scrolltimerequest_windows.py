@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0002_category_scrolltimerequest_auto_save_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrolltimerequest',
+            name='window_progress',
+            field=models.JSONField(blank=True, default=list, verbose_name='وضعیت بازه\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='scrolltimerequest',
+            name='window_size',
+            field=models.CharField(choices=[('none', 'بدون تقسیم'), ('week', 'هفتگی'), ('month', 'ماهانه')], default='none', help_text='بازه\u200cهای طولانی به بازه\u200cهای هفتگی یا ماهانه شمسی تقسیم و به صورت موازی دریافت می\u200cشوند', max_length=10, verbose_name='تقسیم بازه تاریخ'),
+        ),
+        migrations.AddField(
+            model_name='scrolltimerequest',
+            name='windows_completed',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد بازه\u200cهای دریافت شده'),
+        ),
+        migrations.AddField(
+            model_name='scrolltimerequest',
+            name='windows_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد کل بازه\u200cها'),
+        ),
+    ]
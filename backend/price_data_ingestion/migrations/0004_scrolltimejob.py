@@ -0,0 +1,42 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0003_scrolltimerequest_windows'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scrolltimerequest',
+            name='status',
+            field=models.CharField(choices=[('draft', 'پیش\u200cنویس'), ('pending', 'در انتظار'), ('queued', 'در صف پردازش'), ('processing', 'در حال پردازش'), ('preview', 'آماده پیش\u200cنمایش'), ('completed', 'تکمیل شده'), ('failed', 'ناموفق')], default='draft', max_length=20, verbose_name='وضعیت'),
+        ),
+        migrations.CreateModel(
+            name='ScrollTimeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('fetch', 'دریافت برای پیش\u200cنمایش'), ('save', 'ذخیره داده\u200cهای دریافت شده'), ('fetch_and_save', 'دریافت و ذخیره مستقیم')], max_length=20, verbose_name='عملیات')),
+                ('status', models.CharField(choices=[('queued', 'در صف'), ('running', 'در حال اجرا'), ('completed', 'تکمیل شده'), ('failed', 'ناموفق')], default='queued', max_length=20, verbose_name='وضعیت')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('worker', models.CharField(blank=True, max_length=200, verbose_name='worker')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='نتیجه')),
+                ('error_message', models.TextField(blank=True, verbose_name='پیام خطا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ایجاد')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان شروع')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='آخرین اعلام حیات')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان پایان')),
+                ('scroll_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='price_data_ingestion.scrolltimerequest', verbose_name='درخواست Scroll Time')),
+            ],
+            options={
+                'verbose_name': 'کار Scroll Time',
+                'verbose_name_plural': 'کارهای Scroll Time',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='price_data__status_bcae3a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:07
+
+import gzip
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_response_data(apps, schema_editor):
+    """انتقال response_data موجود به جدول پاسخ‌های فشرده"""
+    ScrollTimeRequest = apps.get_model('price_data_ingestion', 'ScrollTimeRequest')
+    ScrollTimeResponse = apps.get_model('price_data_ingestion', 'ScrollTimeResponse')
+
+    requests = (
+        ScrollTimeRequest.objects
+        .filter(response_data__isnull=False)
+        .only('id', 'response_data')
+        .iterator(chunk_size=50)
+    )
+    for scroll_request in requests:
+        records = scroll_request.response_data
+        if not isinstance(records, list):
+            records = [records]
+        raw = json.dumps(records, ensure_ascii=False).encode('utf-8')
+        data = gzip.compress(raw, compresslevel=6)
+        ScrollTimeResponse.objects.create(
+            scroll_request_id=scroll_request.id,
+            data=data,
+            record_count=len(records),
+            raw_size=len(raw),
+            compressed_size=len(data),
+        )
+
+
+def restore_response_data(apps, schema_editor):
+    ScrollTimeRequest = apps.get_model('price_data_ingestion', 'ScrollTimeRequest')
+    ScrollTimeResponse = apps.get_model('price_data_ingestion', 'ScrollTimeResponse')
+
+    for response in ScrollTimeResponse.objects.iterator(chunk_size=50):
+        ScrollTimeRequest.objects.filter(pk=response.scroll_request_id).update(
+            response_data=json.loads(gzip.decompress(bytes(response.data)))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0004_scrolltimejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrollTimeResponse',
+            fields=[
+                ('scroll_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='response', serialize=False, to='price_data_ingestion.scrolltimerequest', verbose_name='درخواست Scroll Time')),
+                ('data', models.BinaryField(verbose_name='داده\u200cهای فشرده (gzip)')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردها')),
+                ('raw_size', models.PositiveBigIntegerField(default=0, verbose_name='حجم اصلی (بایت)')),
+                ('compressed_size', models.PositiveBigIntegerField(default=0, verbose_name='حجم فشرده (بایت)')),
+                ('created_at', models.DateTimeField(auto_now=True, verbose_name='زمان ذخیره')),
+            ],
+            options={
+                'verbose_name': 'پاسخ Scroll Time',
+                'verbose_name_plural': 'پاسخ\u200cهای Scroll Time',
+            },
+        ),
+        migrations.RunPython(move_response_data, restore_response_data),
+        migrations.RemoveField(
+            model_name='scrolltimerequest',
+            name='response_data',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0005_scrolltimeresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubCategorySyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_trade_date', models.DateField(blank=True, null=True, verbose_name='آخرین تاریخ معامله (میلادی)')),
+                ('last_trade_date_shamsi', models.CharField(blank=True, max_length=10, verbose_name='آخرین تاریخ معامله (شمسی)')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='چکیده محتوای آخرین دریافت')),
+                ('last_record_count', models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای آخرین دریافت')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان آخرین همگام\u200cسازی')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='زمان بروزرسانی')),
+                ('last_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='price_data_ingestion.scrolltimerequest', verbose_name='آخرین درخواست')),
+                ('subcategory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='price_data_ingestion.subcategory', verbose_name='زیرگروه')),
+            ],
+            options={
+                'verbose_name': 'وضعیت همگام\u200cسازی زیرگروه',
+                'verbose_name_plural': 'وضعیت همگام\u200cسازی زیرگروه\u200cها',
+            },
+        ),
+    ]
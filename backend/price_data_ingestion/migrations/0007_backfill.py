@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_data_ingestion', '0006_subcategorysyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date_shamsi', models.CharField(max_length=10, verbose_name='تاریخ شروع (شمسی)')),
+                ('end_date_shamsi', models.CharField(max_length=10, verbose_name='تاریخ پایان (شمسی)')),
+                ('window_size', models.CharField(choices=[('none', 'بدون تقسیم'), ('week', 'هفتگی'), ('month', 'ماهانه')], default='month', max_length=10, verbose_name='اندازه بازه هر خانه')),
+                ('duplicate_handling', models.CharField(choices=[('skip', 'رد کردن رکوردهای تکراری'), ('replace', 'جایگزینی رکوردهای تکراری'), ('update', 'بروزرسانی رکوردهای موجود')], default='update', max_length=20, verbose_name='نحوه مواجهه با داده\u200cهای تکراری')),
+                ('selection', models.JSONField(blank=True, default=dict, verbose_name='انتخاب دسته\u200cبندی\u200cها')),
+                ('fingerprint', models.CharField(db_index=True, max_length=64, verbose_name='شناسه پارامترها')),
+                ('status', models.CharField(choices=[('running', 'در حال اجرا'), ('incomplete', 'ناتمام'), ('completed', 'تکمیل شده')], default='running', max_length=20, verbose_name='وضعیت')),
+                ('cells_total', models.PositiveIntegerField(default=0, verbose_name='تعداد کل خانه\u200cها')),
+                ('cells_completed', models.PositiveIntegerField(default=0, verbose_name='تعداد خانه\u200cهای تکمیل شده')),
+                ('total_records', models.PositiveIntegerField(default=0, verbose_name='تعداد کل رکوردها')),
+                ('imported_records', models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای ذخیره شده')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ایجاد')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='زمان بروزرسانی')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان پایان')),
+                ('created_by', models.CharField(blank=True, max_length=150, verbose_name='ایجاد شده توسط')),
+            ],
+            options={
+                'verbose_name': 'بازیابی تاریخچه',
+                'verbose_name_plural': 'بازیابی\u200cهای تاریخچه',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BackfillCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start_shamsi', models.CharField(max_length=10, verbose_name='شروع بازه (شمسی)')),
+                ('window_end_shamsi', models.CharField(max_length=10, verbose_name='پایان بازه (شمسی)')),
+                ('status', models.CharField(choices=[('pending', 'در انتظار'), ('completed', 'تکمیل شده'), ('failed', 'ناموفق')], default='pending', max_length=20, verbose_name='وضعیت')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('total_records', models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردها')),
+                ('imported_records', models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای ذخیره شده')),
+                ('error_message', models.TextField(blank=True, verbose_name='پیام خطا')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان تکمیل')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='price_data_ingestion.backfillrun', verbose_name='بازیابی')),
+                ('scroll_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='price_data_ingestion.scrolltimerequest', verbose_name='درخواست Scroll Time')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='price_data_ingestion.subcategory', verbose_name='زیرگروه')),
+            ],
+            options={
+                'verbose_name': 'خانه بازیابی تاریخچه',
+                'verbose_name_plural': 'خانه\u200cهای بازیابی تاریخچه',
+                'ordering': ['run', 'window_start_shamsi', 'subcategory'],
+                'indexes': [models.Index(fields=['run', 'status'], name='price_data__run_id_830436_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='backfillcell',
+            constraint=models.UniqueConstraint(fields=('run', 'subcategory', 'window_start_shamsi'), name='backfill_cell_unique'),
+        ),
+    ]
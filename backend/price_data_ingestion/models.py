@@ -1,6 +1,14 @@
-from django.db import models
+import gzip
+import io
+import json
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from django.db import models, transaction
 from django.utils import timezone
 
+from price_models import jalali
+
 
 class MainCategory(models.Model):
     """گروه‌های اصلی (MainCat) برای Scroll Time API"""
@@ -66,6 +74,65 @@ class SubCategory(models.Model):
         return f"{self.category.main_category.name} -> {self.category.name} -> {self.name} ({self.value})"
 
 
+class SubCategorySyncState(models.Model):
+    """
+    وضعیت همگام‌سازی افزایشی یک زیرگروه (دستور sync_ime)
+
+    last_trade_date آخرین تاریخ معامله‌ای است که با موفقیت ذخیره شده (watermark)؛
+    همگام‌سازی بعدی فقط از چند روز قبل از آن تا امروز را دریافت می‌کند.
+    content_hash چکیده رکوردهای آخرین دریافت است تا اگر پاسخ تغییری نکرده باشد
+    (مثلاً در روزهای تعطیل) ذخیره‌سازی دوباره انجام نشود.
+    """
+    subcategory = models.OneToOneField(
+        SubCategory,
+        on_delete=models.CASCADE,
+        related_name='sync_state',
+        verbose_name="زیرگروه"
+    )
+    last_trade_date = models.DateField(null=True, blank=True, verbose_name="آخرین تاریخ معامله (میلادی)")
+    last_trade_date_shamsi = models.CharField(max_length=10, blank=True, verbose_name="آخرین تاریخ معامله (شمسی)")
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name="چکیده محتوای آخرین دریافت")
+    last_record_count = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای آخرین دریافت")
+    last_request = models.ForeignKey(
+        'ScrollTimeRequest',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="آخرین درخواست"
+    )
+    last_synced_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان آخرین همگام‌سازی")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="زمان بروزرسانی")
+
+    class Meta:
+        verbose_name = "وضعیت همگام‌سازی زیرگروه"
+        verbose_name_plural = "وضعیت همگام‌سازی زیرگروه‌ها"
+
+    def __str__(self):
+        return f"{self.subcategory_id}: {self.last_trade_date_shamsi or '-'}"
+
+    @classmethod
+    def advance(cls, subcategory_id: int, trade_date: Optional[date], content_hash: str,
+                record_count: int, scroll_request: Optional['ScrollTimeRequest'] = None) -> 'SubCategorySyncState':
+        """
+        ثبت نتیجه یک همگام‌سازی موفق به صورت اتمیک
+
+        ردیف وضعیت قفل می‌شود (SELECT ... FOR UPDATE) و watermark فقط به جلو حرکت
+        می‌کند؛ بنابراین دو اجرای همزمان نمی‌توانند آن را به عقب برگردانند.
+        """
+        with transaction.atomic():
+            state, _ = cls.objects.select_for_update().get_or_create(subcategory_id=subcategory_id)
+            if trade_date and (state.last_trade_date is None or trade_date > state.last_trade_date):
+                state.last_trade_date = trade_date
+                state.last_trade_date_shamsi = jalali.gregorian_to_shamsi(trade_date)
+            state.content_hash = content_hash
+            state.last_record_count = record_count
+            state.last_request = scroll_request
+            state.last_synced_at = timezone.now()
+            state.save()
+        return state
+
+
 class ScrollTimeRequest(models.Model):
     """درخواست‌های Scroll Time"""
     DUPLICATE_HANDLING_CHOICES = [
@@ -77,11 +144,19 @@ class ScrollTimeRequest(models.Model):
     STATUS_CHOICES = [
         ('draft', 'پیش‌نویس'),
         ('pending', 'در انتظار'),
+        ('queued', 'در صف پردازش'),
         ('processing', 'در حال پردازش'),
+        ('preview', 'آماده پیش‌نمایش'),
         ('completed', 'تکمیل شده'),
         ('failed', 'ناموفق'),
     ]
     
+    WINDOW_SIZE_CHOICES = [
+        ('none', 'بدون تقسیم'),
+        ('week', 'هفتگی'),
+        ('month', 'ماهانه'),
+    ]
+    
     # دسته‌بندی‌ها
     main_category = models.ForeignKey(
         MainCategory, 
@@ -113,14 +188,25 @@ class ScrollTimeRequest(models.Model):
         verbose_name="نحوه مواجهه با داده‌های تکراری"
     )
     auto_save = models.BooleanField(default=False, verbose_name="ذخیره خودکار در پایگاه داده")
+    window_size = models.CharField(
+        max_length=10,
+        choices=WINDOW_SIZE_CHOICES,
+        default='none',
+        verbose_name="تقسیم بازه تاریخ",
+        help_text="بازه‌های طولانی به بازه‌های هفتگی یا ماهانه شمسی تقسیم و به صورت موازی دریافت می‌شوند"
+    )
     
     # وضعیت و نتایج
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name="وضعیت")
     total_records = models.PositiveIntegerField(default=0, verbose_name="تعداد کل رکوردها")
     processed_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای پردازش شده")
-    response_data = models.JSONField(null=True, blank=True, verbose_name="داده‌های پاسخ")
     error_message = models.TextField(blank=True, verbose_name="پیام خطا")
     
+    # پیشرفت دریافت بازه‌ها
+    windows_total = models.PositiveIntegerField(default=0, verbose_name="تعداد کل بازه‌ها")
+    windows_completed = models.PositiveIntegerField(default=0, verbose_name="تعداد بازه‌های دریافت شده")
+    window_progress = models.JSONField(default=list, blank=True, verbose_name="وضعیت بازه‌ها")
+    
     # متادیتا
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ایجاد")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="زمان بروزرسانی")
@@ -138,15 +224,283 @@ class ScrollTimeRequest(models.Model):
     def __str__(self):
         return f"درخواست {self.id} - {self.status}"
     
-    def get_payload(self):
-        """ایجاد payload برای ارسال به سرور بورس"""
+    def get_payload(self, start_date_shamsi=None, end_date_shamsi=None):
+        """
+        ایجاد payload برای ارسال به سرور بورس
+        
+        در صورت ارسال start_date_shamsi/end_date_shamsi، payload برای همان بازه
+        (مثلاً یکی از بازه‌های هفتگی/ماهانه) ساخته می‌شود.
+        """
         return {
             'Language': 8,
             'fari': False,
-            'GregorianFromDate': self.start_date_shamsi,
-            'GregorianToDate': self.end_date_shamsi,
+            'GregorianFromDate': start_date_shamsi or self.start_date_shamsi,
+            'GregorianToDate': end_date_shamsi or self.end_date_shamsi,
             'MainCat': self.main_category.value if self.main_category else 0,
             'Cat': self.category.value if self.category else 0,
             'SubCat': self.subcategory.value if self.subcategory else 0,
             'Producer': 0
         }
+    
+    def get_response(self) -> Optional['ScrollTimeResponse']:
+        """
+        پاسخ ذخیره شده این درخواست (بدون بارگذاری داده‌های فشرده)
+        
+        فیلد data به صورت deferred است و فقط هنگام خواندن رکوردها از پایگاه داده
+        بارگذاری می‌شود.
+        """
+        if self.pk is None:
+            return None
+        return ScrollTimeResponse.objects.defer('data').filter(scroll_request_id=self.pk).first()
+    
+    def has_response_data(self) -> bool:
+        return self.pk is not None and ScrollTimeResponse.objects.filter(scroll_request_id=self.pk).exists()
+    
+    def set_response_data(self, records: Iterable[Dict[str, Any]]) -> 'ScrollTimeResponse':
+        """ذخیره فشرده رکوردهای پاسخ (جایگزین پاسخ قبلی)"""
+        return ScrollTimeResponse.store(self, records)
+    
+    def clear_response_data(self):
+        ScrollTimeResponse.objects.filter(scroll_request_id=self.pk).delete()
+
+
+class ScrollTimeResponse(models.Model):
+    """
+    پاسخ خام دریافت شده برای پیش‌نمایش یک درخواست Scroll Time
+    
+    رکوردها به صورت آرایه JSON فشرده (gzip) در جدولی جدا از ScrollTimeRequest
+    نگه‌داری می‌شوند تا فهرست درخواست‌ها، صف کارها و بروزرسانی‌های پیشرفت
+    ردیف‌های چند مگابایتی را نخوانند و ننویسند. چون workerها ممکن است روی
+    سرورهای مختلف اجرا شوند، پاسخ در پایگاه داده (و نه دیسک محلی) ذخیره می‌شود.
+    """
+    COMPRESS_LEVEL = 6
+    READ_CHUNK_SIZE = 64 * 1024
+    
+    scroll_request = models.OneToOneField(
+        ScrollTimeRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='response',
+        verbose_name="درخواست Scroll Time"
+    )
+    data = models.BinaryField(verbose_name="داده‌های فشرده (gzip)")
+    record_count = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردها")
+    raw_size = models.PositiveBigIntegerField(default=0, verbose_name="حجم اصلی (بایت)")
+    compressed_size = models.PositiveBigIntegerField(default=0, verbose_name="حجم فشرده (بایت)")
+    created_at = models.DateTimeField(auto_now=True, verbose_name="زمان ذخیره")
+    
+    class Meta:
+        verbose_name = "پاسخ Scroll Time"
+        verbose_name_plural = "پاسخ‌های Scroll Time"
+    
+    def __str__(self):
+        return f"پاسخ درخواست {self.scroll_request_id} ({self.record_count} رکورد)"
+    
+    @classmethod
+    def compress(cls, records: Iterable[Dict[str, Any]]):
+        """
+        فشرده‌سازی جریانی رکوردها به صورت یک آرایه JSON
+        
+        Returns:
+            (داده فشرده، تعداد رکوردها، حجم اصلی)
+        """
+        buffer = io.BytesIO()
+        count = 0
+        raw_size = 0
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=cls.COMPRESS_LEVEL) as gz:
+            gz.write(b'[')
+            for record in records:
+                chunk = json.dumps(record, ensure_ascii=False).encode('utf-8')
+                if count:
+                    gz.write(b',')
+                    raw_size += 1
+                gz.write(chunk)
+                raw_size += len(chunk)
+                count += 1
+            gz.write(b']')
+        return buffer.getvalue(), count, raw_size + 2
+    
+    @classmethod
+    def store(cls, scroll_request: ScrollTimeRequest, records: Iterable[Dict[str, Any]]) -> 'ScrollTimeResponse':
+        data, count, raw_size = cls.compress(records)
+        response, _ = cls.objects.update_or_create(
+            scroll_request=scroll_request,
+            defaults={
+                'data': data,
+                'record_count': count,
+                'raw_size': raw_size,
+                'compressed_size': len(data),
+            }
+        )
+        return response
+    
+    def iter_chunks(self) -> Iterator[bytes]:
+        """خواندن تکه‌به‌تکه JSON از حالت فشرده خارج شده (برای پارسر جریانی)"""
+        with gzip.GzipFile(fileobj=io.BytesIO(bytes(self.data)), mode='rb') as gz:
+            while True:
+                chunk = gz.read(self.READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def load(self) -> Any:
+        """خواندن کامل رکوردها"""
+        return json.loads(gzip.decompress(bytes(self.data)))
+
+
+class ScrollTimeJob(models.Model):
+    """
+    صف کارهای پس‌زمینه Scroll Time (دریافت / ذخیره)
+    
+    viewها فقط کار را در صف قرار می‌دهند و دستور run_scroll_time_worker آن را با
+    SELECT ... FOR UPDATE SKIP LOCKED برمی‌دارد؛ بنابراین چند worker روی یک یا
+    چند سرور می‌توانند همزمان صف را خالی کنند.
+    """
+    ACTION_CHOICES = [
+        ('fetch', 'دریافت برای پیش‌نمایش'),
+        ('save', 'ذخیره داده‌های دریافت شده'),
+        ('fetch_and_save', 'دریافت و ذخیره مستقیم'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'در صف'),
+        ('running', 'در حال اجرا'),
+        ('completed', 'تکمیل شده'),
+        ('failed', 'ناموفق'),
+    ]
+    
+    scroll_request = models.ForeignKey(
+        ScrollTimeRequest,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name="درخواست Scroll Time"
+    )
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES, verbose_name="عملیات")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="وضعیت")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="تعداد تلاش")
+    worker = models.CharField(max_length=200, blank=True, verbose_name="worker")
+    result = models.JSONField(null=True, blank=True, verbose_name="نتیجه")
+    error_message = models.TextField(blank=True, verbose_name="پیام خطا")
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ایجاد")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان شروع")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="آخرین اعلام حیات")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان پایان")
+    
+    class Meta:
+        verbose_name = "کار Scroll Time"
+        verbose_name_plural = "کارهای Scroll Time"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"کار {self.id} ({self.action}) - {self.status}"
+
+
+class BackfillRun(models.Model):
+    """
+    یک اجرای بازیابی تاریخچه (دستور backfill_ime)
+
+    بازه تاریخ به شبکه‌ای از خانه‌های (زیرگروه، بازه ماهانه/هفتگی) تقسیم می‌شود
+    و وضعیت هر خانه در BackfillCell ثبت می‌شود؛ اجرای دوباره با همان پارامترها
+    (fingerprint یکسان) فقط خانه‌های تکمیل نشده را دریافت می‌کند.
+    """
+    STATUS_CHOICES = [
+        ('running', 'در حال اجرا'),
+        ('incomplete', 'ناتمام'),
+        ('completed', 'تکمیل شده'),
+    ]
+
+    start_date_shamsi = models.CharField(max_length=10, verbose_name="تاریخ شروع (شمسی)")
+    end_date_shamsi = models.CharField(max_length=10, verbose_name="تاریخ پایان (شمسی)")
+    window_size = models.CharField(
+        max_length=10,
+        choices=ScrollTimeRequest.WINDOW_SIZE_CHOICES,
+        default='month',
+        verbose_name="اندازه بازه هر خانه"
+    )
+    duplicate_handling = models.CharField(
+        max_length=20,
+        choices=ScrollTimeRequest.DUPLICATE_HANDLING_CHOICES,
+        default='update',
+        verbose_name="نحوه مواجهه با داده‌های تکراری"
+    )
+    selection = models.JSONField(default=dict, blank=True, verbose_name="انتخاب دسته‌بندی‌ها")
+    fingerprint = models.CharField(max_length=64, db_index=True, verbose_name="شناسه پارامترها")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name="وضعیت")
+    cells_total = models.PositiveIntegerField(default=0, verbose_name="تعداد کل خانه‌ها")
+    cells_completed = models.PositiveIntegerField(default=0, verbose_name="تعداد خانه‌های تکمیل شده")
+    total_records = models.PositiveIntegerField(default=0, verbose_name="تعداد کل رکوردها")
+    imported_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای ذخیره شده")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ایجاد")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="زمان بروزرسانی")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان پایان")
+    created_by = models.CharField(max_length=150, blank=True, verbose_name="ایجاد شده توسط")
+
+    class Meta:
+        verbose_name = "بازیابی تاریخچه"
+        verbose_name_plural = "بازیابی‌های تاریخچه"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"بازیابی {self.id}: {self.start_date_shamsi} تا {self.end_date_shamsi} ({self.status})"
+
+
+class BackfillCell(models.Model):
+    """یک خانه از شبکه بازیابی تاریخچه: یک زیرگروه در یک بازه (نقطه بازیابی)"""
+    STATUS_CHOICES = [
+        ('pending', 'در انتظار'),
+        ('completed', 'تکمیل شده'),
+        ('failed', 'ناموفق'),
+    ]
+
+    run = models.ForeignKey(
+        BackfillRun,
+        on_delete=models.CASCADE,
+        related_name='cells',
+        verbose_name="بازیابی"
+    )
+    subcategory = models.ForeignKey(
+        SubCategory,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="زیرگروه"
+    )
+    window_start_shamsi = models.CharField(max_length=10, verbose_name="شروع بازه (شمسی)")
+    window_end_shamsi = models.CharField(max_length=10, verbose_name="پایان بازه (شمسی)")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="وضعیت")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="تعداد تلاش")
+    total_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردها")
+    imported_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای ذخیره شده")
+    error_message = models.TextField(blank=True, verbose_name="پیام خطا")
+    scroll_request = models.ForeignKey(
+        ScrollTimeRequest,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="درخواست Scroll Time"
+    )
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان تکمیل")
+
+    class Meta:
+        verbose_name = "خانه بازیابی تاریخچه"
+        verbose_name_plural = "خانه‌های بازیابی تاریخچه"
+        ordering = ['run', 'window_start_shamsi', 'subcategory']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'subcategory', 'window_start_shamsi'],
+                name='backfill_cell_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['run', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.subcategory_id} {self.window_start_shamsi} تا {self.window_end_shamsi} ({self.status})"
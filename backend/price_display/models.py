@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Avg, F
+from django.db.models.functions import ExtractIsoYear, ExtractWeek, Length, Substr
 from django.utils import timezone
 from datetime import datetime, timedelta
 from wagtail.models import Page
@@ -6,7 +8,6 @@ from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.api import APIField
 from wagtail_headless_preview.models import HeadlessPreviewMixin
-import jdatetime
 
 # وابستگی‌ها
 from price_data_ingestion.models import MainCategory, Category, SubCategory
@@ -130,33 +131,28 @@ class PricePage(HeadlessPreviewMixin, Page):
             qs = qs.filter(commodity_name__icontains=cat_name)
         return qs
 
+    @staticmethod
+    def _average_by(qs, bucket):
+        """میانگین قیمت نهایی هر دوره با یک GROUP BY در پایگاه داده.
+
+        به جای خواندن همه رکوردها فقط یک ردیف برای هر دوره خوانده می‌شود.
+        خروجی بر اساس کلید دوره مرتب است و دوره‌هایی که رکورد دارند ولی
+        قیمت ندارند میانگین 0 می‌گیرند.
+        """
+        rows = qs.annotate(bucket=bucket).values_list('bucket').annotate(avg=Avg('final_price')).order_by()
+        return sorted(
+            (key, round(float(avg), 2) if avg is not None else 0)
+            for key, avg in rows
+        )
+
     def get_daily_chart_data(self):
         """چارت روزانه از AllData برای محصول انتخاب‌شده (آخرین chart_days روز)."""
         # داده‌ها بر اساس تاریخ شمسی ذخیره شده‌اند به صورت YYYY/MM/DD
-        qs = self._filtered_alldata_queryset()
+        qs = self._filtered_alldata_queryset().exclude(transaction_date='')
         # آخرین chart_days روز بر اساس رشته تاریخ مرتب شده
-        day_points = {}
-        for item in qs.values('transaction_date', 'final_price'):
-            d = item['transaction_date'] or ''
-            try:
-                price = float(item['final_price']) if item['final_price'] is not None else None
-            except Exception:
-                price = None
-            if not d:
-                continue
-            lst = day_points.setdefault(d, [])
-            if price is not None:
-                lst.append(price)
-
-        # محاسبه میانگین روزانه و مرتب‌سازی
-        days_sorted = sorted(day_points.keys())[-self.chart_days:]
-        labels = []
-        data = []
-        for d in days_sorted:
-            prices = day_points[d]
-            avg = sum(prices) / len(prices) if prices else 0
-            labels.append(d)
-            data.append(round(avg, 2))
+        points = self._average_by(qs, F('transaction_date'))[-self.chart_days:]
+        labels = [key for key, _ in points]
+        data = [avg for _, avg in points]
 
         return {
             'labels': labels,
@@ -170,33 +166,12 @@ class PricePage(HeadlessPreviewMixin, Page):
         }
 
     def get_weekly_chart_data(self):
-        """چارت هفتگی با تبدیل تاریخ شمسی به میلادی و گروه‌بندی هفته‌ای."""
-        qs = self._filtered_alldata_queryset()
-        week_points = {}
-        for item in qs.values('transaction_date', 'final_price'):
-            d = item['transaction_date'] or ''
-            if not d or len(d) < 10:
-                continue
-            try:
-                jy, jm, jd = int(d[0:4]), int(d[5:7]), int(d[8:10])
-                gdate = jdatetime.date(jy, jm, jd).togregorian()
-                year, week, _ = gdate.isocalendar()
-                key = f"{year}-W{week:02d}"
-                price = float(item['final_price']) if item['final_price'] is not None else None
-            except Exception:
-                continue
-            lst = week_points.setdefault(key, [])
-            if price is not None:
-                lst.append(price)
-
-        weeks_sorted = sorted(week_points.keys())
-        labels = []
-        data = []
-        for key in weeks_sorted:
-            prices = week_points[key]
-            avg = sum(prices) / len(prices) if prices else 0
-            labels.append(key)
-            data.append(round(avg, 2))
+        """چارت هفتگی با گروه‌بندی هفته‌ای بر اساس تاریخ میلادی معامله (trade_date)."""
+        qs = self._filtered_alldata_queryset().filter(trade_date__isnull=False)
+        # کلید عددی سال ISO × 100 + هفته؛ ترتیب آن همان ترتیب برچسب YYYY-Www است
+        points = self._average_by(qs, ExtractIsoYear('trade_date') * 100 + ExtractWeek('trade_date'))
+        labels = [f"{key // 100}-W{key % 100:02d}" for key, _ in points]
+        data = [avg for _, avg in points]
 
         return {
             'labels': labels,
@@ -211,29 +186,10 @@ class PricePage(HeadlessPreviewMixin, Page):
 
     def get_monthly_chart_data(self):
         """چارت ماهانه با گروه‌بندی بر اساس YYYY/MM از تاریخ شمسی."""
-        qs = self._filtered_alldata_queryset()
-        month_points = {}
-        for item in qs.values('transaction_date', 'final_price'):
-            d = item['transaction_date'] or ''
-            if not d or len(d) < 7:
-                continue
-            key = d[0:7]  # YYYY/MM
-            try:
-                price = float(item['final_price']) if item['final_price'] is not None else None
-            except Exception:
-                price = None
-            lst = month_points.setdefault(key, [])
-            if price is not None:
-                lst.append(price)
-
-        months_sorted = sorted(month_points.keys())
-        labels = []
-        data = []
-        for key in months_sorted:
-            prices = month_points[key]
-            avg = sum(prices) / len(prices) if prices else 0
-            labels.append(key)
-            data.append(round(avg, 2))
+        qs = self._filtered_alldata_queryset().annotate(date_length=Length('transaction_date')).filter(date_length__gte=7)
+        points = self._average_by(qs, Substr('transaction_date', 1, 7))  # YYYY/MM
+        labels = [key for key, _ in points]
+        data = [avg for _, avg in points]
 
         return {
             'labels': labels,
@@ -248,29 +204,10 @@ class PricePage(HeadlessPreviewMixin, Page):
 
     def get_yearly_chart_data(self):
         """چارت سالانه با گروه‌بندی بر اساس YYYY از تاریخ شمسی."""
-        qs = self._filtered_alldata_queryset()
-        year_points = {}
-        for item in qs.values('transaction_date', 'final_price'):
-            d = item['transaction_date'] or ''
-            if not d or len(d) < 4:
-                continue
-            key = d[0:4]  # YYYY
-            try:
-                price = float(item['final_price']) if item['final_price'] is not None else None
-            except Exception:
-                price = None
-            lst = year_points.setdefault(key, [])
-            if price is not None:
-                lst.append(price)
-
-        years_sorted = sorted(year_points.keys())
-        labels = []
-        data = []
-        for key in years_sorted:
-            prices = year_points[key]
-            avg = sum(prices) / len(prices) if prices else 0
-            labels.append(key)
-            data.append(round(avg, 2))
+        qs = self._filtered_alldata_queryset().annotate(date_length=Length('transaction_date')).filter(date_length__gte=4)
+        points = self._average_by(qs, Substr('transaction_date', 1, 4))  # YYYY
+        labels = [key for key, _ in points]
+        data = [avg for _, avg in points]
 
         return {
             'labels': labels,
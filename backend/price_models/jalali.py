@@ -0,0 +1,286 @@
+"""
+تبدیل دقیق تاریخ شمسی (جلالی) ⇄ میلادی
+
+همه مسیرهای دریافت، تجمیع و API از این ماژول استفاده می‌کنند. برای سال‌های
+YEAR_MIN تا YEAR_MAX (حدود ۱۳۰۰ تا ۱۵۰۰ شمسی) یک جدول از پیش محاسبه شده ساخته
+می‌شود:
+
+    _YEAR_START[y - YEAR_MIN]   شماره روز (ordinal میلادی) اول فروردین سال y
+    _DAY_KEYS[ordinal - base]   کلید عددی YYYYMMDD شمسی هر روز
+
+بنابراین تبدیل در هر دو جهت فقط یک جستجوی آرایه است و هیچ شیء jdatetime ساخته
+نمی‌شود. سال‌های کبیسه با الگوریتم سال‌های شکست (Borkowski، همان الگوریتم
+jalaali-js) محاسبه می‌شوند؛ در محدوده جدول نتیجه روز به روز با jdatetime یکسان
+است. تاریخ‌های خارج از جدول با همان الگوریتم (کندتر) تبدیل می‌شوند.
+"""
+from array import array
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+YEAR_MIN = 1300
+YEAR_MAX = 1500
+
+# ماه‌های ۱ تا ۶: ۳۱ روز، ۷ تا ۱۱: ۳۰ روز، اسفند: ۲۹ یا ۳۰ روز
+_MONTH_OFFSETS = (0, 0, 31, 62, 93, 124, 155, 186, 216, 246, 276, 306, 336)
+
+# سال‌های شکست الگوریتم Borkowski
+_BREAKS = (
+    -61, 9, 38, 199, 426, 686, 756, 818, 1111, 1181, 1210,
+    1635, 2060, 2097, 2192, 2262, 2324, 2394, 2456, 3178,
+)
+
+# نویسه‌های قابل حذف از رشته تاریخ (گیومه‌ها، فاصله‌ها) و ارقام فارسی/عربی
+_STRIP_CHARS = ' \t\r\n"\'“”«»‌‏'
+_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+JalaliTuple = Tuple[int, int, int]
+
+
+class JalaliDateError(ValueError):
+    """تاریخ شمسی نامعتبر"""
+
+
+# ----------------------------------------------------------------------
+# الگوریتم (فقط برای ساخت جدول و تاریخ‌های خارج از آن)
+# ----------------------------------------------------------------------
+
+def _div(a: int, b: int) -> int:
+    # تقسیم صحیح با گرد کردن به سمت صفر (مانند الگوریتم مرجع)
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+def _mod(a: int, b: int) -> int:
+    return a - _div(a, b) * b
+
+
+def _march_day(jy: int) -> int:
+    """روز ماه مارس میلادی که اول فروردین سال jy در آن قرار دارد"""
+    if jy < _BREAKS[0] or jy >= _BREAKS[-1]:
+        raise JalaliDateError(f"سال شمسی خارج از محدوده پشتیبانی: {jy}")
+
+    gy = jy + 621
+    leap_j = -14
+    jp = _BREAKS[0]
+    jump = 0
+    for jm in _BREAKS[1:]:
+        jump = jm - jp
+        if jy < jm:
+            break
+        leap_j += _div(jump, 33) * 8 + _div(_mod(jump, 33), 4)
+        jp = jm
+
+    n = jy - jp
+    leap_j += _div(n, 33) * 8 + _div(_mod(n, 33) + 3, 4)
+    if _mod(jump, 33) == 4 and jump - n == 4:
+        leap_j += 1
+    leap_g = _div(gy, 4) - _div((_div(gy, 100) + 1) * 3, 4) - 150
+    return 20 + leap_j - leap_g
+
+
+def _compute_year_start(jy: int) -> int:
+    return date(jy + 621, 3, _march_day(jy)).toordinal()
+
+
+# ----------------------------------------------------------------------
+# جدول
+# ----------------------------------------------------------------------
+
+def _build_tables():
+    year_start = array('l', (_compute_year_start(y) for y in range(YEAR_MIN, YEAR_MAX + 2)))
+    day_keys = array('l')
+    for index in range(YEAR_MAX - YEAR_MIN + 1):
+        year = YEAR_MIN + index
+        year_length = year_start[index + 1] - year_start[index]
+        for month in range(1, 13):
+            month_length = 31 if month <= 6 else 30
+            if month == 12:
+                month_length = year_length - 336
+            base_key = year * 10000 + month * 100
+            day_keys.extend(range(base_key + 1, base_key + month_length + 1))
+    return year_start, day_keys
+
+
+_YEAR_START, _DAY_KEYS = _build_tables()
+_FIRST_ORDINAL = _YEAR_START[0]
+_LAST_ORDINAL = _YEAR_START[-1] - 1
+
+MIN_DATE = date.fromordinal(_FIRST_ORDINAL)
+MAX_DATE = date.fromordinal(_LAST_ORDINAL)
+
+
+def _year_start(jy: int) -> int:
+    if YEAR_MIN <= jy <= YEAR_MAX + 1:
+        return _YEAR_START[jy - YEAR_MIN]
+    return _compute_year_start(jy)
+
+
+# ----------------------------------------------------------------------
+# اطلاعات تقویم
+# ----------------------------------------------------------------------
+
+def is_leap(jy: int) -> bool:
+    """آیا سال شمسی کبیسه است (اسفند ۳۰ روزه)"""
+    return _year_start(jy + 1) - _year_start(jy) == 366
+
+
+def month_length(jy: int, jm: int) -> int:
+    if jm <= 6:
+        return 31
+    if jm <= 11:
+        return 30
+    return 30 if is_leap(jy) else 29
+
+
+def is_valid(jy: int, jm: int, jd: int) -> bool:
+    try:
+        return 1 <= jm <= 12 and 1 <= jd <= month_length(jy, jm)
+    except JalaliDateError:
+        return False
+
+
+def weekday(value: date) -> int:
+    """روز هفته شمسی (شنبه = ۰ ... جمعه = ۶)"""
+    return (value.weekday() + 2) % 7
+
+
+def week_number(jy: int, jm: int, jd: int) -> int:
+    """شماره هفته در سال شمسی (هفته‌ها از شنبه شروع می‌شوند؛ همانند jdatetime)"""
+    year_start = _year_start(jy)
+    day_of_year = _MONTH_OFFSETS[jm] + jd
+    first_weekday = (date.fromordinal(year_start).weekday() + 2) % 7
+    return (day_of_year + first_weekday - 1) // 7 + 1
+
+
+# ----------------------------------------------------------------------
+# تبدیل
+# ----------------------------------------------------------------------
+
+def to_gregorian(jy: int, jm: int, jd: int) -> date:
+    """
+    تبدیل تاریخ شمسی به میلادی
+
+    Raises:
+        JalaliDateError: تاریخ نامعتبر (مثلاً ۳۱ مهر یا ۳۰ اسفند سال غیرکبیسه)
+    """
+    if not is_valid(jy, jm, jd):
+        raise JalaliDateError(f"تاریخ شمسی نامعتبر: {jy}/{jm}/{jd}")
+    return date.fromordinal(_year_start(jy) + _MONTH_OFFSETS[jm] + jd - 1)
+
+
+def from_gregorian(value: date) -> JalaliTuple:
+    """تبدیل تاریخ میلادی به (سال، ماه، روز) شمسی"""
+    key = date_key(value)
+    return key // 10000, key // 100 % 100, key % 100
+
+
+def date_key(value: date) -> int:
+    """کلید عددی YYYYMMDD شمسی یک تاریخ میلادی (مناسب برای مرتب‌سازی و ایندکس)"""
+    ordinal = value.toordinal()
+    if _FIRST_ORDINAL <= ordinal <= _LAST_ORDINAL:
+        return _DAY_KEYS[ordinal - _FIRST_ORDINAL]
+
+    # خارج از جدول: پیدا کردن سال با الگوریتم
+    jy = value.year - 621
+    if ordinal < _compute_year_start(jy):
+        jy -= 1
+    day_of_year = ordinal - _compute_year_start(jy)
+    if day_of_year < 186:
+        jm, jd = day_of_year // 31 + 1, day_of_year % 31 + 1
+    else:
+        day_of_year -= 186
+        jm, jd = day_of_year // 30 + 7, day_of_year % 30 + 1
+    return jy * 10000 + jm * 100 + jd
+
+
+def today() -> JalaliTuple:
+    return from_gregorian(date.today())
+
+
+# ----------------------------------------------------------------------
+# رشته‌ها
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=65536)
+def parse(value: str) -> JalaliTuple:
+    """
+    خواندن رشته تاریخ شمسی (1403/05/01، 1403-5-1، ۱۴۰۳/۰۵/۰۱ و ...)
+
+    Raises:
+        JalaliDateError: رشته یا تاریخ نامعتبر
+    """
+    if not isinstance(value, str):
+        raise JalaliDateError(f"تاریخ شمسی نامعتبر: {value!r}")
+    clean = value.strip(_STRIP_CHARS).translate(_DIGITS).replace('-', '/')
+    parts = clean.split('/')
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        raise JalaliDateError(f"تاریخ شمسی نامعتبر: {value!r}")
+    jy, jm, jd = int(parts[0]), int(parts[1]), int(parts[2])
+    if not is_valid(jy, jm, jd):
+        raise JalaliDateError(f"تاریخ شمسی نامعتبر: {value!r}")
+    return jy, jm, jd
+
+
+def format_date(jy: int, jm: int, jd: int, separator: str = '/') -> str:
+    return f"{jy:04d}{separator}{jm:02d}{separator}{jd:02d}"
+
+
+def shamsi_to_gregorian(value: Union[str, None], default: Optional[date] = None) -> Optional[date]:
+    """
+    تبدیل رشته تاریخ شمسی به میلادی
+
+    Returns:
+        تاریخ میلادی یا default در صورت نامعتبر بودن ورودی
+    """
+    try:
+        return to_gregorian(*parse(value))
+    except JalaliDateError:
+        return default
+
+
+def gregorian_to_shamsi(value: Optional[date], separator: str = '/') -> Optional[str]:
+    """تبدیل تاریخ میلادی به رشته شمسی (1403/05/01)؛ None برای ورودی خالی"""
+    if value is None:
+        return None
+    return format_date(*from_gregorian(value), separator=separator)
+
+
+def today_shamsi(separator: str = '/') -> str:
+    return format_date(*today(), separator=separator)
+
+
+# ----------------------------------------------------------------------
+# تبدیل دسته‌ای
+# ----------------------------------------------------------------------
+
+def batch_shamsi_to_gregorian(values: Iterable[str]) -> List[Optional[date]]:
+    """
+    تبدیل دسته‌ای رشته‌های شمسی به میلادی
+
+    هر رشته یکتا فقط یک بار پارس و تبدیل می‌شود (در داده‌های بورس هزاران رکورد
+    تاریخ یکسان دارند). ورودی‌های نامعتبر None می‌شوند.
+    """
+    converted: Dict[str, Optional[date]] = {}
+    result = []
+    for value in values:
+        try:
+            result.append(converted[value])
+        except KeyError:
+            converted[value] = shamsi_to_gregorian(value)
+            result.append(converted[value])
+        except TypeError:
+            result.append(None)
+    return result
+
+
+def batch_gregorian_to_shamsi(values: Iterable[Optional[date]], separator: str = '/') -> List[Optional[str]]:
+    """تبدیل دسته‌ای تاریخ‌های میلادی به رشته شمسی"""
+    converted: Dict[date, Optional[str]] = {}
+    result = []
+    for value in values:
+        if value not in converted:
+            converted[value] = gregorian_to_shamsi(value, separator)
+        result.append(converted[value])
+    return result
+
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_models', '0002_alter_pricedata_commodity_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataimportlog',
+            name='duplicate_records',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای تکراری'),
+        ),
+        migrations.AddField(
+            model_name='dataimportlog',
+            name='error_records',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای خطادار'),
+        ),
+        migrations.AddField(
+            model_name='dataimportlog',
+            name='updated_records',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد رکوردهای بروزرسانی شده'),
+        ),
+        migrations.AlterField(
+            model_name='dataimportlog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار'), ('processing', 'در حال پردازش'), ('completed', 'تکمیل شده'), ('partial', 'تکمیل با خطا'), ('failed', 'ناموفق')], default='pending', max_length=20, verbose_name='وضعیت'),
+        ),
+    ]
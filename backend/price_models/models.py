@@ -90,6 +90,7 @@ class DataImportLog(models.Model):
         ('pending', 'در انتظار'),
         ('processing', 'در حال پردازش'),
         ('completed', 'تکمیل شده'),
+        ('partial', 'تکمیل با خطا'),
         ('failed', 'ناموفق'),
     ]
     
@@ -99,6 +100,9 @@ class DataImportLog(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="وضعیت")
     total_records = models.PositiveIntegerField(default=0, verbose_name="تعداد کل رکوردها")
     imported_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای وارد شده")
+    updated_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای بروزرسانی شده")
+    duplicate_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای تکراری")
+    error_records = models.PositiveIntegerField(default=0, verbose_name="تعداد رکوردهای خطادار")
     error_message = models.TextField(blank=True, verbose_name="پیام خطا")
     
     # متادیتا
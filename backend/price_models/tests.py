@@ -1,3 +1,108 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from price_models import jalali
+
+
+class JalaliConversionTests(SimpleTestCase):
+    """تبدیل تاریخ شمسی ⇄ میلادی (مقادیر مرجع از تقویم رسمی)"""
+
+    KNOWN_DATES = [
+        ((1403, 1, 1), date(2024, 3, 20)),
+        ((1403, 5, 1), date(2024, 7, 22)),
+        ((1402, 12, 29), date(2024, 3, 19)),
+        ((1403, 12, 30), date(2025, 3, 20)),
+        ((1404, 1, 1), date(2025, 3, 21)),
+        ((1399, 12, 30), date(2021, 3, 20)),
+        ((1300, 1, 1), date(1921, 3, 21)),
+    ]
+
+    def test_known_dates(self):
+        for shamsi, gregorian in self.KNOWN_DATES:
+            with self.subTest(shamsi=shamsi):
+                self.assertEqual(jalali.to_gregorian(*shamsi), gregorian)
+                self.assertEqual(jalali.from_gregorian(gregorian), shamsi)
+                self.assertEqual(jalali.date_key(gregorian), shamsi[0] * 10000 + shamsi[1] * 100 + shamsi[2])
+
+    def test_round_trip_over_leap_year(self):
+        # ۱۴۰۲ عادی و ۱۴۰۳ کبیسه: هر روز دقیقاً یک روز پس از روز قبل
+        day = jalali.to_gregorian(1402, 1, 1)
+        previous = None
+        while day < jalali.to_gregorian(1404, 1, 1):
+            shamsi = jalali.from_gregorian(day)
+            self.assertEqual(jalali.to_gregorian(*shamsi), day)
+            if previous is not None:
+                self.assertGreater(shamsi, previous)
+            previous = shamsi
+            day += timedelta(days=1)
+        self.assertEqual(previous, (1403, 12, 30))
+
+    def test_esfand_length(self):
+        self.assertTrue(jalali.is_leap(1403))
+        self.assertFalse(jalali.is_leap(1402))
+        self.assertEqual(jalali.month_length(1403, 12), 30)
+        self.assertEqual(jalali.month_length(1402, 12), 29)
+        self.assertTrue(jalali.is_valid(1403, 12, 30))
+        self.assertFalse(jalali.is_valid(1402, 12, 30))
+        with self.assertRaises(jalali.JalaliDateError):
+            jalali.to_gregorian(1402, 12, 30)
+
+    def test_dates_outside_lookup_table(self):
+        for shamsi, gregorian in [
+            ((1250, 1, 1), date(1871, 3, 21)),
+            ((1299, 12, 29), date(1921, 3, 20)),
+            ((1501, 1, 1), date(2122, 3, 21)),
+            ((1600, 6, 15), date(2221, 9, 6)),
+        ]:
+            with self.subTest(shamsi=shamsi):
+                self.assertEqual(jalali.to_gregorian(*shamsi), gregorian)
+                self.assertEqual(jalali.from_gregorian(gregorian), shamsi)
+
+        # مرزهای جدول: روز قبل و بعد با الگوریتم تبدیل می‌شوند
+        self.assertEqual(jalali.from_gregorian(jalali.MIN_DATE), (jalali.YEAR_MIN, 1, 1))
+        self.assertEqual(jalali.from_gregorian(jalali.MIN_DATE - timedelta(days=1))[:2], (jalali.YEAR_MIN - 1, 12))
+        self.assertEqual(jalali.from_gregorian(jalali.MAX_DATE + timedelta(days=1)), (jalali.YEAR_MAX + 1, 1, 1))
+
+
+class JalaliParseTests(SimpleTestCase):
+
+    def test_accepted_formats(self):
+        for value in ('1403/05/01', '1403-5-1', '۱۴۰۳/۰۵/۰۱', ' "1403/5/01" ', '١٤٠٣/٥/١'):
+            with self.subTest(value=value):
+                self.assertEqual(jalali.parse(value), (1403, 5, 1))
+
+    def test_invalid_values(self):
+        for value in ('', '1403/05', '1403/05/01/02', '1403/13/01', '1403/07/31', '1402/12/30',
+                      '1403/00/10', 'abc', '1403/o5/01', None, 14030501):
+            with self.subTest(value=value):
+                with self.assertRaises(jalali.JalaliDateError):
+                    jalali.parse(value)
+                self.assertIsNone(jalali.shamsi_to_gregorian(value))
+
+    def test_string_helpers(self):
+        self.assertEqual(jalali.gregorian_to_shamsi(date(2024, 7, 22)), '1403/05/01')
+        self.assertEqual(jalali.gregorian_to_shamsi(date(2024, 7, 22), separator='-'), '1403-05-01')
+        self.assertIsNone(jalali.gregorian_to_shamsi(None))
+        self.assertEqual(
+            jalali.batch_shamsi_to_gregorian(['1403/05/01', 'bad', '1403/05/01']),
+            [date(2024, 7, 22), None, date(2024, 7, 22)],
+        )
+
+
+class JalaliWeekTests(SimpleTestCase):
+
+    def test_weeks_start_on_saturday(self):
+        # اول فروردین ۱۴۰۳ چهارشنبه است
+        self.assertEqual(jalali.weekday(date(2024, 3, 20)), 4)
+        self.assertEqual(jalali.week_number(1403, 1, 1), 1)
+        self.assertEqual(jalali.week_number(1403, 1, 3), 1)   # جمعه
+        self.assertEqual(jalali.week_number(1403, 1, 4), 2)   # شنبه
+        self.assertEqual(jalali.week_number(1403, 12, 30), 53)
+        self.assertEqual(jalali.week_number(1402, 1, 1), 1)
+
+    def test_week_number_is_constant_within_a_week(self):
+        day = jalali.to_gregorian(1403, 1, 4)
+        for offset in range(7):
+            shamsi = jalali.from_gregorian(day + timedelta(days=offset))
+            self.assertEqual(jalali.week_number(*shamsi), 2)
@@ -7,6 +7,7 @@ from django.db.models import Count, Avg, Max, Min
 from price_models.models import PriceData, DataImportLog
 from data_management.models import AllData
 from price_display.models import PriceIndexPage, PricePage
+from .file_import import FileImportService
 from .forms import DataImportForm
 import json
 
@@ -140,11 +141,18 @@ class PriceDataImportAdmin(admin.ModelAdmin):
         extra_context = extra_context or {}
         
         if request.method == 'POST':
-            form = DataImportForm(request.POST)
+            form = DataImportForm(request.POST, request.FILES)
             if form.is_valid():
                 # پردازش فرم و وارد کردن داده‌ها
                 result = self.process_import(form.cleaned_data, request.user)
-                messages.success(request, f'عملیات با موفقیت انجام شد. {result["imported"]} رکورد وارد شد.')
+                if result['error']:
+                    messages.error(request, result['error'])
+                else:
+                    messages.success(
+                        request,
+                        f'عملیات با موفقیت انجام شد. {result["imported"]} رکورد وارد شد '
+                        f'({result["updated"]} بروزرسانی، {result["duplicates"]} تکراری، {result["errors"]} خطا).'
+                    )
                 return HttpResponseRedirect(request.get_full_path())
         else:
             form = DataImportForm()
@@ -166,14 +174,25 @@ class PriceDataImportAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context=extra_context)
     
     def process_import(self, data, user):
-        """پردازش عملیات وارد کردن داده"""
-        # این متد باید منطق وارد کردن داده را پیاده‌سازی کند
-        # فعلاً یک پیاده‌سازی ساده
+        """پردازش عملیات وارد کردن داده (ورود جریانی فایل CSV/XLSX)"""
+        if not data.get('import_file'):
+            return {'imported': 0, 'updated': 0, 'duplicates': 0, 'errors': 0, 'error': 'فایلی انتخاب نشده است!'}
+        
+        result = FileImportService().import_file(
+            data['import_file'],
+            duplicate_handling=data['duplicate_handling'],
+            commodity_name=data.get('commodity_name', ''),
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            created_by=user.get_username(),
+        )
+        stats = result['stats']
         return {
-            'imported': 0,
-            'updated': 0,
-            'duplicates': 0,
-            'errors': 0
+            'imported': stats['imported_records'],
+            'updated': stats['updated_records'],
+            'duplicates': stats['duplicate_records'],
+            'errors': stats['error_records'],
+            'error': result.get('error', ''),
         }
     
     def has_add_permission(self, request):
@@ -1,18 +1,21 @@
+from data_management.commodities import get_resolver
 from data_management.models import (
     AllData, 
+    Commodity,
     CommodityDailyPriceSeries,
     CommodityWeeklyPriceSeries,
     CommodityMonthlyPriceSeries,
     CommodityYearlyPriceSeries
 )
 from wagtail.api.v2.filters import FieldsFilter
+from wagtail.api.v2.utils import BadRequestError
 from wagtail.api.v2.views import BaseAPIViewSet
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from price_display.models import PricePage
-import jdatetime
+from price_models import jalali
 from datetime import datetime, date
 from wagtail.models import Page
 
@@ -38,24 +41,40 @@ class TransactionAPIViewSet(BaseAPIViewSet):
     filter_backends = BaseAPIViewSet.filter_backends + [FieldsFilter]
 
     def get_queryset(self):
-        queryset = AllData.objects.all().order_by('-transaction_date')
+        queryset = AllData.objects.all().order_by('-trade_date')
         
         # فیلتر بر اساس کالا
         commodity = self.request.GET.get('commodity')
         if commodity:
             queryset = queryset.filter(commodity_name__icontains=commodity)
             
-        # فیلتر بر اساس تاریخ
-        from_date = self.request.GET.get('from_date')
+        # فیلتر بر اساس تاریخ (بازه روی ستون ایندکس‌دار trade_date)
+        from_date = self.get_date_param('from_date')
         if from_date:
-            queryset = queryset.filter(transaction_date__gte=from_date)
+            queryset = queryset.filter(trade_date__gte=from_date)
             
-        to_date = self.request.GET.get('to_date')
+        to_date = self.get_date_param('to_date')
         if to_date:
-            queryset = queryset.filter(transaction_date__lte=to_date)
+            queryset = queryset.filter(trade_date__lte=to_date)
             
         return queryset
 
+    def get_date_param(self, name):
+        """خواندن پارامتر تاریخ: شمسی (1403/05/01) یا میلادی (2024-07-22)"""
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        try:
+            jy, jm, jd = jalali.parse(value)
+        except jalali.JalaliDateError:
+            jy = None
+        if jy is not None and jalali.YEAR_MIN <= jy <= jalali.YEAR_MAX:
+            return jalali.to_gregorian(jy, jm, jd)
+        try:
+            return date.fromisoformat(value.strip())
+        except ValueError:
+            raise BadRequestError(f"{name} باید تاریخ شمسی (1403/05/01) یا میلادی (2024-07-22) باشد")
+
 
 class CommodityAPIViewSet(BaseAPIViewSet):
     """API ViewSet برای دریافت لیست کالاها"""
@@ -63,8 +82,7 @@ class CommodityAPIViewSet(BaseAPIViewSet):
     model = Page
     
     def list(self, request):
-        commodities = AllData.objects.values_list('commodity_name', flat=True).distinct()
-        data = [{'name': commodity} for commodity in commodities if commodity]
+        data = list(Commodity.objects.order_by('name').values('id', 'name'))
         return Response({'items': data})
 
 
@@ -74,7 +92,7 @@ def price_chart_data(request, commodity):
     try:
         transactions = AllData.objects.filter(
             commodity_name__icontains=commodity
-        ).order_by('-transaction_date')[:30]
+        ).order_by('-trade_date')[:30]
         
         chart_data = []
         for transaction in transactions:
@@ -153,6 +171,9 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
         if not commodity_name:
             return Response({"error": "Commodity name not found for this page."}, status=404)
 
+        # سری‌ها با کلید عددی کالا ذخیره شده‌اند؛ کالای ناموجود یعنی سری خالی
+        commodity_id = get_resolver().find(commodity_name)
+
         def unix_ts(date_obj: date):
             """تبدیل تاریخ به timestamp برای TradingView"""
             if not date_obj:
@@ -163,7 +184,7 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
         def get_daily_series(limit_days=None):
             """دریافت سری روزانه از جدول پیش‌پردازش شده"""
             queryset = CommodityDailyPriceSeries.objects.filter(
-                commodity_name=commodity_name
+                commodity_id=commodity_id
             ).order_by('-trade_date')
             
             if limit_days:
@@ -190,7 +211,7 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
         def get_weekly_series():
             """دریافت سری هفتگی از جدول پیش‌پردازش شده"""
             queryset = CommodityWeeklyPriceSeries.objects.filter(
-                commodity_name=commodity_name
+                commodity_id=commodity_id
             ).order_by('-year', '-week_number')
             
             series = []
@@ -213,7 +234,7 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
         def get_monthly_series():
             """دریافت سری ماهانه از جدول پیش‌پردازش شده"""
             queryset = CommodityMonthlyPriceSeries.objects.filter(
-                commodity_name=commodity_name
+                commodity_id=commodity_id
             ).order_by('-year', '-month')
             
             series = []
@@ -221,8 +242,7 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
                 # ایجاد تاریخ اول ماه میلادی از سال و ماه شمسی
                 try:
                     # تبدیل سال و ماه شمسی به میلادی
-                    jalali_date = jdatetime.date(item.year, item.month, 1)
-                    gregorian_date = jalali_date.togregorian()
+                    gregorian_date = jalali.to_gregorian(item.year, item.month, 1)
                     ts = unix_ts(gregorian_date)
                     
                     if ts:
@@ -244,15 +264,14 @@ class PriceSeriesAPIViewSet(BaseAPIViewSet):
         def get_yearly_series():
             """دریافت سری سالانه از جدول پیش‌پردازش شده"""
             queryset = CommodityYearlyPriceSeries.objects.filter(
-                commodity_name=commodity_name
+                commodity_id=commodity_id
             ).order_by('-year')
             
             series = []
             for item in queryset:
                 try:
                     # ایجاد تاریخ اول سال میلادی از سال شمسی
-                    jalali_date = jdatetime.date(item.year, 1, 1)
-                    gregorian_date = jalali_date.togregorian()
+                    gregorian_date = jalali.to_gregorian(item.year, 1, 1)
                     ts = unix_ts(gregorian_date)
                     
                     if ts:
@@ -0,0 +1,262 @@
+"""
+دریافت همزمان داده‌های Scroll Time برای همه زیرگروه‌های فعال با asyncio
+
+برای هر سه‌تایی فعال (گروه اصلی، گروه، زیرگروه) یک ScrollTimeRequest ساخته
+می‌شود و payload آن با get_payload() تولید می‌شود. همه درخواست‌ها (و بازه‌های
+هفتگی/ماهانه هر درخواست) با یک httpx.AsyncClient مشترک و یک semaphore سراسری
+به صورت همزمان ارسال می‌شوند و نتیجه هر بازه به مسیر ذخیره‌سازی دسته‌ای
+ScrollTimeService.import_records سپرده می‌شود. در نتیجه زمان کل تقریباً برابر
+کندترین بازه است و نه مجموع زمان همه درخواست‌ها.
+
+تاریخ‌های تغییر یافته همه درخواست‌ها در یک RollupBatch مشترک جمع می‌شوند و
+تجمیع روزانه/هفتگی/ماهانه/سالانه فقط یک بار در پایان اجرا انجام می‌شود.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from data_management.signals import RollupBatch, deferred_rollups
+from price_data_ingestion.models import ScrollTimeRequest, SubCategory
+from price_models import jalali
+from .normalizer import CoercionReport
+from .services import ScrollTimeService, split_shamsi_range
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIngestionRunner:
+    """اجرای همزمان دریافت و ذخیره داده برای همه زیرگروه‌های فعال"""
+
+    # بیشترین تعداد درخواست همزمان به سرور بورس (برای همه زیرگروه‌ها با هم)
+    DEFAULT_CONCURRENCY = 8
+
+    def __init__(self, start_date_shamsi: Optional[str] = None, end_date_shamsi: Optional[str] = None,
+                 window_size: str = 'none', max_concurrency: Optional[int] = None,
+                 duplicate_handling: str = 'update', created_by: str = 'ingest_scroll_time',
+                 batch_size: Optional[int] = None, service: Optional[ScrollTimeService] = None):
+        today = jalali.today_shamsi()
+        self.start_date_shamsi = start_date_shamsi or today
+        self.end_date_shamsi = end_date_shamsi or self.start_date_shamsi
+        self.window_size = window_size
+        self.max_concurrency = max_concurrency or self.DEFAULT_CONCURRENCY
+        self.duplicate_handling = duplicate_handling
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.service = service or ScrollTimeService()
+        self.rollups = RollupBatch()
+
+    @staticmethod
+    def active_subcategories():
+        """
+        زیرگروه‌هایی که خودشان، گروه و گروه اصلی‌شان فعال هستند
+
+        گزینه‌های «همه» (value=0) کنار گذاشته می‌شوند تا داده‌ها دوبار دریافت نشوند.
+        """
+        return SubCategory.objects.filter(
+            is_active=True,
+            category__is_active=True,
+            category__main_category__is_active=True,
+        ).exclude(value=0).exclude(category__value=0).exclude(
+            category__main_category__value=0
+        ).select_related('category__main_category').order_by(
+            'category__main_category__order', 'category__order', 'order', 'id'
+        )
+
+    def create_requests(self, subcategories=None) -> List[Tuple[ScrollTimeRequest, List[Tuple[str, str]]]]:
+        """
+        ساخت ScrollTimeRequest برای هر زیرگروه فعال
+
+        Returns:
+            لیست (درخواست، بازه‌ها)
+        """
+        if subcategories is None:
+            subcategories = self.active_subcategories()
+
+        windows = split_shamsi_range(self.start_date_shamsi, self.end_date_shamsi, self.window_size)
+        jobs = []
+        for subcategory in subcategories:
+            scroll_request = ScrollTimeRequest.objects.create(
+                main_category=subcategory.category.main_category,
+                category=subcategory.category,
+                subcategory=subcategory,
+                start_date_shamsi=self.start_date_shamsi,
+                end_date_shamsi=self.end_date_shamsi,
+                duplicate_handling=self.duplicate_handling,
+                window_size=self.window_size,
+                auto_save=True,
+                status='processing',
+                created_by=self.created_by,
+            )
+            jobs.append((scroll_request, windows))
+        return jobs
+
+    def run(self, subcategories=None) -> Dict[str, Any]:
+        """اجرای همزمان (برای فراخوانی از کد همگام مانند دستورات مدیریتی)"""
+        return asyncio.run(self.arun(subcategories))
+
+    async def arun(self, subcategories=None) -> Dict[str, Any]:
+        """
+        دریافت و ذخیره همه زیرگروه‌ها
+
+        Returns:
+            Dict شامل آمار کلی و نتیجه هر درخواست
+        """
+        started = time.monotonic()
+        jobs = await sync_to_async(self.create_requests)(subcategories)
+        # payloadها در همین مرحله ساخته می‌شوند تا در حلقه رویداد به پایگاه داده دسترسی نداشته باشیم
+        jobs = await sync_to_async(self._build_payloads)(jobs)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        async with httpx.AsyncClient(
+            headers=self.service.DEFAULT_HEADERS,
+            timeout=self.service.REQUEST_TIMEOUT,
+            limits=limits,
+        ) as client:
+            results = await asyncio.gather(*[
+                self._ingest_request(client, semaphore, scroll_request, windows)
+                for scroll_request, windows in jobs
+            ])
+
+        # یک تجمیع برای همه تاریخ‌های تغییر یافته همه زیرگروه‌ها
+        await sync_to_async(self.rollups.flush)()
+
+        totals = self.service._empty_stats()
+        for result in results:
+            for key in totals:
+                totals[key] += result['stats'][key]
+
+        return {
+            'success': all(result['success'] for result in results),
+            'requests': len(results),
+            'failed_requests': sum(1 for result in results if not result['success']),
+            'stats': totals,
+            'results': results,
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
+
+    @staticmethod
+    def _build_payloads(jobs):
+        return [
+            (scroll_request, [(start, end, scroll_request.get_payload(start, end)) for start, end in windows])
+            for scroll_request, windows in jobs
+        ]
+
+    async def _ingest_request(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                              scroll_request: ScrollTimeRequest,
+                              windows: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """دریافت همه بازه‌های یک درخواست و ذخیره هر بازه به محض دریافت"""
+        stats = self.service._empty_stats()
+        coercion_report = CoercionReport()
+        progress = [
+            {'start': start, 'end': end, 'status': 'pending', 'records': 0}
+            for start, end, _ in windows
+        ]
+        await sync_to_async(self.service._save_window_progress)(scroll_request, progress)
+
+        seen = set()
+        failed = []
+        tasks = [
+            self._fetch_indexed(client, semaphore, index, payload)
+            for index, (_, _, payload) in enumerate(windows)
+        ]
+        for task in asyncio.as_completed(tasks):
+            index, records, error = await task
+            entry = progress[index]
+            if error is not None:
+                logger.error(f"Request {scroll_request.id} window {entry['start']} - {entry['end']} failed: {error}")
+                entry['status'] = 'failed'
+                entry['error'] = str(error)[:500]
+                failed.append(entry)
+            else:
+                unique_records = []
+                for record in records:
+                    key = self.service._record_key(record)
+                    if key not in seen:
+                        seen.add(key)
+                        unique_records.append(record)
+                stats['total_records'] += len(unique_records)
+                await sync_to_async(self._import_records)(
+                    unique_records, scroll_request, stats, coercion_report
+                )
+                entry['status'] = 'completed'
+                entry['records'] = len(records)
+            await sync_to_async(self.service._save_window_progress)(scroll_request, progress)
+
+        error_msg = ''
+        if failed:
+            ranges = '، '.join(f"{entry['start']} تا {entry['end']}" for entry in failed)
+            error_msg = f"دریافت {len(failed)} بازه از {len(windows)} بازه ناموفق بود: {ranges}"
+        await sync_to_async(self._finish_request)(scroll_request, stats, error_msg)
+
+        return {
+            'success': not failed,
+            'scroll_request_id': scroll_request.id,
+            'subcategory': scroll_request.subcategory.name,
+            'stats': stats,
+            'coercion_report': coercion_report.as_dict(),
+            'error': error_msg,
+        }
+
+    async def _fetch_indexed(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                             index: int, payload: Dict[str, Any]):
+        """دریافت یک بازه؛ خطا به جای raise برگردانده می‌شود"""
+        try:
+            return index, await self.fetch_records(client, semaphore, payload), None
+        except Exception as e:
+            return index, None, e
+
+    async def fetch_records(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                            payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        دریافت رکوردهای یک payload از cache دیسکی یا با ارسال درخواست
+        (محدودیت نرخ، retry و قطع‌کننده مدار مشترک با ScrollTimeService در IMEClient)
+
+        Returns:
+            رکوردهای پاسخ
+        """
+        cache = self.service.cache
+        url = self.service.BASE_URL
+        body = await asyncio.to_thread(cache.load, url, payload)
+        if body is not None:
+            return await asyncio.to_thread(self._parse_body, body)
+
+        async with semaphore:
+            response = await self.service.client.apost(client, url, json=payload)
+
+        # پارس پاسخ در thread جداگانه تا حلقه رویداد مسدود نشود؛ فقط پاسخ‌های سالم cache می‌شوند
+        body = response.content
+        records = await asyncio.to_thread(self._parse_body, body)
+        await asyncio.to_thread(cache.store, url, payload, body)
+        return records
+
+    def _import_records(self, records: List[Dict[str, Any]], scroll_request: ScrollTimeRequest,
+                        stats: Dict[str, int], coercion_report: CoercionReport):
+        """ذخیره یک بازه؛ تاریخ‌ها در دسته تجمیع مشترک اجرا علامت می‌خورند"""
+        with deferred_rollups(self.rollups):
+            self.service.import_records(
+                records, scroll_request, stats,
+                batch_size=self.batch_size, coercion_report=coercion_report
+            )
+
+    def _parse_body(self, body: bytes) -> List[Dict[str, Any]]:
+        return list(self.service.iter_body_records([body]))
+
+    def _finish_request(self, scroll_request: ScrollTimeRequest, stats: Dict[str, int], error_msg: str):
+        """ثبت نتیجه نهایی درخواست"""
+        scroll_request.total_records = stats['total_records']
+        scroll_request.processed_records = stats['imported_records']
+        scroll_request.status = 'failed' if error_msg else 'completed'
+        scroll_request.error_message = error_msg
+        scroll_request.save()
+        try:
+            self.service._create_import_log(scroll_request, stats)
+        except Exception as log_exc:
+            logger.warning(f"Skipping import log due to error: {log_exc}")
@@ -0,0 +1,335 @@
+"""
+بازیابی تاریخچه چندساله داده‌های Scroll Time با امکان ادامه پس از توقف
+
+بازه تاریخ و زیرگروه‌های انتخاب شده به شبکه‌ای از خانه‌های (زیرگروه، بازه
+ماهانه/هفتگی) تبدیل و در BackfillRun / BackfillCell ذخیره می‌شوند. هر خانه
+مستقل دریافت و ذخیره می‌شود و بلافاصله پس از ذخیره، تکمیل آن در پایگاه داده
+ثبت می‌شود (checkpoint). اجرای دوباره با همان پارامترها همان BackfillRun را
+پیدا می‌کند و فقط خانه‌های در انتظار یا ناموفق را دریافت می‌کند.
+
+تعداد خانه‌های در حال پردازش با max_concurrency محدود است و درخواست‌ها از
+همان محدودکننده نرخ و قطع‌کننده مدار IMEClient عبور می‌کنند. ذخیره‌سازی
+idempotent است (کلید طبیعی AllData)، بنابراین خانه‌ای که ذخیره شده ولی
+checkpoint آن ثبت نشده، در اجرای بعدی بدون تکرار داده دوباره ذخیره می‌شود.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from price_data_ingestion.models import BackfillCell, BackfillRun, ScrollTimeRequest
+from .async_ingestion import AsyncIngestionRunner
+from .normalizer import CoercionReport
+from .services import split_shamsi_range
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_fingerprint(start_date_shamsi: str, end_date_shamsi: str, window_size: str,
+                         duplicate_handling: str, subcategory_ids: List[int]) -> str:
+    """شناسه پارامترهای یک بازیابی (برای یافتن اجرای قبلی)"""
+    params = {
+        'start': start_date_shamsi,
+        'end': end_date_shamsi,
+        'window': window_size,
+        'duplicate_handling': duplicate_handling,
+        'subcategories': sorted(subcategory_ids),
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def plan_backfill(start_date_shamsi: str, end_date_shamsi: str, subcategories,
+                  window_size: str = 'month', duplicate_handling: str = 'update',
+                  selection: Optional[Dict[str, Any]] = None, created_by: str = 'backfill_ime',
+                  restart: bool = False) -> Tuple[BackfillRun, bool]:
+    """
+    ساخت شبکه خانه‌های بازیابی یا یافتن آخرین اجرای قبلی با همان پارامترها
+
+    اجرای قبلی (حتی اگر تکمیل شده باشد) برگردانده می‌شود تا اجرای دوباره فقط
+    خانه‌های باقی‌مانده را دریافت کند؛ با restart=True شبکه جدیدی ساخته می‌شود.
+
+    Returns:
+        (BackfillRun، آیا اجرای قبلی ادامه داده می‌شود)
+    """
+    subcategories = list(subcategories)
+    fingerprint = backfill_fingerprint(
+        start_date_shamsi, end_date_shamsi, window_size, duplicate_handling,
+        [subcategory.id for subcategory in subcategories]
+    )
+
+    if not restart:
+        existing = BackfillRun.objects.filter(fingerprint=fingerprint).order_by('-created_at').first()
+        if existing is not None:
+            return existing, True
+
+    windows = split_shamsi_range(start_date_shamsi, end_date_shamsi, window_size)
+    with transaction.atomic():
+        run = BackfillRun.objects.create(
+            start_date_shamsi=start_date_shamsi,
+            end_date_shamsi=end_date_shamsi,
+            window_size=window_size,
+            duplicate_handling=duplicate_handling,
+            selection=selection or {},
+            fingerprint=fingerprint,
+            cells_total=len(windows) * len(subcategories),
+            created_by=created_by,
+        )
+        BackfillCell.objects.bulk_create([
+            BackfillCell(run=run, subcategory=subcategory, window_start_shamsi=start, window_end_shamsi=end)
+            for start, end in windows
+            for subcategory in subcategories
+        ], batch_size=1000)
+    return run, False
+
+
+class BackfillRunner(AsyncIngestionRunner):
+    """اجرای خانه‌های باقی‌مانده یک BackfillRun با همزمانی محدود"""
+
+    def __init__(self, run: BackfillRun, progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 **kwargs):
+        kwargs.setdefault('created_by', run.created_by or 'backfill_ime')
+        super().__init__(
+            start_date_shamsi=run.start_date_shamsi,
+            end_date_shamsi=run.end_date_shamsi,
+            window_size=run.window_size,
+            duplicate_handling=run.duplicate_handling,
+            **kwargs
+        )
+        self.backfill = run
+        self.progress = progress
+        self._started = 0.0
+        self._cells_done = 0
+        self._cells_planned = 0
+        self._records = 0
+
+    def pending_cells(self) -> List[BackfillCell]:
+        """خانه‌های در انتظار و ناموفق (به ترتیب زمانی)"""
+        return list(
+            self.backfill.cells.exclude(status='completed')
+            .select_related('subcategory__category__main_category')
+            .order_by('window_start_shamsi', 'subcategory_id')
+        )
+
+    def create_requests(self, cells: List[BackfillCell]) -> Dict[int, ScrollTimeRequest]:
+        """یک ScrollTimeRequest برای هر زیرگروه در این اجرا (برای ثبت نتیجه و لاگ ورود)"""
+        requests_by_subcategory = {}
+        for cell in cells:
+            subcategory = cell.subcategory
+            if subcategory.id in requests_by_subcategory:
+                continue
+            requests_by_subcategory[subcategory.id] = ScrollTimeRequest.objects.create(
+                main_category=subcategory.category.main_category,
+                category=subcategory.category,
+                subcategory=subcategory,
+                start_date_shamsi=self.start_date_shamsi,
+                end_date_shamsi=self.end_date_shamsi,
+                duplicate_handling=self.duplicate_handling,
+                window_size=self.window_size,
+                auto_save=True,
+                status='processing',
+                created_by=self.created_by,
+            )
+        return requests_by_subcategory
+
+    async def arun(self, subcategories=None) -> Dict[str, Any]:
+        """
+        دریافت و ذخیره خانه‌های باقی‌مانده
+
+        Returns:
+            Dict شامل آمار این اجرا و وضعیت BackfillRun
+        """
+        self._started = time.monotonic()
+        await sync_to_async(self._start_run)()
+        cells = await sync_to_async(self.pending_cells)()
+        requests_by_subcategory = await sync_to_async(self.create_requests)(cells)
+        jobs = await sync_to_async(self._build_cell_payloads)(cells, requests_by_subcategory)
+        self._cells_planned = len(jobs)
+
+        request_stats = {
+            scroll_request.id: self.service._empty_stats()
+            for scroll_request in requests_by_subcategory.values()
+        }
+        failed = {request_id: [] for request_id in request_stats}
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        async with httpx.AsyncClient(
+            headers=self.service.DEFAULT_HEADERS,
+            timeout=self.service.REQUEST_TIMEOUT,
+            limits=limits,
+        ) as client:
+            workers = [
+                asyncio.create_task(
+                    self._worker(client, semaphore, queue, request_stats, failed)
+                )
+                for _ in range(min(self.max_concurrency, len(jobs)) or 1)
+            ]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        await sync_to_async(self.rollups.flush)()
+
+        for scroll_request in requests_by_subcategory.values():
+            cells_failed = failed[scroll_request.id]
+            error_msg = ''
+            if cells_failed:
+                error_msg = f"{len(cells_failed)} بازه ناموفق: " + '، '.join(cells_failed[:10])
+            await sync_to_async(self._finish_request)(
+                scroll_request, request_stats[scroll_request.id], error_msg
+            )
+
+        run = await sync_to_async(self._finish_run)()
+        totals = self.service._empty_stats()
+        for stats in request_stats.values():
+            for key in totals:
+                totals[key] += stats[key]
+
+        return {
+            'success': run.status == 'completed',
+            'run_id': run.id,
+            'status': run.status,
+            'cells_processed': self._cells_done,
+            'cells_failed': sum(len(items) for items in failed.values()),
+            'cells_completed': run.cells_completed,
+            'cells_total': run.cells_total,
+            'stats': totals,
+            'elapsed_seconds': round(time.monotonic() - self._started, 2),
+        }
+
+    @staticmethod
+    def _build_cell_payloads(cells: List[BackfillCell], requests_by_subcategory: Dict[int, ScrollTimeRequest]):
+        jobs = []
+        for cell in cells:
+            scroll_request = requests_by_subcategory[cell.subcategory_id]
+            payload = scroll_request.get_payload(cell.window_start_shamsi, cell.window_end_shamsi)
+            jobs.append((cell, scroll_request, payload))
+        return jobs
+
+    async def _worker(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, queue: asyncio.Queue,
+                      request_stats: Dict[int, Dict[str, int]], failed: Dict[int, List[str]]):
+        """برداشتن خانه‌ها از صف، دریافت، ذخیره و ثبت checkpoint"""
+        while True:
+            cell, scroll_request, payload = await queue.get()
+            checkpointed = False
+            try:
+                stats = self.service._empty_stats()
+                error_msg = ''
+                try:
+                    records = await self.fetch_records(client, semaphore, payload)
+                except Exception as e:
+                    error_msg = str(e)[:500] or e.__class__.__name__
+                else:
+                    stats['total_records'] = len(records)
+                    report = CoercionReport()
+                    await sync_to_async(self._import_records)(records, scroll_request, stats, report)
+                    # خطاهای بیشتر از رکوردهای رد شده در نرمال‌سازی یعنی یک دسته ذخیره نشده است
+                    if stats['error_records'] > report.rejected:
+                        error_msg = f"{stats['error_records'] - report.rejected} رکورد ذخیره نشد"
+
+                for key, value in stats.items():
+                    request_stats[scroll_request.id][key] += value
+                if error_msg:
+                    logger.error(
+                        f"Backfill {self.backfill.id} cell {cell.subcategory_id} "
+                        f"{cell.window_start_shamsi} - {cell.window_end_shamsi} failed: {error_msg}"
+                    )
+                    failed[scroll_request.id].append(f"{cell.window_start_shamsi} تا {cell.window_end_shamsi}")
+
+                await sync_to_async(self._checkpoint)(cell, scroll_request, stats, error_msg)
+                checkpointed = True
+                self._cells_done += 1
+                self._records += stats['total_records']
+                if self.progress is not None:
+                    self.progress(self._progress_snapshot(cell, stats, error_msg))
+            except Exception as e:
+                # خطای ذخیره، checkpoint یا callback پیشرفت نباید کارگر را متوقف کند؛
+                # در غیر این صورت خانه‌های باقی‌مانده پردازش نمی‌شوند و queue.join() باز نمی‌گردد
+                logger.exception(
+                    f"Backfill {self.backfill.id} cell {cell.subcategory_id} "
+                    f"{cell.window_start_shamsi} - {cell.window_end_shamsi} crashed: {e}"
+                )
+                if not checkpointed:
+                    self._cells_done += 1
+                    failed[scroll_request.id].append(f"{cell.window_start_shamsi} تا {cell.window_end_shamsi}")
+                    await sync_to_async(self._mark_failed)(cell, str(e)[:500] or e.__class__.__name__)
+            finally:
+                queue.task_done()
+
+    def _checkpoint(self, cell: BackfillCell, scroll_request: ScrollTimeRequest,
+                    stats: Dict[str, int], error_msg: str):
+        """ثبت نتیجه یک خانه و بروزرسانی شمارنده‌های BackfillRun"""
+        completed = not error_msg
+        with transaction.atomic():
+            BackfillCell.objects.filter(pk=cell.pk).update(
+                status='completed' if completed else 'failed',
+                attempts=F('attempts') + 1,
+                total_records=stats['total_records'],
+                imported_records=stats['imported_records'],
+                error_message=error_msg,
+                scroll_request=scroll_request,
+                completed_at=timezone.now() if completed else None,
+            )
+            BackfillRun.objects.filter(pk=self.backfill.pk).update(
+                cells_completed=F('cells_completed') + (1 if completed else 0),
+                total_records=F('total_records') + stats['total_records'],
+                imported_records=F('imported_records') + stats['imported_records'],
+                updated_at=timezone.now(),
+            )
+
+    def _mark_failed(self, cell: BackfillCell, error_msg: str):
+        """ثبت خانه‌ای که پردازش آن با خطای پیش‌بینی نشده متوقف شده است (بدون پرتاب خطا)"""
+        try:
+            BackfillCell.objects.filter(pk=cell.pk).update(
+                status='failed',
+                attempts=F('attempts') + 1,
+                error_message=error_msg,
+                completed_at=None,
+            )
+        except Exception as e:
+            logger.error(f"Backfill {self.backfill.id}: could not mark cell {cell.pk} failed: {e}")
+
+    def _start_run(self):
+        BackfillRun.objects.filter(pk=self.backfill.pk).update(
+            status='running', finished_at=None, updated_at=timezone.now()
+        )
+
+    def _finish_run(self) -> BackfillRun:
+        run = self.backfill
+        run.refresh_from_db()
+        run.status = 'completed' if run.cells_completed >= run.cells_total else 'incomplete'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at', 'updated_at'])
+        return run
+
+    def _progress_snapshot(self, cell: BackfillCell, stats: Dict[str, int], error_msg: str) -> Dict[str, Any]:
+        """پیشرفت این اجرا: تعداد خانه‌ها، رکورد بر ثانیه و زمان تخمینی باقی‌مانده"""
+        elapsed = time.monotonic() - self._started
+        remaining = self._cells_planned - self._cells_done
+        return {
+            'cell': cell,
+            'stats': stats,
+            'error': error_msg,
+            'cells_done': self._cells_done,
+            'cells_remaining': remaining,
+            'cells_planned': self._cells_planned,
+            'records': self._records,
+            'rows_per_second': self._records / elapsed if elapsed else 0.0,
+            'eta_seconds': elapsed / self._cells_done * remaining if self._cells_done else None,
+        }
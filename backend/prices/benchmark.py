@@ -0,0 +1,427 @@
+"""
+بنچمارک مسیر دریافت و ذخیره Scroll Time با یک سرور محلی به جای سرور بورس
+
+IMEStubServer یک سرور HTTP محلی است که به درخواست‌های POST (مانند
+GetAmareMoamelatList) بدنه {"d": "[...]"} از پیش ساخته شده را با تأخیر قابل تنظیم
+برمی‌گرداند. بدنه از رکوردهای مصنوعی (synthetic_records) یا از یک پاسخ ضبط شده
+ساخته می‌شود.
+
+IngestionBenchmark برای هر اندازه داده:
+    1. insert: ورود اولیه (همه رکوردها جدید)
+    2. reimport: ورود دوباره همان پاسخ با هر حالت duplicate_handling
+را از ارسال درخواست تا پایان ذخیره اجرا می‌کند و زمان، رکورد بر ثانیه، تعداد
+کوئری‌های پایگاه داده و بیشینه RSS را گزارش می‌دهد. رکوردها در بازه شناسه‌های
+رزرو شده BENCH_PK_BASE و با پیشوند BENCH_PREFIX ذخیره و پس از هر اندازه حذف
+می‌شوند؛ تجمیع‌ها (DailyData و ...) اجرا نمی‌شوند تا داده‌های واقعی تغییر نکنند.
+"""
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import django
+from django.db import connection
+
+from data_management.models import AllData
+from data_management.signals import RollupBatch, deferred_rollups
+from price_data_ingestion.models import Category, MainCategory, ScrollTimeRequest, SubCategory
+from price_models import jalali
+from price_models.models import PriceData
+from .normalizer import IMERecordNormalizer
+from .response_cache import IMEResponseCache
+from .services import ScrollTimeService
+
+logger = logging.getLogger(__name__)
+
+# شناسه‌ها و نام‌های رزرو شده برای داده‌های بنچمارک (برای حذف امن پس از اجرا)
+BENCH_PK_BASE = 2_000_000_000
+BENCH_PREFIX = 'BENCH'
+BENCH_CATEGORY_VALUE = -1
+
+
+def synthetic_records(count: int, days: int = 20, start: str = '1403/05/01', seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    رکوردهای مصنوعی با ساختار پاسخ GetAmareMoamelatList
+
+    رکوردها روی `days` روز متوالی از تاریخ start پخش می‌شوند و اعداد مانند
+    پاسخ واقعی گاهی به صورت رشته با جداکننده هزارگان هستند.
+    """
+    rnd = random.Random(seed)
+    first = jalali.to_gregorian(*jalali.parse(start)).toordinal()
+    dates = [jalali.gregorian_to_shamsi(date.fromordinal(first + offset)) for offset in range(days)]
+    records = []
+    for index in range(count):
+        price = rnd.randint(10_000, 900_000)
+        quantity = rnd.randint(1, 5_000)
+        records.append({
+            'GoodsName': f'{BENCH_PREFIX} کالا {index % 97}',
+            'Symbol': f'{BENCH_PREFIX}{index}',
+            'Talar': 'تالار محصولات صنعتی و معدنی',
+            'ProducerName': f'تولیدکننده {index % 31}',
+            'ContractType': 'نقدی' if index % 3 else 'سلف',
+            'Price': price,
+            'TotalPrice': f'{price * quantity:,}' if index % 5 == 0 else price * quantity,
+            'MinPrice': price - rnd.randint(0, 5_000),
+            'MaxPrice': price + rnd.randint(0, 5_000),
+            'ArzeBasePrice': price - rnd.randint(0, 20_000),
+            'arze': rnd.randint(0, 10_000),
+            'taghaza': rnd.randint(0, 10_000),
+            'Quantity': quantity,
+            'Unit': 'تن',
+            'date': dates[index % days],
+            'ArzehKonandeh': f'عرضه‌کننده {index % 13}',
+            'cBrokerSpcName': f'کارگزاری {index % 41}',
+            'Tasvieh': 'نقدی',
+            'DeliveryDate': dates[-1],
+            'Warehouse': 'انبار کارخانه',
+            'SettlementDate': dates[-1],
+            'xTalarReportPK': BENCH_PK_BASE + index,
+            'bArzehRadifTarSarresid': '',
+            'ModeDescription': 'معمولی',
+            'MethodDescription': 'حراج باز',
+            'Currency': 'ریال',
+            'PacketName': '',
+            'arzehPk': index % 1000,
+        })
+    return records
+
+
+def rebase_records(records: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    """
+    آماده‌سازی پاسخ ضبط شده برای بنچمارک
+
+    رکوردها تا رسیدن به count تکرار می‌شوند و شناسه گزارش، نماد و نام کالا به
+    بازه رزرو شده بنچمارک منتقل می‌شوند تا با داده‌های واقعی برخورد نکنند.
+    """
+    if not records:
+        raise ValueError('پاسخ ضبط شده هیچ رکوردی ندارد')
+    result = []
+    for index in range(count):
+        record = dict(records[index % len(records)])
+        record['xTalarReportPK'] = BENCH_PK_BASE + index
+        record['Symbol'] = f"{BENCH_PREFIX}{index}"
+        record['GoodsName'] = f"{BENCH_PREFIX} {record.get('GoodsName') or ''}".strip()
+        result.append(record)
+    return result
+
+
+def encode_body(records: List[Dict[str, Any]]) -> bytes:
+    """بدنه پاسخ به شکل سرور بورس: JSON دیگری به صورت رشته در کلید d"""
+    return json.dumps({'d': json.dumps(records, ensure_ascii=False)}, ensure_ascii=False).encode('utf-8')
+
+
+class IMEStubServer:
+    """سرور HTTP محلی با رفتار GetAmareMoamelatList"""
+
+    PATH = '/subsystems/ime/services/home/imedata.asmx/GetAmareMoamelatList'
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.body = encode_body([])
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{self.PATH}'
+
+    def start(self) -> 'IMEStubServer':
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = stub.body
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='ime-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def current_rss() -> Optional[int]:
+    """RSS فعلی پردازه (بایت)؛ None اگر /proc در دسترس نباشد"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RSSSampler:
+    """نمونه‌برداری دوره‌ای از RSS در یک thread جداگانه برای یافتن بیشینه"""
+
+    INTERVAL = 0.01
+
+    def __init__(self):
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            self._stop.wait(self.INTERVAL)
+
+    def __enter__(self):
+        if self.baseline is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class QueryCounter:
+    """شمارش کوئری‌های اتصال پایگاه داده thread جاری (بدون نگه‌داشتن متن کوئری‌ها)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class IngestionBenchmark:
+    """اجرای بنچمارک برای اندازه‌ها و حالت‌های مختلف ورود داده"""
+
+    DEFAULT_SIZES = (1_000, 10_000, 100_000)
+    MODES = ('skip', 'update', 'replace')
+    PATHS = ('stream', 'preview')
+
+    def __init__(self, sizes=DEFAULT_SIZES, modes=MODES, paths=('stream',), latency: float = 0.0,
+                 repeat: int = 1, batch_size: Optional[int] = None,
+                 recorded_records: Optional[List[Dict[str, Any]]] = None, log=None):
+        self.sizes = list(sizes)
+        self.modes = list(modes)
+        self.paths = list(paths)
+        self.latency = latency
+        self.repeat = max(1, repeat)
+        self.batch_size = batch_size
+        self.recorded_records = recorded_records
+        self.log = log or (lambda message: None)
+        self.service = ScrollTimeService(cache=IMEResponseCache(mode='off'))
+
+    def run(self) -> Dict[str, Any]:
+        """اجرای همه سناریوها و ساخت گزارش JSON"""
+        results = []
+        main_category, category, subcategory = self._categories()
+        with IMEStubServer(self.latency) as stub:
+            self.service.BASE_URL = stub.url
+            for size in self.sizes:
+                records = (
+                    rebase_records(self.recorded_records, size) if self.recorded_records is not None
+                    else synthetic_records(size)
+                )
+                stub.body = encode_body(records)
+                body_size = len(stub.body)
+                results.append(self._measure_normalizer(records))
+                del records
+
+                try:
+                    for path in self.paths:
+                        self._cleanup()
+                        # ورود اولیه روی جدول خالی و سپس ورود دوباره همان پاسخ با هر حالت
+                        scenarios = [('insert', 'update')] + [('reimport', mode) for mode in self.modes]
+                        for phase, mode in scenarios:
+                            result = self._measure(
+                                stub, size, body_size, path, phase, mode,
+                                main_category, category, subcategory
+                            )
+                            results.append(result)
+                            self.log(self._describe(result))
+                finally:
+                    self._cleanup()
+
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': self._environment(),
+            'settings': {
+                'sizes': self.sizes,
+                'modes': self.modes,
+                'paths': self.paths,
+                'latency_seconds': self.latency,
+                'repeat': self.repeat,
+                'batch_size': self.batch_size or self.service.IMPORT_BATCH_SIZE,
+                'payload': 'recorded' if self.recorded_records is not None else 'synthetic',
+            },
+            'results': results,
+        }
+
+    def _measure(self, stub: IMEStubServer, size: int, body_size: int, path: str, phase: str, mode: str,
+                 main_category, category, subcategory) -> Dict[str, Any]:
+        """اجرای یک سناریو (repeat بار) و گزارش بهترین زمان"""
+        runs = []
+        for attempt in range(self.repeat):
+            if phase == 'insert' and attempt:
+                self._cleanup()
+            scroll_request = ScrollTimeRequest.objects.create(
+                main_category=main_category,
+                category=category,
+                subcategory=subcategory,
+                start_date_shamsi='1403/05/01',
+                end_date_shamsi='1403/05/31',
+                duplicate_handling=mode,
+                auto_save=path == 'stream',
+                status='pending',
+                created_by='benchmark_ingestion',
+            )
+            counter = QueryCounter()
+            requests_before = stub.requests
+            # تجمیع‌ها علامت می‌خورند ولی هیچ‌گاه اجرا نمی‌شوند (دسته flush نمی‌شود)
+            with RSSSampler() as sampler, connection.execute_wrapper(counter), deferred_rollups(RollupBatch()):
+                started = time.perf_counter()
+                outcome = self._ingest(path, scroll_request)
+                elapsed = time.perf_counter() - started
+            if not outcome.get('success'):
+                raise RuntimeError(f"{path}/{phase}/{mode}: {outcome.get('error')}")
+            runs.append({
+                'seconds': elapsed,
+                'queries': counter.count,
+                'http_requests': stub.requests - requests_before,
+                'peak_rss': sampler.peak,
+                'rss_delta': (sampler.peak - sampler.baseline) if sampler.baseline is not None else None,
+                'stats': outcome['stats'],
+            })
+            ScrollTimeRequest.objects.filter(pk=scroll_request.pk).delete()
+
+        best = min(runs, key=lambda run: run['seconds'])
+        return {
+            'rows': size,
+            'body_bytes': body_size,
+            'path': path,
+            'phase': phase,
+            'mode': mode,
+            'seconds': round(best['seconds'], 4),
+            'median_seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+            'records_per_second': round(size / best['seconds'], 1) if best['seconds'] else None,
+            'queries': best['queries'],
+            'queries_per_1k_records': round(best['queries'] * 1000 / size, 2) if size else None,
+            'http_requests': best['http_requests'],
+            'peak_rss_mb': self._mb(max((run['peak_rss'] or 0) for run in runs)),
+            'rss_delta_mb': self._mb(max((run['rss_delta'] or 0) for run in runs)),
+            'stats': best['stats'],
+        }
+
+    def _ingest(self, path: str, scroll_request: ScrollTimeRequest) -> Dict[str, Any]:
+        if path == 'stream':
+            return self.service.stream_to_database(scroll_request, batch_size=self.batch_size)
+        fetched = self.service.fetch_data(scroll_request)
+        if not fetched.get('success'):
+            return fetched
+        return self.service.save_data_to_database(scroll_request, batch_size=self.batch_size)
+
+    def _measure_normalizer(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """زمان نرمال‌سازی به تنهایی (بدون شبکه و پایگاه داده)"""
+        normalizer = IMERecordNormalizer()
+        started = time.perf_counter()
+        accepted, report = normalizer.normalize_batch(records)
+        for _, row in accepted:
+            normalizer.build_alldata(row)
+            normalizer.build_price(row)
+        elapsed = time.perf_counter() - started
+        result = {
+            'rows': len(records),
+            'path': 'normalize',
+            'phase': 'normalize',
+            'mode': None,
+            'seconds': round(elapsed, 4),
+            'records_per_second': round(len(records) / elapsed, 1) if elapsed else None,
+            'rejected': report.rejected,
+        }
+        self.log(self._describe(result))
+        return result
+
+    @staticmethod
+    def _categories():
+        """دسته‌بندی غیرفعال مخصوص بنچمارک (در همگام‌سازی‌ها انتخاب نمی‌شود)"""
+        main_category, _ = MainCategory.objects.get_or_create(
+            value=BENCH_CATEGORY_VALUE, defaults={'name': BENCH_PREFIX, 'is_active': False}
+        )
+        category, _ = Category.objects.get_or_create(
+            main_category=main_category, value=BENCH_CATEGORY_VALUE,
+            defaults={'name': BENCH_PREFIX, 'is_active': False}
+        )
+        subcategory, _ = SubCategory.objects.get_or_create(
+            category=category, value=BENCH_CATEGORY_VALUE,
+            defaults={'name': BENCH_PREFIX, 'is_active': False}
+        )
+        return main_category, category, subcategory
+
+    @staticmethod
+    def _cleanup():
+        """حذف داده‌های بنچمارک (فقط بازه شناسه‌ها و نام‌های رزرو شده)"""
+        AllData.objects.filter(x_talar_report_pk__gte=BENCH_PK_BASE).delete()
+        PriceData.objects.filter(commodity_name__startswith=BENCH_PREFIX).delete()
+
+    @staticmethod
+    def _mb(value: Optional[int]) -> Optional[float]:
+        return round(value / (1024 * 1024), 1) if value else None
+
+    @staticmethod
+    def _describe(result: Dict[str, Any]) -> str:
+        line = (
+            f"{result['rows']:>7} rows  {result['path']:<9} {result['phase']:<9} {result['mode'] or '-':<8} "
+            f"{result['seconds']:>8.3f}s  {result['records_per_second'] or 0:>10.0f} rec/s"
+        )
+        if 'queries' in result:
+            line += f"  {result['queries']:>6} queries  peak RSS {result['peak_rss_mb'] or '-'} MB"
+        return line
+
+    @staticmethod
+    def _environment() -> Dict[str, Any]:
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'database_version': getattr(connection, 'pg_version', None),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        }
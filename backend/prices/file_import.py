@@ -0,0 +1,333 @@
+"""
+ورود جریانی فایل‌های CSV و XLSX در PriceData و AllData
+
+ردیف‌های فایل یکی‌یکی خوانده می‌شوند (XLSX در حالت read_only openpyxl)، بر اساس
+سرستون‌ها به کلیدهای پاسخ IME تبدیل می‌شوند و سپس دسته‌ای از همان مسیر
+نرمال‌سازی و ذخیره Scroll Time (ScrollTimeService.import_batch) عبور می‌کنند.
+در هر لحظه فقط یک دسته در حافظه است؛ بنابراین فایل‌های چند صد هزار ردیفی هم با
+حافظه محدود وارد می‌شوند. شمارنده‌های DataImportLog پس از هر دسته بروز می‌شوند.
+
+سرستون‌های قابل قبول برای هر ستون (بدون حساسیت به حروف بزرگ/کوچک، فاصله و _):
+کلید پاسخ IME (GoodsName)، نام فیلد مدل (commodity_name) یا عنوان فارسی فیلد
+AllData (نام کالا). ستون‌های ناشناخته در raw_data نگه‌داری می‌شوند.
+
+فایل‌ها معمولاً شناسه‌های IME (xTalarReportPK، arzehPk) را ندارند؛ برای این ردیف‌ها
+یک کلید جایگزین قطعی ساخته می‌شود (surrogate_key) تا کالاها و معاملات مختلف یک روز
+روی یک کلید طبیعی AllData نیفتند و ورود دوباره همان فایل همان ردیف‌ها را بیابد.
+"""
+import csv
+import io
+import logging
+import os
+import zipfile
+import zlib
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from data_management.commodities import canonical_name
+from data_management.models import AllData
+from data_management.signals import deferred_rollups
+from price_models import jalali
+from price_models.models import DataImportLog
+from .normalizer import IME_FIELDS, CoercionReport
+from .services import ScrollTimeService
+
+logger = logging.getLogger(__name__)
+
+# سرستون‌های رایج که با عنوان فیلدهای مدل یکسان نیستند
+EXTRA_HEADER_ALIASES = {
+    'تاریخ': 'date',
+    'کالا': 'GoodsName',
+    'قیمت': 'Price',
+    'حجم': 'Quantity',
+}
+
+
+def _header_key(value: Any) -> str:
+    return ''.join(str(value).split()).replace('_', '').replace('‌', '').lower()
+
+
+def _build_header_aliases() -> Dict[str, str]:
+    """سرستون (نرمال شده) ← کلید اصلی پاسخ IME"""
+    aliases = {}
+    for spec in IME_FIELDS:
+        primary = spec.sources[0]
+        names = {spec.name, *spec.sources, str(AllData._meta.get_field(spec.name).verbose_name)}
+        for name in names:
+            aliases[_header_key(name)] = primary
+    for name, primary in EXTRA_HEADER_ALIASES.items():
+        aliases.setdefault(_header_key(name), primary)
+    return aliases
+
+
+HEADER_ALIASES = _build_header_aliases()
+
+# کلید تاریخ معامله در پاسخ IME (ستون الزامی فایل)
+DATE_KEY = next(spec.sources[0] for spec in IME_FIELDS if spec.required)
+
+# شناسه‌های IME در کلید طبیعی AllData
+REPORT_KEY, ARZEH_KEY = 'xTalarReportPK', 'arzehPk'
+
+
+class FileImportService:
+    """ورود فایل‌های CSV/XLSX با همان نرمال‌ساز و مسیر ذخیره دسته‌ای Scroll Time"""
+
+    # تعداد ردیف‌های هر دسته (و هر بروزرسانی DataImportLog)؛ هم‌اندازه آستانه COPY
+    # تا ردیف‌های AllData از مسیر AllDataCopyLoader نوشته شوند
+    BATCH_SIZE = ScrollTimeService.COPY_THRESHOLD
+
+    SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+    # مقدار source رکوردهای PriceData وارد شده از فایل
+    PRICE_SOURCE = 'file_import'
+
+    # خطاهای خواندن فایل که کل ورود را متوقف می‌کنند
+    FILE_ERRORS = (ValueError, csv.Error, UnicodeDecodeError, zipfile.BadZipFile, InvalidFileException)
+
+    def __init__(self, service: Optional[ScrollTimeService] = None, batch_size: Optional[int] = None):
+        self.service = service or ScrollTimeService()
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    @classmethod
+    def extension(cls, filename: str) -> str:
+        return os.path.splitext(filename or '')[1].lower()
+
+    @classmethod
+    def is_supported(cls, filename: str) -> bool:
+        return cls.extension(filename) in cls.SUPPORTED_EXTENSIONS
+
+    # ------------------------------------------------------------------
+    # خواندن جریانی فایل
+    # ------------------------------------------------------------------
+
+    def iter_rows(self, uploaded_file, extension: str) -> Iterator[List[Any]]:
+        """ردیف‌های خام فایل (اولین ردیف سرستون‌ها است)"""
+        uploaded_file.seek(0)
+        if extension == '.xlsx':
+            yield from self._iter_xlsx(uploaded_file)
+        else:
+            yield from self._iter_csv(uploaded_file)
+
+    @staticmethod
+    def _iter_csv(uploaded_file) -> Iterator[List[Any]]:
+        # UploadedFile خودش IOBase نیست؛ فایل زیرین (BytesIO یا فایل موقت) خوانده می‌شود
+        raw = getattr(uploaded_file, 'file', uploaded_file)
+        text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        try:
+            sample = text.read(4096)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            text.seek(0)
+            yield from csv.reader(text, dialect)
+        finally:
+            # فایل آپلود شده متعلق به فراخوان است و نباید با wrapper بسته شود
+            text.detach()
+
+    @staticmethod
+    def _iter_xlsx(uploaded_file) -> Iterator[List[Any]]:
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+
+    def iter_records(self, uploaded_file, extension: str,
+                     defaults: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        تبدیل ردیف‌های فایل به رکوردهایی با کلیدهای پاسخ IME
+
+        Args:
+            defaults: مقدار کلیدهایی که در ردیف خالی هستند (مثلاً GoodsName از فرم)
+
+        Raises:
+            ValueError: فایل خالی است یا ستون تاریخ ندارد
+        """
+        rows = self.iter_rows(uploaded_file, extension)
+        header = next(rows, None)
+        if not header:
+            raise ValueError('فایل خالی است')
+
+        keys = [
+            HEADER_ALIASES.get(_header_key(name), str(name).strip()) if name is not None else None
+            for name in header
+        ]
+        if DATE_KEY not in keys:
+            raise ValueError('ستون تاریخ معامله (date یا «تاریخ معامله شمسی») در فایل یافت نشد')
+
+        defaults = {key: value for key, value in (defaults or {}).items() if value not in (None, '')}
+        occurrences: Dict[tuple, int] = {}
+        for row in rows:
+            record = {}
+            for key, value in zip(keys, row):
+                if key is None or value is None or value == '':
+                    continue
+                if isinstance(value, datetime):
+                    value = jalali.gregorian_to_shamsi(value.date())
+                elif isinstance(value, date):
+                    value = jalali.gregorian_to_shamsi(value)
+                record[key] = value
+            if not record:
+                continue
+            for key, value in defaults.items():
+                record.setdefault(key, value)
+            self.surrogate_key(record, occurrences)
+            yield record
+
+    @staticmethod
+    def surrogate_key(record: Dict[str, Any], occurrences: Dict[tuple, int]):
+        """
+        کلید جایگزین برای ردیفی که شناسه‌های IME ندارد
+
+        xTalarReportPK منفی از نام کالا (شناسه‌های واقعی IME مثبت هستند) و arzehPk
+        شماره ردیف همان (کالا، نماد، تاریخ) در فایل. occurrences شمارنده‌ها را در
+        طول یک فایل نگه می‌دارد.
+        """
+        if record.get(REPORT_KEY) not in (None, '') or record.get(ARZEH_KEY) not in (None, ''):
+            return
+        commodity = canonical_name(record.get('GoodsName'))
+        group = (commodity, str(record.get('Symbol', '')), str(record.get(DATE_KEY, '')))
+        occurrences[group] = occurrences.get(group, 0) + 1
+        record[REPORT_KEY] = -(zlib.crc32(commodity.encode('utf-8')) & 0x7fffffff) or -1
+        record[ARZEH_KEY] = occurrences[group]
+
+    # ------------------------------------------------------------------
+    # ورود
+    # ------------------------------------------------------------------
+
+    def import_file(self, uploaded_file, duplicate_handling: str = 'skip', commodity_name: str = '',
+                    start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    created_by: str = '') -> Dict[str, Any]:
+        """
+        ورود یک فایل CSV/XLSX
+
+        هر دسته در یک تراکنش نوشته می‌شود؛ اگر یک دسته با خطا مواجه شود همه
+        ردیف‌های آن در error_records شمرده می‌شوند و ورود ادامه می‌یابد. تجمیع
+        روزانه/هفتگی/ماهانه/سالانه یک بار در پایان ورود انجام می‌شود.
+
+        Args:
+            uploaded_file: فایل آپلود شده (UploadedFile یا هر شیء فایل باینری قابل seek)
+            duplicate_handling: skip، update یا replace (مطابق DataImportForm)
+            commodity_name: نام کالا برای ردیف‌هایی که ستون کالا ندارند
+            start_date/end_date: بازه ثبت شده در لاگ (پیش‌فرض: بازه تاریخ‌های فایل)
+
+        Returns:
+            Dict شامل success، error، stats، log_id و coercion_report
+        """
+        filename = getattr(uploaded_file, 'name', '') or ''
+        extension = self.extension(filename)
+        if extension not in self.SUPPORTED_EXTENSIONS:
+            return {
+                'success': False,
+                'error': f"فرمت فایل پشتیبانی نمی‌شود؛ فقط {', '.join(self.SUPPORTED_EXTENSIONS)}",
+                'stats': self.service._empty_stats(),
+            }
+
+        today = timezone.localdate()
+        import_log = DataImportLog.objects.create(
+            commodity_name=(commodity_name or os.path.basename(filename))[:100],
+            start_date=start_date or today,
+            end_date=end_date or today,
+            status='processing',
+            created_by=created_by,
+        )
+        stats = self.service._empty_stats()
+        coercion_report = CoercionReport()
+        trade_dates = [None, None]
+        records = self.iter_records(uploaded_file, extension, defaults={'GoodsName': commodity_name})
+
+        try:
+            with deferred_rollups():
+                while True:
+                    chunk = list(islice(records, self.batch_size))
+                    if not chunk:
+                        break
+                    stats['total_records'] += len(chunk)
+
+                    try:
+                        with transaction.atomic():
+                            chunk_stats = self.service.import_batch(
+                                chunk,
+                                duplicate_handling,
+                                alldata_source=f'file_import_{import_log.id}',
+                                price_source=self.PRICE_SOURCE,
+                                coercion_report=coercion_report,
+                                label=f'file import {import_log.id}',
+                            )
+                    except Exception as e:
+                        logger.error(f"File import {import_log.id}: error importing batch of {len(chunk)} rows: {e}")
+                        stats['error_records'] += len(chunk)
+                    else:
+                        for key, value in chunk_stats.items():
+                            stats[key] += value
+                        self._track_dates(chunk, trade_dates)
+
+                    self._update_log(import_log, stats)
+        except self.FILE_ERRORS as e:
+            logger.error(f"File import {import_log.id} ({filename}) failed: {e}")
+            import_log.error_message = str(e)[:1000]
+            import_log.status = 'failed'
+            self._update_log(import_log, stats, final=True)
+            return {
+                'success': False,
+                'error': f'خطا در خواندن فایل: {e}',
+                'stats': stats,
+                'log_id': import_log.id,
+                'coercion_report': coercion_report.as_dict(),
+            }
+
+        if start_date is None and trade_dates[0] is not None:
+            import_log.start_date = trade_dates[0]
+        if end_date is None and trade_dates[1] is not None:
+            import_log.end_date = trade_dates[1]
+        import_log.status = 'completed' if stats['error_records'] == 0 else 'partial'
+        if coercion_report.has_issues:
+            import_log.error_message = coercion_report.summary()[:1000]
+        self._update_log(import_log, stats, final=True)
+
+        logger.info(f"File import {import_log.id} ({filename}): {stats}")
+        return {
+            'success': True,
+            'stats': stats,
+            'log_id': import_log.id,
+            'coercion_report': coercion_report.as_dict(),
+        }
+
+    @staticmethod
+    def _track_dates(chunk: List[Dict[str, Any]], trade_dates: list):
+        """بازه تاریخ معاملات فایل (برای start_date/end_date لاگ)"""
+        values = [value for value in jalali.batch_shamsi_to_gregorian(
+            record.get(DATE_KEY) for record in chunk
+        ) if value is not None]
+        if values:
+            low, high = min(values), max(values)
+            trade_dates[0] = low if trade_dates[0] is None else min(trade_dates[0], low)
+            trade_dates[1] = high if trade_dates[1] is None else max(trade_dates[1], high)
+
+    @staticmethod
+    def _update_log(import_log: DataImportLog, stats: Dict[str, int], final: bool = False):
+        """بروزرسانی شمارنده‌های لاگ (پس از هر دسته برای نمایش پیشرفت)"""
+        fields = {
+            'total_records': stats['total_records'],
+            'imported_records': stats['imported_records'],
+            'updated_records': stats['updated_records'],
+            'duplicate_records': stats['duplicate_records'],
+            'error_records': stats['error_records'],
+            'updated_at': timezone.now(),
+        }
+        if final:
+            fields.update(
+                status=import_log.status,
+                error_message=import_log.error_message,
+                start_date=import_log.start_date,
+                end_date=import_log.end_date,
+            )
+        DataImportLog.objects.filter(pk=import_log.pk).update(**fields)
@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from price_models.models import PriceData
 from price_data_ingestion.models import MainCategory, Category, SubCategory, ScrollTimeRequest
+from .file_import import FileImportService
 from datetime import date, timedelta
 import re
 
@@ -37,7 +38,7 @@ class ScrollTimeRequestForm(forms.ModelForm):
         fields = [
             'main_category', 'category', 'subcategory',
             'start_date_shamsi', 'end_date_shamsi',
-            'duplicate_handling', 'auto_save'
+            'duplicate_handling', 'window_size', 'auto_save'
         ]
         widgets = {
             'main_category': forms.Select(attrs={
@@ -50,6 +51,7 @@ class ScrollTimeRequestForm(forms.ModelForm):
             }),
             'subcategory': forms.Select(attrs={'class': 'form-control'}),
             'duplicate_handling': forms.Select(attrs={'class': 'form-control'}),
+            'window_size': forms.Select(attrs={'class': 'form-control'}),
             'auto_save': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
     
@@ -148,6 +150,13 @@ class DataImportForm(forms.Form):
         initial=date.today
     )
     
+    import_file = forms.FileField(
+        label="فایل داده (CSV یا Excel)",
+        help_text="فایل ‎.csv یا ‎.xlsx با سرستون‌های پاسخ بورس (GoodsName، Price، date و ...) یا نام فیلدهای داده",
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx', 'class': 'form-control'})
+    )
+    
     duplicate_handling = forms.ChoiceField(
         choices=DUPLICATE_HANDLING_CHOICES,
         label="نحوه مواجهه با داده‌های تکراری",
@@ -170,6 +179,12 @@ class DataImportForm(forms.Form):
         initial=True
     )
     
+    def clean_import_file(self):
+        import_file = self.cleaned_data.get('import_file')
+        if import_file and not FileImportService.is_supported(import_file.name):
+            raise ValidationError('فقط فایل‌های CSV (.csv) و Excel (.xlsx) پشتیبانی می‌شوند.')
+        return import_file
+    
     def clean(self):
         cleaned_data = super().clean()
         start_date = cleaned_data.get('start_date')
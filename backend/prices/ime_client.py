@@ -0,0 +1,458 @@
+"""
+کلاینت HTTP مشترک (در سطح پردازه) برای سرور سازمان بورس (ime.co.ir)
+
+همه مسیرهای دریافت (ScrollTimeService، اجرای همزمان asyncio و ScrollTimePage)
+از یک نمونه IMEClient استفاده می‌کنند که با get_client() گرفته می‌شود:
+
+- TokenBucket / AdaptiveLimiter: سقف نرخ درخواست (توکن بر ثانیه) و تعداد
+  درخواست همزمان. با پاسخ‌های سریع و موفق به آرامی افزایش و با کندی، 429 یا
+  خطای سرور به سرعت کاهش می‌یابند (AIMD)؛ بنابراین توان دریافت تا جایی که
+  سرور بورس تحمل می‌کند بالا می‌رود بدون اینکه درخواست‌ها یکباره ارسال شوند.
+- CircuitBreaker: پس از چند خطای پیاپی، درخواست‌ها تا مدتی بدون ارسال با
+  IMEUnavailableError رد می‌شوند و سپس یک درخواست آزمایشی اجازه می‌یابد.
+- retry با تأخیر نمایی و jitter کامل (و احترام به Retry-After).
+- یک HTTPAdapter مشترک (connection pool با keep-alive) که در نشست مخصوص هر
+  thread نصب می‌شود؛ requests.Session امن برای چند thread نیست ولی pool آن هست.
+
+تنظیمات پیش‌فرض با IME_CLIENT در settings قابل تغییر است، مثلاً:
+    IME_CLIENT = {'INITIAL_RATE': 2, 'MAX_CONCURRENCY': 8}
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class IMEUnavailableError(requests.exceptions.ConnectionError):
+    """سرور بورس در دسترس نیست (مدار باز است)؛ درخواست ارسال نشد"""
+
+
+class TokenBucket:
+    """سطل توکن با نرخ قابل تغییر (امن برای چند thread)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> float:
+        """برداشتن یک توکن؛ 0 در صورت موفقیت وگرنه زمان انتظار تا توکن بعدی (ثانیه)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveLimiter:
+    """
+    محدودکننده نرخ و همزمانی با تنظیم خودکار (افزایش جمعی، کاهش ضربی)
+
+    - پاسخ موفق و سریع‌تر از TARGET_LATENCY: نرخ RATE_STEP افزایش و هر
+      `concurrency` پاسخ موفق یک واحد به همزمانی اضافه می‌شود
+    - پاسخ کند: همزمانی یک واحد کم می‌شود
+    - 429 یا خطای سرور/شبکه: نرخ و همزمانی نصف می‌شوند
+    """
+
+    def __init__(self, initial_rate: float, min_rate: float, max_rate: float, burst: float,
+                 initial_concurrency: int, max_concurrency: int, target_latency: float,
+                 rate_step: float = 0.2):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        self.bucket = TokenBucket(initial_rate, burst)
+        self.concurrency = initial_concurrency
+        self.in_flight = 0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def try_acquire(self) -> float:
+        """گرفتن یک جایگاه؛ 0 در صورت موفقیت وگرنه زمان پیشنهادی انتظار (ثانیه)"""
+        with self._lock:
+            if self.in_flight >= self.concurrency:
+                return 0.05
+            wait = self.bucket.try_take()
+            if wait:
+                return wait
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        """آزاد کردن جایگاه و تنظیم نرخ بر اساس نتیجه درخواست"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                self._successes = 0
+                self.concurrency = max(1, self.concurrency // 2)
+                self.bucket.set_rate(max(self.min_rate, self.rate / 2))
+                logger.warning(f"IME throttling: rate -> {self.rate:.2f}/s, concurrency -> {self.concurrency}")
+            elif latency is not None and latency > self.target_latency:
+                self._successes = 0
+                self.concurrency = max(1, self.concurrency - 1)
+            elif latency is not None:
+                self.bucket.set_rate(min(self.max_rate, self.rate + self.rate_step))
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self._successes = 0
+                    self.concurrency += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'rate': round(self.rate, 2),
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight,
+        }
+
+
+class CircuitBreaker:
+    """
+    قطع‌کننده مدار: closed (عادی) ← open (رد فوری) ← half_open (یک درخواست آزمایشی)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Raises:
+            IMEUnavailableError: مدار باز است
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise IMEUnavailableError(
+                        f"سرور بورس در دسترس نیست؛ تلاش دوباره تا {remaining:.0f} ثانیه دیگر"
+                    )
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise IMEUnavailableError("سرور بورس در حال بررسی دوباره است")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("IME circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"IME circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class IMEClient:
+    """کلاینت مشترک سرور بورس (از get_client() استفاده کنید)"""
+
+    DEFAULT_HEADERS = {
+        'Content-Type': 'application/json; charset=UTF-8',
+        'Accept': 'text/plain, */*; q=0.01',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+        'Accept-Language': 'fa-IR,fa;q=0.9,en-GB;q=0.8,en;q=0.7,en-US;q=0.6'
+    }
+
+    # تنظیمات پیش‌فرض (قابل تغییر با settings.IME_CLIENT)
+    DEFAULTS = {
+        'POOL_SIZE': 16,
+        'MAX_RETRIES': 4,
+        'BACKOFF_BASE': 0.5,         # ثانیه
+        'BACKOFF_CAP': 30.0,         # ثانیه
+        'INITIAL_RATE': 4.0,         # درخواست بر ثانیه
+        'MIN_RATE': 0.25,
+        'MAX_RATE': 20.0,
+        'BURST': 4,
+        'INITIAL_CONCURRENCY': 4,
+        'MAX_CONCURRENCY': 16,
+        'TARGET_LATENCY': 10.0,      # ثانیه؛ پاسخ‌های کندتر همزمانی را کم می‌کنند
+        'FAILURE_THRESHOLD': 5,      # خطای پیاپی تا باز شدن مدار
+        'RESET_TIMEOUT': 30.0,       # ثانیه تا درخواست آزمایشی
+    }
+
+    # وضعیت‌هایی که دوباره تلاش می‌شوند؛ 429 نشانه محدودیت نرخ است
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    THROTTLE_STATUSES = frozenset({429, 503})
+
+    def __init__(self, **options):
+        config = dict(self.DEFAULTS)
+        config.update(getattr(settings, 'IME_CLIENT', {}))
+        config.update(options)
+        self.config = config
+
+        self.max_retries = config['MAX_RETRIES']
+        self.backoff_base = config['BACKOFF_BASE']
+        self.backoff_cap = config['BACKOFF_CAP']
+        self.headers = dict(self.DEFAULT_HEADERS)
+        self.limiter = AdaptiveLimiter(
+            initial_rate=config['INITIAL_RATE'],
+            min_rate=config['MIN_RATE'],
+            max_rate=config['MAX_RATE'],
+            burst=config['BURST'],
+            initial_concurrency=config['INITIAL_CONCURRENCY'],
+            max_concurrency=config['MAX_CONCURRENCY'],
+            target_latency=config['TARGET_LATENCY'],
+        )
+        self.breaker = CircuitBreaker(config['FAILURE_THRESHOLD'], config['RESET_TIMEOUT'])
+        # connection pool مشترک همه threadها (urllib3 برای چند thread امن است)
+        self.adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=config['POOL_SIZE'], max_retries=0, pool_block=True
+        )
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # سیاست retry
+    # ------------------------------------------------------------------
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """تأخیر نمایی با jitter کامل؛ Retry-After سرور (در صورت وجود) کف تأخیر است"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+    @staticmethod
+    def _retry_after(headers) -> Optional[float]:
+        value = headers.get('Retry-After') if headers is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, started: float, status: Optional[int] = None, error: bool = False):
+        """ثبت نتیجه یک تلاش در limiter و breaker"""
+        latency = time.monotonic() - started
+        throttled = error or (status in self.THROTTLE_STATUSES) or (status is not None and status >= 500)
+        self.limiter.release(latency=latency, throttled=throttled)
+        if error or (status is not None and status >= 500):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _record_on_close(self, response: requests.Response, started: float):
+        """
+        ثبت نتیجه پاسخ stream هنگام response.close()
+
+        جایگاه limiter تا پایان دریافت بدنه نگه داشته می‌شود تا سقف همزمانی شامل
+        انتقال بدنه باشد و تأخیر ثبت شده (AIMD) زمان دریافت کل پاسخ را نشان دهد؛
+        خطای شبکه هنگام خواندن بدنه مانند خطای درخواست ثبت می‌شود.
+        """
+        close, iter_content = response.close, response.iter_content
+        state = {'recorded': False, 'error': False}
+
+        def iter_content_tracked(*args, **kwargs):
+            try:
+                yield from iter_content(*args, **kwargs)
+            except requests.exceptions.RequestException:
+                state['error'] = True
+                raise
+
+        def close_and_record():
+            try:
+                close()
+            finally:
+                if not state['recorded']:
+                    state['recorded'] = True
+                    if state['error']:
+                        self._record(started, error=True)
+                    else:
+                        self._record(started, status=response.status_code)
+
+        response.iter_content = iter_content_tracked
+        response.close = close_and_record
+
+    # ------------------------------------------------------------------
+    # requests (همگام)
+    # ------------------------------------------------------------------
+
+    def session(self) -> requests.Session:
+        """نشست مخصوص thread جاری با connection pool مشترک"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            self._local.session = session
+        return session
+
+    def post(self, url: str, json: Any = None, timeout: float = 30, stream: bool = False,
+             **kwargs) -> requests.Response:
+        """
+        ارسال POST با محدودیت نرخ، retry و قطع‌کننده مدار
+
+        Returns:
+            پاسخ با وضعیت 200 (در حالت stream فراخوان باید response.close() را صدا بزند؛
+            جایگاه limiter تا آن زمان آزاد نمی‌شود)
+
+        Raises:
+            IMEUnavailableError: مدار باز است
+            requests.exceptions.RequestException: پس از پایان تلاش‌ها
+        """
+        session = self.session()
+        for attempt in range(self.max_retries):
+            self.breaker.allow()
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = session.post(url, json=json, timeout=timeout, stream=stream, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(started, error=True)
+                if attempt < self.max_retries - 1:
+                    delay = self.backoff_delay(attempt)
+                    logger.warning(f"Request error on attempt {attempt + 1}: {e}, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                raise
+
+            if stream and response.status_code == 200:
+                self._record_on_close(response, started)
+                return response
+            self._record(started, status=response.status_code)
+            if response.status_code == 200:
+                return response
+
+            response.close()
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries - 1:
+                delay = self.backoff_delay(attempt, self._retry_after(response.headers))
+                logger.warning(
+                    f"Status {response.status_code} on attempt {attempt + 1}, retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            # وضعیت‌های غیر 200 که خطا محسوب نمی‌شوند (مثلاً 204)
+            raise requests.exceptions.HTTPError(
+                f"Unexpected status code: {response.status_code}", response=response
+            )
+
+    # ------------------------------------------------------------------
+    # httpx (asyncio)
+    # ------------------------------------------------------------------
+
+    async def apost(self, client: httpx.AsyncClient, url: str, json: Any = None) -> httpx.Response:
+        """
+        نسخه asyncio با همان limiter، breaker و سیاست retry
+
+        connection pool در اینجا متعلق به httpx.AsyncClient فراخوان است (که به
+        حلقه رویداد همان اجرا وابسته است).
+        """
+        for attempt in range(self.max_retries):
+            self.breaker.allow()
+            await self.limiter.acquire_async()
+            started = time.monotonic()
+            try:
+                response = await client.post(url, json=json)
+            except httpx.TransportError as e:
+                self._record(started, error=True)
+                if attempt < self.max_retries - 1:
+                    delay = self.backoff_delay(attempt)
+                    logger.warning(f"Request error on attempt {attempt + 1}: {e}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+
+            self._record(started, status=response.status_code)
+            if response.status_code == 200:
+                return response
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries - 1:
+                delay = self.backoff_delay(attempt, self._retry_after(response.headers))
+                logger.warning(
+                    f"Status {response.status_code} on attempt {attempt + 1}, retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            raise httpx.HTTPStatusError(
+                f"Unexpected status code: {response.status_code}",
+                request=response.request, response=response
+            )
+
+    def status(self) -> Dict[str, Any]:
+        """وضعیت فعلی limiter و breaker (برای لاگ و نمایش)"""
+        return {
+            **self.limiter.snapshot(),
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+        }
+
+
+_client: Optional[IMEClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> IMEClient:
+    """نمونه مشترک IMEClient در این پردازه"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = IMEClient()
+    return _client
@@ -0,0 +1,229 @@
+"""
+پارسر جریانی (streaming) پاسخ API سازمان بورس
+
+پاسخ GetAmareMoamelatList به شکل {"d": "[{...}, {...}]"} است؛ یعنی آرایه اصلی
+رکوردها به صورت یک رشته JSON داخل فیلد "d" قرار دارد. این ماژول بدنه پاسخ را
+تکه‌به‌تکه می‌خواند، رشته "d" را به صورت افزایشی unescape می‌کند و هر رکورد را
+به محض کامل شدن yield می‌کند؛ بنابراین حافظه مصرفی به اندازه پاسخ وابسته نیست.
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+# کلید "d" در شیء بیرونی و نوع مقدار آن (رشته یا آرایه)
+_D_KEY_RE = re.compile(r'"d"\s*:\s*(["\[n])')
+# گیومه‌هایی که قطعاً با یک backslash تنها escape نشده‌اند (نامزد پایان رشته "d")
+_QUOTE_CANDIDATE_RE = re.compile(r'"(?<!(?<!\\)\\")')
+# فاصله‌ها و ویرگول‌های بین عناصر آرایه
+_SEPARATORS_RE = re.compile(r'[\s,]*')
+_WHITESPACE_RE = re.compile(r'\s*')
+
+# بیشترین طول یک escape (جفت surrogate مانند 😀)
+_MAX_ESCAPE_LENGTH = 12
+# escape نیمه بالای یک جفت surrogate در انتهای متن
+_HIGH_SURROGATE_RE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+
+_decoder = json.JSONDecoder()
+
+
+def truncate_for_log(value: Any, limit: int = 500) -> str:
+    """نمایش کوتاه یک مقدار برای لاگ (به جای لاگ کردن کل پاسخ)"""
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+class _ArrayParser:
+    """پارسر افزایشی یک آرایه JSON که عناصر سطح اول آن را yield می‌کند"""
+
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.started = False
+        self.finished = False
+
+    def feed(self, text: str, final: bool = False) -> Iterator[Any]:
+        if self.finished:
+            return
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        buffer = self.buffer
+        length = len(buffer)
+        position = 0
+
+        if not self.started:
+            position = _WHITESPACE_RE.match(buffer, position).end()
+            if position >= length:
+                self.position = position
+                return
+            if buffer[position] != '[':
+                raise json.JSONDecodeError("Expecting '['", buffer, position)
+            self.started = True
+            position += 1
+
+        while True:
+            position = _SEPARATORS_RE.match(buffer, position).end()
+            if position >= length:
+                break
+            if buffer[position] == ']':
+                self.finished = True
+                position += 1
+                break
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # عنصر هنوز کامل دریافت نشده است
+                if final:
+                    raise
+                break
+            yield item
+            position = end
+
+        self.position = position
+
+    def close(self) -> None:
+        if not self.finished:
+            raise json.JSONDecodeError("Unterminated array", self.buffer, len(self.buffer))
+
+
+class _StringUnescaper:
+    """تبدیل افزایشی محتوای یک رشته JSON (بدون گیومه‌ها) به متن اصلی"""
+
+    def __init__(self):
+        self.pending = ''
+        self.finished = False
+        self.rest = ''
+
+    def feed(self, text: str) -> str:
+        text = self.pending + text
+        self.pending = ''
+
+        end = self._find_terminator(text)
+        if end != -1:
+            # پایان رشته؛ باقیمانده متعلق به شیء بیرونی است
+            self.finished = True
+            self.rest = text[end + 1:]
+            return self._decode(text[:end])
+
+        # escapeهای نیمه‌کاره انتهای تکه را برای تکه بعدی نگه می‌داریم
+        cut = len(text)
+        tail_start = max(0, cut - _MAX_ESCAPE_LENGTH)
+        backslash = text.find('\\', tail_start)
+        if backslash != -1:
+            while backslash > 0 and text[backslash - 1] == '\\':
+                backslash -= 1
+            cut = backslash
+        # نیمه بالای surrogate بدون نیمه پایین آن decode نمی‌شود (escape پیش از بازه بالا)
+        match = _HIGH_SURROGATE_RE.search(text, max(0, cut - 6), cut)
+        if match:
+            start = match.start()
+            while start > 0 and text[start - 1] == '\\':
+                start -= 1
+            if (match.start() - start) % 2 == 0:
+                cut = match.start()
+        self.pending = text[cut:]
+        return self._decode(text[:cut])
+
+    @staticmethod
+    def _find_terminator(text: str) -> int:
+        """موقعیت اولین گیومه escape نشده یا -1"""
+        position = 0
+        while True:
+            match = _QUOTE_CANDIDATE_RE.search(text, position)
+            if not match:
+                return -1
+            index = match.start()
+            # گیومه‌ای که پس از تعداد زوجی backslash آمده escape نشده است
+            start = index
+            while start > 0 and text[start - 1] == '\\':
+                start -= 1
+            if (index - start) % 2 == 0:
+                return index
+            position = index + 1
+
+    @staticmethod
+    def _decode(raw: str) -> str:
+        if '\\' not in raw:
+            return raw
+        return json.loads(f'"{raw}"')
+
+
+def iter_ime_records(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[Dict[str, Any]]:
+    """
+    خواندن جریانی رکوردهای پاسخ API سازمان بورس
+
+    Args:
+        chunks: تکه‌های بدنه پاسخ (مثلاً response.iter_content())
+        encoding: کدگذاری بدنه پاسخ
+
+    Yields:
+        هر رکورد به صورت dict
+
+    Raises:
+        json.JSONDecodeError: اگر بدنه پاسخ JSON معتبر نباشد
+    """
+    text_decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    prefix = ''
+    mode: Optional[str] = None
+    unescaper = _StringUnescaper()
+    parser = _ArrayParser()
+
+    def text_chunks() -> Iterator[str]:
+        for chunk in chunks:
+            if chunk:
+                text = text_decoder.decode(chunk)
+                if text:
+                    yield text
+        tail = text_decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    for text in text_chunks():
+        if mode is None:
+            # هنوز به ابتدای داده‌ها نرسیده‌ایم؛ پیشوند (کوچک) را نگه می‌داریم
+            prefix += text
+            stripped = prefix.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] == '[':
+                # پاسخ مستقیماً یک آرایه است
+                mode = 'array'
+                text = stripped
+            else:
+                match = _D_KEY_RE.search(prefix)
+                if not match:
+                    continue
+                kind = match.group(1)
+                if kind == 'n':
+                    # "d": null
+                    return
+                mode = 'string' if kind == '"' else 'array'
+                text = prefix[match.end():] if kind == '"' else prefix[match.start(1):]
+            prefix = ''
+
+        if mode == 'string':
+            decoded = unescaper.feed(text)
+            if decoded:
+                yield from parser.feed(decoded)
+            if unescaper.finished:
+                yield from parser.feed('', final=True)
+                parser.close()
+                return
+        else:
+            yield from parser.feed(text)
+            if parser.finished:
+                return
+
+    if mode is None:
+        if prefix.strip() and not _D_KEY_RE.search(prefix):
+            # شیء بیرونی بدون کلید "d"؛ مانند رفتار قبلی هیچ رکوردی برنمی‌گردانیم
+            json.loads(prefix)
+        return
+
+    if mode == 'string' and not unescaper.finished:
+        raise json.JSONDecodeError("Unterminated 'd' string", unescaper.pending, 0)
+    yield from parser.feed('', final=True)
+    parser.close()
@@ -0,0 +1,171 @@
+"""
+صف کارهای پس‌زمینه Scroll Time
+
+viewهای ادمین به جای اجرای دریافت/ذخیره داخل درخواست HTTP، یک ScrollTimeJob در
+صف قرار می‌دهند و بلافاصله پاسخ می‌دهند. دستور run_scroll_time_worker کارها را با
+SELECT ... FOR UPDATE SKIP LOCKED برمی‌دارد تا چند worker بدون تداخل صف را خالی کنند.
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from price_data_ingestion.models import ScrollTimeJob, ScrollTimeRequest
+from .services import ScrollTimeService
+
+logger = logging.getLogger(__name__)
+
+# بیشترین تعداد تلاش برای کارهایی که worker آن‌ها از کار افتاده است
+MAX_ATTEMPTS = 3
+
+# فاصله اعلام حیات worker و مدتی که پس از آن کار رها شده محسوب می‌شود
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=15)
+
+
+def enqueue_job(scroll_request: ScrollTimeRequest, action: str) -> ScrollTimeJob:
+    """
+    قرار دادن یک کار در صف
+
+    Args:
+        scroll_request: درخواست Scroll Time
+        action: fetch / save / fetch_and_save
+
+    Returns:
+        کار ایجاد شده
+    """
+    with transaction.atomic():
+        job = ScrollTimeJob.objects.create(scroll_request=scroll_request, action=action)
+        scroll_request.status = 'queued'
+        scroll_request.error_message = ''
+        scroll_request.processed_records = 0
+        scroll_request.save(update_fields=['status', 'error_message', 'processed_records', 'updated_at'])
+    logger.info(f"Enqueued job {job.id} ({action}) for scroll request {scroll_request.id}")
+    return job
+
+
+def claim_next_job(worker_name: str) -> Optional[ScrollTimeJob]:
+    """
+    برداشتن قدیمی‌ترین کار در صف
+
+    ردیف کار با FOR UPDATE SKIP LOCKED قفل می‌شود؛ کارهایی که worker دیگری در حال
+    برداشتن آن‌هاست نادیده گرفته می‌شوند.
+    """
+    with transaction.atomic():
+        job = (
+            ScrollTimeJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        job.status = 'running'
+        job.worker = worker_name
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=['status', 'worker', 'attempts', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def requeue_stale_jobs(stale_after: timedelta = STALE_AFTER) -> int:
+    """
+    بازگرداندن کارهایی که worker آن‌ها متوقف شده است
+
+    کارهایی که بیش از MAX_ATTEMPTS بار تلاش شده‌اند ناموفق علامت می‌خورند.
+
+    Returns:
+        تعداد کارهای بازیابی شده
+    """
+    threshold = timezone.now() - stale_after
+    recovered = 0
+    with transaction.atomic():
+        stale_jobs = (
+            ScrollTimeJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='running', heartbeat_at__lt=threshold)
+        )
+        for job in stale_jobs:
+            logger.warning(f"Job {job.id} on worker {job.worker} is stale")
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = 'failed'
+                job.error_message = 'worker پاسخ نمی‌دهد و تعداد تلاش‌ها به پایان رسید'
+                job.finished_at = timezone.now()
+                ScrollTimeRequest.objects.filter(pk=job.scroll_request_id).update(
+                    status='failed', error_message=job.error_message, updated_at=timezone.now()
+                )
+            else:
+                job.status = 'queued'
+                ScrollTimeRequest.objects.filter(pk=job.scroll_request_id).update(
+                    status='queued', updated_at=timezone.now()
+                )
+            job.save(update_fields=['status', 'error_message', 'finished_at'])
+            recovered += 1
+    return recovered
+
+
+class _Heartbeat(threading.Thread):
+    """بروزرسانی دوره‌ای heartbeat_at در طول اجرای یک کار"""
+
+    def __init__(self, job_id: int, interval: int = HEARTBEAT_INTERVAL):
+        super().__init__(name=f'scroll-time-heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                ScrollTimeJob.objects.filter(pk=self.job_id).update(heartbeat_at=timezone.now())
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {self.job_id} stopped: {e}")
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job: ScrollTimeJob, service: Optional[ScrollTimeService] = None) -> Dict[str, Any]:
+    """
+    اجرای یک کار برداشته شده و ثبت نتیجه آن
+
+    Returns:
+        نتیجه سرویس (همان قالب fetch_data / save_data_to_database)
+    """
+    service = service or ScrollTimeService()
+    scroll_request = job.scroll_request
+    handlers = {
+        'fetch': service.fetch_data,
+        'save': service.save_data_to_database,
+        'fetch_and_save': service.stream_to_database,
+    }
+
+    heartbeat = _Heartbeat(job.id)
+    heartbeat.start()
+    try:
+        result = handlers[job.action](scroll_request)
+    except Exception as e:
+        logger.exception(f"Job {job.id} crashed")
+        result = {'success': False, 'error': f"خطای غیرمنتظره: {str(e)}"}
+        ScrollTimeRequest.objects.filter(pk=scroll_request.pk).update(
+            status='failed', error_message=result['error'], updated_at=timezone.now()
+        )
+    finally:
+        heartbeat.stop()
+
+    job.status = 'completed' if result.get('success') else 'failed'
+    # لیست رکوردها (data) در نتیجه کار ذخیره نمی‌شود
+    job.result = {key: value for key, value in result.items() if key != 'data'}
+    job.error_message = result.get('error') or ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error_message', 'finished_at'])
+    return result
@@ -0,0 +1,200 @@
+"""
+Django management command برای بازیابی تاریخچه چندساله داده‌های Scroll Time با امکان ادامه
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from data_management.partitions import AllDataPartitions
+from price_data_ingestion.models import ScrollTimeRequest
+from price_models import jalali
+from prices.backfill import BackfillRunner, plan_backfill
+from prices.response_cache import IMEResponseCache
+from prices.services import ScrollTimeService
+
+
+def _int_list(value):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise CommandError(f'{value} باید لیست اعداد جدا شده با ویرگول باشد')
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}'
+
+
+class Command(BaseCommand):
+    help = (
+        'بازیابی تاریخچه: تقسیم بازه تاریخ شمسی به خانه‌های (زیرگروه، ماه/هفته)، '
+        'دریافت همزمان و ثبت هر خانه تکمیل شده؛ اجرای دوباره از همان نقطه ادامه می‌دهد'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            required=True,
+            help='تاریخ شروع شمسی، مثال: 1398/01/01'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='تاریخ پایان شمسی (پیش‌فرض: امروز)'
+        )
+        parser.add_argument(
+            '--window',
+            choices=['month', 'week'],
+            default='month',
+            help='اندازه بازه هر خانه (پیش‌فرض: month)'
+        )
+        parser.add_argument(
+            '--main-cat',
+            type=str,
+            help='فقط این گروه‌های اصلی (value، جدا شده با ویرگول)'
+        )
+        parser.add_argument(
+            '--cat',
+            type=str,
+            help='فقط این گروه‌ها (value، جدا شده با ویرگول)'
+        )
+        parser.add_argument(
+            '--subcat',
+            type=str,
+            help='فقط این زیرگروه‌ها (value، جدا شده با ویرگول)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=BackfillRunner.DEFAULT_CONCURRENCY,
+            help='بیشترین تعداد خانه در حال پردازش همزمان'
+        )
+        parser.add_argument(
+            '--duplicate-handling',
+            choices=[choice for choice, _ in ScrollTimeRequest.DUPLICATE_HANDLING_CHOICES],
+            default='update',
+            help='نحوه مواجهه با رکوردهای تکراری'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='تعداد رکوردهای هر دسته در ذخیره‌سازی'
+        )
+        parser.add_argument(
+            '--cache-mode',
+            choices=IMEResponseCache.MODES,
+            help='حالت cache پاسخ‌ها'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='شروع یک بازیابی جدید حتی اگر اجرایی با همین پارامترها وجود داشته باشد'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط ساخت/نمایش شبکه خانه‌ها بدون ارسال درخواست'
+        )
+
+    def handle(self, *args, **options):
+        start = options['start']
+        end = options['end'] or jalali.today_shamsi()
+        start_date = jalali.shamsi_to_gregorian(start)
+        end_date = jalali.shamsi_to_gregorian(end)
+        if start_date is None or end_date is None:
+            raise CommandError('فرمت تاریخ نامعتبر است (مثال: 1398/01/01)')
+        if start_date > end_date:
+            raise CommandError('تاریخ شروع نمی‌تواند بعد از تاریخ پایان باشد')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency باید حداقل 1 باشد')
+
+        subcategories = BackfillRunner.active_subcategories()
+        selection = {}
+        for option, lookup in (('main_cat', 'category__main_category__value__in'),
+                               ('cat', 'category__value__in'),
+                               ('subcat', 'value__in')):
+            if options[option]:
+                values = _int_list(options[option])
+                selection[option] = values
+                subcategories = subcategories.filter(**{lookup: values})
+        subcategories = list(subcategories)
+        if not subcategories:
+            raise CommandError('هیچ زیرگروه فعالی با این انتخاب یافت نشد')
+
+        run, resumed = plan_backfill(
+            start, end, subcategories,
+            window_size=options['window'],
+            duplicate_handling=options['duplicate_handling'],
+            selection=selection,
+            restart=options['restart'],
+        )
+        remaining = run.cells.exclude(status='completed').count()
+        if resumed:
+            self.stdout.write(self.style.SUCCESS(
+                f'♻️ ادامه بازیابی #{run.id}: {run.cells_completed} از {run.cells_total} خانه قبلاً تکمیل شده، '
+                f'{remaining} خانه باقی مانده'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'🗂️ بازیابی #{run.id}: {len(subcategories)} زیرگروه × '
+                f'{run.cells_total // len(subcategories)} بازه = {run.cells_total} خانه ({start} تا {end})'
+            ))
+
+        if options['dry_run']:
+            failed = run.cells.filter(status='failed').count()
+            self.stdout.write(f'   در انتظار: {remaining - failed}، ناموفق: {failed}')
+            return
+        if not remaining:
+            self.stdout.write(self.style.SUCCESS('✅ همه خانه‌ها قبلاً تکمیل شده‌اند (برای دریافت دوباره --restart)'))
+            return
+
+        if AllDataPartitions.is_supported():
+            # پارتیشن ماه‌های بازه از قبل ساخته می‌شوند تا رکوردها از DEFAULT عبور نکنند
+            created = AllDataPartitions().ensure_range(start_date, end_date)
+            if created:
+                self.stdout.write(f'   {len(created)} پارتیشن ماهانه جدید برای AllData ساخته شد')
+
+        runner = BackfillRunner(
+            run,
+            progress=self._report_progress,
+            max_concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            service=ScrollTimeService(cache=IMEResponseCache(mode=options['cache_mode'])),
+        )
+        try:
+            summary = runner.run()
+        except KeyboardInterrupt:
+            run.refresh_from_db()
+            self.stdout.write(self.style.WARNING(
+                f'\n⏸️ متوقف شد؛ {run.cells_completed} از {run.cells_total} خانه ذخیره شده. '
+                f'برای ادامه همین دستور را دوباره اجرا کنید'
+            ))
+            return
+
+        stats = summary['stats']
+        style = self.style.SUCCESS if summary['success'] else self.style.WARNING
+        self.stdout.write(style(
+            f"\n{'✅' if summary['success'] else '⚠️'} بازیابی #{summary['run_id']} ({summary['status']}): "
+            f"{summary['cells_completed']} از {summary['cells_total']} خانه تکمیل، "
+            f"{summary['cells_failed']} ناموفق در این اجرا؛ {stats['total_records']} رکورد، "
+            f"{stats['imported_records']} ذخیره شده در {_format_seconds(summary['elapsed_seconds'])}"
+        ))
+        if summary['cells_failed']:
+            self.stdout.write('   برای تلاش دوباره خانه‌های ناموفق همین دستور را دوباره اجرا کنید')
+
+    def _report_progress(self, progress):
+        cell = progress['cell']
+        done = progress['cells_done']
+        planned = progress['cells_planned']
+        line = (
+            f"[{done}/{planned}] {cell.subcategory.name} {cell.window_start_shamsi} تا "
+            f"{cell.window_end_shamsi}: {progress['stats']['total_records']} رکورد | "
+            f"{progress['rows_per_second']:.0f} رکورد بر ثانیه | "
+            f"زمان باقی‌مانده {_format_seconds(progress['eta_seconds'])}"
+        )
+        if progress['error']:
+            self.stdout.write(self.style.ERROR(f"✗ {line} - {progress['error']}"))
+        else:
+            self.stdout.write(f'✓ {line}')
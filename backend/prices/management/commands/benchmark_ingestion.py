@@ -0,0 +1,135 @@
+"""
+Django management command برای بنچمارک دریافت و ذخیره Scroll Time با سرور محلی IME
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.benchmark import IngestionBenchmark
+from prices.services import ScrollTimeService
+
+
+class Command(BaseCommand):
+    help = (
+        'بنچمارک سرتاسری دریافت + نرمال‌سازی + ذخیره با یک سرور محلی به جای سرور بورس '
+        'و ذخیره گزارش JSON (زمان، رکورد بر ثانیه، تعداد کوئری، بیشینه RSS)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default=','.join(str(size) for size in IngestionBenchmark.DEFAULT_SIZES),
+            help='تعداد رکوردهای هر سناریو، جدا شده با ویرگول (پیش‌فرض: 1000,10000,100000)'
+        )
+        parser.add_argument(
+            '--modes',
+            type=str,
+            default=','.join(IngestionBenchmark.MODES),
+            help='حالت‌های duplicate_handling برای ورود دوباره (skip,update,replace)'
+        )
+        parser.add_argument(
+            '--paths',
+            type=str,
+            default='stream',
+            help='مسیرهای ورود: stream (ذخیره مستقیم) و/یا preview (دریافت، ذخیره پاسخ، سپس ذخیره)'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.0,
+            help='تأخیر پاسخ سرور محلی (ثانیه)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='تعداد تکرار هر سناریو (بهترین زمان گزارش می‌شود)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='تعداد رکوردهای هر دسته در ذخیره‌سازی'
+        )
+        parser.add_argument(
+            '--payload',
+            type=str,
+            help='فایل پاسخ ضبط شده ({"d": "[...]"} یا آرایه JSON) به جای داده مصنوعی'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='ingestion_benchmark.json',
+            help='مسیر فایل گزارش JSON'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes باید لیست اعداد باشد (مثال: 1000,10000)')
+        if not sizes or min(sizes) < 1:
+            raise CommandError('--sizes باید حداقل یک عدد مثبت داشته باشد')
+
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        invalid = set(modes) - set(IngestionBenchmark.MODES)
+        if invalid:
+            raise CommandError(f"حالت نامعتبر: {', '.join(sorted(invalid))}")
+
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        invalid = set(paths) - set(IngestionBenchmark.PATHS)
+        if not paths or invalid:
+            raise CommandError(f"--paths باید از {', '.join(IngestionBenchmark.PATHS)} باشد")
+
+        if options['latency'] < 0:
+            raise CommandError('--latency نمی‌تواند منفی باشد')
+
+        recorded = None
+        if options['payload']:
+            recorded = self._load_payload(options['payload'])
+            self.stdout.write(f"📼 پاسخ ضبط شده: {len(recorded)} رکورد از {options['payload']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🏁 بنچمارک {len(sizes)} اندازه × {len(paths)} مسیر "
+            f"(ورود اولیه + {len(modes)} حالت ورود دوباره)، تأخیر سرور {options['latency']} ثانیه"
+        ))
+        self.stdout.write(self.style.WARNING(
+            '⚠️ داده‌های بنچمارک در پایگاه داده فعلی نوشته و سپس حذف می‌شوند؛ روی پایگاه داده production اجرا نکنید'
+        ))
+
+        benchmark = IngestionBenchmark(
+            sizes=sizes,
+            modes=modes,
+            paths=paths,
+            latency=options['latency'],
+            repeat=options['repeat'],
+            batch_size=options['batch_size'],
+            recorded_records=recorded,
+            log=self.stdout.write,
+        )
+        report = benchmark.run()
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ گزارش {len(report['results'])} سناریو در {options['output']} ذخیره شد "
+            f"(commit: {report['environment']['git_commit'] or '-'})"
+        ))
+
+    @staticmethod
+    def _load_payload(path):
+        try:
+            with open(path, 'rb') as payload:
+                body = payload.read()
+        except OSError as e:
+            raise CommandError(f'خطا در خواندن {path}: {e}')
+
+        if body.lstrip()[:1] == b'[':
+            records = json.loads(body)
+        else:
+            records = list(ScrollTimeService().iter_body_records([body]))
+        records = [record for record in records if isinstance(record, dict)]
+        if not records:
+            raise CommandError(f'فایل {path} هیچ رکوردی ندارد')
+        return records
@@ -0,0 +1,113 @@
+"""
+Django management command برای بارگذاری انبوه فایل‌های پاسخ IME در AllData با COPY
+"""
+import json
+import time
+from itertools import chain, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data_management.commodities import get_resolver
+from data_management.copy_loader import AllDataCopyLoader
+from data_management.signals import deferred_rollups
+from prices.services import ScrollTimeService
+
+
+class Command(BaseCommand):
+    help = (
+        'بارگذاری انبوه پاسخ‌های ذخیره شده سرور بورس ({"d": "[...]"} یا آرایه JSON) در جدول '
+        'AllData از طریق COPY به جدول موقت و ادغام با INSERT ... ON CONFLICT (فقط PostgreSQL)'
+    )
+
+    DEFAULT_BATCH_SIZE = 50000
+    READ_CHUNK_SIZE = 64 * 1024
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='+',
+            help='مسیر فایل‌های پاسخ'
+        )
+        parser.add_argument(
+            '--duplicate-handling',
+            choices=AllDataCopyLoader.MODES,
+            default='update',
+            help='نحوه مواجهه با رکوردهای موجود (پیش‌فرض: update)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=self.DEFAULT_BATCH_SIZE,
+            help=f'تعداد رکوردهای هر COPY (پیش‌فرض: {self.DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--source',
+            type=str,
+            default='bulk_load',
+            help='مقدار فیلد source رکوردهای ذخیره شده'
+        )
+
+    def handle(self, *args, **options):
+        if not AllDataCopyLoader.is_supported():
+            raise CommandError('COPY فقط در پایگاه داده PostgreSQL پشتیبانی می‌شود')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size باید حداقل 1 باشد')
+
+        service = ScrollTimeService()
+        loader = AllDataCopyLoader()
+        totals = {'total_records': 0, 'rejected': 0, 'inserted': 0, 'updated': 0, 'duplicates': 0}
+        started = time.monotonic()
+
+        # تجمیع تاریخ‌های تغییر یافته یک بار پس از پایان همه فایل‌ها اجرا می‌شود
+        with deferred_rollups():
+            for path in options['files']:
+                self.stdout.write(f'📂 {path}')
+                records = self._iter_file(service, path)
+                while True:
+                    chunk = list(islice(records, options['batch_size']))
+                    if not chunk:
+                        break
+
+                    accepted, report = service.normalizer.normalize_batch(chunk)
+                    if report.has_issues:
+                        self.stdout.write(self.style.WARNING(f'   ⚠️ {report.summary()}'))
+                    objs = [
+                        service.normalizer.build_alldata(row, raw_data=record, source=options['source'])
+                        for record, row in accepted
+                    ]
+                    get_resolver().assign(objs)
+                    result = loader.load(objs, duplicate_handling=options['duplicate_handling'])
+
+                    totals['total_records'] += len(chunk)
+                    totals['rejected'] += report.rejected
+                    for key in ('inserted', 'updated', 'duplicates'):
+                        totals[key] += result[key]
+                    self.stdout.write(
+                        f"   ✓ {len(chunk)} رکورد: {result['inserted']} جدید، "
+                        f"{result['updated']} بروزرسانی، {result['duplicates']} تکراری"
+                    )
+
+        elapsed = time.monotonic() - started
+        rate = totals['total_records'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {totals['total_records']} رکورد در {elapsed:.1f} ثانیه ({rate:.0f} رکورد بر ثانیه): "
+            f"{totals['inserted']} جدید، {totals['updated']} بروزرسانی، "
+            f"{totals['duplicates']} تکراری، {totals['rejected']} رد شده"
+        ))
+
+    def _iter_file(self, service, path):
+        """خواندن جریانی رکوردهای یک فایل پاسخ"""
+        try:
+            payload = open(path, 'rb')
+        except OSError as e:
+            raise CommandError(f'خطا در خواندن {path}: {e}')
+
+        with payload:
+            head = payload.read(1024)
+            if head.lstrip()[:1] == b'[':
+                # آرایه JSON ساده (مثلاً خروجی ذخیره شده رکوردها)
+                records = json.loads(head + payload.read())
+                yield from (record for record in records if isinstance(record, dict))
+                return
+            chunks = iter(lambda: payload.read(self.READ_CHUNK_SIZE), b'')
+            yield from service.iter_body_records(chain([head], chunks))
@@ -0,0 +1,123 @@
+"""
+Django management command برای دریافت همزمان داده‌های Scroll Time همه زیرگروه‌های فعال
+"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from price_data_ingestion.models import ScrollTimeRequest
+from prices.async_ingestion import AsyncIngestionRunner
+from prices.response_cache import IMEResponseCache
+from prices.services import ScrollTimeService
+
+
+class Command(BaseCommand):
+    help = 'دریافت همزمان (asyncio) داده‌های Scroll Time برای همه زیرگروه‌های فعال و ذخیره دسته‌ای آن‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='تاریخ شروع شمسی (پیش‌فرض: امروز)، مثال: 1403/05/01'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='تاریخ پایان شمسی (پیش‌فرض: برابر تاریخ شروع)'
+        )
+        parser.add_argument(
+            '--window',
+            choices=[choice for choice, _ in ScrollTimeRequest.WINDOW_SIZE_CHOICES],
+            default='none',
+            help='تقسیم بازه به بازه‌های هفتگی یا ماهانه شمسی'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=AsyncIngestionRunner.DEFAULT_CONCURRENCY,
+            help='بیشترین تعداد درخواست همزمان به سرور بورس'
+        )
+        parser.add_argument(
+            '--duplicate-handling',
+            choices=[choice for choice, _ in ScrollTimeRequest.DUPLICATE_HANDLING_CHOICES],
+            default='update',
+            help='نحوه مواجهه با رکوردهای تکراری'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='تعداد رکوردهای هر دسته در ذخیره‌سازی'
+        )
+        parser.add_argument(
+            '--main-cat',
+            type=int,
+            help='فقط زیرگروه‌های این گروه اصلی (value)'
+        )
+        parser.add_argument(
+            '--cache-mode',
+            choices=IMEResponseCache.MODES,
+            help='حالت cache پاسخ‌ها (offline برای پخش دوباره پاسخ‌های ذخیره شده)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط نمایش زیرگروه‌ها بدون ارسال درخواست'
+        )
+
+    def handle(self, *args, **options):
+        for key in ('start', 'end'):
+            value = options[key]
+            if value and not re.match(r'^\d{4}/\d{1,2}/\d{1,2}$', value):
+                raise CommandError(f'فرمت تاریخ {value} نامعتبر است (مثال: 1403/05/01)')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency باید حداقل 1 باشد')
+
+        runner = AsyncIngestionRunner(
+            start_date_shamsi=options['start'],
+            end_date_shamsi=options['end'],
+            window_size=options['window'],
+            max_concurrency=options['concurrency'],
+            duplicate_handling=options['duplicate_handling'],
+            batch_size=options['batch_size'],
+            service=ScrollTimeService(cache=IMEResponseCache(mode=options['cache_mode'])),
+        )
+
+        subcategories = runner.active_subcategories()
+        if options['main_cat'] is not None:
+            subcategories = subcategories.filter(category__main_category__value=options['main_cat'])
+        subcategories = list(subcategories)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🚀 دریافت {len(subcategories)} زیرگروه از {runner.start_date_shamsi} تا {runner.end_date_shamsi} '
+            f'(حداکثر {runner.max_concurrency} درخواست همزمان)'
+        ))
+
+        if options['dry_run']:
+            for subcategory in subcategories:
+                self.stdout.write(f'   - {subcategory}')
+            return
+
+        if not subcategories:
+            self.stdout.write(self.style.WARNING('⚠️ هیچ زیرگروه فعالی یافت نشد'))
+            return
+
+        summary = runner.run(subcategories)
+
+        for result in summary['results']:
+            stats = result['stats']
+            line = (
+                f"#{result['scroll_request_id']} {result['subcategory']}: "
+                f"{stats['total_records']} رکورد، {stats['imported_records']} جدید، "
+                f"{stats['updated_records']} بروزرسانی، {stats['error_records']} خطا"
+            )
+            if result['success']:
+                self.stdout.write(f'✓ {line}')
+            else:
+                self.stdout.write(self.style.ERROR(f"✗ {line} - {result['error']}"))
+
+        totals = summary['stats']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ پایان در {summary['elapsed_seconds']} ثانیه: {summary['requests']} درخواست "
+            f"({summary['failed_requests']} ناموفق)، {totals['total_records']} رکورد، "
+            f"{totals['imported_records']} جدید، {totals['updated_records']} بروزرسانی"
+        ))
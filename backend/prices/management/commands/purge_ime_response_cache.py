@@ -0,0 +1,35 @@
+"""
+Django management command برای حذف پاسخ‌های منقضی شده cache دیسکی API بورس
+
+نمونه cron (هر شب ساعت ۳):
+    0 3 * * * cd /app/backend && python manage.py purge_ime_response_cache
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.response_cache import IMEResponseCache
+
+
+class Command(BaseCommand):
+    help = 'حذف پاسخ‌های منقضی شده و فایل‌های موقت رها شده از cache پاسخ‌های API بورس (IME_RESPONSE_CACHE_DIR)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            type=str,
+            help='مسیر cache (پیش‌فرض: IME_RESPONSE_CACHE_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        cache = IMEResponseCache(directory=options['directory'])
+        if not os.path.isdir(cache.directory):
+            self.stdout.write(self.style.WARNING(f'⚠️ مسیر cache وجود ندارد: {cache.directory}'))
+            return
+
+        try:
+            removed = cache.purge_expired()
+        except OSError as e:
+            raise CommandError(f'خطا در پاکسازی cache: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'🧹 {removed} پاسخ منقضی شده از {cache.directory} حذف شد'))
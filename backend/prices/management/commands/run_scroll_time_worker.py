@@ -0,0 +1,87 @@
+"""
+Django management command برای اجرای worker صف کارهای Scroll Time
+"""
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from prices.jobs import STALE_AFTER, claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'اجرای worker برای برداشتن و اجرای کارهای صف Scroll Time (قابل اجرا به صورت چند نمونه همزمان)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='پس از خالی شدن صف خارج شود'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help='پس از اجرای این تعداد کار خارج شود'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='فاصله بررسی صف در صورت خالی بودن (ثانیه)'
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=int(STALE_AFTER.total_seconds() // 60),
+            help='کارهای در حال اجرایی که این مدت اعلام حیات نکرده‌اند دوباره در صف قرار می‌گیرند'
+        )
+
+    def handle(self, *args, **options):
+        worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        stale_after = timedelta(minutes=options['stale_minutes'])
+        self.stopping = False
+
+        def request_stop(signum, frame):
+            # کار جاری کامل می‌شود و سپس worker خارج می‌شود
+            self.stopping = True
+            self.stdout.write(self.style.WARNING('⏹️ درخواست توقف دریافت شد؛ پس از پایان کار جاری خارج می‌شویم'))
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(self.style.SUCCESS(f'🚀 worker {worker_name} شروع به کار کرد'))
+        processed = 0
+
+        while not self.stopping:
+            close_old_connections()
+
+            recovered = requeue_stale_jobs(stale_after)
+            if recovered:
+                self.stdout.write(self.style.WARNING(f'♻️ {recovered} کار رها شده دوباره در صف قرار گرفت'))
+
+            job = claim_next_job(worker_name)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'⏳ اجرای کار #{job.id} ({job.action}) برای درخواست #{job.scroll_request_id}')
+            started = time.monotonic()
+            result = run_job(job)
+            elapsed = time.monotonic() - started
+
+            if result.get('success'):
+                self.stdout.write(self.style.SUCCESS(f'✅ کار #{job.id} در {elapsed:.1f} ثانیه انجام شد'))
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ کار #{job.id} ناموفق: {result.get('error')}"))
+
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'🏁 worker {worker_name} پس از {processed} کار متوقف شد'))
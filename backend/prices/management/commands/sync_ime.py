@@ -0,0 +1,146 @@
+"""
+Django management command برای همگام‌سازی افزایشی داده‌های Scroll Time از watermark هر زیرگروه
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from price_data_ingestion.models import ScrollTimeRequest
+from price_models import jalali
+from prices.response_cache import IMEResponseCache
+from prices.services import ScrollTimeService
+from prices.sync import IncrementalSyncRunner
+
+
+class Command(BaseCommand):
+    help = 'همگام‌سازی افزایشی: دریافت هر زیرگروه فقط از آخرین تاریخ ذخیره شده (منهای همپوشانی) تا امروز'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overlap',
+            type=int,
+            default=IncrementalSyncRunner.SAFETY_OVERLAP_DAYS,
+            help='تعداد روزهایی که قبل از watermark دوباره دریافت می‌شوند'
+        )
+        parser.add_argument(
+            '--initial-days',
+            type=int,
+            default=IncrementalSyncRunner.INITIAL_LOOKBACK_DAYS,
+            help='بازه اولین همگام‌سازی زیرگروه‌هایی که هنوز وضعیتی ندارند (روز)'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='تاریخ پایان شمسی (پیش‌فرض: امروز)، مثال: 1403/05/01'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=IncrementalSyncRunner.DEFAULT_CONCURRENCY,
+            help='بیشترین تعداد درخواست همزمان به سرور بورس'
+        )
+        parser.add_argument(
+            '--duplicate-handling',
+            choices=[choice for choice, _ in ScrollTimeRequest.DUPLICATE_HANDLING_CHOICES],
+            default='update',
+            help='نحوه مواجهه با رکوردهای تکراری'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='تعداد رکوردهای هر دسته در ذخیره‌سازی'
+        )
+        parser.add_argument(
+            '--main-cat',
+            type=int,
+            help='فقط زیرگروه‌های این گروه اصلی (value)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='ذخیره حتی اگر محتوای پاسخ با آخرین همگام‌سازی یکسان باشد'
+        )
+        parser.add_argument(
+            '--cache-mode',
+            choices=IMEResponseCache.MODES,
+            help='حالت cache پاسخ‌ها'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط نمایش بازه دریافت هر زیرگروه بدون ارسال درخواست'
+        )
+
+    def handle(self, *args, **options):
+        if options['overlap'] < 0:
+            raise CommandError('--overlap نمی‌تواند منفی باشد')
+        if options['initial_days'] < 1:
+            raise CommandError('--initial-days باید حداقل 1 باشد')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency باید حداقل 1 باشد')
+
+        end_date = None
+        if options['end']:
+            end_date = jalali.shamsi_to_gregorian(options['end'])
+            if end_date is None:
+                raise CommandError(f"فرمت تاریخ {options['end']} نامعتبر است (مثال: 1403/05/01)")
+
+        runner = IncrementalSyncRunner(
+            overlap_days=options['overlap'],
+            initial_days=options['initial_days'],
+            end_date=end_date,
+            force=options['force'],
+            max_concurrency=options['concurrency'],
+            duplicate_handling=options['duplicate_handling'],
+            batch_size=options['batch_size'],
+            service=ScrollTimeService(cache=IMEResponseCache(mode=options['cache_mode'])),
+        )
+
+        subcategories = runner.active_subcategories()
+        if options['main_cat'] is not None:
+            subcategories = subcategories.filter(category__main_category__value=options['main_cat'])
+        subcategories = list(subcategories)
+
+        if not subcategories:
+            self.stdout.write(self.style.WARNING('⚠️ هیچ زیرگروه فعالی یافت نشد'))
+            return
+
+        plan = runner.plan(subcategories)
+        total_days = sum((entry['end'] - entry['start']).days + 1 for entry in plan)
+        self.stdout.write(self.style.SUCCESS(
+            f'🔄 همگام‌سازی {len(plan)} زیرگروه تا {runner.end_date_shamsi} '
+            f'({total_days} روز در مجموع، همپوشانی {runner.overlap_days} روز)'
+        ))
+
+        if options['dry_run']:
+            for entry in plan:
+                state = entry['state']
+                watermark = state.last_trade_date_shamsi if state is not None and state.last_trade_date_shamsi else 'بدون سابقه'
+                self.stdout.write(
+                    f"   - {entry['subcategory']}: {jalali.gregorian_to_shamsi(entry['start'])} تا "
+                    f"{jalali.gregorian_to_shamsi(entry['end'])} (watermark: {watermark})"
+                )
+            return
+
+        summary = runner.run(subcategories)
+
+        for result in summary['results']:
+            stats = result['stats']
+            if result['skipped']:
+                self.stdout.write(f"= #{result['scroll_request_id']} {result['subcategory']}: بدون تغییر")
+                continue
+            line = (
+                f"#{result['scroll_request_id']} {result['subcategory']}: "
+                f"{stats['total_records']} رکورد، {stats['imported_records']} جدید، "
+                f"{stats['updated_records']} بروزرسانی، {stats['error_records']} خطا"
+            )
+            if result['success']:
+                self.stdout.write(f"✓ {line} (watermark: {result['watermark'] or '-'})")
+            else:
+                self.stdout.write(self.style.ERROR(f"✗ {line} - {result['error']}"))
+
+        totals = summary['stats']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ پایان در {summary['elapsed_seconds']} ثانیه: {summary['requests']} زیرگروه "
+            f"({summary['skipped_requests']} بدون تغییر، {summary['failed_requests']} ناموفق)، "
+            f"{totals['total_records']} رکورد، {totals['imported_records']} جدید، "
+            f"{totals['updated_records']} بروزرسانی"
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from prices.models import ScrollTimeRequest, MainCategory, Category, SubCategory
+from price_data_ingestion.models import ScrollTimeRequest, MainCategory, Category, SubCategory
+from prices.response_cache import IMEResponseCache
 from prices.services import ScrollTimeService
 import json
 
@@ -25,6 +26,11 @@ class Command(BaseCommand):
             help='SubCategory value (default: 464 for گندله)',
             default=464
         )
+        parser.add_argument(
+            '--cache-mode',
+            choices=IMEResponseCache.MODES,
+            help='حالت cache پاسخ‌ها (offline برای پخش دوباره پاسخ‌های ذخیره شده بدون اتصال به سرور)'
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('🔍 شروع تست API سازمان بورس...'))
@@ -54,12 +60,13 @@ class Command(BaseCommand):
                 self.stdout.write(f'   {key}: {value}')
             
             # Initialize service and show headers
-            service = ScrollTimeService()
+            service = ScrollTimeService(cache=IMEResponseCache(mode=options['cache_mode']))
             self.stdout.write('\n📡 Headers ارسالی:')
             for key, value in service.DEFAULT_HEADERS.items():
                 self.stdout.write(f'   {key}: {value}')
                 
             self.stdout.write(f'\n🔗 URL: {service.BASE_URL}')
+            self.stdout.write(f'🗄️ Cache: {service.cache.mode} ({service.cache.directory})')
             
             # Test API call
             self.stdout.write('\n⏳ در حال ارسال درخواست...')
@@ -0,0 +1,334 @@
+"""
+نرمال‌سازی رکوردهای خام API سازمان بورس بر اساس یک نقشه فیلد اعلانی
+
+نگاشت «کلید IME ← فیلد مدل» فقط یک بار در IME_FIELDS تعریف می‌شود و همه مسیرهای
+ورود داده (ScrollTimeService، دریافت همزمان، ScrollTimePage) از آن استفاده می‌کنند.
+هر رکورد خام با یک حلقه روی نقشه به یک tuple با ترتیب ثابت (COLUMNS) تبدیل می‌شود
+که مستقیماً برای ساخت ردیف‌های AllData و PriceData (با آرگومان‌های موقعیتی و بدون
+kwargs) استفاده می‌شود.
+
+خطاهای تبدیل (عدد نامعتبر، متن بلندتر از طول فیلد، تاریخ نامعتبر) در یک
+CoercionReport برای هر دسته جمع‌آوری می‌شوند.
+"""
+import math
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from data_management.models import AllData
+from price_models import jalali
+from price_models.models import PriceData
+
+# انواع فیلد
+TEXT = 'text'
+INTEGER = 'integer'
+DECIMAL = 'decimal'
+JALALI_DATE = 'jalali_date'
+
+# بزرگترین مقدار DecimalField(max_digits=15, decimal_places=2)
+_DECIMAL_LIMIT = 10 ** 13
+
+# خطاهایی که به معنای مقدار نامعتبر هستند (نه خطای برنامه)
+_COERCION_ERRORS = (ValueError, TypeError, ArithmeticError)
+
+_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789', ',٬ ')
+
+
+class FieldSpec(NamedTuple):
+    """تعریف یک ستون: فیلد مدل، کلیدهای منبع (اولین مقدار غیرخالی)، نوع و پیش‌فرض"""
+    name: str
+    sources: Tuple[str, ...]
+    kind: str
+    max_length: Optional[int] = None
+    default: Any = None
+    required: bool = False
+
+
+# کلید اول نام فیلد در پاسخ GetAmareMoamelatList است؛ بقیه نام‌های قدیمی/جایگزین هستند
+IME_FIELDS = (
+    FieldSpec('commodity_name', ('GoodsName',), TEXT, 100, default='نامشخص'),
+    FieldSpec('symbol', ('Symbol',), TEXT, 50, default=''),
+    FieldSpec('hall', ('Talar', 'Hall'), TEXT, 100, default=''),
+    FieldSpec('producer', ('ProducerName', 'Producer'), TEXT, 200, default=''),
+    FieldSpec('contract_type', ('ContractType',), TEXT, 50, default=''),
+    FieldSpec('final_price', ('Price',), DECIMAL),
+    FieldSpec('transaction_value', ('TotalPrice', 'Value'), INTEGER, default=0),
+    FieldSpec('lowest_price', ('MinPrice',), DECIMAL),
+    FieldSpec('highest_price', ('MaxPrice',), DECIMAL),
+    FieldSpec('base_price', ('ArzeBasePrice', 'BasePrice'), DECIMAL),
+    FieldSpec('offer_volume', ('arze', 'OfferVolume'), INTEGER, default=0),
+    FieldSpec('demand_volume', ('taghaza', 'DemandVolume'), INTEGER, default=0),
+    FieldSpec('contract_volume', ('Quantity', 'Volume'), INTEGER, default=0),
+    FieldSpec('unit', ('Unit',), TEXT, 20, default=''),
+    FieldSpec('transaction_date', ('date',), JALALI_DATE, required=True),
+    FieldSpec('supplier', ('ArzehKonandeh', 'Supplier'), TEXT, 200, default=''),
+    FieldSpec('broker', ('cBrokerSpcName', 'Broker'), TEXT, 100, default=''),
+    FieldSpec('settlement_type', ('Tasvieh', 'SettlementType'), TEXT, 50, default=''),
+    FieldSpec('delivery_date', ('DeliveryDate',), TEXT, 10, default=''),
+    FieldSpec('warehouse', ('Warehouse',), TEXT, 100, default=''),
+    FieldSpec('settlement_date', ('SettlementDate',), TEXT, 10, default=''),
+    FieldSpec('x_talar_report_pk', ('xTalarReportPK', 'XTalarReportPK'), INTEGER, default=0),
+    FieldSpec('b_arzeh_radif_tar_sarresid', ('bArzehRadifTarSarresid',), TEXT, 10),
+    FieldSpec('mode_description', ('ModeDescription',), TEXT, 50),
+    FieldSpec('method_description', ('MethodDescription',), TEXT, 50),
+    FieldSpec('currency', ('Currency',), TEXT, 20),
+    FieldSpec('packet_name', ('PacketName',), TEXT, 50),
+    FieldSpec('arzeh_pk', ('arzehPk', 'ArzehPK'), INTEGER, default=0),
+)
+
+# ستون‌های مشتق از تاریخ شمسی معامله (تاریخ میلادی و کلید عددی YYYYMMDD شمسی)
+DATE_COLUMNS = ('trade_date', 'jalali_date_key')
+
+# ستون‌های خروجی: فیلدهای IME_FIELDS و در انتها ستون‌های مشتق از تاریخ
+COLUMNS = tuple(spec.name for spec in IME_FIELDS) + DATE_COLUMNS
+
+# فیلدهای PriceData ← ستون نرمال‌شده
+PRICE_COLUMNS = {
+    'commodity_name': 'commodity_name',
+    'symbol': 'symbol',
+    'final_price': 'final_price',
+    'avg_price': 'final_price',
+    'max_price': 'highest_price',
+    'min_price': 'lowest_price',
+    'base_price': 'base_price',
+    'volume': 'contract_volume',
+    'price_date': 'trade_date',
+}
+
+
+class CoercionReport:
+    """گزارش خطاهای تبدیل یک دسته (یا مجموع چند دسته)"""
+
+    SAMPLE_SIZE = 5
+
+    def __init__(self):
+        self.rows = 0
+        self.rejected = 0
+        self.failures: Dict[str, int] = {}
+        self.truncated: Dict[str, int] = {}
+        self.samples: Dict[str, List[str]] = {}
+
+    def failure(self, field: str, value: Any):
+        self.failures[field] = self.failures.get(field, 0) + 1
+        samples = self.samples.setdefault(field, [])
+        if len(samples) < self.SAMPLE_SIZE:
+            samples.append(repr(value)[:100])
+
+    def truncation(self, field: str):
+        self.truncated[field] = self.truncated.get(field, 0) + 1
+
+    def merge(self, other: 'CoercionReport'):
+        self.rows += other.rows
+        self.rejected += other.rejected
+        for field, count in other.failures.items():
+            self.failures[field] = self.failures.get(field, 0) + count
+            samples = self.samples.setdefault(field, [])
+            samples.extend(other.samples.get(field, [])[:self.SAMPLE_SIZE - len(samples)])
+        for field, count in other.truncated.items():
+            self.truncated[field] = self.truncated.get(field, 0) + count
+
+    @property
+    def has_issues(self) -> bool:
+        return bool(self.rejected or self.failures or self.truncated)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'rejected': self.rejected,
+            'failures': dict(self.failures),
+            'truncated': dict(self.truncated),
+            'samples': {field: list(values) for field, values in self.samples.items()},
+        }
+
+    def summary(self) -> str:
+        parts = [f"{self.rows} rows, {self.rejected} rejected"]
+        if self.failures:
+            parts.append('failures: ' + ', '.join(f"{k}={v}" for k, v in sorted(self.failures.items())))
+        if self.truncated:
+            parts.append('truncated: ' + ', '.join(f"{k}={v}" for k, v in sorted(self.truncated.items())))
+        return '; '.join(parts)
+
+
+def _to_number(value: Any):
+    """عدد از int/float/رشته (با ارقام فارسی و جداکننده هزارگان)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value
+    elif isinstance(value, str):
+        number = float(value.translate(_DIGITS))
+    else:
+        raise TypeError(f"not a number: {type(value).__name__}")
+    if isinstance(number, float):
+        if not math.isfinite(number):
+            raise ValueError('not finite')
+        if number.is_integer():
+            number = int(number)
+    return number
+
+
+def _coerce_integer(value: Any) -> int:
+    number = _to_number(value)
+    return number if isinstance(number, int) else int(round(number))
+
+
+def _coerce_decimal(value: Any):
+    number = _to_number(value)
+    if abs(number) >= _DECIMAL_LIMIT:
+        raise ValueError('out of range')
+    return number
+
+
+@lru_cache(maxsize=4096)
+def _date_columns(value: str) -> Tuple[str, date, int]:
+    """(تاریخ شمسی با فرمت یکسان 1403/05/01، تاریخ میلادی، کلید عددی 14030501)"""
+    jy, jm, jd = jalali.parse(value)
+    return jalali.format_date(jy, jm, jd), jalali.to_gregorian(jy, jm, jd), jy * 10000 + jm * 100 + jd
+
+
+_COERCERS = {INTEGER: _coerce_integer, DECIMAL: _coerce_decimal}
+
+
+class IMERecordNormalizer:
+    """
+    تبدیل رکورد خام IME به ردیف نرمال‌شده و ساخت اشیاء AllData / PriceData
+
+    نمونه‌سازی یک بار انجام می‌شود (نقشه فیلد، چیدمان ستون‌های مدل‌ها و پیش‌فرض‌ها
+    از قبل محاسبه می‌شوند) و سپس برای همه رکوردها استفاده می‌شود.
+    """
+
+    def __init__(self, fields: Tuple[FieldSpec, ...] = IME_FIELDS):
+        self.fields = fields
+        self.columns = tuple(spec.name for spec in fields) + DATE_COLUMNS
+        if sum(1 for spec in fields if spec.kind == JALALI_DATE) != 1:
+            raise ValueError('field map must contain exactly one Jalali date field')
+        self._alldata_layout = self._layout(AllData, {name: name for name in self.columns})
+        self._price_layout = self._layout(PriceData, PRICE_COLUMNS)
+
+    def _layout(self, model, column_map: Dict[str, str]):
+        """
+        چیدمان آرگومان‌های موقعیتی مدل: مقادیر پیش‌فرض همه فیلدهای concrete و
+        لیست (اندیس فیلد، اندیس ستون) برای فیلدهایی که از ردیف پر می‌شوند
+        """
+        fields = model._meta.concrete_fields
+        template = []
+        positions = {}
+        assignments = []
+        for index, field in enumerate(fields):
+            positions[field.attname] = index
+            column = column_map.get(field.attname)
+            if column in self.columns:
+                assignments.append((index, self.columns.index(column)))
+            elif field.has_default() and callable(field.default):
+                raise ValueError(f"{model.__name__}.{field.name}: callable defaults are not supported")
+            template.append(None if field.primary_key else field.get_default())
+        return template, positions, assignments
+
+    # ------------------------------------------------------------------
+    # نرمال‌سازی
+    # ------------------------------------------------------------------
+
+    def normalize(self, record: Dict[str, Any], report: CoercionReport) -> Optional[tuple]:
+        """
+        تبدیل یک رکورد خام به tuple با ترتیب self.columns
+
+        مقدار هر فیلد از اولین کلید منبع غیرخالی خوانده می‌شود؛ مقادیر خالی پیش‌فرض
+        می‌گیرند، متن بلند کوتاه و مقدار عددی نامعتبر (پس از ثبت در report) با
+        پیش‌فرض جایگزین می‌شود. رشته و عدد صحیح سالم بدون فراخوانی تابع تبدیل پذیرفته می‌شوند.
+
+        Returns:
+            ردیف نرمال‌شده یا None اگر فیلد الزامی (تاریخ معامله) نامعتبر باشد
+        """
+        report.rows += 1
+        get = record.get
+        row = []
+        trade_date = date_key = None
+        for name, sources, kind, max_length, default, required in self.fields:
+            value = get(sources[0])
+            for fallback in sources[1:]:
+                if value is None or value == '':
+                    value = get(fallback)
+
+            if kind == JALALI_DATE:
+                try:
+                    value, trade_date, date_key = _date_columns(value)
+                except _COERCION_ERRORS:
+                    report.failure(name, value)
+                    if required:
+                        report.rejected += 1
+                        return None
+                    value = trade_date = default
+                    date_key = None
+            elif value is None or value == '':
+                if required:
+                    report.failure(name, value)
+                    report.rejected += 1
+                    return None
+                value = default
+            elif kind == TEXT:
+                if type(value) is not str:
+                    value = str(value)
+                if max_length is not None and len(value) > max_length:
+                    report.truncation(name)
+                    value = value[:max_length]
+            elif type(value) is not int or (kind == DECIMAL and not -_DECIMAL_LIMIT < value < _DECIMAL_LIMIT):
+                try:
+                    value = _COERCERS[kind](value)
+                except _COERCION_ERRORS:
+                    report.failure(name, value)
+                    if required:
+                        report.rejected += 1
+                        return None
+                    value = default
+            row.append(value)
+
+        row.append(trade_date)
+        row.append(date_key)
+        return tuple(row)
+
+    def normalize_batch(self, records: Iterable[Dict[str, Any]]) -> Tuple[List[Tuple[Dict[str, Any], tuple]], CoercionReport]:
+        """
+        نرمال‌سازی یک دسته
+
+        Returns:
+            (لیست (رکورد خام، ردیف) برای رکوردهای پذیرفته شده، گزارش خطاهای تبدیل دسته)
+        """
+        report = CoercionReport()
+        normalize = self.normalize
+        accepted = []
+        for record in records:
+            if not isinstance(record, dict):
+                report.rows += 1
+                report.rejected += 1
+                report.failure('record', record)
+                continue
+            row = normalize(record, report)
+            if row is not None:
+                accepted.append((record, row))
+        return accepted, report
+
+    # ------------------------------------------------------------------
+    # ساخت اشیاء مدل
+    # ------------------------------------------------------------------
+
+    def values(self, row: tuple) -> Dict[str, Any]:
+        """ردیف به صورت dict فیلدهای AllData (برای update_or_create و مانند آن)"""
+        return dict(zip(self.columns, row))
+
+    def build_alldata(self, row: tuple, **extra) -> AllData:
+        """ساخت شی AllData (ذخیره نشده)؛ extra مثلاً source و raw_data"""
+        template, positions, assignments = self._alldata_layout
+        args = template.copy()
+        for field_index, column_index in assignments:
+            args[field_index] = row[column_index]
+        for name, value in extra.items():
+            args[positions[name]] = value
+        return AllData(*args)
+
+    def build_price(self, row: tuple, **extra) -> PriceData:
+        """ساخت شی PriceData (ذخیره نشده)"""
+        template, positions, assignments = self._price_layout
+        args = template.copy()
+        for field_index, column_index in assignments:
+            args[field_index] = row[column_index]
+        for name, value in extra.items():
+            args[positions[name]] = value
+        return PriceData(*args)
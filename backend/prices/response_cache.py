@@ -0,0 +1,314 @@
+"""
+Cache دیسکی پاسخ‌های خام API سازمان بورس
+
+هر پاسخ با hash (sha256) از آدرس API و payload نرمال‌شده
+(ScrollTimeRequest.get_payload()) شناسایی می‌شود؛ بنابراین درخواست‌های تکراری یا
+هم‌پوشان برای یک دسته و بازه تاریخ یکسان دوباره از ime.co.ir دریافت نمی‌شوند.
+بدنه پاسخ به صورت gzip و اطلاعات آن (زمان انقضا، payload) در یک فایل json کنار آن
+ذخیره می‌شود. مدت اعتبار به بازه تاریخ بستگی دارد: بازه‌های گذشته مدت طولانی
+معتبرند و بازه‌ای که شامل امروز است زود منقضی می‌شود.
+
+حالت‌ها (IME_RESPONSE_CACHE_MODE):
+    default: خواندن از cache معتبر و ذخیره پاسخ‌های جدید
+    refresh: دریافت دوباره از API و بازنویسی cache
+    offline: فقط پخش دوباره از cache (بدون توجه به انقضا و بدون ارسال درخواست)
+    off:     غیرفعال
+
+پاسخ‌های منقضی شده (و فایل‌های موقت رها شده) هر PURGE_EVERY نوشتن یک بار حذف
+می‌شوند؛ برای پاکسازی زمان‌بندی شده (cron) دستور زیر هم وجود دارد:
+    python manage.py purge_ime_response_cache
+"""
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, IO, Iterable, Iterator, Optional
+
+import requests
+from django.conf import settings
+
+from price_models import jalali
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCacheMiss(requests.exceptions.RequestException):
+    """پاسخ در حالت offline در cache وجود ندارد"""
+
+
+class IMEResponseCache:
+    """Cache محتوا-محور (content-addressed) پاسخ‌های API روی دیسک"""
+
+    MODES = ('default', 'refresh', 'offline', 'off')
+
+    # مدت اعتبار (ثانیه) بر اساس فاصله پایان بازه تا امروز
+    TODAY_TTL = 10 * 60                # بازه شامل امروز یا آینده
+    RECENT_TTL = 6 * 60 * 60           # بازه‌ای که در چند روز اخیر تمام شده (اصلاحات دیرهنگام)
+    HISTORICAL_TTL = 30 * 24 * 60 * 60  # بازه‌های قدیمی
+    RECENT_DAYS = 3
+
+    # اندازه هر تکه در خواندن فایل‌های cache
+    READ_CHUNK_SIZE = 64 * 1024
+
+    # حذف پاسخ‌های منقضی شده پس از هر چند نوشتن (0: غیرفعال)
+    PURGE_EVERY = 200
+    # فایل‌های موقت قدیمی‌تر از این (ثانیه) باقیمانده نوشتن‌های قطع شده هستند
+    STALE_TEMP_AGE = 24 * 60 * 60
+
+    # شمارنده نوشتن‌ها در این پردازه
+    _writes = itertools.count(1)
+
+    def __init__(self, directory: Optional[str] = None, mode: Optional[str] = None):
+        self.directory = directory or getattr(
+            settings, 'IME_RESPONSE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'ime_responses')
+        )
+        self.mode = mode or getattr(settings, 'IME_RESPONSE_CACHE_MODE', 'default')
+        if self.mode not in self.MODES:
+            raise ValueError(f"Invalid cache mode: {self.mode}")
+
+    # ------------------------------------------------------------------
+    # کلید و مسیرها
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """نرمال‌سازی payload (مثلاً 1403/5/1 و 1403/05/01 یک کلید دارند)"""
+        normalized = {}
+        for key, value in payload.items():
+            if key in ('GregorianFromDate', 'GregorianToDate') and isinstance(value, str):
+                parts = value.strip().split('/')
+                if len(parts) == 3 and all(part.isdigit() for part in parts):
+                    value = f"{int(parts[0]):04d}/{int(parts[1]):02d}/{int(parts[2]):02d}"
+            elif isinstance(value, str) and value.strip().lstrip('-').isdigit():
+                value = int(value)
+            normalized[key] = value
+        return normalized
+
+    def key_for(self, url: str, payload: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            self.normalize_payload(payload), sort_keys=True, separators=(',', ':'), ensure_ascii=False
+        )
+        return hashlib.sha256(f"{url}\n{canonical}".encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json.gz", f"{base}.meta.json"
+
+    # ------------------------------------------------------------------
+    # مدت اعتبار
+    # ------------------------------------------------------------------
+
+    def ttl_for(self, payload: Dict[str, Any]) -> int:
+        """مدت اعتبار بر اساس تاریخ پایان بازه (شمسی)"""
+        end_date = jalali.shamsi_to_gregorian(payload.get('GregorianToDate'))
+        if end_date is None:
+            return self.TODAY_TTL
+
+        today = date.today()
+        if end_date >= today:
+            return self.TODAY_TTL
+        if end_date >= today - timedelta(days=self.RECENT_DAYS):
+            return self.RECENT_TTL
+        return self.HISTORICAL_TTL
+
+    # ------------------------------------------------------------------
+    # خواندن
+    # ------------------------------------------------------------------
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ('default', 'offline')
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ('default', 'refresh')
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == 'offline'
+
+    def open(self, url: str, payload: Dict[str, Any]) -> Optional[IO[bytes]]:
+        """
+        باز کردن بدنه پاسخ cache شده (فایل از حالت فشرده خارج شده)
+
+        Returns:
+            فایل باینری یا None در صورت نبود/انقضای پاسخ
+
+        Raises:
+            ResponseCacheMiss: در حالت offline اگر پاسخ موجود نباشد
+        """
+        if not self.readable:
+            return None
+
+        key = self.key_for(url, payload)
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            if not self.offline and meta.get('expires_at', 0) < time.time():
+                logger.debug(f"Cache entry {key[:12]} expired")
+                return None
+            cached = gzip.open(body_path, 'rb')
+        except (OSError, ValueError):
+            if self.offline:
+                raise ResponseCacheMiss(f"پاسخ درخواست در cache وجود ندارد (offline): {key[:12]}")
+            return None
+
+        logger.info(f"Serving response from cache {key[:12]}")
+        return cached
+
+    def load(self, url: str, payload: Dict[str, Any]) -> Optional[bytes]:
+        """خواندن کامل بدنه پاسخ cache شده"""
+        cached = self.open(url, payload)
+        if cached is None:
+            return None
+        with cached:
+            return cached.read()
+
+    def iter_chunks(self, cached: IO[bytes]) -> Iterator[bytes]:
+        """خواندن تکه‌به‌تکه فایل cache (برای پارسر جریانی)"""
+        with cached:
+            while True:
+                chunk = cached.read(self.READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    # ------------------------------------------------------------------
+    # نوشتن
+    # ------------------------------------------------------------------
+
+    def writer(self, url: str, payload: Dict[str, Any]) -> Optional['CacheWriter']:
+        """نویسنده جریانی برای ذخیره پاسخ همزمان با خواندن آن از شبکه"""
+        if not self.writable:
+            return None
+        if self.PURGE_EVERY and next(self._writes) % self.PURGE_EVERY == 0:
+            try:
+                removed = self.purge_expired()
+            except OSError as e:
+                logger.warning(f"Could not purge response cache: {e}")
+            else:
+                logger.info(f"Purged {removed} expired responses from {self.directory}")
+        key = self.key_for(url, payload)
+        meta = {
+            'key': key,
+            'url': url,
+            'payload': self.normalize_payload(payload),
+            'stored_at': time.time(),
+            'expires_at': time.time() + self.ttl_for(payload),
+        }
+        try:
+            return CacheWriter(self._paths(key), meta)
+        except OSError as e:
+            logger.warning(f"Response cache disabled for this request: {e}")
+            return None
+
+    def store(self, url: str, payload: Dict[str, Any], body: bytes) -> None:
+        """ذخیره کامل یک بدنه پاسخ"""
+        writer = self.writer(url, payload)
+        if writer is None:
+            return
+        for _ in writer.wrap([body]):
+            pass
+        writer.commit()
+
+    def purge_expired(self) -> int:
+        """حذف پاسخ‌های منقضی شده و فایل‌های موقت رها شده؛ تعداد پاسخ‌های حذف شده را برمی‌گرداند"""
+        removed = 0
+        now = time.time()
+        if not os.path.isdir(self.directory):
+            return 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(('.tmp', '.tmp.meta')):
+                    temp_path = os.path.join(root, name)
+                    try:
+                        if os.path.getmtime(temp_path) < now - self.STALE_TEMP_AGE:
+                            os.remove(temp_path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not name.endswith('.meta.json'):
+                    continue
+                meta_path = os.path.join(root, name)
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as meta_file:
+                        expired = json.load(meta_file).get('expires_at', 0) < now
+                except (OSError, ValueError):
+                    expired = True
+                if expired:
+                    body_path = meta_path[:-len('.meta.json')] + '.json.gz'
+                    for path in (body_path, meta_path):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                    removed += 1
+        return removed
+
+
+class CacheWriter:
+    """
+    ذخیره جریانی یک پاسخ در فایل موقت
+
+    فایل فقط پس از commit() (یعنی دریافت کامل پاسخ) در جای نهایی قرار می‌گیرد؛
+    پاسخ‌های ناقص یا خطادار هرگز در cache باقی نمی‌مانند.
+    """
+
+    def __init__(self, paths, meta: Dict[str, Any]):
+        self.body_path, self.meta_path = paths
+        self.meta = meta
+        directory = os.path.dirname(self.body_path)
+        os.makedirs(directory, exist_ok=True)
+        handle, self.temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        self._raw = os.fdopen(handle, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+        self._chunks = None
+        self.size = 0
+
+    def wrap(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """عبور تکه‌ها و نوشتن همزمان آن‌ها در فایل موقت"""
+        self._chunks = iter(chunks)
+        for chunk in self._chunks:
+            if chunk:
+                self._gzip.write(chunk)
+                self.size += len(chunk)
+            yield chunk
+
+    def commit(self) -> None:
+        """خواندن باقیمانده پاسخ و انتقال فایل به cache"""
+        try:
+            if self._chunks is not None:
+                for chunk in self._chunks:
+                    if chunk:
+                        self._gzip.write(chunk)
+                        self.size += len(chunk)
+            self._gzip.close()
+            self._raw.close()
+            os.replace(self.temp_path, self.body_path)
+            self.meta['size'] = self.size
+            meta_temp = f"{self.temp_path}.meta"
+            with open(meta_temp, 'w', encoding='utf-8') as meta_file:
+                json.dump(self.meta, meta_file, ensure_ascii=False)
+            os.replace(meta_temp, self.meta_path)
+        except OSError as e:
+            logger.warning(f"Could not store response in cache: {e}")
+            self.discard()
+
+    def discard(self) -> None:
+        """حذف فایل موقت (پاسخ ناقص)"""
+        for handle in (self._gzip, self._raw):
+            try:
+                handle.close()
+            except (OSError, ValueError):
+                pass
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
@@ -15,7 +15,8 @@ import logging
 
 from price_data_ingestion.models import ScrollTimeRequest, MainCategory, Category, SubCategory
 from .forms import ScrollTimeRequestForm
-from .services import ScrollTimeService, DataPreviewService
+from .jobs import enqueue_job
+from .services import DataPreviewService
 
 logger = logging.getLogger(__name__)
 
@@ -64,7 +65,6 @@ class ScrollTimeSendView(DetailView):
     def post(self, request, *args, **kwargs):
         """ارسال درخواست به سرور بورس"""
         import json
-        import traceback
         from django.utils import timezone
         
         # تنظیم object برای DetailView
@@ -87,73 +87,19 @@ class ScrollTimeSendView(DetailView):
             messages.success(request, f'✅ تست ارتباط موفق! اطلاعات: {json.dumps(debug_info, indent=2)}')
             return self.get(request, *args, **kwargs)
         
+        if scroll_request.status in ['queued', 'processing']:
+            messages.info(request, 'این درخواست در حال پردازش است')
+            return redirect('prices:scroll_time_send', scroll_request.id)
+        
         if scroll_request.status not in ['pending', 'failed']:
             messages.warning(request, 'این درخواست قبلاً پردازش شده است')
             return redirect('prices:scroll_time_preview', scroll_request.id)
 
-        try:
-            # ارسال درخواست
-            service = ScrollTimeService()
-            result = service.fetch_data(scroll_request)
-            
-            # بررسی نتیجه و نمایش اطلاعات کامل برای debug
-            if result['success']:
-                debug_info['result'] = 'SUCCESS'
-                debug_info['records_count'] = len(result.get('data', []))
-                messages.success(request, f"✅ {result['message']}")
-                messages.info(request, f"Debug Info: {json.dumps(debug_info, indent=2)}")
-                return redirect('prices:scroll_time_preview', scroll_request.id)
-            else:
-                debug_info['result'] = 'FAILED'
-                debug_info['error'] = result.get('error', 'Unknown error')
-                
-                # اطلاعات کامل برای debug
-                full_debug = f"""
-                ❌ خطا در ارسال درخواست:
-                
-                🔗 URL: {service.BASE_URL}
-                
-                📝 Payload ارسالی:
-                {scroll_request.get_payload()}
-                
-                ⚠️ خطای دریافت شده:
-                {result.get('error', 'خطای ناشناخته')}
-                
-                📊 وضعیت درخواست: {scroll_request.status}
-                
-                🔧 Headers استفاده شده:
-                {service.DEFAULT_HEADERS}
-                
-                🐛 Debug Info:
-                {json.dumps(debug_info, indent=2, ensure_ascii=False)}
-                """
-                
-                # نمایش پیام خطا به کاربر
-                messages.error(request, f"خطا در ارسال درخواست: {result['error']}")
-                messages.warning(request, full_debug)
-                
-                # لاگ کردن اطلاعات کامل برای مطالعه
-                logger.error(f"API Call Failed - Debug Info: {full_debug}")
-                
-                # افزودن اطلاعات debug به context برای نمایش در template
-                context = self.get_context_data()
-                context['debug_info'] = full_debug
-                context['api_error'] = True
-                
-                return self.render_to_response(context)
-                
-        except Exception as e:
-            debug_info['result'] = 'EXCEPTION'
-            debug_info['exception'] = str(e)
-            debug_info['traceback'] = traceback.format_exc()
-            
-            error_msg = f"خطای سیستمی: {str(e)}"
-            messages.error(request, error_msg)
-            messages.error(request, f"Debug Info: {json.dumps(debug_info, indent=2, ensure_ascii=False)}")
-            
-            logger.error(f"System Error in ScrollTimeSendView: {traceback.format_exc()}")
-            
-            return self.get(request, *args, **kwargs)
+        # دریافت (و در حالت ذخیره خودکار، ذخیره جریانی) در worker پس‌زمینه انجام می‌شود
+        action = 'fetch_and_save' if scroll_request.auto_save else 'fetch'
+        job = enqueue_job(scroll_request, action)
+        messages.success(request, f'✅ درخواست در صف پردازش قرار گرفت (کار #{job.id})')
+        return redirect('prices:scroll_time_send', scroll_request.id)
 
 
 class ScrollTimePreviewView(DetailView):
@@ -180,7 +126,6 @@ class ScrollTimePreviewView(DetailView):
     def post(self, request, *args, **kwargs):
         """ذخیره داده‌ها در پایگاه داده"""
         import json
-        import traceback
         from django.utils import timezone
         
         scroll_request = self.get_object()
@@ -192,45 +137,31 @@ class ScrollTimePreviewView(DetailView):
             'action': action,
             'request_id': scroll_request.id,
             'status': scroll_request.status,
-            'has_response_data': bool(scroll_request.response_data),
-            'response_data_length': len(scroll_request.response_data) if scroll_request.response_data else 0,
         }
+        response = scroll_request.get_response()
+        debug_info['has_response_data'] = response is not None
+        debug_info['response_data_length'] = response.record_count if response else 0
         
         if action == 'test_save':
             messages.info(request, f'🧪 تست ذخیره - اطلاعات درخواست: {json.dumps(debug_info, indent=2, ensure_ascii=False)}')
             return self.get(request, *args, **kwargs)
         
         if action == 'save':
-            try:
-                service = ScrollTimeService()
-                result = service.save_data_to_database(scroll_request)
-                
-                debug_info['save_result'] = result.get('success', False)
-                debug_info['save_stats'] = result.get('stats', {})
-                
-                if result['success']:
-                    messages.success(request, f"✅ {result['message']}")
-                    messages.info(request, f"📊 آمار عملیات: {json.dumps(result.get('stats', {}), indent=2, ensure_ascii=False)}")
-                    return redirect('prices:scroll_time_completed', scroll_request.id)
-                else:
-                    debug_info['error'] = result.get('error', 'Unknown error')
-                    messages.error(request, f"❌ خطا در ذخیره: {result['error']}")
-                    messages.warning(request, f"🐛 Debug Info: {json.dumps(debug_info, indent=2, ensure_ascii=False)}")
-                    
-            except Exception as e:
-                debug_info['exception'] = str(e)
-                debug_info['traceback'] = traceback.format_exc()
-                
-                error_msg = f"خطای سیستمی در ذخیره داده‌ها: {str(e)}"
-                messages.error(request, error_msg)
-                messages.error(request, f"🐛 Debug Info: {json.dumps(debug_info, indent=2, ensure_ascii=False)}")
-                
-                logger.error(f"System Error in ScrollTimePreviewView save: {traceback.format_exc()}")
+            if scroll_request.status in ['queued', 'processing']:
+                messages.info(request, 'این درخواست در حال پردازش است')
+            elif not scroll_request.has_response_data():
+                messages.error(request, '❌ هیچ داده‌ای برای ذخیره وجود ندارد')
+                return self.get(request, *args, **kwargs)
+            else:
+                # ذخیره در worker پس‌زمینه انجام می‌شود؛ پیشرفت در صفحه ارسال نمایش داده می‌شود
+                job = enqueue_job(scroll_request, 'save')
+                messages.success(request, f'✅ ذخیره داده‌ها در صف پردازش قرار گرفت (کار #{job.id})')
+            return redirect('prices:scroll_time_send', scroll_request.id)
                 
         elif action == 'cancel':
             scroll_request.status = 'pending'
-            scroll_request.response_data = None
             scroll_request.save()
+            scroll_request.clear_response_data()
             messages.info(request, 'عملیات لغو شد')
             return redirect('prices:scroll_time_create')
         
@@ -295,19 +226,43 @@ def ajax_get_subcategories(request):
 
 @csrf_exempt 
 def ajax_scroll_time_status(request):
-    """بررسی وضعیت درخواست Scroll Time"""
+    """بررسی وضعیت درخواست Scroll Time (پیشرفت زنده کار پس‌زمینه)"""
     if request.method == 'GET':
         request_id = request.GET.get('request_id')
         
         if request_id:
             scroll_request = get_object_or_404(ScrollTimeRequest, id=request_id)
+            job = scroll_request.jobs.order_by('-created_at', '-id').first()
+            
+            redirect_url = None
+            if scroll_request.status == 'preview':
+                redirect_url = reverse('prices:scroll_time_preview', args=[scroll_request.id])
+            elif scroll_request.status == 'completed':
+                redirect_url = reverse('prices:scroll_time_completed', args=[scroll_request.id])
+            
+            progress_percent = None
+            if scroll_request.total_records:
+                progress_percent = round(scroll_request.processed_records * 100 / scroll_request.total_records, 1)
             
             return JsonResponse({
                 'success': True,
                 'status': scroll_request.status,
+                'status_display': scroll_request.get_status_display(),
                 'total_records': scroll_request.total_records,
                 'processed_records': scroll_request.processed_records,
+                'progress_percent': progress_percent,
+                'windows_total': scroll_request.windows_total,
+                'windows_completed': scroll_request.windows_completed,
                 'error_message': scroll_request.error_message,
+                'finished': scroll_request.status in ['preview', 'completed', 'failed'],
+                'redirect_url': redirect_url,
+                'job': {
+                    'id': job.id,
+                    'action': job.action,
+                    'status': job.status,
+                    'attempts': job.attempts,
+                    'worker': job.worker,
+                } if job else None,
             })
     
     return JsonResponse({'success': False})
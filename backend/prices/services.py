@@ -4,51 +4,81 @@
 import requests
 import json
 import logging
-from typing import Dict, List, Any, Optional
-from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from datetime import datetime, date, timedelta
 from django.conf import settings
+from django.db import transaction
 from price_data_ingestion.models import ScrollTimeRequest
+from price_models import jalali
 from price_models.models import PriceData, DataImportLog
 from data_management.models import AllData as DataManagementAllData
+from data_management.copy_loader import AllDataCopyLoader
+from data_management.commodities import get_resolver as get_commodity_resolver
+from data_management.signals import deferred_rollups, mark_dirty
+from .ime_client import IMEClient, get_client
+from .ime_stream import iter_ime_records, truncate_for_log
+from .normalizer import CoercionReport, IMERecordNormalizer
+from .response_cache import IMEResponseCache
 
 logger = logging.getLogger(__name__)
 
 
 def convert_shamsi_to_gregorian(shamsi_date_str: str) -> date:
     """
-    تبدیل تاریخ شمسی به میلادی (ساده‌سازی شده)
+    تبدیل تاریخ شمسی به میلادی
     
     Args:
         shamsi_date_str: تاریخ شمسی به فرمت 1403/05/01
         
     Returns:
         datetime.date object
+        
+    Raises:
+        jalali.JalaliDateError: تاریخ نامعتبر؛ رکورد به جای ثبت با تاریخ اشتباه
+        به عنوان رکورد خطادار شمرده می‌شود
     """
-    try:
-        if not shamsi_date_str:
-            return datetime.now().date()
+    return jalali.to_gregorian(*jalali.parse(shamsi_date_str))
 
-        # پاک‌سازی ورودی: حذف نویسه‌های اضافی مانند گیومه فارسی و انگلیسی
-        clean_str = shamsi_date_str.strip()
-        for ch in ['“', '”', '"', "'"]:
-            clean_str = clean_str.replace(ch, '')
-        # تبدیل ساده - فعلاً 622 سال کم می‌کنیم
-        # در آینده باید از کتابخانه دقیق‌تری استفاده کرد
-        parts = clean_str.split('/')
-        if len(parts) != 3:
-            return datetime.now().date()
-        year, month, day = parts
-        gregorian_year = int(year) + 621  # تقریبی
-        
-        # محدود کردن ماه و روز
-        gregorian_month = min(int(month), 12)
-        gregorian_day = min(int(day), 28)  # برای جلوگیری از خطا
-        
-        return datetime(gregorian_year, gregorian_month, gregorian_day).date()
-        
-    except Exception as e:
-        logger.warning(f"Error converting shamsi date {shamsi_date_str}: {e}")
-        return datetime.now().date()
+
+def split_shamsi_range(start_date_shamsi: str, end_date_shamsi: str, window_size: str) -> List[Tuple[str, str]]:
+    """
+    تقسیم یک بازه تاریخ شمسی به بازه‌های کوچکتر
+    
+    Args:
+        start_date_shamsi: تاریخ شروع به فرمت 1403/05/01
+        end_date_shamsi: تاریخ پایان به فرمت 1403/12/29
+        window_size: 'week' (شنبه تا جمعه)، 'month' (ماه شمسی) یا 'none'
+        
+    Returns:
+        لیست بازه‌ها به صورت (شروع، پایان)؛ اگر تقسیم ممکن نباشد همان بازه اصلی
+    """
+    if window_size not in ('week', 'month'):
+        return [(start_date_shamsi, end_date_shamsi)]
+    
+    try:
+        start = convert_shamsi_to_gregorian(start_date_shamsi)
+        end = convert_shamsi_to_gregorian(end_date_shamsi)
+    except jalali.JalaliDateError:
+        return [(start_date_shamsi, end_date_shamsi)]
+    
+    if start > end:
+        return [(start_date_shamsi, end_date_shamsi)]
+    
+    windows = []
+    current = start
+    while current <= end:
+        if window_size == 'week':
+            window_end = current + timedelta(days=6 - jalali.weekday(current))
+        else:
+            year, month, _ = jalali.from_gregorian(current)
+            window_end = jalali.to_gregorian(year, month, jalali.month_length(year, month))
+        window_end = min(window_end, end)
+        windows.append((jalali.gregorian_to_shamsi(current), jalali.gregorian_to_shamsi(window_end)))
+        current = window_end + timedelta(days=1)
+    
+    return windows
 
 
 class ScrollTimeService:
@@ -56,17 +86,47 @@ class ScrollTimeService:
     
     BASE_URL = "https://www.ime.co.ir/subsystems/ime/services/home/imedata.asmx/GetAmareMoamelatList"
     
-    # Headers پیش‌فرض برای درخواست - مطابق کد موفق
-    DEFAULT_HEADERS = {
-        'Content-Type': 'application/json; charset=UTF-8',
-        'Accept': 'text/plain, */*; q=0.01',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-        'Accept-Language': 'fa-IR,fa;q=0.9,en-GB;q=0.8,en;q=0.7,en-US;q=0.6'
-    }
+    # Headers پیش‌فرض برای درخواست - مطابق کد موفق (مشترک با IMEClient)
+    DEFAULT_HEADERS = IMEClient.DEFAULT_HEADERS
+    
+    # تنظیمات ارسال درخواست (retry و محدودیت نرخ در IMEClient)
+    REQUEST_TIMEOUT = 30  # timeout افزایش یافته برای شبکه کندتر
+    
+    # اندازه هر تکه در خواندن جریانی پاسخ (بایت)
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
+    # بیشترین تعداد درخواست همزمان به سرور بورس (برای بازه‌های تقسیم شده)
+    MAX_CONCURRENCY = 4
+    
+    # تعداد رکوردهای هر دسته در ذخیره‌سازی دسته‌ای
+    IMPORT_BATCH_SIZE = 1000
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(self.DEFAULT_HEADERS)
+    # دسته‌های AllData بزرگ‌تر از این تعداد با COPY و جدول موقت نوشته می‌شوند
+    COPY_THRESHOLD = 5000
+    
+    # کلید یکتای PriceData و فیلدهایی که در صورت تکرار بروزرسانی می‌شوند
+    PRICE_UNIQUE_FIELDS = ['commodity_name', 'symbol', 'price_date', 'source']
+    PRICE_UPDATE_FIELDS = ['final_price', 'avg_price', 'min_price', 'max_price', 'base_price', 'volume', 'updated_at']
+    
+    # کلید یکتای AllData (شناسه‌های IME) و فیلدهایی که در صورت تکرار بازنویسی می‌شوند
+    ALLDATA_UNIQUE_FIELDS = list(DataManagementAllData.NATURAL_KEY)
+    ALLDATA_UPDATE_FIELDS = [
+        'commodity_name', 'hall', 'producer', 'contract_type',
+        'final_price', 'transaction_value', 'lowest_price', 'highest_price', 'base_price',
+        'offer_volume', 'demand_volume', 'contract_volume', 'unit',
+        'supplier', 'broker', 'settlement_type', 'delivery_date', 'warehouse', 'settlement_date',
+        'b_arzeh_radif_tar_sarresid', 'mode_description', 'method_description',
+        'packet_name', 'currency', 'jalali_date_key', 'commodity',
+        'raw_data', 'source', 'api_endpoint', 'updated_at',
+    ]
+    
+    def __init__(self, cache: Optional[IMEResponseCache] = None, client: Optional[IMEClient] = None):
+        # کلاینت مشترک پردازه (connection pool، محدودیت نرخ، retry و قطع‌کننده مدار)
+        self.client = client or get_client()
+        # cache دیسکی پاسخ‌ها (حالت آن از تنظیمات IME_RESPONSE_CACHE_MODE خوانده می‌شود)
+        self.cache = cache or IMEResponseCache()
+        # نگاشت فیلدهای IME به مدل‌ها (یک بار کامپایل می‌شود)
+        self.normalizer = IMERecordNormalizer()
     
     def fetch_data(self, scroll_request: ScrollTimeRequest) -> Dict[str, Any]:
         """
@@ -91,8 +151,8 @@ class ScrollTimeService:
             
             # بررسی payload قبل از ارسال
             # نکته: در API سازمان بورس، مقدار 0 به معنای "همه" است و معتبر است
-            if payload.get('MainCat') is None or payload.get('Cat') is None or payload.get('SubCat') is None:
-                error_msg = "اطلاعات دسته‌بندی کامل نیست. لطفاً دسته‌بندی‌ها را کامل کنید."
+            error_msg = self._validate_payload(payload)
+            if error_msg:
                 logger.error(error_msg)
                 
                 scroll_request.status = 'failed'
@@ -105,80 +165,26 @@ class ScrollTimeService:
                     'data': None
                 }
             
-            # ارسال درخواست با timeout بیشتر و retry
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Attempt {attempt + 1}/{max_retries}")
-                    
-                    response = self.session.post(
-                        self.BASE_URL,
-                        json=payload,  # استفاده از json به جای data - مطابق کد موفق
-                        timeout=30  # timeout افزایش یافته برای شبکه کندتر
-                    )
-                    
-                    logger.info(f"Response status: {response.status_code}")
-                    logger.info(f"Response headers: {dict(response.headers)}")
-                    
-                    # بررسی وضعیت پاسخ
-                    if response.status_code == 200:
-                        break
-                    elif response.status_code == 500 and attempt < max_retries - 1:
-                        logger.warning(f"Server error on attempt {attempt + 1}, retrying...")
-                        continue
-                    else:
-                        response.raise_for_status()
-                        
-                except requests.exceptions.Timeout:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"Timeout on attempt {attempt + 1}, retrying...")
-                        continue
-                    else:
-                        raise
-                except requests.exceptions.RequestException as e:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"Request error on attempt {attempt + 1}: {e}, retrying...")
-                        continue
-                    else:
-                        raise
-            
-            # پردازش پاسخ JSON - API IME پاسخ را در فیلد "d" قرار می‌دهد
-            response_json = response.json()
-            logger.info(f"Raw response JSON: {response_json}")
-            
-            # استخراج داده‌های اصلی از فیلد "d"
-            if 'd' in response_json:
-                # داده‌ها در فیلد "d" به صورت JSON string هستند
-                data_string = response_json.get('d', '[]')
-                logger.info(f"Data string from 'd' field: {data_string[:500]}...")  # نمایش 500 کاراکتر اول
-                try:
-                    data = json.loads(data_string) if isinstance(data_string, str) else data_string
-                except json.JSONDecodeError as decode_error:
-                    logger.error(f"JSON decode error: {decode_error}")
-                    data = data_string
-            else:
-                data = response_json
+            # ارسال درخواست(ها) و خواندن جریانی رکوردها از فیلد "d"؛ رکوردها همزمان با
+            # دریافت فشرده و در جدول پاسخ‌ها (ScrollTimeResponse) ذخیره می‌شوند
+            response = scroll_request.set_response_data(self.iter_request_records(scroll_request))
+            total = response.record_count
             
-            # بررسی اینکه data یک لیست است
-            if not isinstance(data, list):
-                logger.warning(f"Data is not a list, type: {type(data)}, value: {data}")
-                data = []
-                
-            logger.info(f"Final processed data length: {len(data)}")
+            logger.info(
+                f"Final processed data length: {total} "
+                f"({response.raw_size} bytes, {response.compressed_size} bytes compressed)"
+            )
             
-            # ذخیره داده‌های پاسخ
-            scroll_request.response_data = data
-            scroll_request.total_records = len(data)
+            scroll_request.total_records = total
             scroll_request.status = 'preview'
             scroll_request.save()
             
-            logger.info(f"Successfully received {len(data)} records")
+            logger.info(f"Successfully received {total} records")
             
             return {
                 'success': True,
-                'data': data,
-                'total_records': len(data),
-                'message': f'دریافت {len(data)} رکورد با موفقیت انجام شد'
+                'total_records': total,
+                'message': f'دریافت {total} رکورد با موفقیت انجام شد'
             }
             
         except requests.exceptions.RequestException as e:
@@ -190,7 +196,8 @@ class ScrollTimeService:
                 'error_message': str(e),
                 'url': self.BASE_URL,
                 'payload': payload,
-                'headers': dict(self.session.headers),
+                'headers': dict(self.client.headers),
+                'client_status': self.client.status(),
                 'method': 'POST'
             }
             
@@ -243,53 +250,238 @@ class ScrollTimeService:
                 'data': None
             }
     
-    def save_data_to_database(self, scroll_request: ScrollTimeRequest) -> Dict[str, Any]:
+    @staticmethod
+    def _validate_payload(payload: Dict[str, Any]) -> Optional[str]:
+        """بررسی payload قبل از ارسال؛ در صورت نقص پیام خطا برمی‌گرداند"""
+        # نکته: در API سازمان بورس، مقدار 0 به معنای "همه" است و معتبر است
+        if payload.get('MainCat') is None or payload.get('Cat') is None or payload.get('SubCat') is None:
+            return "اطلاعات دسته‌بندی کامل نیست. لطفاً دسته‌بندی‌ها را کامل کنید."
+        return None
+    
+    def iter_request_records(self, scroll_request: ScrollTimeRequest) -> Iterator[Dict[str, Any]]:
+        """
+        دریافت رکوردهای یک درخواست Scroll Time
+        
+        اگر window_size تعیین شده باشد، بازه تاریخ به بازه‌های هفتگی/ماهانه شمسی
+        تقسیم می‌شود و بازه‌ها به صورت موازی (حداکثر MAX_CONCURRENCY درخواست
+        همزمان) دریافت می‌شوند؛ در غیر این صورت یک درخواست جریانی ارسال می‌شود.
+        پیشرفت هر بازه در window_progress درخواست ثبت می‌شود.
+        
+        Args:
+            scroll_request: شی درخواست Scroll Time
+            
+        Yields:
+            رکوردهای بدون تکرار پاسخ
+        """
+        windows = split_shamsi_range(
+            scroll_request.start_date_shamsi, scroll_request.end_date_shamsi, scroll_request.window_size
+        )
+        progress = [
+            {'start': start, 'end': end, 'status': 'pending', 'records': 0}
+            for start, end in windows
+        ]
+        self._save_window_progress(scroll_request, progress)
+        
+        if len(windows) == 1:
+            entry = progress[0]
+            try:
+                for record in self.iter_payload_records(scroll_request.get_payload()):
+                    entry['records'] += 1
+                    yield record
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)[:500]
+                self._save_window_progress(scroll_request, progress)
+                raise
+            entry['status'] = 'completed'
+            self._save_window_progress(scroll_request, progress)
+            return
+        
+        yield from self._fetch_windows(scroll_request, windows, progress)
+    
+    def _fetch_windows(self, scroll_request: ScrollTimeRequest, windows: List[Tuple[str, str]],
+                       progress: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        دریافت موازی بازه‌ها و ادغام نتایج بدون رکورد تکراری
+        
+        درخواست‌ها در threadهای جداگانه ارسال می‌شوند ولی ثبت پیشرفت و yield
+        رکوردها فقط در thread فراخوان انجام می‌شود (دسترسی به پایگاه داده از
+        threadهای کارگر انجام نمی‌شود).
+        """
+        payloads = [scroll_request.get_payload(start, end) for start, end in windows]
+        max_workers = min(len(windows), self.MAX_CONCURRENCY)
+        logger.info(f"Fetching {len(windows)} windows with {max_workers} workers")
+        
+        seen = set()
+        failed = []
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scroll-time')
+        try:
+            futures = {
+                executor.submit(self._fetch_window, payload): index
+                for index, payload in enumerate(payloads)
+            }
+            for future in as_completed(futures):
+                entry = progress[futures[future]]
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logger.error(f"Window {entry['start']} - {entry['end']} failed: {e}")
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)[:500]
+                    failed.append(entry)
+                    self._save_window_progress(scroll_request, progress)
+                    continue
+                
+                entry['status'] = 'completed'
+                entry['records'] = len(records)
+                self._save_window_progress(scroll_request, progress)
+                
+                for record in records:
+                    key = self._record_key(record)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield record
+        finally:
+            # در صورت توقف زودهنگام، درخواست‌های شروع نشده لغو می‌شوند
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        if failed:
+            ranges = '، '.join(f"{entry['start']} تا {entry['end']}" for entry in failed)
+            raise requests.exceptions.RequestException(
+                f"دریافت {len(failed)} بازه از {len(windows)} بازه ناموفق بود: {ranges}"
+            )
+    
+    def _fetch_window(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """دریافت کامل یک بازه (در thread کارگر اجرا می‌شود)"""
+        return list(self.iter_payload_records(payload))
+    
+    @staticmethod
+    def _save_window_progress(scroll_request: ScrollTimeRequest, progress: List[Dict[str, Any]]):
+        """ثبت پیشرفت بازه‌ها روی درخواست"""
+        scroll_request.windows_total = len(progress)
+        scroll_request.windows_completed = sum(1 for entry in progress if entry['status'] == 'completed')
+        scroll_request.window_progress = [dict(entry) for entry in progress]
+        scroll_request.save(update_fields=['windows_total', 'windows_completed', 'window_progress', 'updated_at'])
+    
+    @staticmethod
+    def _record_key(record: Dict[str, Any]) -> Any:
+        """کلید یکتای یک رکورد خام برای حذف تکراری‌ها در ادغام بازه‌ها"""
+        key = (record.get('xTalarReportPK'), record.get('arzehPk'), record.get('Symbol'), record.get('date'))
+        if key[0] is None and key[1] is None:
+            return json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+        return key
+    
+    def _send_request(self, payload: Dict[str, Any]) -> requests.Response:
+        """
+        ارسال درخواست به API از طریق کلاینت مشترک (retry با تأخیر نمایی)
+        
+        پاسخ به صورت stream دریافت می‌شود تا بدنه آن تکه‌به‌تکه خوانده شود؛
+        فراخوان باید پس از مصرف، response.close() را صدا بزند.
+        
+        Args:
+            payload: بدنه درخواست
+            
+        Returns:
+            شی Response با وضعیت 200
+        """
+        return self.client.post(
+            self.BASE_URL,
+            json=payload,  # استفاده از json به جای data - مطابق کد موفق
+            timeout=self.REQUEST_TIMEOUT,
+            stream=True
+        )
+    
+    def iter_payload_records(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        رکوردهای پاسخ یک payload؛ ابتدا از cache دیسکی و در غیر این صورت از API
+        
+        پاسخ‌های دریافتی از API همزمان با پارس شدن در cache نوشته می‌شوند و فقط
+        در صورت دریافت و پارس کامل در cache باقی می‌مانند.
+        
+        Args:
+            payload: بدنه درخواست
+            
+        Yields:
+            هر رکورد به صورت dict
+        """
+        cached = self.cache.open(self.BASE_URL, payload)
+        if cached is not None:
+            yield from self.iter_body_records(self.cache.iter_chunks(cached))
+            return
+        
+        response = self._send_request(payload)
+        writer = self.cache.writer(self.BASE_URL, payload)
+        try:
+            chunks = response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE)
+            if writer is not None:
+                chunks = writer.wrap(chunks)
+            yield from self.iter_body_records(chunks)
+            if writer is not None:
+                writer.commit()
+                writer = None
+        finally:
+            if writer is not None:
+                writer.discard()
+            response.close()
+    
+    def iter_body_records(self, chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+        """
+        خواندن جریانی رکوردهای بدنه پاسخ (بدون نگه‌داشتن کل بدنه در حافظه)
+        
+        Args:
+            chunks: تکه‌های بدنه پاسخ (از شبکه یا cache)
+            
+        Yields:
+            هر رکورد به صورت dict (عناصر غیر dict نادیده گرفته می‌شوند)
+        """
+        for record in iter_ime_records(chunks):
+            if isinstance(record, dict):
+                yield record
+            else:
+                logger.warning(f"Skipping non-object record: {truncate_for_log(record, 200)}")
+    
+    def save_data_to_database(self, scroll_request: ScrollTimeRequest, batch_size: Optional[int] = None) -> Dict[str, Any]:
         """
         ذخیره داده‌های دریافت شده در پایگاه داده
         
+        رکوردها به صورت دسته‌ای (batch) وارد می‌شوند؛ جزئیات در import_records.
+        
         Args:
             scroll_request: شی درخواست Scroll Time
+            batch_size: تعداد رکوردهای هر دسته (پیش‌فرض: IMPORT_BATCH_SIZE)
             
         Returns:
             Dict شامل گزارش عملکرد
         """
+        # آمار عملکرد
+        stats = self._empty_stats()
+        
         try:
-            if not scroll_request.response_data:
+            response = scroll_request.get_response()
+            if response is None or not response.record_count:
                 return {
                     'success': False,
                     'error': 'هیچ داده‌ای برای ذخیره وجود ندارد',
                     'stats': {}
                 }
             
-            # آمار عملکرد
-            stats = {
-                'total_records': 0,
-                'imported_records': 0,
-                'updated_records': 0,
-                'duplicate_records': 0,
-                'error_records': 0,
-            }
-            
-            data_list = scroll_request.response_data
-            if not isinstance(data_list, list):
-                data_list = [data_list]
-            
-            stats['total_records'] = len(data_list)
+            stats['total_records'] = response.record_count
+            scroll_request.status = 'processing'
+            scroll_request.total_records = response.record_count
+            scroll_request.processed_records = 0
+            scroll_request.save(update_fields=['status', 'total_records', 'processed_records', 'updated_at'])
             
-            # پردازش هر رکورد
-            for record in data_list:
-                try:
-                    processed = self._process_single_record(record, scroll_request, stats)
-                    if processed:
-                        stats['imported_records'] += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing record: {e}")
-                    stats['error_records'] += 1
+            # پردازش دسته‌ای رکوردها به صورت جریانی از پاسخ فشرده
+            coercion_report = CoercionReport()
+            self.import_records(
+                self.iter_body_records(response.iter_chunks()), scroll_request, stats,
+                batch_size=batch_size, coercion_report=coercion_report
+            )
             
             # بروزرسانی وضعیت درخواست
             scroll_request.status = 'completed'
-            scroll_request.processed_records = stats['imported_records'] + stats['updated_records']
+            scroll_request.processed_records = stats['imported_records']
             scroll_request.save()
             # ایجاد لاگ وارد کردن داده (در صورت خطا آن را نادیده بگیرید)
             try:
@@ -300,6 +492,7 @@ class ScrollTimeService:
             return {
                 'success': True,
                 'stats': stats,
+                'coercion_report': coercion_report.as_dict(),
                 'message': f'ذخیره داده‌ها با موفقیت انجام شد. {stats["imported_records"]} رکورد جدید، {stats["updated_records"]} رکورد بروزرسانی شد.'
             }
             
@@ -317,206 +510,322 @@ class ScrollTimeService:
                 'stats': stats
             }
     
-    def _process_single_record(self, record: Dict[str, Any], scroll_request: ScrollTimeRequest, stats: Dict[str, int]) -> bool:
+    def stream_to_database(self, scroll_request: ScrollTimeRequest, batch_size: Optional[int] = None) -> Dict[str, Any]:
         """
-        پردازش یک رکورد منفرد
+        دریافت داده از سرور بورس و ذخیره مستقیم آن بدون مرحله پیش‌نمایش
+        
+        رکوردها همزمان با دریافت بدنه پاسخ پارس و به صورت دسته‌ای ذخیره می‌شوند؛
+        بنابراین نه کل پاسخ و نه لیست رکوردها در حافظه (یا جدول پاسخ‌ها) نگه
+        داشته نمی‌شود.
         
         Args:
-            record: رکورد داده
-            scroll_request: درخواست اصلی
-            stats: آمار عملکرد
+            scroll_request: شی درخواست Scroll Time
+            batch_size: تعداد رکوردهای هر دسته (پیش‌فرض: IMPORT_BATCH_SIZE)
             
         Returns:
-            True اگر رکورد با موفقیت پردازش شد
+            Dict شامل گزارش عملکرد
         """
+        stats = self._empty_stats()
+        
         try:
-            # استخراج اطلاعات از رکورد واقعی Iran Exchange API
-            goods_name = record.get('GoodsName', 'نامشخص')
-            symbol = record.get('Symbol', '')
-            shamsi_date_str = record.get('date')  # فرمت: 1403/05/01
-            
-            # تبدیل تاریخ شمسی به میلادی
-            price_date = convert_shamsi_to_gregorian(shamsi_date_str)
-            
-            # بررسی وجود رکورد تکراری براساس commodity_name و price_date
-            # (مطابق unique_together در مدل)
-            existing_record = PriceData.objects.filter(
-                commodity_name=goods_name,
-                price_date=price_date
-            ).first()
-            
-            # بررسی وجود رکورد تکراری در AllData نیز
-            existing_alldata = DataManagementAllData.objects.filter(
-                commodity_name=goods_name,
-                transaction_date=shamsi_date_str
-            ).first()
-            
-            if existing_record or existing_alldata:
-                stats['duplicate_records'] += 1
+            scroll_request.status = 'processing'
+            scroll_request.total_records = 0
+            scroll_request.processed_records = 0
+            scroll_request.save()
+            
+            payload = scroll_request.get_payload()
+            logger.info(f"Streaming request to {self.BASE_URL}")
+            logger.info(f"Payload: {payload}")
+            
+            error_msg = self._validate_payload(payload)
+            if error_msg:
+                raise ValueError(error_msg)
+            
+            records = self._count_records(self.iter_request_records(scroll_request), stats)
+            coercion_report = CoercionReport()
+            self.import_records(
+                records, scroll_request, stats, batch_size=batch_size, coercion_report=coercion_report
+            )
+            
+            scroll_request.total_records = stats['total_records']
+            scroll_request.status = 'completed'
+            scroll_request.processed_records = stats['imported_records']
+            scroll_request.save()
+            try:
+                self._create_import_log(scroll_request, stats)
+            except Exception as log_exc:
+                logger.warning(f"Skipping import log due to error: {log_exc}")
+            
+            return {
+                'success': True,
+                'stats': stats,
+                'coercion_report': coercion_report.as_dict(),
+                'message': f'ذخیره داده‌ها با موفقیت انجام شد. {stats["imported_records"]} رکورد جدید، {stats["updated_records"]} رکورد بروزرسانی شد.'
+            }
+            
+        except Exception as e:
+            error_msg = f"خطا در دریافت و ذخیره داده‌ها: {str(e)}"
+            logger.error(error_msg)
+            
+            scroll_request.status = 'failed'
+            scroll_request.error_message = error_msg
+            scroll_request.total_records = stats['total_records']
+            scroll_request.processed_records = stats['imported_records']
+            scroll_request.save()
+            
+            return {
+                'success': False,
+                'error': error_msg,
+                'stats': stats
+            }
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            'total_records': 0,
+            'imported_records': 0,
+            'updated_records': 0,
+            'duplicate_records': 0,
+            'error_records': 0,
+        }
+    
+    @staticmethod
+    def _count_records(records: Iterable[Dict[str, Any]], stats: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+        """شمارش رکوردهای عبوری در stats['total_records']"""
+        for record in records:
+            stats['total_records'] += 1
+            yield record
+    
+    def import_records(self, records: Iterable[Dict[str, Any]], scroll_request: ScrollTimeRequest,
+                       stats: Dict[str, int], batch_size: Optional[int] = None,
+                       coercion_report: Optional[CoercionReport] = None) -> Dict[str, int]:
+        """
+        وارد کردن دسته‌ای رکوردها در PriceData و AllData
+        
+        رکوردها batch_size تایی خوانده می‌شوند. برای هر دسته فقط یک کوئری برای
+        یافتن کلیدهای موجود هر جدول اجرا می‌شود و نوشتن‌ها (bulk_create /
+        bulk_update / delete) داخل یک تراکنش انجام می‌شوند. اگر یک دسته با خطا
+        مواجه شود، همه رکوردهای آن دسته در error_records شمرده می‌شوند.
+        
+        تجمیع روزانه/هفتگی/ماهانه/سالانه برای هر رکورد اجرا نمی‌شود؛ پس از پایان
+        ورود یک تجمیع برای تاریخ‌های تغییر یافته اجرا می‌شود (deferred_rollups).
+        
+        Args:
+            records: هر iterable از رکوردهای خام API (لیست یا generator)
+            scroll_request: درخواست اصلی (برای duplicate_handling و source)
+            stats: دیکشنری آمار که به‌روزرسانی می‌شود
+            batch_size: تعداد رکوردهای هر دسته
+            coercion_report: گزارش خطاهای تبدیل همه دسته‌ها در آن جمع می‌شود
+            
+        Returns:
+            همان دیکشنری stats
+        """
+        batch_size = batch_size or self.IMPORT_BATCH_SIZE
+        iterator = iter(records)
+        
+        # تاریخ‌های تغییر یافته همه دسته‌ها جمع و پس از آخرین دسته یک بار تجمیع می‌شوند
+        with deferred_rollups():
+            while True:
+                chunk = list(islice(iterator, batch_size))
+                if not chunk:
+                    break
                 
-                # رفتار با داده‌های تکراری
-                if scroll_request.duplicate_handling == 'skip':
-                    return False
-                elif scroll_request.duplicate_handling == 'update':
-                    if existing_record:
-                        self._update_price_record(existing_record, record)
-                    if existing_alldata:
-                        self._update_alldata_record(existing_alldata, record, scroll_request)
-                    stats['updated_records'] += 1
-                    return True
-                elif scroll_request.duplicate_handling == 'replace':
-                    if existing_record:
-                        existing_record.delete()
-                    if existing_alldata:
-                        existing_alldata.delete()
-                    self._create_price_record(record, scroll_request)
-                    self._create_alldata_record(record, scroll_request)
-                    return True
-            else:
-                # ایجاد رکوردهای جدید در هر دو جدول
-                self._create_price_record(record, scroll_request)
-                self._create_alldata_record(record, scroll_request)
-                return True
+                try:
+                    with transaction.atomic():
+                        chunk_stats = self._import_chunk(chunk, scroll_request, coercion_report)
+                except Exception as e:
+                    logger.error(f"Error importing chunk of {len(chunk)} records: {e}")
+                    stats['error_records'] += len(chunk)
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Error processing single record: {e}")
-            logger.error(f"Record data: {record}")
-            raise
-    
-    def _create_price_record(self, record: Dict[str, Any], scroll_request: ScrollTimeRequest) -> PriceData:
-        """ایجاد رکورد جدید PriceData براساس ساختار Iran Exchange API"""
-        
-        # تبدیل تاریخ شمسی به میلادی
-        shamsi_date_str = record.get('date', '')  # 1403/05/01
-        price_date = convert_shamsi_to_gregorian(shamsi_date_str)
-        
-        return PriceData.objects.create(
-            # اطلاعات اصلی کالا (mapping به field های واقعی PriceData)
-            commodity_name=record.get('GoodsName', 'نامشخص')[:100],  # محدود به 100 کاراکتر
-            symbol=record.get('Symbol', '')[:50],  # محدود به 50 کاراکتر
-            
-            # تاریخ
-            price_date=price_date,
-            
-            # اطلاعات قیمت (mapping به field های واقعی)
-            final_price=record.get('Price', 0),  # قیمت نهایی
-            avg_price=record.get('Price', 0),    # فعلاً از همان Price استفاده می‌کنیم
-            lowest_price=record.get('MinPrice', 0),  # کمترین قیمت
-            highest_price=record.get('MaxPrice', 0),  # بیشترین قیمت
-            
-            # اطلاعات حجم و ارزش
-            volume=int(record.get('Quantity', 0)) if record.get('Quantity') else None,  # حجم
-            value=record.get('TotalPrice', 0),  # ارزش کل
-            unit=record.get('Unit', '')[:20],  # واحد - محدود به 20 کاراکتر
-            
-            # متاداده
-            source='scroll_time'
+                for key, value in chunk_stats.items():
+                    stats[key] += value
+                
+                self._report_progress(scroll_request, stats)
+        
+        return stats
+    
+    @staticmethod
+    def _report_progress(scroll_request: ScrollTimeRequest, stats: Dict[str, int]):
+        """
+        ثبت پیشرفت ذخیره‌سازی (برای نمایش زنده وضعیت در ادمین)
+        
+        رکوردهای بروزرسانی شده در imported_records هم شمرده می‌شوند؛ بنابراین
+        imported_records تعداد رکوردهای نوشته شده است.
+        """
+        scroll_request.processed_records = stats['imported_records']
+        scroll_request.total_records = max(scroll_request.total_records, stats['total_records'])
+        ScrollTimeRequest.objects.filter(pk=scroll_request.pk).update(
+            processed_records=scroll_request.processed_records,
+            total_records=scroll_request.total_records,
         )
     
-    def _update_price_record(self, existing_record: PriceData, new_data: Dict[str, Any]):
-        """بروزرسانی رکورد موجود براساس ساختار Iran Exchange API"""
-        existing_record.commodity_name = new_data.get('GoodsName', existing_record.commodity_name)[:100]
-        existing_record.final_price = new_data.get('Price', existing_record.final_price)
-        existing_record.avg_price = new_data.get('Price', existing_record.avg_price)  # فعلاً از همان Price استفاده می‌کنیم
-        existing_record.lowest_price = new_data.get('MinPrice', existing_record.lowest_price)
-        existing_record.highest_price = new_data.get('MaxPrice', existing_record.highest_price)
-        existing_record.volume = int(new_data.get('Quantity', existing_record.volume or 0)) if new_data.get('Quantity') else existing_record.volume
-        existing_record.value = new_data.get('TotalPrice', existing_record.value)
-        existing_record.unit = new_data.get('Unit', existing_record.unit)[:20]
-        existing_record.source = 'scroll_time'
-        existing_record.save()
-    
-    def _create_alldata_record(self, record: Dict[str, Any], scroll_request: ScrollTimeRequest) -> DataManagementAllData:
-        """ایجاد رکورد جدید در مدل data_management.AllData براساس ساختار Iran Exchange API"""
-        
-        shamsi_date_str = record.get('date', '')  # 1403/05/01
-        
-        return DataManagementAllData.objects.create(
-            # اطلاعات اصلی کالا
-            commodity_name=record.get('GoodsName', 'نامشخص')[:100],
-            symbol=record.get('Symbol', '')[:50],
-            hall=record.get('Hall', '')[:100],
-            producer=record.get('Producer', '')[:200],
-            contract_type=record.get('ContractType', '')[:50],
-            
-            # قیمت‌ها
-            final_price=record.get('Price', 0),
-            transaction_value=record.get('TotalPrice', 0),
-            lowest_price=record.get('MinPrice', 0),
-            highest_price=record.get('MaxPrice', 0),
-            base_price=record.get('BasePrice', 0),
-            
-            # حجم‌ها
-            offer_volume=int(record.get('OfferVolume', 0)) if record.get('OfferVolume') else 0,
-            demand_volume=int(record.get('DemandVolume', 0)) if record.get('DemandVolume') else 0,
-            contract_volume=int(record.get('Quantity', 0)) if record.get('Quantity') else 0,
-            unit=record.get('Unit', '')[:20],
-            
-            # تاریخ
-            transaction_date=shamsi_date_str,
-            
-            # اطلاعات اضافی
-            supplier=record.get('Supplier', '')[:200],
-            broker=record.get('Broker', '')[:100],
-            settlement_type=record.get('SettlementType', '')[:50],
-            delivery_date=record.get('DeliveryDate', ''),
-            warehouse=record.get('Warehouse', ''),
-            settlement_date=record.get('SettlementDate', ''),
-            
-            # شناسه‌ها
-            x_talar_report_pk=record.get('XTalarReportPK'),
-            arzeh_pk=record.get('ArzehPK'),
-            packet_name=record.get('PacketName', ''),
-            currency=record.get('Currency', ''),
-            
-            # داده خام
-            raw_data=record,
-            
-            # متادیتا
-            source=f'scroll_time_{scroll_request.id}',
-            api_endpoint='https://www.ime.co.ir/subsystems/ime/services/home/imedata.asmx/GetAmareMoamelatList'
+    def _import_chunk(self, chunk: List[Dict[str, Any]], scroll_request: ScrollTimeRequest,
+                      coercion_report: Optional[CoercionReport] = None) -> Dict[str, int]:
+        """پردازش یک دسته از رکوردهای یک درخواست Scroll Time (داخل transaction.atomic)"""
+        return self.import_batch(
+            chunk,
+            scroll_request.duplicate_handling,
+            alldata_source=f'scroll_time_{scroll_request.id}',
+            api_endpoint=self.BASE_URL,
+            coercion_report=coercion_report,
+            label=f'request {scroll_request.id}',
+            subcategory_id=scroll_request.subcategory_id,
         )
     
-    def _update_alldata_record(self, existing_record: DataManagementAllData, new_data: Dict[str, Any], scroll_request: ScrollTimeRequest) -> None:
-        """بروزرسانی رکورد موجود در مدل data_management.AllData براساس ساختار Iran Exchange API"""
-        existing_record.commodity_name = new_data.get('GoodsName', existing_record.commodity_name)[:100]
-        existing_record.symbol = new_data.get('Symbol', existing_record.symbol)[:50]
-        existing_record.hall = new_data.get('Hall', existing_record.hall)[:100]
-        existing_record.producer = new_data.get('Producer', existing_record.producer)[:200]
-        existing_record.contract_type = new_data.get('ContractType', existing_record.contract_type)[:50]
-        
-        # قیمت‌ها
-        existing_record.final_price = new_data.get('Price', existing_record.final_price)
-        existing_record.transaction_value = new_data.get('TotalPrice', existing_record.transaction_value)
-        existing_record.lowest_price = new_data.get('MinPrice', existing_record.lowest_price)
-        existing_record.highest_price = new_data.get('MaxPrice', existing_record.highest_price)
-        existing_record.base_price = new_data.get('BasePrice', existing_record.base_price)
-        
-        # حجم‌ها
-        existing_record.offer_volume = int(new_data.get('OfferVolume', existing_record.offer_volume or 0)) if new_data.get('OfferVolume') else existing_record.offer_volume
-        existing_record.demand_volume = int(new_data.get('DemandVolume', existing_record.demand_volume or 0)) if new_data.get('DemandVolume') else existing_record.demand_volume
-        existing_record.contract_volume = int(new_data.get('Quantity', existing_record.contract_volume or 0)) if new_data.get('Quantity') else existing_record.contract_volume
-        existing_record.unit = new_data.get('Unit', existing_record.unit)[:20]
-        
-        # اطلاعات اضافی
-        existing_record.supplier = new_data.get('Supplier', existing_record.supplier)[:200]
-        existing_record.broker = new_data.get('Broker', existing_record.broker)[:100]
-        existing_record.settlement_type = new_data.get('SettlementType', existing_record.settlement_type)[:50]
-        existing_record.delivery_date = new_data.get('DeliveryDate', existing_record.delivery_date)
-        existing_record.warehouse = new_data.get('Warehouse', existing_record.warehouse)
-        existing_record.settlement_date = new_data.get('SettlementDate', existing_record.settlement_date)
-        
-        # شناسه‌ها
-        existing_record.x_talar_report_pk = new_data.get('XTalarReportPK', existing_record.x_talar_report_pk)
-        existing_record.arzeh_pk = new_data.get('ArzehPK', existing_record.arzeh_pk)
-        existing_record.packet_name = new_data.get('PacketName', existing_record.packet_name)
-        existing_record.currency = new_data.get('Currency', existing_record.currency)
-        
-        # داده خام و متادیتا
-        existing_record.raw_data = new_data
-        existing_record.source = f'scroll_time_{scroll_request.id}'
-        
-        existing_record.save()
+    def import_batch(self, chunk: List[Dict[str, Any]], duplicate_handling: str, alldata_source: str,
+                     price_source: str = 'scroll_time', api_endpoint: Optional[str] = None,
+                     coercion_report: Optional[CoercionReport] = None, label: str = '',
+                     subcategory_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        نرمال‌سازی و نوشتن یک دسته از رکوردهای خام در PriceData و AllData
+        (باید داخل transaction.atomic فراخوانی شود)
+        
+        وجود رکورد برای هر جدول جداگانه و روی کلید همان جدول بررسی می‌شود (کلید
+        PriceData درشت‌تر از کلید طبیعی AllData است؛ چند معامله یک روز یک ردیف
+        PriceData دارند ولی هر کدام ردیف AllData خود را دارند):
+        - skip: رکوردی که در آن جدول وجود دارد نادیده گرفته می‌شود
+        - update: رکوردهای موجود با مقادیر جدید بروزرسانی می‌شوند
+        - replace: رکوردهای موجود حذف و دوباره ایجاد می‌شوند
+        تکرار داخل خود دسته نیز مثل رکوردی که قبلاً ذخیره شده در نظر گرفته می‌شود.
+        آمار (جدید/تکراری/بروزرسانی) بر اساس AllData (هر معامله) شمرده می‌شود.
+        """
+        chunk_stats = {
+            'imported_records': 0,
+            'updated_records': 0,
+            'duplicate_records': 0,
+            'error_records': 0,
+        }
+        
+        # نرمال‌سازی رکوردها و ساخت اشیاء مدل (بدون ذخیره)
+        accepted, report = self.normalizer.normalize_batch(chunk)
+        chunk_stats['error_records'] += report.rejected
+        if report.has_issues:
+            logger.warning(f"Coercion issues in {label or alldata_source} batch: {report.summary()}")
+        if coercion_report is not None:
+            coercion_report.merge(report)
+        
+        entries = [
+            (
+                self.normalizer.build_price(row, source=price_source),
+                self.normalizer.build_alldata(row, raw_data=record, source=alldata_source, api_endpoint=api_endpoint),
+            )
+            for record, row in accepted
+        ]
+        
+        if not entries:
+            return chunk_stats
+        
+        # شناسه کالا از cache نام‌ها (کالاهای جدید با زیرگروه این ورود ایجاد می‌شوند)
+        get_commodity_resolver().assign((alldata for _, alldata in entries), subcategory_id)
+        
+        # یک کوئری برای هر جدول جهت یافتن رکوردهای موجود
+        existing_prices = self._existing_price_keys([price for price, _ in entries])
+        existing_alldata = self._existing_alldata_keys([alldata for _, alldata in entries])
+        
+        price_rows = {}
+        alldata_rows = {}
+        delete_price_ids = set()
+        delete_alldata_ids = set()
+        
+        for price_obj, alldata_obj in entries:
+            price_key = self._price_key(price_obj)
+            alldata_key = self._alldata_key(alldata_obj)
+            
+            # PriceData: خلاصه روزانه نماد؛ مستقل از AllData
+            if price_key not in existing_prices and price_key not in price_rows:
+                price_rows[price_key] = price_obj
+            elif duplicate_handling == 'update':
+                price_rows[price_key] = price_obj
+            elif duplicate_handling == 'replace':
+                if price_key in existing_prices:
+                    delete_price_ids.add(existing_prices[price_key])
+                price_rows[price_key] = price_obj
+            
+            # AllData: هر معامله روی کلید طبیعی خودش
+            if alldata_key not in existing_alldata and alldata_key not in alldata_rows:
+                alldata_rows[alldata_key] = alldata_obj
+                chunk_stats['imported_records'] += 1
+                continue
+            
+            chunk_stats['duplicate_records'] += 1
+            
+            if duplicate_handling == 'skip':
+                continue
+            elif duplicate_handling == 'update':
+                alldata_rows[alldata_key] = alldata_obj
+                chunk_stats['updated_records'] += 1
+                chunk_stats['imported_records'] += 1
+            elif duplicate_handling == 'replace':
+                if alldata_key in existing_alldata:
+                    delete_alldata_ids.add(existing_alldata[alldata_key])
+                alldata_rows[alldata_key] = alldata_obj
+                chunk_stats['imported_records'] += 1
+        
+        if delete_price_ids:
+            PriceData.objects.filter(pk__in=delete_price_ids).delete()
+        if delete_alldata_ids:
+            DataManagementAllData.objects.filter(pk__in=delete_alldata_ids).delete()
+        
+        # PriceData: درج و بروزرسانی در یک دستور INSERT ... ON CONFLICT DO UPDATE
+        if price_rows:
+            PriceData.objects.bulk_create(
+                list(price_rows.values()),
+                update_conflicts=True,
+                unique_fields=self.PRICE_UNIQUE_FIELDS,
+                update_fields=self.PRICE_UPDATE_FIELDS,
+            )
+        
+        # AllData: درج و بروزرسانی روی کلید طبیعی در یک دستور INSERT ... ON CONFLICT DO UPDATE؛
+        # دسته‌های بزرگ (بازیابی تاریخچه) از طریق COPY به جدول موقت و سپس ادغام
+        if len(alldata_rows) >= self.COPY_THRESHOLD and AllDataCopyLoader.is_supported():
+            AllDataCopyLoader().load(alldata_rows.values(), duplicate_handling='update')
+        elif alldata_rows:
+            DataManagementAllData.objects.bulk_create(
+                list(alldata_rows.values()),
+                update_conflicts=True,
+                unique_fields=self.ALLDATA_UNIQUE_FIELDS,
+                update_fields=self.ALLDATA_UPDATE_FIELDS,
+            )
+        
+        # bulk_create سیگنال post_save را اجرا نمی‌کند؛ تاریخ‌های ایجاد، بروزرسانی
+        # یا جایگزین شده علامت می‌خورند و پس از پایان ورود یک بار تجمیع می‌شوند
+        mark_dirty(alldata_rows.values())
+        
+        return chunk_stats
+    
+    @staticmethod
+    def _price_key(price_obj: PriceData) -> tuple:
+        """کلید یکتای PriceData (مطابق unique_together در مدل)"""
+        return (price_obj.commodity_name, price_obj.symbol, price_obj.price_date, price_obj.source)
+    
+    @staticmethod
+    def _alldata_key(alldata_obj: DataManagementAllData) -> tuple:
+        """کلید یکتای AllData (مطابق UniqueConstraint در مدل)"""
+        return alldata_obj.natural_key()
+    
+    def _existing_price_keys(self, price_objs: List[PriceData]) -> Dict[tuple, int]:
+        """یافتن رکوردهای موجود PriceData برای یک دسته با یک کوئری"""
+        existing = {}
+        rows = PriceData.objects.filter(
+            commodity_name__in={obj.commodity_name for obj in price_objs},
+            price_date__in={obj.price_date for obj in price_objs},
+        ).values_list('id', 'commodity_name', 'symbol', 'price_date', 'source')
+        for pk, *key in rows:
+            existing.setdefault(tuple(key), pk)
+        return existing
+    
+    def _existing_alldata_keys(self, alldata_objs: List[DataManagementAllData]) -> Dict[tuple, int]:
+        """یافتن رکوردهای موجود AllData برای یک دسته با یک کوئری"""
+        existing = {}
+        rows = DataManagementAllData.objects.filter(
+            x_talar_report_pk__in={obj.x_talar_report_pk for obj in alldata_objs},
+            # فیلتر trade_date فقط پارتیشن‌های ماه‌های این دسته را می‌خواند
+            trade_date__in={obj.trade_date for obj in alldata_objs},
+        ).values_list('id', *self.ALLDATA_UNIQUE_FIELDS)
+        for pk, *key in rows:
+            existing.setdefault(tuple(key), pk)
+        return existing
     
     def _create_import_log(self, scroll_request: ScrollTimeRequest, stats: Dict[str, int]):
         """ایجاد لاگ وارد کردن داده"""
@@ -529,7 +838,7 @@ class ScrollTimeService:
             updated_records=stats['updated_records'],
             duplicate_records=stats['duplicate_records'],
             error_records=stats['error_records'],
-            status='success' if stats['error_records'] == 0 else 'partial',
+            status='completed' if stats['error_records'] == 0 else 'partial',
             created_by=scroll_request.created_by
         )
 
@@ -549,23 +858,23 @@ class DataPreviewService:
         Returns:
             Dict شامل نمونه داده‌ها و آمار
         """
-        if not scroll_request.response_data:
+        response = scroll_request.get_response()
+        if response is None or not response.record_count:
             return {
                 'success': False,
                 'error': 'هیچ داده‌ای برای پیش‌نمایش وجود ندارد'
             }
         
-        data_list = scroll_request.response_data
-        if not isinstance(data_list, list):
-            data_list = [data_list]
-        
-        # نمونه رکوردها
-        sample_records = data_list[:limit]
+        # نمونه رکوردها؛ فقط ابتدای پاسخ فشرده باز و پارس می‌شود
+        records = (record for record in iter_ime_records(response.iter_chunks()) if isinstance(record, dict))
+        sample_records = list(islice(records, limit))
         
         # آمار کلی
         stats = {
-            'total_records': len(data_list),
+            'total_records': response.record_count,
             'sample_count': len(sample_records),
+            'raw_size': response.raw_size,
+            'compressed_size': response.compressed_size,
             'categories': scroll_request.main_category.name,
             'subcategories': f"{scroll_request.category.name} -> {scroll_request.subcategory.name}",
             'date_range': f"{scroll_request.start_date_shamsi} تا {scroll_request.end_date_shamsi}"
@@ -575,5 +884,6 @@ class DataPreviewService:
             'success': True,
             'stats': stats,
             'sample_records': sample_records,
+            'sample_json': json.dumps(sample_records, ensure_ascii=False, indent=2),
             'scroll_request_id': scroll_request.id
         }
@@ -0,0 +1,187 @@
+"""
+همگام‌سازی افزایشی داده‌های Scroll Time بر اساس watermark هر زیرگروه
+
+برای هر زیرگروه فعال آخرین تاریخ معامله ذخیره شده در SubCategorySyncState
+نگه‌داری می‌شود. هر اجرا فقط از SAFETY_OVERLAP_DAYS روز قبل از آن تاریخ تا
+امروز را دریافت می‌کند (همپوشانی برای اصلاحات دیرهنگام سرور بورس) و پس از
+ذخیره موفق، watermark را به صورت اتمیک جلو می‌برد. اگر چکیده محتوای پاسخ با
+آخرین دریافت یکسان باشد ذخیره‌سازی انجام نمی‌شود.
+
+دریافت و ذخیره با همان مسیر همزمان AsyncIngestionRunner انجام می‌شود.
+"""
+import hashlib
+import json
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from price_data_ingestion.models import ScrollTimeRequest, SubCategorySyncState
+from price_models import jalali
+from .async_ingestion import AsyncIngestionRunner
+from .normalizer import CoercionReport
+from .services import split_shamsi_range
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(records: List[Dict[str, Any]]) -> str:
+    """چکیده SHA-256 رکوردها، مستقل از ترتیب آن‌ها در پاسخ"""
+    lines = sorted(
+        json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+        for record in records
+    )
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class IncrementalSyncRunner(AsyncIngestionRunner):
+    """همگام‌سازی همه زیرگروه‌های فعال از watermark هر کدام تا امروز"""
+
+    # تعداد روزهایی که قبل از watermark دوباره دریافت می‌شوند
+    SAFETY_OVERLAP_DAYS = 3
+
+    # بازه اولین همگام‌سازی زیرگروهی که هنوز وضعیتی ندارد
+    INITIAL_LOOKBACK_DAYS = 30
+
+    # بازه‌های طولانی‌تر از این تعداد روز به صورت ماهانه تقسیم می‌شوند
+    MAX_SINGLE_WINDOW_DAYS = 31
+
+    def __init__(self, overlap_days: Optional[int] = None, initial_days: Optional[int] = None,
+                 end_date: Optional[date] = None, force: bool = False, **kwargs):
+        self.end_date = end_date or date.today()
+        kwargs.setdefault('created_by', 'sync_ime')
+        super().__init__(
+            start_date_shamsi=jalali.gregorian_to_shamsi(self.end_date),
+            end_date_shamsi=jalali.gregorian_to_shamsi(self.end_date),
+            **kwargs
+        )
+        self.overlap_days = self.SAFETY_OVERLAP_DAYS if overlap_days is None else overlap_days
+        self.initial_days = initial_days or self.INITIAL_LOOKBACK_DAYS
+        self.force = force
+        # نتیجه همگام‌سازی هر درخواست (شناسه درخواست -> وضعیت)
+        self._outcomes: Dict[int, Dict[str, Any]] = {}
+
+    def sync_range(self, state: Optional[SubCategorySyncState]) -> Tuple[date, date]:
+        """بازه دریافت یک زیرگروه: از watermark منهای همپوشانی (یا بازه اولیه) تا امروز"""
+        if state is not None and state.last_trade_date:
+            start = state.last_trade_date - timedelta(days=self.overlap_days)
+        else:
+            start = self.end_date - timedelta(days=self.initial_days)
+        return min(start, self.end_date), self.end_date
+
+    def plan(self, subcategories=None) -> List[Dict[str, Any]]:
+        """
+        بازه دریافت هر زیرگروه بدون ساخت درخواست (برای --dry-run و create_requests)
+
+        Returns:
+            لیست {'subcategory', 'state', 'start', 'end'}
+        """
+        if subcategories is None:
+            subcategories = self.active_subcategories()
+        subcategories = list(subcategories)
+        states = {
+            state.subcategory_id: state
+            for state in SubCategorySyncState.objects.filter(subcategory__in=subcategories)
+        }
+        entries = []
+        for subcategory in subcategories:
+            state = states.get(subcategory.id)
+            start, end = self.sync_range(state)
+            entries.append({'subcategory': subcategory, 'state': state, 'start': start, 'end': end})
+        return entries
+
+    def create_requests(self, subcategories=None):
+        """ساخت ScrollTimeRequest برای هر زیرگروه با بازه مخصوص همان زیرگروه"""
+        jobs = []
+        for entry in self.plan(subcategories):
+            subcategory = entry['subcategory']
+            start = jalali.gregorian_to_shamsi(entry['start'])
+            end = jalali.gregorian_to_shamsi(entry['end'])
+            span = (entry['end'] - entry['start']).days
+            window_size = 'month' if span > self.MAX_SINGLE_WINDOW_DAYS else 'none'
+
+            scroll_request = ScrollTimeRequest.objects.create(
+                main_category=subcategory.category.main_category,
+                category=subcategory.category,
+                subcategory=subcategory,
+                start_date_shamsi=start,
+                end_date_shamsi=end,
+                duplicate_handling=self.duplicate_handling,
+                window_size=window_size,
+                auto_save=True,
+                status='processing',
+                created_by=self.created_by,
+            )
+            state = entry['state']
+            self._outcomes[scroll_request.id] = {
+                'subcategory_id': subcategory.id,
+                'previous_hash': state.content_hash if state is not None else '',
+                'previous_watermark': state.last_trade_date_shamsi if state is not None else '',
+                'single_window': window_size == 'none',
+                'records': [],
+                'skipped': False,
+                'clean': True,
+            }
+            jobs.append((scroll_request, split_shamsi_range(start, end, window_size)))
+        return jobs
+
+    async def arun(self, subcategories=None) -> Dict[str, Any]:
+        summary = await super().arun(subcategories)
+        for result in summary['results']:
+            outcome = self._outcomes.get(result['scroll_request_id'], {})
+            result['skipped'] = outcome.get('skipped', False)
+            result['watermark'] = outcome.get('watermark', outcome.get('previous_watermark', ''))
+        summary['skipped_requests'] = sum(1 for result in summary['results'] if result['skipped'])
+        return summary
+
+    def _import_records(self, records: List[Dict[str, Any]], scroll_request: ScrollTimeRequest,
+                        stats: Dict[str, int], coercion_report: CoercionReport):
+        """
+        ذخیره یک بازه؛ اگر پاسخ با آخرین دریافت یکسان باشد ذخیره انجام نمی‌شود
+
+        مقایسه چکیده فقط برای درخواست‌های یک بازه‌ای انجام می‌شود (همگام‌سازی
+        روزانه)؛ در درخواست‌های چند بازه‌ای همه بازه‌ها ذخیره می‌شوند.
+        """
+        outcome = self._outcomes[scroll_request.id]
+        outcome['records'].extend(records)
+
+        if (outcome['single_window'] and not self.force and outcome['previous_hash']
+                and content_digest(records) == outcome['previous_hash']):
+            logger.info(f"Request {scroll_request.id}: content unchanged since last sync, skipping import")
+            outcome['skipped'] = True
+            return
+
+        errors_before = stats['error_records']
+        rejected_before = coercion_report.rejected
+        super()._import_records(records, scroll_request, stats, coercion_report)
+        # خطاهای بیشتر از رکوردهای رد شده در نرمال‌سازی یعنی یک دسته ذخیره نشده است
+        if stats['error_records'] - errors_before > coercion_report.rejected - rejected_before:
+            outcome['clean'] = False
+
+    def _finish_request(self, scroll_request: ScrollTimeRequest, stats: Dict[str, int], error_msg: str):
+        """ثبت نتیجه درخواست و جلو بردن watermark در صورت موفقیت کامل"""
+        super()._finish_request(scroll_request, stats, error_msg)
+
+        outcome = self._outcomes[scroll_request.id]
+        records = outcome.pop('records')
+        if error_msg or not outcome['clean']:
+            logger.warning(f"Request {scroll_request.id}: sync incomplete, watermark not advanced")
+            return
+
+        trade_dates = [
+            value for value in jalali.batch_shamsi_to_gregorian(
+                record.get('date') for record in records
+            )
+            if value is not None and value <= self.end_date
+        ]
+        state = SubCategorySyncState.advance(
+            outcome['subcategory_id'],
+            max(trade_dates) if trade_dates else None,
+            content_digest(records),
+            len(records),
+            scroll_request,
+        )
+        outcome['watermark'] = state.last_trade_date_shamsi
@@ -1,3 +1,140 @@
-from django.test import TestCase
+import json
+from datetime import date
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+
+from data_management.models import AllData
+from price_models.models import PriceData
+from prices.file_import import FileImportService
+from prices.ime_stream import iter_ime_records
+from prices.normalizer import CoercionReport, IMERecordNormalizer
+
+
+class FileImportServiceTests(TestCase):
+    """ورود فایل‌هایی که شناسه‌های IME (xTalarReportPK، arzehPk، Symbol) را ندارند"""
+
+    CSV = (
+        'تاریخ,کالا,قیمت\n'
+        '1403/05/01,ورق,100\n'
+        '1403/05/01,میلگرد,200\n'
+        '1403/05/01,سیمان,300\n'
+    )
+
+    def _import(self, content, duplicate_handling='skip'):
+        uploaded = SimpleUploadedFile('prices.csv', content.encode('utf-8'), content_type='text/csv')
+        return FileImportService().import_file(uploaded, duplicate_handling=duplicate_handling)
+
+    def test_multi_commodity_csv_keeps_every_row(self):
+        result = self._import(self.CSV)
+
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['stats']['imported_records'], 3)
+        self.assertEqual(result['stats']['duplicate_records'], 0)
+        self.assertEqual(
+            sorted(AllData.objects.values_list('commodity_name', 'final_price')),
+            sorted([('ورق', 100), ('میلگرد', 200), ('سیمان', 300)]),
+        )
+        self.assertEqual(PriceData.objects.count(), 3)
+
+    def test_same_commodity_trades_on_one_day_are_kept(self):
+        result = self._import('تاریخ,کالا,قیمت\n1403/05/01,ورق,100\n1403/05/01,ورق,110\n')
+
+        self.assertEqual(result['stats']['imported_records'], 2)
+        self.assertEqual(AllData.objects.filter(commodity_name='ورق').count(), 2)
+
+    def test_reimporting_the_same_file_finds_existing_rows(self):
+        self._import(self.CSV)
+        result = self._import(self.CSV.replace(',100', ',150'), duplicate_handling='update')
+
+        self.assertEqual(result['stats']['duplicate_records'], 3)
+        self.assertEqual(AllData.objects.count(), 3)
+        self.assertEqual(AllData.objects.get(commodity_name='ورق').final_price, 150)
+
+
+class IMEStreamTests(SimpleTestCase):
+    """پارس جریانی پاسخ {"d": "[...]"} باید با هر اندازه تکه برابر json.loads باشد"""
+
+    RECORDS = [
+        {'GoodsName': 'ورق گرم 😀', 'Symbol': 'ST-1', 'Producer': 'فولاد "مبارکه" \\ اصفهان', 'Price': 1},
+        {'GoodsName': '𝕏 میلگرد', 'Symbol': 'ST-2', 'Producer': '🏭🏭', 'Price': 2},
+        {'GoodsName': 'سیمان', 'Symbol': 'ST-3', 'Producer': 'a\nb\tc', 'Price': 3},
+    ]
+
+    @staticmethod
+    def _chunks(body, size):
+        return [body[index:index + size] for index in range(0, len(body), size)]
+
+    def test_chunked_parsing_matches_json_loads(self):
+        # آرایه داخلی بدون escape و شیء بیرونی با escape نویسه‌های خارج از BMP (جفت surrogate)
+        body = json.dumps({'d': json.dumps(self.RECORDS, ensure_ascii=False)}).encode('utf-8')
+        expected = json.loads(json.loads(body)['d'])
+
+        for size in range(1, len(body) + 1):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(list(iter_ime_records(self._chunks(body, size))), expected)
+
+    def test_chunked_array_body_matches_json_loads(self):
+        body = json.dumps(self.RECORDS, ensure_ascii=False).encode('utf-8')
+
+        for size in range(1, 40):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(list(iter_ime_records(self._chunks(body, size))), self.RECORDS)
+
+
+class IMERecordNormalizerTests(SimpleTestCase):
+    """تبدیل هر نوع فیلد نقشه IME_FIELDS"""
+
+    RECORD = {'GoodsName': 'ورق گرم', 'Symbol': 'ST-1', 'Price': 1000, 'date': '1403/05/01'}
+
+    def setUp(self):
+        self.normalizer = IMERecordNormalizer()
+        self.report = CoercionReport()
+
+    def _normalize(self, **fields):
+        row = self.normalizer.normalize({**self.RECORD, **fields}, self.report)
+        return None if row is None else self.normalizer.values(row)
+
+    def test_text_is_truncated_to_field_length(self):
+        values = self._normalize(GoodsName='ک' * 150, Symbol=12345)
+
+        self.assertEqual(values['commodity_name'], 'ک' * 100)
+        self.assertEqual(values['symbol'], '12345')
+        self.assertEqual(self.report.truncated, {'commodity_name': 1})
+
+    def test_decimal_outside_field_range_falls_back_to_default(self):
+        self.assertEqual(self._normalize(Price='۱٬۲۵۰')['final_price'], 1250)
+        self.assertEqual(self._normalize(Price='12.5')['final_price'], 12.5)
+        self.assertIsNone(self._normalize(Price=10 ** 13)['final_price'])
+        self.assertIsNone(self._normalize(Price='abc')['final_price'])
+        self.assertEqual(self.report.failures, {'final_price': 2})
+
+    def test_integer_coercion(self):
+        values = self._normalize(Quantity='2,000', TotalPrice=3.6, arze='x')
+
+        self.assertEqual(values['contract_volume'], 2000)
+        self.assertEqual(values['transaction_value'], 4)
+        self.assertEqual(values['offer_volume'], 0)
+        self.assertEqual(self.report.failures, {'offer_volume': 1})
+
+    def test_invalid_jalali_date_rejects_the_record(self):
+        self.assertIsNone(self._normalize(date='1403/13/01'))
+        self.assertIsNone(self._normalize(date=None))
+        self.assertEqual(self.report.rows, 2)
+        self.assertEqual(self.report.rejected, 2)
+        self.assertEqual(self.report.failures, {'transaction_date': 2})
+
+    def test_jalali_date_columns(self):
+        values = self._normalize(date='۱۴۰۳-۵-۱')
+
+        self.assertEqual(values['transaction_date'], '1403/05/01')
+        self.assertEqual(values['trade_date'], date(2024, 7, 22))
+        self.assertEqual(values['jalali_date_key'], 14030501)
+
+    def test_first_non_empty_source_is_used(self):
+        values = self._normalize(xTalarReportPK='', XTalarReportPK=987, arzehPk=5, ArzehPK=6)
+
+        self.assertEqual(values['x_talar_report_pk'], 987)
+        self.assertEqual(values['arzeh_pk'], 5)
+        self.assertEqual(self._normalize()['x_talar_report_pk'], 0)
+        self.assertFalse(self.report.has_issues)
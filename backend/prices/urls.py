@@ -1,5 +1,4 @@
 from django.urls import path
-from django.http import JsonResponse
 from .views import PriceDataImportView
 from .scroll_time_views import (
     ScrollTimeCreateView,
@@ -8,6 +7,7 @@ from .scroll_time_views import (
     ScrollTimeCompletedView,
     ajax_get_categories,
     ajax_get_subcategories,
+    ajax_scroll_time_status,
 )
 
 app_name = 'prices'
@@ -25,5 +25,5 @@ urlpatterns = [
     # AJAX URLs
     path('ajax/categories/', ajax_get_categories, name='ajax_get_categories'),
     path('ajax/subcategories/', ajax_get_subcategories, name='ajax_get_subcategories'),
-    path('ajax/scroll-time-status/', lambda request: JsonResponse({'success': False, 'error': 'Not implemented'}), name='ajax_scroll_time_status'),
+    path('ajax/scroll-time-status/', ajax_scroll_time_status, name='ajax_scroll_time_status'),
 ]
@@ -5,6 +5,8 @@ from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from django.http import JsonResponse
 from price_models.models import PriceData, DataImportLog
+from .file_import import FileImportService
+from .forms import DataImportForm
 
 # Create your views here.
 
@@ -22,11 +24,34 @@ class PriceDataImportView(TemplateView):
         return context
     
     def post(self, request, *args, **kwargs):
-        # Handle file upload and import logic here
-        if 'import_file' in request.FILES:
-            # Add your import logic here
-            messages.success(request, 'فایل با موفقیت آپلود شد!')
+        if 'import_file' not in request.FILES:
+            messages.error(request, 'فایلی انتخاب نشده است!')
+            return self.get(request, *args, **kwargs)
+        
+        import_file = request.FILES['import_file']
+        if not FileImportService.is_supported(import_file.name):
+            messages.error(request, 'فقط فایل‌های CSV (.csv) و Excel (.xlsx) پشتیبانی می‌شوند.')
+            return self.get(request, *args, **kwargs)
+        
+        duplicate_handling = request.POST.get('duplicate_handling', 'skip')
+        if duplicate_handling not in dict(DataImportForm.DUPLICATE_HANDLING_CHOICES):
+            duplicate_handling = 'skip'
+        
+        result = FileImportService().import_file(
+            import_file,
+            duplicate_handling=duplicate_handling,
+            commodity_name=request.POST.get('commodity_name', ''),
+            created_by=request.user.get_username(),
+        )
+        if not result['success']:
+            messages.error(request, result['error'])
             return redirect('price_data_import')
         
-        messages.error(request, 'فایلی انتخاب نشده است!')
-        return self.get(request, *args, **kwargs)
+        stats = result['stats']
+        messages.success(
+            request,
+            f"فایل با موفقیت وارد شد: {stats['total_records']} ردیف، {stats['imported_records']} رکورد وارد شد "
+            f"({stats['updated_records']} بروزرسانی، {stats['duplicate_records']} تکراری، "
+            f"{stats['error_records']} خطا)"
+        )
+        return redirect('price_data_import')
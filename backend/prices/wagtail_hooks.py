@@ -10,6 +10,7 @@ from data_management.models import AllData
 from price_display.models import PricePage, PriceIndexPage
 from price_models.models import PriceData, DataImportLog
 from price_data_ingestion.models import ScrollTimeRequest, MainCategory, Category, SubCategory
+from .file_import import FileImportService
 from .forms import DataImportForm
 
 
@@ -117,27 +118,40 @@ class ImportView(CreateView):
     def get_form_class(self):
         return DataImportForm
     
+    def get_form_kwargs(self):
+        # DataImportForm یک ModelForm نیست؛ instance و for_user به آن داده نمی‌شوند
+        kwargs = {'initial': self.get_initial()}
+        if self.request.method in ('POST', 'PUT'):
+            kwargs.update(data=self.request.POST, files=self.request.FILES)
+        return kwargs
+    
     def form_valid(self, form):
-        # Process the uploaded file
+        # ورود جریانی فایل آپلود شده (DataImportLog در FileImportService ساخته و بروز می‌شود)
         file = form.cleaned_data.get('import_file')
         commodity = form.cleaned_data.get('commodity_name')
+        if not file:
+            form.add_error('import_file', 'فایلی انتخاب نشده است!')
+            return self.form_invalid(form)
         
-        # Create import log
-        import_log = DataImportLog.objects.create(
+        result = FileImportService().import_file(
+            file,
+            duplicate_handling=form.cleaned_data['duplicate_handling'],
             commodity_name=commodity,
             start_date=form.cleaned_data.get('start_date'),
             end_date=form.cleaned_data.get('end_date'),
-            status='در حال پردازش',
-            total_records=0,
-            created_by=self.request.user
+            created_by=self.request.user.get_username(),
         )
+        if not result['success']:
+            messages.error(self.request, result['error'])
+            return HttpResponseRedirect(self.index_url)
         
-        # Logic for processing the file would go here
-        # For now, just report success
-        import_log.status = 'تکمیل شده'
-        import_log.save()
-        
-        messages.success(self.request, f'فایل برای {commodity} با موفقیت آپلود و پردازش شد!')
+        stats = result['stats']
+        messages.success(
+            self.request,
+            f"فایل برای {commodity} پردازش شد: {stats['imported_records']} رکورد وارد شد "
+            f"({stats['updated_records']} بروزرسانی، {stats['duplicate_records']} تکراری، "
+            f"{stats['error_records']} خطا)"
+        )
         return HttpResponseRedirect(self.index_url)
 
 
@@ -181,6 +181,10 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Cache دیسکی پاسخ‌های API سازمان بورس (default / refresh / offline / off)
+IME_RESPONSE_CACHE_DIR = env.get("IME_RESPONSE_CACHE_DIR", os.path.join(BASE_DIR, "cache", "ime_responses"))
+IME_RESPONSE_CACHE_MODE = env.get("IME_RESPONSE_CACHE_MODE", "default")
+
 
 # Wagtail settings
 